@@ -1,3 +1,300 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
+from django.core.paginator import Paginator
+from django.db import connections
+from django.urls import NoReverseMatch, reverse
+from django.utils.functional import cached_property
+from django.utils.text import Truncator
 
-# Register your models here.
+from loja.models import (
+  Avaliacao, EspecificacaoProduto, Fornecedor, HistoricoPedido, HistoricoPedidoArquivado, ItemPedido, Pagamento,
+  PagamentoDiario, Pedido, Produto, ResumoAvaliacaoProduto, ServicoFretagem, Usuario, VendaDiariaFornecedor,
+  VendaDiariaProduto,
+)
+from loja.routers import usar_replica
+
+
+def estimar_linhas(modelo, alias):
+  """Estimativa do número de linhas mantida pelo banco; None quando o banco não oferece uma."""
+  conexao = connections[alias]
+  tabela = modelo._meta.db_table
+  with conexao.cursor() as cursor:
+    if conexao.vendor == 'mysql':
+      cursor.execute(
+        "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        [tabela],
+      )
+    elif conexao.vendor == 'postgresql':
+      cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [tabela])
+    else:
+      return None
+    linha = cursor.fetchone()
+  if linha is None or linha[0] is None or linha[0] < 0:
+    return None
+  return int(linha[0])
+
+
+class PaginadorEstimado(Paginator):
+  """
+  Evita o COUNT(*) exato nas listagens sem filtro de tabelas grandes, usando a estimativa
+  de linhas do banco. Abaixo do limiar, ou com filtros aplicados, conta normalmente.
+  """
+  limiar = 100_000
+
+  @cached_property
+  def count(self):
+    query = getattr(self.object_list, 'query', None)
+    if query is not None and not query.where:
+      estimativa = estimar_linhas(self.object_list.model, self.object_list.db)
+      if estimativa is not None and estimativa >= self.limiar:
+        return estimativa
+    return super().count
+
+
+class RotuloPreCarregadoWidget(ForeignKeyRawIdWidget):
+  """Raw id cujo rótulo vem de objetos já carregados, em vez de um SELECT por linha do inline."""
+
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.objetos = {}
+
+  def label_and_url_for_value(self, value):
+    objeto = self.objetos.get(str(value))
+    if objeto is None:
+      return super().label_and_url_for_value(value)
+    # Mesmo rótulo e link do ForeignKeyRawIdWidget, sem o SELECT.
+    opcoes = objeto._meta
+    try:
+      url = reverse(f'{self.admin_site.name}:{opcoes.app_label}_{opcoes.model_name}_change', args=(objeto.pk,))
+    except NoReverseMatch:
+      url = ''
+    return Truncator(objeto).words(14), url
+
+
+class InlinePreCarregado(admin.TabularInline):
+  extra = 0
+  precarregar = ()
+
+  def formfield_for_foreignkey(self, db_field, request, **kwargs):
+    if db_field.name in self.precarregar:
+      kwargs['widget'] = RotuloPreCarregadoWidget(db_field.remote_field, self.admin_site, using=kwargs.get('using'))
+    return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+  def get_queryset(self, request):
+    return super().get_queryset(request).select_related(*self.precarregar)
+
+  def get_formset(self, request, obj=None, **kwargs):
+    formset = super().get_formset(request, obj, **kwargs)
+    if obj is not None and obj.pk is not None:
+      # O admin chama get_formset mais de uma vez por requisição; carrega os filhos uma vez só.
+      cache = request.__dict__.setdefault('_loja_inlines_precarregados', {})
+      chave = (type(self), obj.pk)
+      if chave not in cache:
+        cache[chave] = list(self.get_queryset(request).filter(**{formset.fk.name: obj}))
+      filhos = cache[chave]
+      for campo in self.precarregar:
+        formfield = formset.form.base_fields.get(campo)
+        if formfield is None:
+          continue
+        formfield.widget.objetos = {
+          str(getattr(filho, f'{campo}_id')): getattr(filho, campo)
+          for filho in filhos if getattr(filho, f'{campo}_id') is not None
+        }
+    return formset
+
+
+class TabelaGrandeAdmin(admin.ModelAdmin):
+  paginator = PaginadorEstimado
+  show_full_result_count = False
+  list_per_page = 50
+
+  def changelist_view(self, request, extra_context=None):
+    if request.method != 'GET':
+      return super().changelist_view(request, extra_context)
+    # A listagem é só leitura: vai para a réplica, inclusive a renderização, que é
+    # quando a página de resultados é consultada.
+    with usar_replica():
+      response = super().changelist_view(request, extra_context)
+      if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+class ItemPedidoInline(InlinePreCarregado):
+  model = ItemPedido
+  raw_id_fields = ('produto', 'especificacao')
+  precarregar = ('produto', 'especificacao')
+
+  def get_queryset(self, request):
+    return super().get_queryset(request).select_related('especificacao__produto')
+
+
+class PagamentoInline(InlinePreCarregado):
+  model = Pagamento
+
+
+class UsuarioForm(forms.ModelForm):
+  """O hash gravado não é editável: a senha só muda pelo campo nova_senha, via definir_senha()."""
+  nova_senha = forms.CharField(
+    label='Nova senha', required=False, strip=False, widget=forms.PasswordInput,
+    help_text='Deixe em branco para manter a senha atual.',
+  )
+
+  class Meta:
+    model = Usuario
+    fields = ('nome', 'email')
+
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    if self.instance.pk is None:
+      self.fields['nova_senha'].required = True
+      self.fields['nova_senha'].help_text = ''
+
+  def clean(self):
+    dados = super().clean()
+    if dados.get('nova_senha'):
+      # Antes do full_clean() do modelo, que confere o tamanho da senha em texto.
+      self.instance.definir_senha(dados['nova_senha'])
+    return dados
+
+
+@admin.register(Usuario)
+class UsuarioAdmin(admin.ModelAdmin):
+  form = UsuarioForm
+  fields = ('nome', 'email', 'nova_senha')
+  list_display = ('nome', 'email')
+  search_fields = ('email', 'nome')
+  ordering = ('nome',)
+
+
+@admin.register(Fornecedor)
+class FornecedorAdmin(admin.ModelAdmin):
+  list_display = ('nome', 'cnpj', 'email', 'telefone')
+  search_fields = ('nome', 'cnpj')
+  ordering = ('nome',)
+
+
+@admin.register(Produto)
+class ProdutoAdmin(TabelaGrandeAdmin):
+  list_display = ('nome', 'preco', 'estoque', 'fornecedor')
+  list_select_related = ('fornecedor',)
+  autocomplete_fields = ('fornecedor',)
+  search_fields = ('nome',)
+
+
+@admin.register(EspecificacaoProduto)
+class EspecificacaoProdutoAdmin(TabelaGrandeAdmin):
+  list_display = ('__str__', 'tamanho', 'cor', 'preco_adicional')
+  list_select_related = ('produto',)
+  raw_id_fields = ('produto',)
+
+
+@admin.register(Pedido)
+class PedidoAdmin(TabelaGrandeAdmin):
+  list_display = ('id', 'usuario', 'data_pedido', 'status', 'valor_total', 'quantidade_itens', 'situacao_pagamento')
+  list_select_related = ('usuario',)
+  list_filter = ('status', 'situacao_pagamento', ('data_pedido', admin.DateFieldListFilter))
+  raw_id_fields = ('usuario',)
+  ordering = ('-data_pedido', '-id')
+  inlines = (ItemPedidoInline, PagamentoInline)
+
+  def get_readonly_fields(self, request, obj=None):
+    # O total é mantido pelos sinais de loja.totais e o pagamento pela conciliação (loja.conciliacao).
+    if obj is None:
+      return ('valor_pago', 'situacao_pagamento')
+    return ('valor_total', 'quantidade_itens', 'valor_pago', 'situacao_pagamento')
+
+
+@admin.register(ItemPedido)
+class ItemPedidoAdmin(TabelaGrandeAdmin):
+  list_display = ('__str__', 'produto', 'quantidade', 'preco_unitario')
+  list_select_related = ('produto',)
+  raw_id_fields = ('pedido', 'produto', 'especificacao')
+
+
+@admin.register(Pagamento)
+class PagamentoAdmin(TabelaGrandeAdmin):
+  list_display = ('__str__', 'forma_pagamento', 'data_pagamento', 'valor_pagamento')
+  list_filter = ('forma_pagamento', ('data_pagamento', admin.DateFieldListFilter))
+  raw_id_fields = ('pedido',)
+
+
+@admin.register(Avaliacao)
+class AvaliacaoAdmin(TabelaGrandeAdmin):
+  list_display = ('__str__', 'usuario', 'nota')
+  list_select_related = ('produto', 'usuario')
+  list_filter = ('nota',)
+  raw_id_fields = ('produto', 'usuario')
+
+
+@admin.register(ResumoAvaliacaoProduto)
+class ResumoAvaliacaoProdutoAdmin(TabelaGrandeAdmin):
+  list_display = ('produto', 'total', 'media')
+  list_select_related = ('produto',)
+  readonly_fields = [campo.name for campo in ResumoAvaliacaoProduto._meta.fields]
+
+  def has_add_permission(self, request):
+    return False
+
+  def has_change_permission(self, request, obj=None):
+    return False
+
+
+@admin.register(HistoricoPedido)
+class HistoricoPedidoAdmin(TabelaGrandeAdmin):
+  list_display = ('__str__', 'data_alteracao', 'status_anterior', 'status_atual')
+  list_filter = (('data_alteracao', admin.DateFieldListFilter),)
+  raw_id_fields = ('pedido',)
+
+
+@admin.register(HistoricoPedidoArquivado)
+class HistoricoPedidoArquivadoAdmin(TabelaGrandeAdmin):
+  list_display = ('__str__', 'data_alteracao', 'status_anterior', 'status_atual')
+  list_filter = (('data_alteracao', admin.DateFieldListFilter),)
+  readonly_fields = [campo.name for campo in HistoricoPedidoArquivado._meta.fields]
+
+  def has_add_permission(self, request):
+    return False
+
+  def has_change_permission(self, request, obj=None):
+    return False
+
+
+@admin.register(ServicoFretagem)
+class ServicoFretagemAdmin(TabelaGrandeAdmin):
+  list_display = ('nome_transportadora', 'pedido_id', 'tipo_servico', 'preco_fretagem', 'prazo_entrega')
+  raw_id_fields = ('pedido',)
+
+
+class ConsolidadoAdmin(TabelaGrandeAdmin):
+  """Consolidados diários (loja.consolidados): só leitura, corrigidos com manage.py loja_rollup."""
+  list_filter = (('data', admin.DateFieldListFilter),)
+  date_hierarchy = 'data'
+
+  def get_readonly_fields(self, request, obj=None):
+    return [campo.name for campo in self.model._meta.fields]
+
+  def has_add_permission(self, request):
+    return False
+
+  def has_change_permission(self, request, obj=None):
+    return False
+
+
+@admin.register(VendaDiariaProduto)
+class VendaDiariaProdutoAdmin(ConsolidadoAdmin):
+  list_display = ('data', 'produto_id', 'itens', 'unidades', 'receita')
+  raw_id_fields = ('produto',)
+
+
+@admin.register(VendaDiariaFornecedor)
+class VendaDiariaFornecedorAdmin(ConsolidadoAdmin):
+  list_display = ('data', 'fornecedor_id', 'itens', 'unidades', 'receita')
+  raw_id_fields = ('fornecedor',)
+
+
+@admin.register(PagamentoDiario)
+class PagamentoDiarioAdmin(ConsolidadoAdmin):
+  list_display = ('data', 'forma_pagamento', 'quantidade', 'valor')
+  list_filter = (('data', admin.DateFieldListFilter), 'forma_pagamento')
@@ -0,0 +1,298 @@
+import datetime
+import json
+import os
+import shutil
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import router
+from django.utils import timezone
+
+from loja.models import ItemPedido, Pedido, Produto
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+PADROES = {
+  # Onde fica o instantâneo colunar; cada geração numa subpasta, a vigente apontada por ATUAL.
+  'DIRETORIO': str(Path(__file__).resolve().parent.parent / 'var' / 'analise'),
+  'TAMANHO_LOTE': 50000,
+  # Idade máxima (s) do instantâneo antes de ser extraído de novo; None nunca expira.
+  'MAX_IDADE': 3600,
+}
+ATUAL = 'ATUAL'
+META = 'meta.json'
+
+
+def configuracao():
+  return {**PADROES, **getattr(settings, 'LOJA_ANALISE', {})}
+
+
+def _exigir_numpy():
+  if np is None:
+    raise ImproperlyConfigured("loja.analise precisa do numpy: pip install -r requirements-analise.txt.")
+
+
+def _inteiros(valores):
+  return np.fromiter(valores, dtype=np.int64, count=len(valores))
+
+
+def _centavos(valores):
+  return np.fromiter((int(valor.scaleb(2)) for valor in valores), dtype=np.int64, count=len(valores))
+
+
+def _reais(centavos):
+  return Decimal(int(centavos)).scaleb(-2)
+
+
+# Cada tabela: modelo, campos lidos e como cada coluna sai das linhas do lote. Valores
+# monetários viram centavos em int64, para somas exatas.
+TABELAS = {
+  'pedidos': (
+    Pedido, ('pk', 'data_pedido', 'valor_total', 'quantidade_itens'),
+    {
+      'id': lambda colunas: _inteiros(colunas[0]),
+      'data': lambda colunas: np.array(colunas[1], dtype='datetime64[D]'),
+      'valor_total': lambda colunas: _centavos(colunas[2]),
+      'unidades': lambda colunas: _inteiros(colunas[3]),
+    },
+  ),
+  'itens': (
+    ItemPedido, ('pk', 'pedido_id', 'produto_id', 'quantidade', 'preco_unitario'),
+    {
+      'pedido_id': lambda colunas: _inteiros(colunas[1]),
+      'produto_id': lambda colunas: _inteiros(colunas[2]),
+      'quantidade': lambda colunas: _inteiros(colunas[3]),
+      'receita': lambda colunas: _inteiros(colunas[3]) * _centavos(colunas[4]),
+    },
+  ),
+  'produtos': (
+    Produto, ('pk', 'fornecedor_id'),
+    {
+      'id': lambda colunas: _inteiros(colunas[0]),
+      'fornecedor_id': lambda colunas: _inteiros(colunas[1]),
+    },
+  ),
+}
+
+
+class Instantaneo:
+  """
+  Cópia colunar de Pedido, ItemPedido e Produto: ``tabelas[nome][coluna]`` é um array
+  numpy, em ordem de pk. Aberto do disco, os arrays são mapeados em memória (só leitura)
+  e as páginas só são lidas quando um relatório as usa.
+  """
+
+  def __init__(self, tabelas, gerado_em):
+    self.tabelas = tabelas
+    self.gerado_em = gerado_em
+
+  def __getitem__(self, tabela):
+    return self.tabelas[tabela]
+
+  def idade(self):
+    return (timezone.now() - self.gerado_em).total_seconds()
+
+
+def _extrair_tabela(modelo, campos, colunas, tamanho_lote, using):
+  """Lê a tabela em faixas de pk, convertendo cada lote em arrays antes de buscar o próximo."""
+  partes = {coluna: [] for coluna in colunas}
+  linhas = modelo.objects.using(using).order_by('pk').values_list(*campos)
+  ultimo = 0
+  while lote := list(linhas.filter(pk__gt=ultimo)[:tamanho_lote]):
+    valores = list(zip(*lote))
+    for coluna, converter in colunas.items():
+      partes[coluna].append(converter(valores))
+    ultimo = lote[-1][0]
+  return {
+    coluna: np.concatenate(arrays) if arrays else converter([[] for _ in campos])
+    for (coluna, arrays), converter in zip(partes.items(), colunas.values())
+  }
+
+
+def extrair(tamanho_lote=None, using=None):
+  _exigir_numpy()
+  tamanho_lote = tamanho_lote or configuracao()['TAMANHO_LOTE']
+  using = using or router.db_for_read(Pedido)
+  gerado_em = timezone.now()
+  return Instantaneo(
+    {
+      nome: _extrair_tabela(modelo, campos, colunas, tamanho_lote, using)
+      for nome, (modelo, campos, colunas) in TABELAS.items()
+    },
+    gerado_em,
+  )
+
+
+def gravar(instantaneo, diretorio=None):
+  """
+  Grava cada coluna num .npy dentro de uma pasta nova e só então aponta ATUAL para ela
+  (os.replace), então quem está lendo nunca vê uma geração pela metade. Ficam a geração
+  nova e a anterior, que pode ainda estar mapeada por outro processo.
+  """
+  _exigir_numpy()
+  diretorio = Path(diretorio or configuracao()['DIRETORIO'])
+  geracao = instantaneo.gerado_em.strftime('%Y%m%dT%H%M%S%f')
+  pasta = diretorio / geracao
+  pasta.mkdir(parents=True, exist_ok=True)
+  for tabela, colunas in instantaneo.tabelas.items():
+    for coluna, valores in colunas.items():
+      np.save(pasta / f'{tabela}.{coluna}.npy', valores)
+  meta = {
+    'gerado_em': instantaneo.gerado_em.isoformat(),
+    'tabelas': {tabela: sorted(colunas) for tabela, colunas in instantaneo.tabelas.items()},
+  }
+  (pasta / META).write_text(json.dumps(meta), encoding='utf-8')
+
+  anterior = _geracao_atual(diretorio)
+  provisorio = diretorio / f'{ATUAL}.{os.getpid()}'
+  provisorio.write_text(geracao, encoding='utf-8')
+  os.replace(provisorio, diretorio / ATUAL)
+  for antiga in diretorio.iterdir():
+    if antiga.is_dir() and antiga.name not in (geracao, anterior):
+      shutil.rmtree(antiga, ignore_errors=True)
+  return pasta
+
+
+def _geracao_atual(diretorio):
+  try:
+    return (diretorio / ATUAL).read_text(encoding='utf-8').strip()
+  except FileNotFoundError:
+    return None
+
+
+def abrir(diretorio=None):
+  """A geração vigente do disco, com as colunas mapeadas em memória; None se não houver."""
+  _exigir_numpy()
+  diretorio = Path(diretorio or configuracao()['DIRETORIO'])
+  geracao = _geracao_atual(diretorio)
+  if geracao is None:
+    return None
+  pasta = diretorio / geracao
+  meta = json.loads((pasta / META).read_text(encoding='utf-8'))
+  tabelas = {
+    tabela: {coluna: np.load(pasta / f'{tabela}.{coluna}.npy', mmap_mode='r') for coluna in colunas}
+    for tabela, colunas in meta['tabelas'].items()
+  }
+  return Instantaneo(tabelas, datetime.datetime.fromisoformat(meta['gerado_em']))
+
+
+def instantaneo(max_idade=None, atualizar=False, diretorio=None, tamanho_lote=None, using=None):
+  """
+  O instantâneo do disco se tiver menos de ``max_idade`` segundos (padrão MAX_IDADE);
+  senão, ou com ``atualizar``, extrai um novo do banco, grava e o devolve mapeado.
+  """
+  config = configuracao()
+  max_idade = config['MAX_IDADE'] if max_idade is None else max_idade
+  if not atualizar:
+    atual = abrir(diretorio)
+    if atual is not None and (max_idade is None or atual.idade() <= max_idade):
+      return atual
+  gravar(extrair(tamanho_lote=tamanho_lote, using=using), diretorio)
+  return abrir(diretorio)
+
+
+# Relatórios
+
+def _somar_por(chaves, *valores):
+  """GROUP BY vetorizado: as chaves distintas, quantas linhas cada uma tem e a soma de cada coluna."""
+  ordem = np.argsort(chaves, kind='stable')
+  chaves = chaves[ordem]
+  inicios = np.flatnonzero(np.r_[True, chaves[1:] != chaves[:-1]]) if len(chaves) else np.array([], dtype=np.intp)
+  contagens = np.diff(np.r_[inicios, len(chaves)])
+  somas = [
+    np.add.reduceat(np.asarray(coluna)[ordem], inicios) if len(inicios) else np.array([], dtype=np.int64)
+    for coluna in valores
+  ]
+  return chaves[inicios], contagens, somas
+
+
+def _no_periodo(datas, inicio, fim):
+  filtro = np.ones(len(datas), dtype=bool)
+  if inicio is not None:
+    filtro &= datas >= np.datetime64(inicio, 'D')
+  if fim is not None:
+    filtro &= datas <= np.datetime64(fim, 'D')
+  return filtro
+
+
+def _itens_do_periodo(instantaneo, inicio, fim):
+  """Máscara dos itens cujo pedido caiu no período. Itens de pedidos fora do instantâneo ficam de fora."""
+  pedidos, itens = instantaneo['pedidos'], instantaneo['itens']
+  if not len(pedidos['id']):
+    return np.zeros(len(itens['pedido_id']), dtype=bool)
+  posicoes = np.minimum(np.searchsorted(pedidos['id'], itens['pedido_id']), len(pedidos['id']) - 1)
+  encontrados = pedidos['id'][posicoes] == itens['pedido_id']
+  return encontrados & _no_periodo(pedidos['data'][posicoes], inicio, fim)
+
+
+def receita_por_dia(instantaneo, inicio=None, fim=None):
+  """Pedidos, unidades e valor_total somado por dia do pedido, de ``inicio`` a ``fim`` (inclusive)."""
+  _exigir_numpy()
+  pedidos = instantaneo['pedidos']
+  filtro = _no_periodo(pedidos['data'], inicio, fim)
+  dias, contagens, (unidades, receita) = _somar_por(
+    np.asarray(pedidos['data'][filtro]), pedidos['unidades'][filtro], pedidos['valor_total'][filtro],
+  )
+  return [
+    {'data': dia.item(), 'pedidos': int(quantos), 'unidades': int(soma_unidades), 'receita': _reais(soma_receita)}
+    for dia, quantos, soma_unidades, soma_receita in zip(dias, contagens, unidades, receita)
+  ]
+
+
+def tamanho_cestas(instantaneo, inicio=None, fim=None):
+  """Distribuição do tamanho das cestas: unidades e linhas de item por pedido do período."""
+  _exigir_numpy()
+  pedidos, itens = instantaneo['pedidos'], instantaneo['itens']
+  filtro = _no_periodo(pedidos['data'], inicio, fim)
+  unidades = np.asarray(pedidos['unidades'][filtro])
+  if not len(unidades):
+    return {
+      'pedidos': 0, 'media_unidades': None, 'mediana_unidades': None, 'p90_unidades': None,
+      'media_itens': None, 'distribuicao': {},
+    }
+  # Linhas de item por pedido: contagem dos pedido_id dos itens, alinhada à ordem dos pedidos.
+  ids = np.asarray(pedidos['id'][filtro])
+  posicoes = np.searchsorted(ids, itens['pedido_id'])
+  posicoes = np.minimum(posicoes, len(ids) - 1)
+  do_periodo = ids[posicoes] == itens['pedido_id']
+  linhas = np.bincount(posicoes[do_periodo], minlength=len(ids))
+  valores, quantos = np.unique(unidades, return_counts=True)
+  return {
+    'pedidos': int(len(unidades)),
+    'media_unidades': float(unidades.mean()),
+    'mediana_unidades': float(np.median(unidades)),
+    'p90_unidades': float(np.percentile(unidades, 90)),
+    'media_itens': float(linhas.mean()),
+    'distribuicao': {int(valor): int(quantidade) for valor, quantidade in zip(valores, quantos)},
+  }
+
+
+CRITERIOS = ('receita', 'unidades')
+
+
+def mais_vendidos(instantaneo, inicio=None, fim=None, limite=10, criterio='receita'):
+  """Os ``limite`` produtos com mais receita (ou unidades) no período; empates pelo menor id."""
+  _exigir_numpy()
+  if criterio not in CRITERIOS:
+    raise ValueError(f"Critério inválido: {criterio}. Use {' ou '.join(CRITERIOS)}.")
+  itens, produtos = instantaneo['itens'], instantaneo['produtos']
+  filtro = _itens_do_periodo(instantaneo, inicio, fim)
+  ids, linhas, (unidades, receita) = _somar_por(
+    np.asarray(itens['produto_id'][filtro]), itens['quantidade'][filtro], itens['receita'][filtro],
+  )
+  medida = receita if criterio == 'receita' else unidades
+  ordem = np.lexsort((ids, -medida))[:limite]
+  posicoes = np.minimum(np.searchsorted(produtos['id'], ids[ordem]), max(len(produtos['id']) - 1, 0))
+  return [
+    {
+      'produto_id': int(ids[i]),
+      'fornecedor_id': int(produtos['fornecedor_id'][posicao]) if produtos['id'][posicao] == ids[i] else None,
+      'itens': int(linhas[i]), 'unidades': int(unidades[i]), 'receita': _reais(receita[i]),
+    }
+    for i, posicao in zip(ordem, posicoes)
+  ]
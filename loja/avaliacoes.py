@@ -0,0 +1,97 @@
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, F
+
+from loja.models import Avaliacao, ResumoAvaliacaoProduto
+from loja.services import lotes_por_chave
+
+TAMANHO_LOTE = 5000
+
+
+def _histograma(nota):
+  # Notas fora de 0–5 só passam se o save() for chamado sem full_clean(); não entram no histograma.
+  return [f'nota_{nota}'] if 0 <= nota <= 5 else []
+
+
+def _aplicar(produto_id, nota, sinal, using):
+  """Soma (sinal=1) ou retira (sinal=-1) uma nota do resumo com um UPDATE atômico."""
+  atualizacao = {'total': F('total') + sinal, 'soma': F('soma') + sinal * nota}
+  atualizacao.update({campo: F(campo) + sinal for campo in _histograma(nota)})
+  resumos = ResumoAvaliacaoProduto.objects.using(using).filter(produto_id=produto_id)
+  if resumos.update(**atualizacao) or sinal < 0:
+    return
+  try:
+    with transaction.atomic(using=using):
+      ResumoAvaliacaoProduto.objects.using(using).create(
+        produto_id=produto_id, total=1, soma=nota, **{campo: 1 for campo in _histograma(nota)},
+      )
+  except IntegrityError:
+    # Outra transação criou o resumo entre o UPDATE e o INSERT.
+    resumos.update(**atualizacao)
+
+
+def avaliacao_salva(avaliacao, created, using=None):
+  using = using or router.db_for_write(ResumoAvaliacaoProduto)
+  atual = (avaliacao.produto_id, int(avaliacao.nota))
+  if not created:
+    carregados = avaliacao.valores_carregados()
+    anterior = (carregados.get('produto_id', atual[0]), int(carregados.get('nota', atual[1])))
+    if anterior == atual:
+      return
+    _aplicar(*anterior, -1, using)
+  _aplicar(*atual, 1, using)
+
+
+def avaliacao_removida(avaliacao, using=None):
+  using = using or router.db_for_write(ResumoAvaliacaoProduto)
+  carregados = avaliacao.valores_carregados()
+  _aplicar(
+    carregados.get('produto_id', avaliacao.produto_id),
+    int(carregados.get('nota', avaliacao.nota)),
+    -1,
+    using,
+  )
+
+
+def _resumos_agrupados(contagens):
+  """Agrupa linhas (produto_id, nota, quantidade) ordenadas por produto em resumos."""
+  resumo = None
+  for produto_id, nota, quantidade in contagens:
+    if resumo is None or resumo.produto_id != produto_id:
+      if resumo is not None:
+        yield resumo
+      resumo = ResumoAvaliacaoProduto(produto_id=produto_id)
+    resumo.total += quantidade
+    resumo.soma += nota * quantidade
+    for campo in _histograma(nota):
+      setattr(resumo, campo, getattr(resumo, campo) + quantidade)
+  if resumo is not None:
+    yield resumo
+
+
+def reconstruir_resumos(tamanho_lote=TAMANHO_LOTE, using=None):
+  """
+  Recria todos os resumos a partir de Avaliacao em memória constante: o banco agrupa por
+  (produto, nota) e o resultado, no máximo seis linhas por produto, é lido em lotes por
+  (produto, nota) com lotes_por_chave e gravado em lotes.
+  """
+  using = using or router.db_for_write(ResumoAvaliacaoProduto)
+  contagens = (
+    Avaliacao.objects.using(using)
+    .values_list('produto_id', 'nota')
+    .annotate(quantidade=Count('pk'))
+  )
+  linhas = (
+    linha for lote in lotes_por_chave(contagens, tamanho_lote, ('produto_id', 'nota')) for linha in lote
+  )
+  gravados, lote = 0, []
+  with transaction.atomic(using=using):
+    ResumoAvaliacaoProduto.objects.using(using).all().delete()
+    for resumo in _resumos_agrupados(linhas):
+      lote.append(resumo)
+      if len(lote) >= tamanho_lote:
+        ResumoAvaliacaoProduto.objects.using(using).bulk_create(lote)
+        gravados += len(lote)
+        lote = []
+    ResumoAvaliacaoProduto.objects.using(using).bulk_create(lote)
+    gravados += len(lote)
+  return gravados
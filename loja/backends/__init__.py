@@ -0,0 +1,7 @@
+"""
+Backends de banco com pool de conexões em processo.
+
+Use ``ENGINE = 'loja.backends.mysql_pool'`` (ou ``loja.backends.sqlite_pool`` como
+substituto local) com ``CONN_MAX_AGE = 0``: ao fim de cada requisição a conexão volta
+para o pool em vez de ser fechada. O pool é configurado pela chave ``POOL`` do banco.
+"""
@@ -0,0 +1,7 @@
+from django.db.backends.mysql import base
+
+from loja.backends.pool import ConexoesEmPool
+
+
+class DatabaseWrapper(ConexoesEmPool, base.DatabaseWrapper):
+  pass
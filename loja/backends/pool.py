@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import deque
+
+PADROES = {
+  'TAMANHO': 10,
+  'ESPERA': 30,
+  'VALIDAR_APOS': 30,
+}
+
+
+class PoolEsgotado(Exception):
+  pass
+
+
+def conexao_responde(conexao):
+  """Health check genérico de DB-API: um ``SELECT 1`` na conexão bruta."""
+  try:
+    cursor = conexao.cursor()
+    try:
+      cursor.execute('SELECT 1')
+      cursor.fetchall()
+    finally:
+      cursor.close()
+  except Exception:
+    return False
+  return True
+
+
+class PoolConexoes:
+  """
+  Pool limitado de conexões DB-API compartilhado pelas threads de um processo.
+
+  ``criar`` abre uma conexão nova. Conexões ociosas por mais de ``validar_apos``
+  segundos passam por ``validar`` antes de serem entregues; as que falham são
+  fechadas e substituídas. Com o pool cheio, ``obter`` espera até ``espera`` segundos
+  por uma devolução e então levanta ``PoolEsgotado``.
+  """
+
+  def __init__(self, criar, tamanho=PADROES['TAMANHO'], espera=PADROES['ESPERA'],
+               validar=conexao_responde, validar_apos=PADROES['VALIDAR_APOS']):
+    self.criar = criar
+    self.tamanho = tamanho
+    self.espera = espera
+    self.validar = validar
+    self.validar_apos = validar_apos
+    self._livres = deque()
+    self._abertas = 0
+    self._condicao = threading.Condition()
+    self._contadores = {'criadas': 0, 'reutilizadas': 0, 'descartadas': 0, 'esperas': 0}
+
+  def obter(self):
+    prazo = time.monotonic() + self.espera
+    while True:
+      with self._condicao:
+        if not self._livres and self._abertas >= self.tamanho:
+          self._contadores['esperas'] += 1
+        while not self._livres and self._abertas >= self.tamanho:
+          restante = prazo - time.monotonic()
+          if restante <= 0:
+            raise PoolEsgotado(f"Nenhuma conexão livre após {self.espera}s ({self.tamanho} abertas).")
+          self._condicao.wait(restante)
+        if self._livres:
+          conexao, devolvida_em = self._livres.pop()
+        else:
+          conexao = None
+          self._abertas += 1
+
+      if conexao is None:
+        try:
+          conexao = self.criar()
+        except BaseException:
+          self._liberar_vaga()
+          raise
+        self._contar('criadas')
+        return conexao
+
+      ociosa = time.monotonic() - devolvida_em
+      if self.validar is None or ociosa < self.validar_apos or self.validar(conexao):
+        self._contar('reutilizadas')
+        return conexao
+      self.descartar(conexao)
+
+  def devolver(self, conexao):
+    with self._condicao:
+      # LIFO: a conexão mais recente tem menos chance de ter expirado no servidor.
+      self._livres.append((conexao, time.monotonic()))
+      self._condicao.notify()
+
+  def descartar(self, conexao):
+    """Fecha uma conexão que saiu do pool e libera a vaga dela."""
+    try:
+      conexao.close()
+    except Exception:
+      pass
+    self._contar('descartadas')
+    self._liberar_vaga()
+
+  def fechar(self):
+    """Fecha as conexões livres; as que estão em uso continuam com quem as obteve."""
+    with self._condicao:
+      livres, self._livres = self._livres, deque()
+    for conexao, _ in livres:
+      self.descartar(conexao)
+
+  def estatisticas(self):
+    with self._condicao:
+      return {**self._contadores, 'abertas': self._abertas, 'livres': len(self._livres)}
+
+  def _contar(self, nome):
+    with self._condicao:
+      self._contadores[nome] += 1
+
+  def _liberar_vaga(self):
+    with self._condicao:
+      self._abertas -= 1
+      self._condicao.notify()
+
+
+_pools = {}
+_trava_pools = threading.Lock()
+
+
+def pool_para(alias, conn_params, criar, configuracao=None):
+  """Pool do processo para o alias; parâmetros de conexão diferentes (ex.: banco de teste) têm pool próprio."""
+  chave = (alias, repr(sorted(conn_params.items())))
+  with _trava_pools:
+    pool = _pools.get(chave)
+    if pool is None:
+      config = {**PADROES, **(configuracao or {})}
+      pool = _pools[chave] = PoolConexoes(
+        criar, tamanho=config['TAMANHO'], espera=config['ESPERA'], validar_apos=config['VALIDAR_APOS'],
+      )
+    return pool
+
+
+def fechar_pools(alias=None):
+  with _trava_pools:
+    chaves = [chave for chave in _pools if alias is None or chave[0] == alias]
+    pools = [_pools.pop(chave) for chave in chaves]
+  for pool in pools:
+    pool.fechar()
+
+
+def estatisticas(alias=None):
+  with _trava_pools:
+    pools = [(chave[0], pool) for chave, pool in _pools.items() if alias is None or chave[0] == alias]
+  return [{'alias': nome, **pool.estatisticas()} for nome, pool in pools]
+
+
+class ConexoesEmPool:
+  """
+  Mixin para um ``DatabaseWrapper``: a conexão bruta vem do pool do processo e volta
+  para ele quando o Django a fecha (fim da requisição com ``CONN_MAX_AGE = 0``). Uma
+  conexão fechada no meio de uma transação ou depois de um erro de banco é descartada.
+  """
+  _pool = None
+
+  def _usar_pool(self):
+    return True
+
+  def get_new_connection(self, conn_params):
+    if not self._usar_pool():
+      return super().get_new_connection(conn_params)
+    self._pool = pool_para(
+      self.alias, conn_params,
+      lambda: super(ConexoesEmPool, self).get_new_connection(conn_params),
+      self.settings_dict.get('POOL'),
+    )
+    return self._pool.obter()
+
+  def _close(self):
+    pool, self._pool = self._pool, None
+    if pool is None or self.connection is None:
+      return super()._close()
+    conexao = self.connection
+    if self.in_atomic_block or self.errors_occurred:
+      pool.descartar(conexao)
+      return
+    try:
+      if not self.autocommit:
+        conexao.rollback()
+    except Exception:
+      pool.descartar(conexao)
+      return
+    pool.devolver(conexao)
@@ -0,0 +1,10 @@
+from django.db.backends.sqlite3 import base
+
+from loja.backends.pool import ConexoesEmPool
+
+
+class DatabaseWrapper(ConexoesEmPool, base.DatabaseWrapper):
+
+  def _usar_pool(self):
+    # Cada conexão com um banco em memória é um banco diferente.
+    return not self.is_in_memory_db()
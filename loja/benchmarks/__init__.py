@@ -0,0 +1,6 @@
+"""
+Benchmarks executados contra o banco configurado com ``python manage.py loja_bench <nome>``.
+
+Cada módulo deste pacote expõe ``executar(**parametros)`` e devolve um dicionário com
+as métricas medidas.
+"""
@@ -0,0 +1,122 @@
+"""
+Caminhos quentes do ORM medidos por ``loja_bench orm`` e pelos testes de pytest-benchmark.
+Cada função executa o caminho uma vez; os dados vêm de ``manage.py loja_seed``.
+"""
+import datetime
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Max, Min, Sum
+from django.urls import reverse
+
+from loja.models import EspecificacaoProduto, ItemPedido, Pagamento, Pedido, ServicoFretagem
+from loja.routers import usar_replica
+from loja.views import SESSAO_USUARIO
+
+RECEITA = DecimalField(max_digits=14, decimal_places=2)
+
+
+class Amostra:
+  """Ids existentes sorteados com semente fixa, para que execuções diferentes façam o mesmo trabalho."""
+
+  def __init__(self, semente=42):
+    self.gerador = random.Random(semente)
+    self.produtos = EspecificacaoProduto.objects.aggregate(menor=Min('produto_id'), maior=Max('produto_id'))
+    self.dias = Pedido.objects.aggregate(inicio=Min('data_pedido'), fim=Max('data_pedido'))
+    if self.produtos['maior'] is None or self.dias['inicio'] is None:
+      raise RuntimeError("Banco sem pedidos ou produtos com especificação; rode manage.py loja_seed antes.")
+    self.usuario_ids = list(Pedido.objects.order_by().values_list('usuario_id', flat=True).distinct()[:1000])
+
+  def produto(self):
+    return self.gerador.randint(self.produtos['menor'], self.produtos['maior'])
+
+  def especificacao(self):
+    # Ids podem ter buracos; o primeiro existente a partir do sorteio serve.
+    return EspecificacaoProduto.objects.filter(produto_id__gte=self.produto()).order_by('produto_id', 'id').values_list(
+      'pk', 'produto_id', 'produto__preco',
+    ).first()
+
+  def usuario(self):
+    return self.gerador.choice(self.usuario_ids)
+
+  def mes(self):
+    inicio, fim = self.dias['inicio'], self.dias['fim']
+    dia = inicio + datetime.timedelta(days=self.gerador.randint(0, (fim - inicio).days))
+    return dia.replace(day=1)
+
+
+def entrar_como_usuario(cliente, usuario_id):
+  """Guarda ``usuario_id`` na sessão de ``cliente``, como login_async, para as rotas de pedidos."""
+  sessao = cliente.session
+  sessao[SESSAO_USUARIO] = usuario_id
+  sessao.save()
+  return cliente
+
+
+def entrar_como_staff(cliente):
+  """Loga ``cliente`` com um usuário staff do admin, que vê os pedidos de todos os usuários."""
+  staff, _ = get_user_model().objects.get_or_create(username='loja-benchmark', defaults={'is_staff': True})
+  cliente.force_login(staff)
+  return cliente
+
+
+def detalhe_produto(cliente, produto_id):
+  resposta = cliente.get(reverse('loja:api_produto', args=[produto_id]))
+  assert resposta.status_code in (200, 404), resposta.status_code
+  return resposta
+
+
+def listar_pedidos(cliente, usuario_id=None, limite=50):
+  parametros = {'limite': limite}
+  if usuario_id is not None:
+    parametros['usuario'] = usuario_id
+  resposta = cliente.get(reverse('loja:api_pedidos'), parametros)
+  assert resposta.status_code == 200, resposta.status_code
+  return b''.join(resposta.streaming_content) if resposta.streaming else resposta.content
+
+
+def criar_pedido(usuario_id, especificacoes, data=None, desfazer=True):
+  """
+  Cria um pedido pelo caminho normal do ORM: um ``create`` por linha, com os sinais de
+  totais, histórico e facetas. Com ``desfazer`` a transação é revertida no fim.
+  """
+  with transaction.atomic():
+    pedido = Pedido.objects.create(
+      usuario_id=usuario_id, data_pedido=data or datetime.date.today(), valor_total=Decimal('0.00'),
+      status='Pendente', endereco_entrega='Rua do Benchmark, 1',
+    )
+    for especificacao_id, produto_id, preco in especificacoes:
+      ItemPedido.objects.create(
+        pedido=pedido, produto_id=produto_id, especificacao_id=especificacao_id, quantidade=1, preco_unitario=preco,
+      )
+    ServicoFretagem.objects.create(
+      pedido=pedido, nome_transportadora='Correios', tipo_servico='PAC', preco_fretagem=Decimal('19.90'),
+      prazo_entrega=8,
+    )
+    pedido.alterar_status('Pago')
+    if desfazer:
+      transaction.set_rollback(True)
+  return pedido
+
+
+def relatorio_mensal(inicio):
+  """Agregados de relatório de um mês: pagamentos por forma, produtos mais vendidos e pedidos por status."""
+  fim = (inicio + datetime.timedelta(days=32)).replace(day=1)
+  with usar_replica():
+    pagamentos = list(
+      Pagamento.objects.filter(data_pagamento__gte=inicio, data_pagamento__lt=fim)
+      .values('forma_pagamento').annotate(total=Sum('valor_pagamento'), quantidade=Count('pk'))
+      .order_by('-total')
+    )
+    mais_vendidos = list(
+      ItemPedido.objects.filter(pedido__data_pedido__gte=inicio, pedido__data_pedido__lt=fim)
+      .values('produto_id').annotate(unidades=Sum('quantidade'), receita=Sum(F('quantidade') * F('preco_unitario'), output_field=RECEITA))
+      .order_by('-unidades', 'produto_id')[:10]
+    )
+    por_status = dict(
+      Pedido.objects.filter(data_pedido__gte=inicio, data_pedido__lt=fim)
+      .values_list('status').annotate(quantidade=Count('pk')).order_by()
+    )
+  return {'pagamentos': pagamentos, 'mais_vendidos': mais_vendidos, 'por_status': por_status}
@@ -0,0 +1,90 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from loja.benchmarks._cenarios import entrar_como_usuario
+from loja.models import Fornecedor, Pedido, Produto, Usuario
+
+
+def _urls(produto_id, pedido_id, prefixo):
+  return [
+    reverse(f'loja:api_{prefixo}produtos'),
+    reverse(f'loja:api_{prefixo}produto', args=[produto_id]),
+    reverse(f'loja:api_{prefixo}status_pedido', args=[pedido_id]),
+  ]
+
+
+def _wsgi(urls, requisicoes, concorrencia, usuario_id):
+  def trabalhador(quantidade):
+    cliente = Client()
+    erros = 0
+    try:
+      entrar_como_usuario(cliente, usuario_id)
+      for i in range(quantidade):
+        erros += cliente.get(urls[i % len(urls)]).status_code != 200
+    finally:
+      connections.close_all()
+    return erros
+
+  por_trabalhador = requisicoes // concorrencia
+  inicio = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+    erros = sum(executor.map(trabalhador, [por_trabalhador] * concorrencia))
+  return por_trabalhador * concorrencia, erros, time.perf_counter() - inicio
+
+
+async def _asgi(urls, requisicoes, concorrencia, usuario_id):
+  cliente = await sync_to_async(entrar_como_usuario)(AsyncClient(), usuario_id)
+  semaforo = asyncio.Semaphore(concorrencia)
+
+  async def requisitar(i):
+    async with semaforo:
+      resposta = await cliente.get(urls[i % len(urls)])
+      return resposta.status_code != 200
+
+  inicio = time.perf_counter()
+  erros = sum(await asyncio.gather(*(requisitar(i) for i in range(requisicoes))))
+  return requisicoes, erros, time.perf_counter() - inicio
+
+
+def executar(requisicoes=1000, concorrencia=32):
+  """
+  Compara, em processo, a vazão das rotas síncronas atendidas pelo handler WSGI com a
+  das rotas assíncronas atendidas pelo handler ASGI, sob a mesma concorrência.
+  """
+  requisicoes, concorrencia = int(requisicoes), int(concorrencia)
+  fornecedor = Fornecedor.objects.create(
+    nome="Benchmark", telefone="0", email="benchmark@example.com", endereco="-", cnpj="0" * 14,
+  )
+  produto = Produto.objects.create(nome="Benchmark", descricao="-", preco=1, estoque=1, fornecedor=fornecedor)
+  usuario = Usuario.objects.create(nome="Benchmark", email="benchmark-asgi@example.com", senha="benchmark123")
+  pedido = Pedido.objects.create(
+    usuario=usuario, data_pedido="2024-01-01", valor_total=0, status="Pendente", endereco_entrega="-",
+  )
+  try:
+    resultado = {}
+    # Os clientes de teste usam o host 'testserver'.
+    with override_settings(ALLOWED_HOSTS=['testserver']):
+      medicoes = (
+        ('wsgi', _wsgi(_urls(produto.pk, pedido.pk, ''), requisicoes, concorrencia, usuario.pk)),
+        ('asgi', asyncio.run(_asgi(_urls(produto.pk, pedido.pk, 'async_'), requisicoes, concorrencia, usuario.pk))),
+      )
+    for nome, (total, erros, duracao) in medicoes:
+      resultado[nome] = {
+        'requisicoes': total,
+        'erros': erros,
+        'duracao_s': round(duracao, 3),
+        'requisicoes_por_s': round(total / duracao, 1),
+      }
+    return resultado
+  finally:
+    pedido.delete()
+    usuario.delete()
+    produto.delete()
+    fornecedor.delete()
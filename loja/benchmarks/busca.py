@@ -0,0 +1,90 @@
+import random
+import statistics
+import time
+
+from django.db import transaction
+from django.db.models import Q
+
+from loja.busca import indexar, buscar
+from loja.models import Fornecedor, Produto
+from loja.services import em_lotes
+
+VOCABULARIO = (
+  'camiseta calça bermuda jaqueta moletom vestido saia blusa camisa regata meia boné tênis sandália bota '
+  'algodão linho poliéster couro jeans malha lã seda viscose sarja '
+  'azul vermelho verde preto branco cinza amarelo rosa marrom bege '
+  'infantil masculino feminino unissex esportivo casual social básico estampado listrado '
+  'confortável leve resistente térmico impermeável elástico ajustável macio durável clássico'
+).split()
+
+
+SILABAS = 'ba be bi bo bu ca ce ci co cu da de di do du fa fe fi fo fu la le li lo lu ma me mi mo mu ra re ri ro ru'.split()
+
+
+def _marcas(gerador, quantidade):
+  """Palavras sintéticas que tornam os termos seletivos, como marcas e linhas de produto."""
+  return [''.join(gerador.choice(SILABAS) for _ in range(3)) for _ in range(quantidade)]
+
+
+def _texto(gerador, palavras, marcas, quantas_marcas):
+  return ' '.join(
+    [gerador.choice(VOCABULARIO) for _ in range(palavras)] + [gerador.choice(marcas) for _ in range(quantas_marcas)]
+  )
+
+
+def _icontains(consulta):
+  filtro = Q()
+  for termo in consulta.split():
+    filtro &= Q(nome__icontains=termo) | Q(descricao__icontains=termo)
+  return list(Produto.objects.filter(filtro).values_list('pk', flat=True)[:20])
+
+
+def _medir(funcao, consultas):
+  tempos = []
+  for consulta in consultas:
+    inicio = time.perf_counter()
+    funcao(consulta)
+    tempos.append((time.perf_counter() - inicio) * 1000)
+  return {
+    'media_ms': round(statistics.mean(tempos), 2),
+    'p95_ms': round(sorted(tempos)[int(len(tempos) * 0.95) - 1], 2),
+  }
+
+
+def executar(produtos=1_000_000, consultas=50, semente=42, tamanho_lote=5000):
+  """
+  Gera um catálogo sintético, indexa e compara a busca pelo índice invertido com o
+  ``icontains`` em nome/descrição. Tudo roda numa transação desfeita no final.
+  """
+  produtos, consultas, tamanho_lote = int(produtos), int(consultas), int(tamanho_lote)
+  gerador = random.Random(int(semente))
+  marcas = _marcas(gerador, 5000)
+  amostras = [_texto(gerador, gerador.randint(0, 2), marcas, 1) for _ in range(consultas)]
+
+  with transaction.atomic():
+    fornecedor = Fornecedor.objects.create(
+      nome="Benchmark", telefone="0", email="benchmark@example.com", endereco="-", cnpj="0" * 14,
+    )
+    inicio = time.perf_counter()
+    for lote in em_lotes(range(produtos), tamanho_lote):
+      criados = Produto.objects.bulk_create([
+        Produto(
+          nome=_texto(gerador, 2, marcas, 1), descricao=_texto(gerador, 12, marcas, 2), preco=gerador.randint(10, 500),
+          estoque=1, fornecedor=fornecedor,
+        )
+        for _ in lote
+      ])
+      if criados[0].pk is None:
+        criados = Produto.objects.filter(fornecedor=fornecedor).order_by('-pk')[:len(lote)]
+      indexar((produto.pk, produto.nome, produto.descricao) for produto in criados)
+    carga = time.perf_counter() - inicio
+
+    resultado = {
+      'produtos': produtos,
+      'consultas': consultas,
+      'carga_e_indexacao_s': round(carga, 1),
+      'icontains': _medir(_icontains, amostras),
+      'indice': _medir(buscar, amostras),
+    }
+    transaction.set_rollback(True)
+  return resultado
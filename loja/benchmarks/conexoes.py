@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+
+from loja.backends.pool import estatisticas, fechar_pools
+from loja.models import Produto
+
+BACKENDS_COM_POOL = {
+  'mysql': 'loja.backends.mysql_pool',
+  'sqlite': 'loja.backends.sqlite_pool',
+}
+
+
+def _modos(base):
+  motor_pool = BACKENDS_COM_POOL[connections['default'].vendor]
+  return {
+    'sem_pool': {**base, 'CONN_MAX_AGE': 0},
+    'persistente': {**base, 'CONN_MAX_AGE': None, 'CONN_HEALTH_CHECKS': True},
+    'pool': {**base, 'ENGINE': motor_pool, 'CONN_MAX_AGE': 0},
+  }
+
+
+def _medir(alias, requisicoes, concorrencia):
+  def trabalhador(quantidade):
+    try:
+      for _ in range(quantidade):
+        # O mesmo ciclo de uma requisição: conexão sob demanda, uma consulta e o
+        # close_old_connections do sinal request_finished.
+        conexao = connections[alias]
+        conexao.close_if_unusable_or_obsolete()
+        list(Produto.objects.using(alias).values_list('pk', flat=True)[:1])
+        conexao.close_if_unusable_or_obsolete()
+    finally:
+      connections[alias].close()
+
+  por_trabalhador = requisicoes // concorrencia
+  inicio = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+    list(executor.map(trabalhador, [por_trabalhador] * concorrencia))
+  return por_trabalhador * concorrencia, time.perf_counter() - inicio
+
+
+def executar(requisicoes=2000, concorrencia=8, tamanho_pool=None):
+  """
+  Mede requisições por segundo abrindo uma conexão por requisição (``CONN_MAX_AGE = 0``),
+  com conexões persistentes e com o pool em processo. Cada modo roda em um alias
+  temporário copiado de ``default``; com SQLite o resultado só indica o custo local.
+  """
+  requisicoes, concorrencia = int(requisicoes), int(concorrencia)
+  tamanho_pool = int(tamanho_pool) if tamanho_pool else concorrencia
+  base = dict(connections['default'].settings_dict)
+  base['POOL'] = {**base.get('POOL', {}), 'TAMANHO': tamanho_pool}
+
+  resultado = {}
+  for modo, configuracao in _modos(base).items():
+    alias = f'loja_bench_{modo}'
+    connections.settings[alias] = configuracao
+    try:
+      total, duracao = _medir(alias, requisicoes, concorrencia)
+      resultado[modo] = {
+        'requisicoes': total,
+        'duracao_s': round(duracao, 3),
+        'requisicoes_por_s': round(total / duracao, 1),
+      }
+      if modo == 'pool':
+        resultado[modo]['pool'] = estatisticas(alias)
+    finally:
+      fechar_pools(alias)
+      del connections.settings[alias]
+  return resultado
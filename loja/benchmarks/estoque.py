@@ -0,0 +1,62 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+
+from loja.estoque import EstoqueInsuficiente, reservar_estoque
+from loja.models import Fornecedor, Produto
+
+
+def _reservar_varias(produto_ids, reservas, quantidade):
+  sucessos = falhas = 0
+  try:
+    for _ in range(reservas):
+      try:
+        reservar_estoque({produto_id: quantidade for produto_id in produto_ids})
+        sucessos += 1
+      except EstoqueInsuficiente:
+        falhas += 1
+  finally:
+    connections.close_all()
+  return sucessos, falhas
+
+
+def executar(threads=16, reservas=200, produtos=3, estoque=1000, quantidade=1):
+  """
+  Dispara reservas concorrentes de vários produtos a partir de um pool de threads e
+  confere que o estoque nunca fica negativo nem perde baixas.
+  """
+  threads, reservas, produtos, estoque, quantidade = map(int, (threads, reservas, produtos, estoque, quantidade))
+  fornecedor = Fornecedor.objects.create(
+    nome="Benchmark", telefone="0", email="benchmark@example.com", endereco="-", cnpj="0" * 14,
+  )
+  Produto.objects.bulk_create([
+    Produto(nome=f"Benchmark {i}", descricao="-", preco=1, estoque=estoque, fornecedor=fornecedor)
+    for i in range(produtos)
+  ])
+  produto_ids = list(Produto.objects.filter(fornecedor=fornecedor).values_list('pk', flat=True))
+
+  try:
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+      resultados = list(executor.map(
+        lambda _: _reservar_varias(produto_ids, reservas, quantidade), range(threads)
+      ))
+    duracao = time.perf_counter() - inicio
+
+    sucessos = sum(s for s, _ in resultados)
+    falhas = sum(f for _, f in resultados)
+    restantes = dict(Produto.objects.filter(pk__in=produto_ids).values_list('pk', 'estoque'))
+    esperado = estoque - sucessos * quantidade
+    return {
+      'threads': threads,
+      'tentativas': threads * reservas,
+      'sucessos': sucessos,
+      'falhas': falhas,
+      'duracao_s': round(duracao, 3),
+      'reservas_por_s': round(threads * reservas / duracao, 1),
+      'consistente': all(valor == esperado and valor >= 0 for valor in restantes.values()),
+    }
+  finally:
+    Produto.objects.filter(pk__in=produto_ids).delete()
+    fornecedor.delete()
@@ -0,0 +1,49 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.test.utils import override_settings
+
+from loja import senhas
+from loja.models import Usuario
+
+SENHA = 'benchmark-login'
+
+
+def _vazao(funcao, quantidade, concorrencia):
+  inicio = time.perf_counter()
+  if concorrencia == 1:
+    for _ in range(quantidade):
+      funcao()
+  else:
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+      for futuro in [executor.submit(funcao) for _ in range(quantidade)]:
+        futuro.result()
+  return round(quantidade / (time.perf_counter() - inicio), 1)
+
+
+def executar(iteracoes='100000,300000,600000,1000000', logins=20, concorrencia=4):
+  """
+  Para cada custo do PBKDF2 (``iteracoes``, separados por vírgula): o tempo de um hash,
+  logins por segundo com autenticar (consulta + verificação) e verificações por segundo
+  com ``concorrencia`` threads, como no executor das views assíncronas. O hashlib solta
+  o GIL durante o PBKDF2, então as threads usam núcleos diferentes. O usuário de teste
+  é criado numa transação desfeita no final.
+  """
+  logins, concorrencia = int(logins), int(concorrencia)
+  resultado = {}
+  for custo in [int(valor) for valor in str(iteracoes).split(',')]:
+    with override_settings(LOJA_SENHAS={**senhas.configuracao(), 'ITERACOES': custo}):
+      inicio = time.perf_counter()
+      hash_senha = make_password(SENHA)
+      hash_ms = (time.perf_counter() - inicio) * 1000
+      with transaction.atomic():
+        usuario = Usuario.objects.create(nome="Benchmark", email="benchmark-login@example.com", senha=SENHA)
+        resultado[str(custo)] = {
+          'hash_ms': round(hash_ms, 2),
+          'logins_por_s': _vazao(lambda: senhas.autenticar(usuario.email, SENHA), logins, 1),
+          'verificacoes_por_s_paralelo': _vazao(lambda: senhas.conferir(SENHA, hash_senha), logins, concorrencia),
+        }
+        transaction.set_rollback(True)
+  return resultado
@@ -0,0 +1,47 @@
+import statistics
+import time
+
+from django.test import Client, override_settings
+
+from loja.benchmarks._cenarios import (
+  Amostra, criar_pedido, detalhe_produto, entrar_como_staff, listar_pedidos, relatorio_mensal,
+)
+
+
+def _medir(funcao, repeticoes):
+  funcao()
+  tempos = []
+  for _ in range(repeticoes):
+    inicio = time.perf_counter()
+    funcao()
+    tempos.append((time.perf_counter() - inicio) * 1000)
+  tempos.sort()
+  return {
+    'media_ms': round(statistics.mean(tempos), 3),
+    'p50_ms': round(tempos[len(tempos) // 2], 3),
+    'p95_ms': round(tempos[max(0, int(len(tempos) * 0.95) - 1)], 3),
+    'max_ms': round(tempos[-1], 3),
+  }
+
+
+def executar(repeticoes=200, semente=42, itens=3):
+  """
+  Mede os caminhos quentes do ORM contra os dados já gravados (``manage.py loja_seed``):
+  detalhe de produto, criação de pedido (revertida), listagem de pedidos e agregados de
+  relatório. Os ids vêm de um sorteio com ``semente``, então execuções são comparáveis.
+  As listagens são feitas como staff, que vê os pedidos de todos os usuários.
+  """
+  repeticoes, itens = int(repeticoes), int(itens)
+  amostra = Amostra(int(semente))
+  cliente = entrar_como_staff(Client())
+  with override_settings(ALLOWED_HOSTS=['testserver']):
+    return {
+      'repeticoes': repeticoes,
+      'detalhe_produto': _medir(lambda: detalhe_produto(cliente, amostra.produto()), repeticoes),
+      'criar_pedido': _medir(
+        lambda: criar_pedido(amostra.usuario(), [amostra.especificacao() for _ in range(itens)]), repeticoes,
+      ),
+      'listar_pedidos': _medir(lambda: listar_pedidos(cliente), repeticoes),
+      'listar_pedidos_usuario': _medir(lambda: listar_pedidos(cliente, amostra.usuario()), repeticoes),
+      'relatorio_mensal': _medir(lambda: relatorio_mensal(amostra.mes()), max(1, repeticoes // 10)),
+    }
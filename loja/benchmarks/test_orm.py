@@ -0,0 +1,37 @@
+"""
+Benchmarks dos caminhos quentes com pytest-benchmark. Ficam fora de ``testpaths``; rode com
+
+    pytest loja/benchmarks --benchmark-autosave
+    pytest loja/benchmarks --benchmark-compare --benchmark-compare-fail=mean:15%
+
+ou ``--benchmark-json=resultado.json`` para guardar o resultado. ``LOJA_BENCH_PEDIDOS``
+define a escala dos dados gerados (padrão 2000 pedidos).
+"""
+import os
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from loja.benchmarks import _cenarios
+from loja.sinteticos import Escala, popular
+
+@pytest.fixture
+def amostra(db):
+    popular(Escala(pedidos=int(os.environ.get("LOJA_BENCH_PEDIDOS", 2000))), semente=42)
+    return _cenarios.Amostra(42)
+
+def test_detalhe_produto(benchmark, client, amostra):
+    benchmark(lambda: _cenarios.detalhe_produto(client, amostra.produto()))
+
+def test_criar_pedido(benchmark, amostra):
+    especificacoes = [amostra.especificacao() for _ in range(3)]
+    benchmark(_cenarios.criar_pedido, amostra.usuario(), especificacoes)
+
+def test_listar_pedidos(benchmark, admin_client, amostra):
+    benchmark(_cenarios.listar_pedidos, admin_client)
+
+def test_listar_pedidos_usuario(benchmark, admin_client, amostra):
+    benchmark(lambda: _cenarios.listar_pedidos(admin_client, amostra.usuario()))
+
+def test_relatorio_mensal(benchmark, amostra):
+    benchmark(_cenarios.relatorio_mensal, amostra.mes())
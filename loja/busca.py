@@ -0,0 +1,136 @@
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import router, transaction
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+
+from loja.models import Produto, TermoBusca
+from loja.services import lotes_por_chave
+
+TAMANHO_LOTE = 1000
+TAMANHO_TERMO = TermoBusca._meta.get_field('termo').max_length
+PESO_NOME = 3
+PESO_DESCRICAO = 1
+
+STOPWORDS = frozenset(
+  'a ao aos as com da das de do dos e em na nas no nos o os ou para por pra que se sem um uma'.split()
+)
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def normalizar(texto):
+  """Tokens minúsculos e sem acento: "Camiseta Algodão" vira ["camiseta", "algodao"]."""
+  decomposto = unicodedata.normalize('NFKD', texto or '').lower()
+  sem_acento = ''.join(c for c in decomposto if not unicodedata.combining(c))
+  return [
+    token[:TAMANHO_TERMO] for token in _TOKEN.findall(sem_acento)
+    if len(token) > 1 and token not in STOPWORDS
+  ]
+
+
+def termos(nome, descricao):
+  """Peso de cada termo do produto; ocorrências no nome valem mais que na descrição."""
+  pesos = Counter()
+  for token in normalizar(nome):
+    pesos[token] += PESO_NOME
+  for token in normalizar(descricao):
+    pesos[token] += PESO_DESCRICAO
+  return pesos
+
+
+def _linhas(produtos):
+  return [
+    TermoBusca(produto_id=produto_id, termo=termo, peso=peso)
+    for produto_id, nome, descricao in produtos
+    for termo, peso in termos(nome, descricao).items()
+  ]
+
+
+def indexar(produtos, using=None):
+  """Reindexa os produtos dados como tuplas (id, nome, descricao)."""
+  produtos = list(produtos)
+  if not produtos:
+    return
+  using = using or router.db_for_write(TermoBusca)
+  with transaction.atomic(using=using):
+    TermoBusca.objects.using(using).filter(produto_id__in=[produto[0] for produto in produtos]).delete()
+    TermoBusca.objects.using(using).bulk_create(_linhas(produtos), batch_size=TAMANHO_LOTE)
+
+
+def produto_salvo(produto, created, using=None):
+  carregados = produto.valores_carregados()
+  if not created and (carregados.get('nome'), carregados.get('descricao')) == (produto.nome, produto.descricao):
+    return
+  indexar([(produto.pk, produto.nome, produto.descricao)], using=using)
+
+
+def reconstruir_indice(tamanho_lote=TAMANHO_LOTE, using=None):
+  """
+  Recria o índice inteiro lendo os produtos em lotes por pk (lotes_por_chave). Cada
+  lote é gravado na própria transação; enquanto roda, a busca fica incompleta.
+  """
+  using = using or router.db_for_write(TermoBusca)
+  TermoBusca.objects.using(using).all().delete()
+  produtos = Produto.objects.using(using).values_list('pk', 'nome', 'descricao')
+  indexados = 0
+  for lote in lotes_por_chave(produtos, tamanho_lote):
+    indexar(lote, using=using)
+    indexados += len(lote)
+  return indexados
+
+
+def buscar(consulta, preco_min=None, preco_max=None, fornecedor=None, limite=20, using=None):
+  """
+  Produtos que contêm todos os termos da consulta, do mais ao menos relevante: soma do
+  peso de cada termo no produto multiplicado pela raridade do termo no catálogo. Os
+  candidatos saem do termo mais raro, então o custo acompanha o número de produtos
+  encontrados, não o tamanho do catálogo.
+  """
+  tokens = sorted(set(normalizar(consulta)))
+  if not tokens:
+    return []
+  indice = TermoBusca.objects.using(using)
+  frequencias = dict(
+    indice.filter(termo__in=tokens).values_list('termo').annotate(produtos=Count('produto_id')).order_by()
+  )
+  if len(frequencias) < len(tokens):
+    return []
+
+  candidatos = indice.filter(termo=min(frequencias, key=frequencias.get))
+  if preco_min is not None:
+    candidatos = candidatos.filter(produto__preco__gte=preco_min)
+  if preco_max is not None:
+    candidatos = candidatos.filter(produto__preco__lte=preco_max)
+  if fornecedor is not None:
+    candidatos = candidatos.filter(produto__fornecedor_id=fornecedor)
+
+  raridade = {termo: 1 / (1 + math.log(produtos)) for termo, produtos in frequencias.items()}
+  relevancia = Sum(
+    Case(
+      *[When(termo=termo, then=F('peso') * Value(peso)) for termo, peso in raridade.items()],
+      output_field=FloatField(),
+    )
+  )
+  encontrados = candidatos if len(tokens) == 1 else indice.filter(
+    termo__in=tokens, produto_id__in=candidatos.values('produto_id'),
+  )
+  ranking = list(
+    encontrados.values('produto_id')
+    .annotate(encontrados=Count('termo'), relevancia=relevancia)
+    .filter(encontrados=len(tokens))
+    .order_by('-relevancia', 'produto_id')[:limite]
+  )
+
+  produtos = {
+    produto['id']: produto
+    for produto in Produto.objects.using(using)
+    .filter(pk__in=[linha['produto_id'] for linha in ranking])
+    .values('id', 'nome', 'preco', 'fornecedor_id')
+  }
+  return [
+    {**produtos[linha['produto_id']], 'relevancia': round(linha['relevancia'], 4)}
+    for linha in ranking if linha['produto_id'] in produtos
+  ]
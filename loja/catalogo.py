@@ -0,0 +1,191 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from loja.models import EspecificacaoProduto, Produto, ResumoAvaliacaoProduto
+
+PADROES = {
+  'CACHE': 'default',
+  'TIMEOUT': 300,
+  'LRU_MAXIMO': 1024,
+  # Segundos que uma entrada vale na LRU sem consultar a versão de novo no cache.
+  'LRU_TTL': 30,
+}
+
+
+def configuracao():
+  return {**PADROES, **getattr(settings, 'LOJA_CATALOGO_CACHE', {})}
+
+
+class LRU:
+  """
+  Camada em processo, limitada, na frente do cache compartilhado. Com ``ttl`` (segundos)
+  as entradas expiram mesmo que a versão não mude, o que limita por quanto tempo um
+  processo serve dados antigos quando o cache não é compartilhado.
+  """
+
+  def __init__(self, maximo, ttl=None):
+    self.maximo = maximo
+    self.ttl = ttl
+    self._itens = OrderedDict()
+    self._trava = threading.Lock()
+
+  def obter(self, chave, versao):
+    with self._trava:
+      entrada = self._itens.get(chave)
+      if entrada is None or entrada[0] != versao:
+        return None
+      if entrada[2] is not None and entrada[2] <= time.monotonic():
+        del self._itens[chave]
+        return None
+      self._itens.move_to_end(chave)
+      return entrada[1]
+
+  def guardar(self, chave, versao, valor):
+    expira = None if self.ttl is None else time.monotonic() + self.ttl
+    with self._trava:
+      self._itens[chave] = (versao, valor, expira)
+      self._itens.move_to_end(chave)
+      while len(self._itens) > self.maximo:
+        self._itens.popitem(last=False)
+
+  def remover(self, chave):
+    with self._trava:
+      self._itens.pop(chave, None)
+
+  def limpar(self):
+    with self._trava:
+      self._itens.clear()
+
+  def __len__(self):
+    return len(self._itens)
+
+
+class CatalogoCache:
+  """
+  Cache de leitura da página de produto: Produto, Fornecedor, variações e o agregado de
+  avaliações. As entradas são chaveadas por id e versão; invalidar troca a versão, então
+  entradas antigas em outros processos deixam de ser servidas sem precisar apagá-las.
+  O estoque fica de fora por mudar a cada reserva.
+
+  A versão só chega aos outros processos se o cache for compartilhado (Redis, Memcached).
+  Com o LocMemCache cada processo tem as próprias versões, e uma alteração feita em outro
+  processo aparece quando a entrada expira: TIMEOUT no cache, LRU_TTL na LRU.
+  """
+
+  def __init__(self, cache=None, timeout=None, lru_maximo=None, lru_ttl=None):
+    config = configuracao()
+    self.cache = caches[cache or config['CACHE']]
+    self.timeout = config['TIMEOUT'] if timeout is None else timeout
+    self.lru = LRU(
+      config['LRU_MAXIMO'] if lru_maximo is None else lru_maximo,
+      config['LRU_TTL'] if lru_ttl is None else lru_ttl,
+    )
+    self._trava = threading.Lock()
+    self._contadores = {'hits_lru': 0, 'hits_cache': 0, 'misses': 0, 'invalidacoes': 0}
+
+  def _contar(self, nome, quantidade=1):
+    with self._trava:
+      self._contadores[nome] += quantidade
+
+  def estatisticas(self):
+    with self._trava:
+      contadores = dict(self._contadores)
+    consultas = contadores['hits_lru'] + contadores['hits_cache'] + contadores['misses']
+    contadores['taxa_acerto'] = (
+      round((contadores['hits_lru'] + contadores['hits_cache']) / consultas, 4) if consultas else None
+    )
+    contadores['tamanho_lru'] = len(self.lru)
+    return contadores
+
+  def _chave_versao(self, produto_id):
+    return f'loja:catalogo:versao:{produto_id}'
+
+  def _versao(self, produto_id):
+    chave = self._chave_versao(produto_id)
+    versao = self.cache.get(chave)
+    if versao is None:
+      self.cache.add(chave, time.time_ns(), None)
+      versao = self.cache.get(chave)
+    return versao
+
+  def obter(self, produto_id):
+    versao = self._versao(produto_id)
+    dados = self.lru.obter(produto_id, versao)
+    if dados is not None:
+      self._contar('hits_lru')
+      return dados
+
+    chave = f'loja:catalogo:produto:{produto_id}:{versao}'
+    dados = self.cache.get(chave)
+    if dados is not None:
+      self._contar('hits_cache')
+    else:
+      self._contar('misses')
+      dados = carregar_produto(produto_id)
+      self.cache.set(chave, dados, self.timeout)
+    self.lru.guardar(produto_id, versao, dados)
+    return dados
+
+  def invalidar(self, produto_ids):
+    produto_ids = set(produto_ids)
+    if not produto_ids:
+      return
+    for produto_id in produto_ids:
+      self.lru.remover(produto_id)
+    self.cache.set_many({self._chave_versao(pk): time.time_ns() for pk in produto_ids}, None)
+    self._contar('invalidacoes', len(produto_ids))
+
+
+def carregar_produto(produto_id):
+  produto = Produto.objects.select_related('fornecedor', 'resumo_avaliacoes').get(pk=produto_id)
+  especificacoes = list(
+    EspecificacaoProduto.objects.filter(produto_id=produto_id)
+    .order_by('pk')
+    .values('id', 'tamanho', 'cor', 'personalizacao', 'preco_adicional')
+  )
+  resumo = getattr(produto, 'resumo_avaliacoes', None) or ResumoAvaliacaoProduto(produto=produto)
+  return {
+    'id': produto.pk,
+    'nome': produto.nome,
+    'descricao': produto.descricao,
+    'preco': produto.preco,
+    'fornecedor': {'id': produto.fornecedor.pk, 'nome': produto.fornecedor.nome},
+    'especificacoes': especificacoes,
+    'avaliacoes': {'media': resumo.media, 'total': resumo.total, 'histograma': resumo.histograma},
+  }
+
+
+_catalogo = None
+_trava_catalogo = threading.Lock()
+
+
+def catalogo():
+  global _catalogo
+  if _catalogo is None:
+    with _trava_catalogo:
+      if _catalogo is None:
+        _catalogo = CatalogoCache()
+  return _catalogo
+
+
+def obter_produto(produto_id):
+  return catalogo().obter(produto_id)
+
+
+def invalidar_produtos(produto_ids, using=None):
+  """
+  Invalida agora e de novo no commit: uma leitura concorrente feita antes do commit
+  poderia repovoar o cache com os dados antigos.
+  """
+  produto_ids = set(produto_ids)
+  catalogo().invalidar(produto_ids)
+  transaction.on_commit(lambda: catalogo().invalidar(produto_ids), using=using)
+
+
+def estatisticas():
+  return catalogo().estatisticas()
@@ -0,0 +1,90 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import router, transaction
+from django.db.models import Sum
+
+from loja.models import Pagamento, Pedido, ProgressoConciliacao
+
+TAMANHO_LOTE = 5000
+CENTAVO = Decimal('0.01')
+ZERO = Decimal('0.00')
+PROGRESSO = 'pagamentos'
+
+
+def situacao(valor_total, valor_pago):
+  # Sem pagamento vem antes: um pedido de total zero sem pagamentos não está quitado.
+  if valor_pago <= 0:
+    return Pedido.SEM_PAGAMENTO
+  if valor_pago > valor_total:
+    return Pedido.EXCEDENTE
+  if valor_pago == valor_total:
+    return Pedido.QUITADO
+  return Pedido.PARCIAL
+
+
+@dataclass
+class ResultadoConciliacao:
+  pedidos: int = 0
+  alterados: int = 0
+  situacoes: Counter = field(default_factory=Counter)
+
+
+def _pagos(primeiro, ultimo, using):
+  """Soma dos pagamentos de cada pedido da faixa, num único GROUP BY pelo índice (pedido, data)."""
+  return dict(
+    Pagamento.objects.using(using)
+    .filter(pedido_id__gte=primeiro, pedido_id__lte=ultimo)
+    .values_list('pedido_id')
+    .annotate(total=Sum('valor_pagamento'))
+    .order_by()
+  )
+
+
+def conciliar_lote(pedidos, using, resultado):
+  """
+  Concilia ``pedidos``, tuplas (pk, valor_total, valor_pago, situacao_pagamento) em ordem
+  de pk, e grava só os que mudaram, com um UPDATE em lote.
+  """
+  pagos = _pagos(pedidos[0][0], pedidos[-1][0], using)
+  alterados = []
+  for pk, valor_total, valor_pago_atual, situacao_atual in pedidos:
+    valor_pago = (pagos.get(pk) or ZERO).quantize(CENTAVO)
+    nova = situacao(valor_total, valor_pago)
+    resultado.situacoes[nova] += 1
+    if (valor_pago, nova) != (valor_pago_atual, situacao_atual):
+      alterados.append(Pedido(pk=pk, valor_pago=valor_pago, situacao_pagamento=nova))
+  Pedido.objects.using(using).bulk_update(alterados, ['valor_pago', 'situacao_pagamento'], batch_size=1000)
+  resultado.pedidos += len(pedidos)
+  resultado.alterados += len(alterados)
+
+
+def conciliar(tamanho_lote=TAMANHO_LOTE, recomecar=False, using=None, nome=PROGRESSO):
+  """
+  Recalcula ``valor_pago`` e ``situacao_pagamento`` de todos os pedidos, em faixas de
+  ``tamanho_lote`` pedidos por pk. Cada faixa custa um SELECT dos pedidos (FOR UPDATE,
+  que segura pagamentos novos desses pedidos até o commit), um GROUP BY em Pagamento e
+  o UPDATE dos que mudaram; o ponto de retomada é gravado na mesma transação. Uma
+  execução interrompida continua de onde parou, salvo com ``recomecar``. Ao terminar, o
+  ponto de retomada é apagado e a próxima execução começa do primeiro pedido.
+  """
+  using = using or router.db_for_write(Pedido)
+  progresso, _ = ProgressoConciliacao.objects.using(using).get_or_create(nome=nome)
+  if recomecar:
+    progresso.ultimo_pedido_id = progresso.pedidos_processados = 0
+
+  resultado = ResultadoConciliacao()
+  pedidos = Pedido.objects.using(using).order_by('pk').values_list(
+    'pk', 'valor_total', 'valor_pago', 'situacao_pagamento',
+  )
+  while True:
+    with transaction.atomic(using=using):
+      lote = list(pedidos.select_for_update().filter(pk__gt=progresso.ultimo_pedido_id)[:tamanho_lote])
+      if not lote:
+        progresso.delete()
+        return resultado
+      conciliar_lote(lote, using, resultado)
+      progresso.ultimo_pedido_id = lote[-1][0]
+      progresso.pedidos_processados += len(lote)
+      progresso.save(using=using)
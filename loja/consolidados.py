@@ -0,0 +1,414 @@
+import datetime
+import logging
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+import django
+
+from django.db import IntegrityError, OperationalError, connections, router, transaction
+from django.db.models import Count, DecimalField, F, Max, Sum
+
+from loja.models import (
+  DiaConsolidadoPendente, ItemPedido, Pagamento, PagamentoDiario, Pedido, Produto, VendaDiariaFornecedor,
+  VendaDiariaProduto,
+)
+from loja.transacoes import AcumuladoNoCommit
+
+TAMANHO_LOTE = 5000
+DIAS_POR_TAREFA = 7
+# Segundos que a reconstrução espera pela trava de um dia.
+ESPERA_TRAVA = 300
+# Segundos que os deltas esperam, depois do commit de quem vendeu: o bastante para outro
+# delta do mesmo dia terminar seus UPDATEs, não para uma reconstrução inteira.
+ESPERA_TRAVA_DELTA = 1
+RECEITA = DecimalField(max_digits=14, decimal_places=2)
+CONSOLIDADOS = (VendaDiariaProduto, VendaDiariaFornecedor, PagamentoDiario)
+
+logger = logging.getLogger(__name__)
+
+
+def _valor(modelo, campo, valor):
+  return modelo._meta.get_field(campo).to_python(valor)
+
+
+@contextmanager
+def travar_dias(dias, using, espera=ESPERA_TRAVA):
+  """
+  Trava cada dia com GET_LOCK do MySQL, em ordem crescente, até o fim do bloco, esperando
+  até ``espera`` segundos por cada um (OperationalError se não conseguir). A
+  reconstrução e a aplicação de deltas de um mesmo dia passam a rodar uma depois da
+  outra, então nenhum delta cai entre o DELETE e o INSERT da reconstrução. Nos outros
+  bancos não faz nada: o SQLite já serializa as escritas.
+  """
+  conexao = connections[using]
+  if conexao.vendor != 'mysql':
+    yield
+    return
+  travados = []
+  try:
+    with conexao.cursor() as cursor:
+      for dia in sorted(set(dias)):
+        nome = f'loja_consolidados_{dia.isoformat()}'
+        cursor.execute('SELECT GET_LOCK(%s, %s)', [nome, espera])
+        if cursor.fetchone()[0] != 1:
+          raise OperationalError(f"Trava {nome} não obtida em {espera}s.")
+        travados.append(nome)
+    yield
+  finally:
+    with conexao.cursor() as cursor:
+      for nome in reversed(travados):
+        cursor.execute('SELECT RELEASE_LOCK(%s)', [nome])
+
+
+def _aplicar(modelo, chave, deltas, using):
+  """Soma os deltas à linha do consolidado com um UPDATE atômico, criando-a se ainda não existe."""
+  if not any(deltas.values()):
+    return
+  linhas = modelo.objects.using(using).filter(**chave)
+  atualizacao = {campo: F(campo) + delta for campo, delta in deltas.items()}
+  if linhas.update(**atualizacao):
+    return
+  try:
+    with transaction.atomic(using=using):
+      modelo.objects.using(using).create(**chave, **deltas)
+  except IntegrityError:
+    # Outra transação criou a linha entre o UPDATE e o INSERT.
+    linhas.update(**atualizacao)
+
+
+class DeltasConsolidados(AcumuladoNoCommit):
+  """
+  Junta os deltas de uma transação (ou savepoint) por linha de consolidado e os aplica
+  depois do commit. As linhas de um dia são disputadas por todas as vendas do dia;
+  aplicando fora da transação, cada uma fica travada por um único UPDATE, não até o fim
+  da transação de quem vendeu. Fora de transação, ``concluir`` aplica os deltas na hora.
+
+  A trava dos dias (travar_dias) espera só ESPERA_TRAVA_DELTA, para não segurar a
+  requisição durante uma reconstrução. Sem ela, nenhum delta é aplicado: os dias ficam
+  em DiaConsolidadoPendente para a próxima loja_rollup --pendentes.
+  """
+
+  def __init__(self, using, imediato=False):
+    super().__init__(using)
+    self.imediato = imediato
+    self.deltas = defaultdict(lambda: defaultdict(int))
+
+  def somar(self, modelo, chave, **deltas):
+    acumulado = self.deltas[modelo, tuple(sorted(chave.items()))]
+    for campo, delta in deltas.items():
+      acumulado[campo] += delta
+
+  def executar(self):
+    dias = {dict(chave)['data'] for _, chave in self.deltas}
+    try:
+      with travar_dias(dias, self.using, espera=ESPERA_TRAVA_DELTA):
+        for (modelo, chave), deltas in self.deltas.items():
+          _aplicar(modelo, dict(chave), deltas, self.using)
+    except OperationalError as erro:
+      # Aplicar depois, sem a trava, poderia contar a venda duas vezes se a reconstrução
+      # em andamento já a leu; a reconstrução do dia a partir das vendas é sempre exata.
+      DiaConsolidadoPendente.objects.using(self.using).bulk_create(
+        [DiaConsolidadoPendente(data=dia) for dia in sorted(dias)]
+      )
+      logger.warning(
+        "Deltas dos consolidados de %s não aplicados (%s); dias marcados para reconstrução.",
+        ', '.join(dia.isoformat() for dia in sorted(dias)), erro,
+      )
+
+  def concluir(self):
+    if self.imediato:
+      self.executar()
+
+
+def _deltas(using):
+  if not connections[using].in_atomic_block:
+    # Fora de transação o on_commit rodaria antes de haver deltas.
+    return DeltasConsolidados(using, imediato=True)
+  return DeltasConsolidados.da_transacao(using)
+
+
+def _somar_venda(deltas, data, produto_id, fornecedor_id, sinal, quantidade, receita):
+  valores = {'itens': sinal, 'unidades': sinal * quantidade, 'receita': sinal * receita}
+  deltas.somar(VendaDiariaProduto, {'data': data, 'produto_id': produto_id}, **valores)
+  deltas.somar(VendaDiariaFornecedor, {'data': data, 'fornecedor_id': fornecedor_id}, **valores)
+
+
+# Manutenção incremental
+
+CAMPOS_ITEM = ('pedido_id', 'produto_id', 'quantidade', 'preco_unitario')
+
+
+def _item(item, valores, sinal, using, deltas):
+  if ItemPedido.pedido.is_cached(item) and item.pedido.pk == valores['pedido_id']:
+    data = item.pedido.data_pedido
+  else:
+    data = Pedido.objects.using(using).filter(pk=valores['pedido_id']).values_list('data_pedido', flat=True).first()
+  if ItemPedido.produto.is_cached(item) and item.produto.pk == valores['produto_id']:
+    fornecedor_id = item.produto.fornecedor_id
+  else:
+    fornecedor_id = Produto.objects.using(using).filter(pk=valores['produto_id']).values_list(
+      'fornecedor_id', flat=True,
+    ).first()
+  if data is None or fornecedor_id is None:
+    return
+  quantidade = int(valores['quantidade'] or 0)
+  receita = quantidade * (_valor(ItemPedido, 'preco_unitario', valores['preco_unitario']) or 0)
+  _somar_venda(deltas, _valor(Pedido, 'data_pedido', data), valores['produto_id'], fornecedor_id, sinal, quantidade, receita)
+
+
+def item_salvo(item, created, using=None):
+  using = using or router.db_for_write(VendaDiariaProduto)
+  atual = {campo: getattr(item, campo) for campo in CAMPOS_ITEM}
+  anterior = None if created else {
+    campo: item.valores_carregados().get(campo, atual[campo]) for campo in CAMPOS_ITEM
+  }
+  if anterior == atual:
+    return
+  deltas = _deltas(using)
+  if anterior is not None:
+    _item(item, anterior, -1, using, deltas)
+  _item(item, atual, 1, using, deltas)
+  deltas.concluir()
+
+
+def item_removido(item, using=None):
+  using = using or router.db_for_write(VendaDiariaProduto)
+  valores = {campo: item.valores_carregados().get(campo, getattr(item, campo)) for campo in CAMPOS_ITEM}
+  deltas = _deltas(using)
+  _item(item, valores, -1, using, deltas)
+  deltas.concluir()
+
+
+def pedido_salvo(pedido, created, update_fields=None, using=None):
+  """Uma troca de data_pedido move as vendas do pedido de um dia para o outro."""
+  if created or (update_fields is not None and 'data_pedido' not in update_fields):
+    return
+  anterior = pedido.valores_carregados().get('data_pedido', pedido.data_pedido)
+  anterior, atual = _valor(Pedido, 'data_pedido', anterior), _valor(Pedido, 'data_pedido', pedido.data_pedido)
+  if anterior == atual:
+    return
+  using = using or router.db_for_write(VendaDiariaProduto)
+  deltas = _deltas(using)
+  vendas = (
+    ItemPedido.objects.using(using).filter(pedido_id=pedido.pk)
+    .values('produto_id', 'produto__fornecedor_id')
+    .annotate(itens=Count('pk'), unidades=Sum('quantidade'), receita=Sum(F('quantidade') * F('preco_unitario'), output_field=RECEITA))
+    .order_by()
+  )
+  for venda in vendas:
+    for data, sinal in ((anterior, -1), (atual, 1)):
+      chave_produto = {'data': data, 'produto_id': venda['produto_id']}
+      chave_fornecedor = {'data': data, 'fornecedor_id': venda['produto__fornecedor_id']}
+      valores = {campo: sinal * venda[campo] for campo in ('itens', 'unidades', 'receita')}
+      deltas.somar(VendaDiariaProduto, chave_produto, **valores)
+      deltas.somar(VendaDiariaFornecedor, chave_fornecedor, **valores)
+  deltas.concluir()
+
+
+CAMPOS_PAGAMENTO = ('data_pagamento', 'forma_pagamento', 'valor_pagamento')
+
+
+def _pagamento(valores, sinal, deltas):
+  chave = {
+    'data': _valor(Pagamento, 'data_pagamento', valores['data_pagamento']),
+    'forma_pagamento': valores['forma_pagamento'],
+  }
+  valor = _valor(Pagamento, 'valor_pagamento', valores['valor_pagamento']) or 0
+  deltas.somar(PagamentoDiario, chave, quantidade=sinal, valor=sinal * valor)
+
+
+def pagamento_salvo(pagamento, created, using=None):
+  using = using or router.db_for_write(PagamentoDiario)
+  atual = {campo: getattr(pagamento, campo) for campo in CAMPOS_PAGAMENTO}
+  anterior = None if created else {
+    campo: pagamento.valores_carregados().get(campo, atual[campo]) for campo in CAMPOS_PAGAMENTO
+  }
+  if anterior == atual:
+    return
+  deltas = _deltas(using)
+  if anterior is not None:
+    _pagamento(anterior, -1, deltas)
+  _pagamento(atual, 1, deltas)
+  deltas.concluir()
+
+
+def pagamento_removido(pagamento, using=None):
+  using = using or router.db_for_write(PagamentoDiario)
+  valores = {campo: pagamento.valores_carregados().get(campo, getattr(pagamento, campo)) for campo in CAMPOS_PAGAMENTO}
+  deltas = _deltas(using)
+  _pagamento(valores, -1, deltas)
+  deltas.concluir()
+
+
+def vendas_importadas(pedidos, itens, pagamentos, using=None):
+  """Deltas das linhas gravadas com bulk_create, que não disparam os sinais."""
+  using = using or router.db_for_write(VendaDiariaProduto)
+  deltas = _deltas(using)
+  datas = {pedido.pk: _valor(Pedido, 'data_pedido', pedido.data_pedido) for pedido in pedidos}
+  fornecedores = dict(
+    Produto.objects.using(using).filter(pk__in={item.produto_id for item in itens}).values_list('pk', 'fornecedor_id')
+  )
+  for item in itens:
+    quantidade = int(item.quantidade)
+    receita = quantidade * _valor(ItemPedido, 'preco_unitario', item.preco_unitario)
+    _somar_venda(deltas, datas[item.pedido_id], item.produto_id, fornecedores[item.produto_id], 1, quantidade, receita)
+  for pagamento in pagamentos:
+    _pagamento({campo: getattr(pagamento, campo) for campo in CAMPOS_PAGAMENTO}, 1, deltas)
+  deltas.concluir()
+
+
+# Reconstrução
+
+def periodos(inicio, fim, dias):
+  """Divide [inicio, fim] em períodos de até ``dias`` dias, com as duas pontas inclusivas."""
+  while inicio <= fim:
+    ate = min(inicio + datetime.timedelta(days=dias - 1), fim)
+    yield inicio, ate
+    inicio = ate + datetime.timedelta(days=1)
+
+
+def _vendas(inicio, fim, agrupar, using):
+  return (
+    ItemPedido.objects.using(using)
+    .filter(pedido__data_pedido__gte=inicio, pedido__data_pedido__lte=fim)
+    .values('pedido__data_pedido', agrupar)
+    .annotate(
+      itens=Count('pk'), unidades=Sum('quantidade'),
+      receita=Sum(F('quantidade') * F('preco_unitario'), output_field=RECEITA),
+    )
+    .order_by()
+  )
+
+
+def reconstruir(inicio, fim, tamanho_lote=TAMANHO_LOTE, using=None):
+  """
+  Recalcula os consolidados dos dias de ``inicio`` a ``fim`` (inclusive) a partir de
+  ItemPedido e Pagamento: apaga as linhas do período e grava o resultado de um GROUP BY
+  por consolidado, numa transação. Devolve quantas linhas foram gravadas.
+
+  Os dias ficam travados (travar_dias) até o commit, e os deltas de vendas novas esperam
+  por ESPERA_TRAVA_DELTA e são somados depois, ou deixam o dia em DiaConsolidadoPendente.
+  As marcas do período já existentes no início são apagadas com o commit. Uma venda confirmada instantes antes da reconstrução, com o delta
+  ainda por aplicar, porém, entra no GROUP BY e depois recebe o delta também: para um
+  resultado exato, reconstrua dias fechados ou pause as escritas nos dias reconstruídos.
+  """
+  using = using or router.db_for_write(VendaDiariaProduto)
+  fontes = (
+    (
+      VendaDiariaProduto, _vendas(inicio, fim, 'produto_id', using),
+      lambda linha: {'produto_id': linha['produto_id']},
+    ),
+    (
+      VendaDiariaFornecedor, _vendas(inicio, fim, 'produto__fornecedor_id', using),
+      lambda linha: {'fornecedor_id': linha['produto__fornecedor_id']},
+    ),
+  )
+  pagamentos = (
+    Pagamento.objects.using(using)
+    .filter(data_pagamento__gte=inicio, data_pagamento__lte=fim)
+    .values('data_pagamento', 'forma_pagamento')
+    .annotate(quantidade=Count('pk'), valor=Sum('valor_pagamento'))
+    .order_by()
+  )
+  gravadas = 0
+  dias = [inicio + datetime.timedelta(days=dia) for dia in range((fim - inicio).days + 1)]
+  # Só as marcas anteriores à leitura das vendas: um delta perdido durante a reconstrução
+  # pode ser de uma venda que ela não viu, e a sua marca fica para a próxima.
+  pendentes = DiaConsolidadoPendente.objects.using(using).filter(data__gte=inicio, data__lte=fim)
+  ultima_marca = pendentes.aggregate(ultima=Max('pk'))['ultima']
+  with travar_dias(dias, using), transaction.atomic(using=using):
+    if ultima_marca is not None:
+      pendentes.filter(pk__lte=ultima_marca).delete()
+    for modelo in CONSOLIDADOS:
+      modelo.objects.using(using).filter(data__gte=inicio, data__lte=fim).delete()
+    for modelo, linhas, chave in fontes:
+      gravadas += len(modelo.objects.using(using).bulk_create(
+        (
+          modelo(
+            data=linha['pedido__data_pedido'], itens=linha['itens'], unidades=linha['unidades'],
+            receita=linha['receita'], **chave(linha),
+          )
+          for linha in linhas.iterator(chunk_size=tamanho_lote)
+        ),
+        batch_size=tamanho_lote,
+      ))
+    gravadas += len(PagamentoDiario.objects.using(using).bulk_create(
+      (
+        PagamentoDiario(
+          data=linha['data_pagamento'], forma_pagamento=linha['forma_pagamento'],
+          quantidade=linha['quantidade'], valor=linha['valor'],
+        )
+        for linha in pagamentos.iterator(chunk_size=tamanho_lote)
+      ),
+      batch_size=tamanho_lote,
+    ))
+  return gravadas
+
+
+def _iniciar_processo():
+  django.setup()
+
+
+def _reconstruir_tarefa(inicio, fim, tamanho_lote, using):
+  try:
+    return inicio, fim, reconstruir(inicio, fim, tamanho_lote=tamanho_lote, using=using)
+  finally:
+    connections.close_all()
+
+
+def reconstruir_periodo(inicio, fim, dias_por_tarefa=DIAS_POR_TAREFA, workers=1, tamanho_lote=TAMANHO_LOTE, using=None):
+  """
+  Reconstrói [inicio, fim] em tarefas de ``dias_por_tarefa`` dias, cada uma na sua
+  transação. Com ``workers`` > 1 as tarefas rodam em processos separados, cada um com
+  suas conexões; as do processo atual são fechadas antes para não serem herdadas.
+  Gera (inicio, fim, linhas) de cada tarefa, na ordem em que terminam.
+  """
+  tarefas = list(periodos(inicio, fim, dias_por_tarefa))
+  if workers <= 1:
+    for comeco, final in tarefas:
+      yield comeco, final, reconstruir(comeco, final, tamanho_lote=tamanho_lote, using=using)
+    return
+  connections.close_all()
+  with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_processo) as executor:
+    futuros = [
+      executor.submit(_reconstruir_tarefa, comeco, final, tamanho_lote, using) for comeco, final in tarefas
+    ]
+    for futuro in as_completed(futuros):
+      yield futuro.result()
+
+
+def reconstruir_pendentes(tamanho_lote=TAMANHO_LOTE, using=None):
+  """
+  Reconstrói, um a um, os dias marcados em DiaConsolidadoPendente por deltas que não
+  conseguiram a trava. Gera (dia, linhas) de cada dia reconstruído.
+  """
+  using = using or router.db_for_write(VendaDiariaProduto)
+  dias = DiaConsolidadoPendente.objects.using(using).values_list('data', flat=True).distinct().order_by('data')
+  for dia in list(dias):
+    yield dia, reconstruir(dia, dia, tamanho_lote=tamanho_lote, using=using)
+
+
+# Leitura
+
+AGRUPAMENTOS = {
+  'produto': (VendaDiariaProduto, 'produto_id', ('itens', 'unidades', 'receita')),
+  'fornecedor': (VendaDiariaFornecedor, 'fornecedor_id', ('itens', 'unidades', 'receita')),
+  'pagamento': (PagamentoDiario, 'forma_pagamento', ('quantidade', 'valor')),
+}
+
+
+def consultar(agrupamento, inicio, fim, chave=None, por_dia=False, using=None):
+  """
+  Totais do período por produto, fornecedor ou forma de pagamento (``agrupamento``),
+  lidos dos consolidados. Com ``por_dia`` a série sai dia a dia; ``chave`` filtra um
+  único produto, fornecedor ou forma.
+  """
+  modelo, campo_chave, medidas = AGRUPAMENTOS[agrupamento]
+  linhas = modelo.objects.using(using).filter(data__gte=inicio, data__lte=fim)
+  if chave is not None:
+    linhas = linhas.filter(**{campo_chave: chave})
+  grupos = ('data', campo_chave) if por_dia else (campo_chave,)
+  return list(
+    linhas.values(*grupos).annotate(**{medida: Sum(medida) for medida in medidas}).order_by(*grupos)
+  )
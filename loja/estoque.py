@@ -0,0 +1,99 @@
+from collections import Counter
+
+from django.core.exceptions import ValidationError
+from django.db import router, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from loja.models import ItemPedido, Produto
+
+
+class EstoqueInsuficiente(ValidationError):
+  def __init__(self, produto_ids):
+    self.produto_ids = list(produto_ids)
+    super().__init__(f"Estoque insuficiente para os produtos: {', '.join(map(str, self.produto_ids))}.")
+
+
+def _normalizar(quantidades):
+  """Soma quantidades repetidas e ordena por PK: todas as transações travam as linhas na mesma ordem."""
+  if isinstance(quantidades, dict):
+    quantidades = quantidades.items()
+  total = Counter()
+  for produto_id, quantidade in quantidades:
+    if quantidade <= 0:
+      raise ValidationError("Quantidade reservada deve ser positiva.")
+    total[produto_id] += quantidade
+  return sorted(total.items())
+
+
+def _quantidade_por_produto(itens):
+  return Case(
+    *[When(pk=produto_id, then=Value(quantidade)) for produto_id, quantidade in itens],
+    output_field=IntegerField(),
+  )
+
+
+def reservar_estoque(quantidades, using=None):
+  """
+  Baixa o estoque de vários produtos de uma vez ou de nenhum.
+
+  Um único ``UPDATE ... SET estoque = estoque - n WHERE estoque >= n`` cobre todos os
+  produtos; se alguma linha não for atualizada a reserva inteira é desfeita e
+  ``EstoqueInsuficiente`` é levantada.
+  """
+  itens = _normalizar(quantidades)
+  if not itens:
+    return
+  using = using or router.db_for_write(Produto)
+  ids = [produto_id for produto_id, _ in itens]
+  quantidade = _quantidade_por_produto(itens)
+
+  with transaction.atomic(using=using):
+    atualizados = (
+      Produto.objects.using(using)
+      .filter(pk__in=ids, estoque__gte=quantidade)
+      .order_by('pk')
+      .update(estoque=F('estoque') - quantidade)
+    )
+    if atualizados == len(itens):
+      return
+    transaction.set_rollback(True, using=using)
+
+  disponiveis = dict(Produto.objects.using(using).filter(pk__in=ids).values_list('pk', 'estoque'))
+  faltantes = [produto_id for produto_id, n in itens if disponiveis.get(produto_id, 0) < n]
+  raise EstoqueInsuficiente(faltantes or ids)
+
+
+def liberar_estoque(quantidades, using=None):
+  """Devolve ao estoque quantidades reservadas anteriormente."""
+  itens = _normalizar(quantidades)
+  if not itens:
+    return
+  using = using or router.db_for_write(Produto)
+  quantidade = _quantidade_por_produto(itens)
+  (
+    Produto.objects.using(using)
+    .filter(pk__in=[produto_id for produto_id, _ in itens])
+    .order_by('pk')
+    .update(estoque=F('estoque') + quantidade)
+  )
+
+
+def criar_itens_com_reserva(itens, using=None):
+  """Reserva o estoque dos itens e os grava na mesma transação."""
+  using = using or router.db_for_write(ItemPedido)
+  for item in itens:
+    item.full_clean(exclude=['pedido', 'produto', 'especificacao'])
+  with transaction.atomic(using=using):
+    reservar_estoque([(item.produto_id, item.quantidade) for item in itens], using=using)
+    for item in itens:
+      item.save(using=using)
+  return itens
+
+
+def remover_itens_com_liberacao(itens, using=None):
+  """Remove os itens e devolve o estoque reservado para eles."""
+  using = using or router.db_for_write(ItemPedido)
+  with transaction.atomic(using=using):
+    liberar_estoque([(item.produto_id, item.quantidade) for item in itens if item.quantidade], using=using)
+    for item in itens:
+      item.delete(using=using)
@@ -0,0 +1,168 @@
+import csv
+import datetime
+import zlib
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import DecimalField, F, Prefetch, Value
+from django.db.models.functions import Coalesce
+
+from loja.models import ItemPedido, Pagamento, Pedido, ServicoFretagem
+from loja.services import lotes_por_chave
+
+TAMANHO_LOTE = 2000
+# As linhas são juntadas em blocos deste tamanho antes de ir para a resposta ou o arquivo.
+TAMANHO_BLOCO = 64 * 1024
+FORMATOS = ('csv', 'jsonl')
+ZERO = Decimal('0.00')
+PRECO = DecimalField(max_digits=10, decimal_places=2)
+
+COLUNAS_CSV = (
+  'id', 'usuario_id', 'data_pedido', 'status', 'endereco_entrega', 'valor_total', 'quantidade_itens',
+  'itens', 'valor_itens', 'pagamentos', 'valor_pago', 'formas_pagamento', 'valor_frete', 'transportadoras',
+)
+
+
+def periodo_do_mes(mes):
+  """``'2024-05'`` -> (1º de maio, 1º de junho), fim exclusivo."""
+  inicio = datetime.date.fromisoformat(f'{mes}-01')
+  fim = (inicio + datetime.timedelta(days=32)).replace(day=1)
+  return inicio, fim
+
+
+def pedidos(inicio, fim, tamanho_lote=TAMANHO_LOTE, using=None):
+  """
+  Pedidos com ``inicio <= data_pedido < fim`` e seus itens, pagamentos e fretes. Os
+  pedidos são lidos em lotes por (data_pedido, id), com o prefetch dos filhos feito lote
+  a lote, então a memória não cresce com o período. Cada item traz o
+  ``preco_adicional`` da sua especificação (zero sem especificação).
+  """
+  queryset = (
+    Pedido.objects.using(using)
+    .filter(data_pedido__gte=inicio, data_pedido__lt=fim)
+    .prefetch_related(
+      Prefetch(
+        'itempedido_set',
+        queryset=ItemPedido.objects.annotate(
+          preco_adicional=Coalesce(F('especificacao__preco_adicional'), Value(ZERO), output_field=PRECO),
+        ).order_by('id'),
+      ),
+      Prefetch('pagamento_set', queryset=Pagamento.objects.order_by('data_pagamento', 'id')),
+      Prefetch('servicofretagem_set', queryset=ServicoFretagem.objects.order_by('id')),
+    )
+  )
+  for lote in lotes_por_chave(queryset, tamanho_lote, ('data_pedido', 'id')):
+    yield from lote
+
+
+def _documento(pedido):
+  return {
+    'id': pedido.pk,
+    'usuario_id': pedido.usuario_id,
+    'data_pedido': pedido.data_pedido,
+    'status': pedido.status,
+    'endereco_entrega': pedido.endereco_entrega,
+    'valor_total': pedido.valor_total,
+    'quantidade_itens': pedido.quantidade_itens,
+    'itens': [
+      {
+        'id': item.pk,
+        'produto_id': item.produto_id,
+        'especificacao_id': item.especificacao_id,
+        'quantidade': item.quantidade,
+        'preco_unitario': item.preco_unitario,
+        'preco_adicional': item.preco_adicional,
+      }
+      for item in pedido.itempedido_set.all()
+    ],
+    'pagamentos': [
+      {
+        'id': pagamento.pk,
+        'forma_pagamento': pagamento.forma_pagamento,
+        'data_pagamento': pagamento.data_pagamento,
+        'valor_pagamento': pagamento.valor_pagamento,
+      }
+      for pagamento in pedido.pagamento_set.all()
+    ],
+    'fretes': [
+      {
+        'id': frete.pk,
+        'nome_transportadora': frete.nome_transportadora,
+        'tipo_servico': frete.tipo_servico,
+        'preco_fretagem': frete.preco_fretagem,
+        'prazo_entrega': frete.prazo_entrega,
+      }
+      for frete in pedido.servicofretagem_set.all()
+    ],
+  }
+
+
+def _linha_csv(pedido):
+  itens = pedido.itempedido_set.all()
+  pagamentos = pedido.pagamento_set.all()
+  fretes = pedido.servicofretagem_set.all()
+  return (
+    pedido.pk, pedido.usuario_id, pedido.data_pedido, pedido.status, pedido.endereco_entrega,
+    pedido.valor_total, pedido.quantidade_itens,
+    len(itens), sum((item.quantidade * (item.preco_unitario + item.preco_adicional) for item in itens), ZERO),
+    len(pagamentos), sum((pagamento.valor_pagamento for pagamento in pagamentos), ZERO),
+    ';'.join(sorted({pagamento.forma_pagamento for pagamento in pagamentos})),
+    sum((frete.preco_fretagem for frete in fretes), ZERO),
+    ';'.join(sorted({frete.nome_transportadora for frete in fretes})),
+  )
+
+
+class _Eco:
+  """Destino do csv.writer que devolve a linha em vez de guardá-la."""
+
+  def write(self, valor):
+    return valor
+
+
+def linhas_jsonl(pedidos):
+  """Um pedido por linha, com itens, pagamentos e fretes aninhados."""
+  encoder = DjangoJSONEncoder(ensure_ascii=False)
+  for pedido in pedidos:
+    yield encoder.encode(_documento(pedido)) + '\n'
+
+
+def linhas_csv(pedidos):
+  """Um pedido por linha, com os filhos resumidos em contagens, somas e listas."""
+  escritor = csv.writer(_Eco())
+  yield escritor.writerow(COLUNAS_CSV)
+  for pedido in pedidos:
+    yield escritor.writerow(_linha_csv(pedido))
+
+
+def _blocos(partes, tamanho=TAMANHO_BLOCO):
+  acumulado, total = [], 0
+  for parte in partes:
+    acumulado.append(parte)
+    total += len(parte)
+    if total >= tamanho:
+      yield ''.join(acumulado)
+      acumulado, total = [], 0
+  if acumulado:
+    yield ''.join(acumulado)
+
+
+def codificar(partes, comprimir=False):
+  """Texto em UTF-8 e, com ``comprimir``, em gzip, bloco a bloco."""
+  if not comprimir:
+    for bloco in _blocos(partes):
+      yield bloco.encode()
+    return
+  compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+  for bloco in _blocos(partes):
+    comprimido = compressor.compress(bloco.encode())
+    if comprimido:
+      yield comprimido
+  yield compressor.flush()
+
+
+def exportar(inicio, fim, formato='csv', comprimir=False, tamanho_lote=TAMANHO_LOTE, using=None):
+  """Gera os bytes da exportação dos pedidos do período; nada é montado inteiro em memória."""
+  if formato not in FORMATOS:
+    raise ValueError(f"Formato desconhecido: {formato}. Use um de: {', '.join(FORMATOS)}.")
+  serializar = linhas_jsonl if formato == 'jsonl' else linhas_csv
+  return codificar(serializar(pedidos(inicio, fim, tamanho_lote, using)), comprimir)
@@ -0,0 +1,290 @@
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from loja.models import EspecificacaoProduto, Produto
+from loja.services import lotes_por_chave
+
+PADROES = {
+  'CACHE': 'default',
+  # Por quanto tempo cada mudança publicada fica disponível para os outros processos.
+  'TIMEOUT_MUDANCAS': 3600,
+  # Segundos até o índice ser refeito por inteiro, mesmo sem mudanças publicadas. Cobre
+  # mudanças que não chegaram pelo cache (LocMemCache por processo, cache esvaziado).
+  'MAX_IDADE': 900,
+  # Monta o índice ao subir o processo (projeto_django.wsgi/asgi), e não na primeira consulta.
+  'AQUECER': False,
+  # Limites superiores (exclusivos) das faixas de preço; a última faixa não tem limite.
+  'FAIXAS_PRECO': (50, 100, 200, 500),
+}
+
+TAMANHO_LOTE = 5000
+
+FACETAS = ('tamanho', 'cor', 'fornecedor', 'preco')
+CHAVE_VERSAO = 'loja:facetas:versao'
+
+
+def configuracao():
+  return {**PADROES, **getattr(settings, 'LOJA_FACETAS', {})}
+
+
+def faixa_preco(preco, limites):
+  inferior = 0
+  for limite in limites:
+    if preco < limite:
+      return f'{inferior}-{limite}'
+    inferior = limite
+  return f'{inferior}+'
+
+
+class _Bitmaps:
+  """
+  Os bitmaps de um índice. A carga completa monta um novo, fora da trava do índice, e o
+  troca inteiro pelo atual.
+  """
+
+  def __init__(self, faixas_preco):
+    self.faixas_preco = faixas_preco
+    self.posicoes = {}
+    self.ids = []
+    self.todos = 0
+    self.bitmaps = {faceta: defaultdict(int) for faceta in FACETAS}
+    self.valores = {}
+
+  def carregar(self, produtos, especificacoes):
+    valores = defaultdict(lambda: defaultdict(set))
+    for lote in lotes_por_chave(produtos.values_list('pk', 'fornecedor_id', 'preco'), TAMANHO_LOTE):
+      for pk, fornecedor_id, preco in lote:
+        valores[pk]['fornecedor'].add(fornecedor_id)
+        valores[pk]['preco'].add(faixa_preco(preco, self.faixas_preco))
+    for lote in lotes_por_chave(especificacoes.values_list('pk', 'produto_id', 'tamanho', 'cor'), TAMANHO_LOTE):
+      for _, produto_id, tamanho, cor in lote:
+        if produto_id in valores:
+          valores[produto_id]['tamanho'].add(tamanho)
+          valores[produto_id]['cor'].add(cor)
+    for pk, facetas in valores.items():
+      self.adicionar(pk, facetas)
+
+  def adicionar(self, produto_id, facetas):
+    posicao = self.posicoes.get(produto_id)
+    if posicao is None:
+      # Um produto removido mantém a posição; a próxima carga completa compacta os bits.
+      posicao = self.posicoes[produto_id] = len(self.ids)
+      self.ids.append(produto_id)
+    bit = 1 << posicao
+    self.todos |= bit
+    for faceta, valores in facetas.items():
+      for valor in valores:
+        self.bitmaps[faceta][valor] |= bit
+    self.valores[produto_id] = {faceta: set(valores) for faceta, valores in facetas.items()}
+
+  def remover(self, produto_id):
+    posicao = self.posicoes.get(produto_id)
+    if posicao is None:
+      return
+    bit = 1 << posicao
+    self.todos &= ~bit
+    for faceta, valores in self.valores.pop(produto_id, {}).items():
+      for valor in valores:
+        restante = self.bitmaps[faceta][valor] & ~bit
+        if restante:
+          self.bitmaps[faceta][valor] = restante
+        else:
+          del self.bitmaps[faceta][valor]
+
+
+class IndiceFacetas:
+  """
+  Contagens de facetas em memória. Cada produto ocupa um bit; cada valor de faceta
+  guarda um bitmap (um ``int``) dos produtos que o têm. Filtros são OR dentro da mesma
+  faceta e AND entre facetas, e cada faceta é contada ignorando o próprio filtro, como
+  nas listagens com múltipla seleção. Tamanho e cor valem por produto: um produto com
+  uma variação M e outra Azul atende a "M e Azul". Nenhuma contagem consulta o banco.
+
+  Processos diferentes se mantêm em dia por um diário de mudanças no cache: cada
+  alteração publica os ids afetados com uma versão, e o índice recarrega só esses
+  produtos antes de responder. Se alguma versão expirou, ou o índice passou de
+  ``max_idade`` segundos, ele é refeito, por uma thread de cada vez e sem travar as
+  consultas, que seguem com o índice anterior até a troca. O diário só chega aos outros
+  processos com um cache compartilhado; com o LocMemCache vale apenas a idade máxima.
+  """
+
+  def __init__(self, cache=None, faixas_preco=None, max_idade=None):
+    config = configuracao()
+    self.cache = caches[cache or config['CACHE']]
+    self.timeout_mudancas = config['TIMEOUT_MUDANCAS']
+    self.max_idade = config['MAX_IDADE'] if max_idade is None else max_idade
+    self.faixas_preco = tuple(Decimal(limite) for limite in (faixas_preco or config['FAIXAS_PRECO']))
+    # _trava protege o índice atual; _trava_carga deixa uma carga completa por vez.
+    self._trava = threading.RLock()
+    self._trava_carga = threading.Lock()
+    self.versao = None
+    self.carregado_em = None
+    self._dados = _Bitmaps(self.faixas_preco)
+
+  # Montagem
+
+  def carregar(self):
+    """Monta o índice inteiro a partir do banco, lendo em fatias, e o troca pelo atual."""
+    versao = self._versao_publicada()
+    dados = _Bitmaps(self.faixas_preco)
+    dados.carregar(Produto.objects.all(), EspecificacaoProduto.objects.all())
+    with self._trava:
+      # Mudanças aplicadas ao índice antigo durante a carga podem ser mais novas que
+      # ``versao``; voltar a ela faz a próxima sincronização reaplicá-las.
+      self._dados = dados
+      self.versao = versao
+      self.carregado_em = time.monotonic()
+
+  def recarregar(self, produto_ids):
+    """Relê do banco só os produtos dados; os que não existem mais saem do índice."""
+    produto_ids = set(produto_ids)
+    with self._trava:
+      for produto_id in produto_ids:
+        self._dados.remover(produto_id)
+      self._dados.carregar(
+        Produto.objects.filter(pk__in=produto_ids),
+        EspecificacaoProduto.objects.filter(produto_id__in=produto_ids),
+      )
+
+  # Sincronização entre processos
+
+  def _versao_publicada(self):
+    return self.cache.get(CHAVE_VERSAO, 0)
+
+  def publicar(self, produto_ids):
+    self.cache.add(CHAVE_VERSAO, 0, None)
+    try:
+      versao = self.cache.incr(CHAVE_VERSAO)
+    except ValueError:
+      # A chave expirou entre o add e o incr.
+      self.cache.add(CHAVE_VERSAO, 1, None)
+      versao = 1
+    self.cache.set(f'loja:facetas:mudanca:{versao}', sorted(produto_ids), self.timeout_mudancas)
+
+  def _expirado(self):
+    return self.max_idade is not None and time.monotonic() - self.carregado_em >= self.max_idade
+
+  def sincronizar(self):
+    publicada = self._versao_publicada()
+    with self._trava:
+      if self.versao is not None and publicada >= self.versao and not self._expirado():
+        if publicada == self.versao:
+          return
+        chaves = [f'loja:facetas:mudanca:{versao}' for versao in range(self.versao + 1, publicada + 1)]
+        mudancas = self.cache.get_many(chaves)
+        if len(mudancas) == len(chaves):
+          self.recarregar({pk for ids in mudancas.values() for pk in ids})
+          self.versao = publicada
+          return
+    self._carregar_uma_vez()
+
+  def _carregar_uma_vez(self):
+    if self.versao is None:
+      # Sem índice ainda não há o que servir: as demais threads esperam pela carga.
+      with self._trava_carga:
+        if self.versao is None:
+          self.carregar()
+      return
+    # Com uma carga em andamento, responde com o índice atual em vez de refazê-lo de novo.
+    if self._trava_carga.acquire(blocking=False):
+      try:
+        self.carregar()
+      finally:
+        self._trava_carga.release()
+
+  # Consultas
+
+  def _selecao(self, faceta, valores):
+    bitmap = 0
+    for valor in valores:
+      bitmap |= self._dados.bitmaps[faceta].get(valor, 0)
+    return bitmap
+
+  def _filtrar(self, filtros, ignorar=None):
+    resultado = self._dados.todos
+    for faceta, valores in filtros.items():
+      if faceta != ignorar and valores:
+        resultado &= self._selecao(faceta, valores)
+    return resultado
+
+  def contagens(self, filtros=None):
+    """
+    ``filtros`` mapeia faceta para os valores selecionados, ex.:
+    ``{'cor': ['Azul', 'Preto'], 'tamanho': ['M']}``. Devolve o total filtrado e, para
+    cada faceta, a contagem de cada valor.
+    """
+    filtros = _normalizar_filtros(filtros)
+    self.sincronizar()
+    with self._trava:
+      facetas = {}
+      for faceta in FACETAS:
+        base = self._filtrar(filtros, ignorar=faceta)
+        facetas[faceta] = {
+          valor: contagem for valor, bitmap in self._dados.bitmaps[faceta].items()
+          if (contagem := (bitmap & base).bit_count())
+        }
+      return {'total': self._filtrar(filtros).bit_count(), 'facetas': facetas}
+
+  def produtos(self, filtros=None):
+    """Ids dos produtos que atendem aos filtros, em ordem de inserção no índice."""
+    filtros = _normalizar_filtros(filtros)
+    self.sincronizar()
+    with self._trava:
+      bits = bin(self._filtrar(filtros))[:1:-1]
+      return [self._dados.ids[posicao] for posicao, bit in enumerate(bits) if bit == '1']
+
+
+def _normalizar_filtros(filtros):
+  filtros = {faceta: valores for faceta, valores in (filtros or {}).items() if valores}
+  desconhecidas = set(filtros) - set(FACETAS)
+  if desconhecidas:
+    raise ValueError(f"Facetas desconhecidas: {', '.join(sorted(desconhecidas))}.")
+  if 'fornecedor' in filtros:
+    filtros['fornecedor'] = [int(valor) for valor in filtros['fornecedor']]
+  return filtros
+
+
+_indice = None
+_trava_indice = threading.Lock()
+
+
+def indice():
+  global _indice
+  if _indice is None:
+    with _trava_indice:
+      if _indice is None:
+        _indice = IndiceFacetas()
+  return _indice
+
+
+def aquecer():
+  """Monta o índice deste processo se LOJA_FACETAS['AQUECER'] estiver ligado."""
+  if configuracao()['AQUECER']:
+    indice().sincronizar()
+
+
+def contagens(filtros=None):
+  return indice().contagens(filtros)
+
+
+def produtos_alterados(produto_ids, using=None):
+  """Publica a mudança no commit; cada processo aplica na próxima consulta."""
+  produto_ids = set(produto_ids)
+  transaction.on_commit(lambda: indice().publicar(produto_ids), using=using)
+
+
+def produto_salvo(produto, created, using=None):
+  carregados = produto.valores_carregados()
+  if created or any(carregados.get(campo) != getattr(produto, campo) for campo in ('preco', 'fornecedor_id')):
+    produtos_alterados([produto.pk], using=using)
+
+
+def especificacao_alterada(especificacao, using=None):
+  anterior = especificacao.valores_carregados().get('produto_id', especificacao.produto_id)
+  produtos_alterados({especificacao.produto_id, anterior}, using=using)
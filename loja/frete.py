@@ -0,0 +1,301 @@
+import bisect
+import csv
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import router, transaction
+
+from loja.models import ServicoFretagem
+
+TABELAS_PADRAO = Path(__file__).resolve().parent / 'tabelas_frete'
+
+PADROES = {
+  # Arquivos .csv ou .json com as tabelas de preço; ver carregar_tabelas.
+  'TABELAS': (str(TABELAS_PADRAO / 'correios.csv'), str(TABELAS_PADRAO / 'jadlog.json')),
+  # Threads de cada tabela externa (ver Cotador) e quanto tempo (s) esperar por todas
+  # numa cotação.
+  'WORKERS': 2,
+  'ESPERA': 2.0,
+  # Cotações memorizadas por (prefixo do CEP, faixa de peso).
+  'TTL': 600,
+  'MEMO_MAXIMO': 4096,
+  'DIGITOS_CEP': 5,
+  'FAIXA_PESO': 500,
+}
+
+
+def configuracao():
+  return {**PADROES, **getattr(settings, 'LOJA_FRETE', {})}
+
+
+def normalizar_cep(cep):
+  digitos = ''.join(c for c in str(cep) if c.isdigit())
+  if len(digitos) != 8:
+    raise ValueError(f"CEP inválido: {cep}.")
+  return digitos
+
+
+@dataclass(frozen=True)
+class Cotacao:
+  transportadora: str
+  servico: str
+  preco: Decimal
+  prazo: int
+
+
+class TabelaFrete:
+  """
+  Tabela de preços de um serviço: faixas de CEP, cada uma com preço e prazo por limite de
+  peso (gramas). A faixa é achada por busca binária no início das faixas, e o preço é o
+  do menor limite que comporta o peso. Qualquer objeto com ``cotar(cep, peso)`` que
+  devolva uma Cotacao ou None pode ser usado no lugar, como um cliente de API; ele deve
+  ter o próprio timeout de rede, menor que ``ESPERA``, porque uma thread presa numa
+  chamada não pode ser interrompida.
+  """
+
+  def __init__(self, transportadora, servico, faixas):
+    self.transportadora = transportadora
+    self.servico = servico
+    por_cep = {}
+    for cep_inicio, cep_fim, peso_ate, preco, prazo in faixas:
+      por_cep.setdefault((int(cep_inicio), int(cep_fim)), []).append((int(peso_ate), Decimal(preco), int(prazo)))
+    self._inicios, self._faixas = [], []
+    for (inicio, fim), pesos in sorted(por_cep.items()):
+      if inicio > fim or (self._faixas and inicio <= self._faixas[-1][1]):
+        raise ValueError(f"{self}: faixa de CEP {inicio:08d}-{fim:08d} inválida ou sobreposta.")
+      self._inicios.append(inicio)
+      self._faixas.append((inicio, fim, sorted(pesos)))
+
+  def __str__(self):
+    return f'{self.transportadora} {self.servico}'
+
+  def cotar(self, cep, peso):
+    cep = int(cep)
+    posicao = bisect.bisect_right(self._inicios, cep) - 1
+    if posicao < 0 or cep > self._faixas[posicao][1]:
+      return None
+    pesos = self._faixas[posicao][2]
+    limite = bisect.bisect_left(pesos, (peso,))
+    if limite == len(pesos):
+      return None
+    _, preco, prazo = pesos[limite]
+    return Cotacao(self.transportadora, self.servico, preco, prazo)
+
+  def alinhada(self, digitos_cep):
+    """Se nenhuma faixa divide um prefixo de ``digitos_cep`` dígitos, condição para memorizar por prefixo."""
+    bloco = 10 ** (8 - digitos_cep)
+    return all(inicio % bloco == 0 and (fim + 1) % bloco == 0 for inicio, fim, _ in self._faixas)
+
+
+CAMPOS_FAIXA = ('cep_inicio', 'cep_fim', 'peso_ate', 'preco', 'prazo')
+
+
+def carregar_tabelas(caminho):
+  """
+  Lê as tabelas de um arquivo. CSV: uma faixa por linha, com ``transportadora``,
+  ``servico``, ``cep_inicio``, ``cep_fim``, ``peso_ate``, ``preco`` e ``prazo``. JSON:
+  uma lista de ``{"transportadora", "servico", "faixas": [...]}`` com os mesmos campos.
+  """
+  caminho = Path(caminho)
+  if caminho.suffix == '.json':
+    with caminho.open(encoding='utf-8') as arquivo:
+      servicos = json.load(arquivo)
+    return [
+      TabelaFrete(
+        servico['transportadora'], servico['servico'],
+        [tuple(faixa[campo] for campo in CAMPOS_FAIXA) for faixa in servico['faixas']],
+      )
+      for servico in servicos
+    ]
+  if caminho.suffix == '.csv':
+    faixas = {}
+    with caminho.open(encoding='utf-8', newline='') as arquivo:
+      for linha in csv.DictReader(arquivo):
+        chave = (linha['transportadora'], linha['servico'])
+        faixas.setdefault(chave, []).append(tuple(linha[campo] for campo in CAMPOS_FAIXA))
+    return [TabelaFrete(transportadora, servico, linhas) for (transportadora, servico), linhas in faixas.items()]
+  raise ValueError(f"Formato de tabela de frete não suportado: {caminho.name}.")
+
+
+class MemoTTL:
+  """Memória em processo, limitada, em que cada entrada vale por ``ttl`` segundos."""
+
+  def __init__(self, ttl, maximo, relogio=time.monotonic):
+    self.ttl = ttl
+    self.maximo = maximo
+    self.relogio = relogio
+    self._itens = OrderedDict()
+    self._trava = threading.Lock()
+
+  def obter(self, chave):
+    with self._trava:
+      entrada = self._itens.get(chave)
+      if entrada is None:
+        return None
+      expira, valor = entrada
+      if expira <= self.relogio():
+        del self._itens[chave]
+        return None
+      self._itens.move_to_end(chave)
+      return valor
+
+  def guardar(self, chave, valor):
+    with self._trava:
+      self._itens[chave] = (self.relogio() + self.ttl, valor)
+      self._itens.move_to_end(chave)
+      while len(self._itens) > self.maximo:
+        self._itens.popitem(last=False)
+
+  def limpar(self):
+    with self._trava:
+      self._itens.clear()
+
+  def __len__(self):
+    return len(self._itens)
+
+
+class Cotador:
+  """
+  Cota o frete em todas as tabelas e devolve as ofertas do mais barato para o mais caro.
+  O peso é arredondado para cima até a faixa de ``FAIXA_PESO`` gramas e o resultado é
+  memorizado por (prefixo do CEP, faixa de peso).
+
+  Tabelas em memória (TabelaFrete) são cotadas na própria thread. As externas, como
+  clientes de API, rodam em paralelo, cada uma no seu pool de ``WORKERS`` threads: uma
+  transportadora travada só prende as próprias threads, e enquanto todas estiverem
+  ocupadas ela é pulada em vez de enfileirar mais chamadas. Tabelas que falham, passam
+  de ``ESPERA`` ou são puladas ficam de fora, e essa cotação incompleta não é memorizada.
+  """
+
+  def __init__(self, tabelas=None, **opcoes):
+    config = {**configuracao(), **opcoes}
+    if tabelas is None:
+      tabelas = [tabela for caminho in config['TABELAS'] for tabela in carregar_tabelas(caminho)]
+    self.tabelas = list(tabelas)
+    self.digitos_cep = config['DIGITOS_CEP']
+    self.faixa_peso = config['FAIXA_PESO']
+    self.espera = config['ESPERA']
+    for tabela in self.tabelas:
+      if isinstance(tabela, TabelaFrete) and not tabela.alinhada(self.digitos_cep):
+        raise ImproperlyConfigured(
+          f"Tabela {tabela} tem faixas de CEP que dividem prefixos de {self.digitos_cep} dígitos."
+        )
+    self.memo = MemoTTL(config['TTL'], config['MEMO_MAXIMO'])
+    self.workers = config['WORKERS']
+    self._pools = {
+      indice: ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f'loja-frete-{indice}')
+      for indice, tabela in enumerate(self.tabelas) if not isinstance(tabela, TabelaFrete)
+    }
+    self._em_uso = dict.fromkeys(self._pools, 0)
+    self._trava = threading.Lock()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *excecao):
+    self.fechar()
+
+  def cotar(self, cep, peso):
+    cep = normalizar_cep(cep)
+    if peso <= 0:
+      raise ValueError("Peso deve ser positivo.")
+    faixa = math.ceil(peso / self.faixa_peso)
+    chave = (cep[:self.digitos_cep], faixa)
+    cotacoes = self.memo.obter(chave)
+    if cotacoes is None:
+      cotacoes, completa = self._avaliar(cep, faixa * self.faixa_peso)
+      if completa:
+        self.memo.guardar(chave, cotacoes)
+    return list(cotacoes)
+
+  def _reservar(self, indice):
+    with self._trava:
+      if self._em_uso[indice] >= self.workers:
+        return False
+      self._em_uso[indice] += 1
+      return True
+
+  def _liberar(self, indice):
+    with self._trava:
+      self._em_uso[indice] -= 1
+
+  def _avaliar(self, cep, peso):
+    futuros, completa = [], True
+    for indice, pool in self._pools.items():
+      if not self._reservar(indice):
+        # Todas as threads da tabela ainda esperam chamadas anteriores.
+        completa = False
+        continue
+      futuro = pool.submit(self.tabelas[indice].cotar, cep, peso)
+      futuro.add_done_callback(lambda _, indice=indice: self._liberar(indice))
+      futuros.append(futuro)
+
+    cotacoes = [
+      tabela.cotar(cep, peso) for indice, tabela in enumerate(self.tabelas) if indice not in self._pools
+    ]
+    prontos, atrasados = wait(futuros, timeout=self.espera)
+    completa = completa and not atrasados
+    for futuro in prontos:
+      if futuro.exception() is not None:
+        completa = False
+      else:
+        cotacoes.append(futuro.result())
+    cotacoes = sorted(
+      (cotacao for cotacao in cotacoes if cotacao is not None),
+      key=lambda cotacao: (cotacao.preco, cotacao.prazo, cotacao.transportadora, cotacao.servico),
+    )
+    return tuple(cotacoes), completa
+
+  def fechar(self):
+    for pool in self._pools.values():
+      pool.shutdown(wait=False, cancel_futures=True)
+
+
+_cotador = None
+_trava_cotador = threading.Lock()
+
+
+def cotador():
+  global _cotador
+  if _cotador is None:
+    with _trava_cotador:
+      if _cotador is None:
+        _cotador = Cotador()
+  return _cotador
+
+
+def cotar(cep, peso):
+  return cotador().cotar(cep, peso)
+
+
+def escolher_frete(pedido, cep, peso, transportadora, servico, using=None):
+  """
+  Grava como ServicoFretagem do pedido a cotação escolhida, substituindo o frete escolhido
+  antes. O preço é cotado de novo (normalmente da memória), nunca o enviado pelo cliente.
+  Os totais do pedido são ajustados pelos sinais de loja.totais.
+  """
+  escolhida = next(
+    (
+      cotacao for cotacao in cotar(cep, peso)
+      if (cotacao.transportadora, cotacao.servico) == (transportadora, servico)
+    ),
+    None,
+  )
+  if escolhida is None:
+    raise ValueError(f"{transportadora} {servico} não atende o CEP {cep} com {peso} g.")
+  using = using or router.db_for_write(ServicoFretagem)
+  with transaction.atomic(using=using):
+    ServicoFretagem.objects.using(using).filter(pedido=pedido).delete()
+    return ServicoFretagem.objects.using(using).create(
+      pedido=pedido, nome_transportadora=escolhida.transportadora, tipo_servico=escolhida.servico,
+      preco_fretagem=escolhida.preco, prazo_entrega=escolhida.prazo,
+    )
@@ -0,0 +1,85 @@
+from django.db import connections, router, transaction
+from django.db.models import BooleanField, Value
+from django.utils import timezone
+
+from loja.models import HistoricoPedido, HistoricoPedidoArquivado
+from loja.transacoes import AcumuladoNoCommit
+
+TAMANHO_LOTE = 1000
+
+CAMPOS = ('id', 'pedido_id', 'data_alteracao', 'status_anterior', 'status_atual')
+
+
+def historico_pedido(pedido_id, using=None):
+  """
+  Histórico de um pedido, vivo e arquivado, do mais recente para o mais antigo, numa
+  única consulta (UNION ALL). Cada linha traz ``arquivado`` indicando a origem.
+  """
+  vivo = HistoricoPedido.objects.filter(pedido_id=pedido_id)
+  arquivado = HistoricoPedidoArquivado.objects.filter(pedido_id=pedido_id)
+  if using:
+    vivo, arquivado = vivo.using(using), arquivado.using(using)
+  return (
+    vivo.values(*CAMPOS).annotate(arquivado=Value(False, output_field=BooleanField()))
+    .union(
+      arquivado.values(*CAMPOS).annotate(arquivado=Value(True, output_field=BooleanField())),
+      all=True,
+    )
+    .order_by('-data_alteracao', '-id')
+  )
+
+
+def arquivar_historico(antes, tamanho_lote=TAMANHO_LOTE, using=None):
+  """
+  Move para HistoricoPedidoArquivado as linhas com ``data_alteracao`` anterior a
+  ``antes``. Cada lote é copiado e apagado na mesma transação, então as travas duram
+  pouco e uma interrupção não deixa linhas duplicadas nem perdidas.
+  """
+  using = using or router.db_for_write(HistoricoPedido)
+  antigos = HistoricoPedido.objects.using(using).filter(data_alteracao__lt=antes).order_by('data_alteracao', 'id')
+  movidos = 0
+  while True:
+    with transaction.atomic(using=using):
+      lote = list(antigos.values(*CAMPOS)[:tamanho_lote])
+      if not lote:
+        return movidos
+      HistoricoPedidoArquivado.objects.using(using).bulk_create(
+        [HistoricoPedidoArquivado(**linha) for linha in lote]
+      )
+      HistoricoPedido.objects.using(using).filter(pk__in=[linha['id'] for linha in lote]).delete()
+    movidos += len(lote)
+
+
+class GravacaoHistorico(AcumuladoNoCommit):
+  """
+  Acumula as transições de status de uma transação (ou savepoint) e as grava com um
+  único bulk_create no commit. Se o savepoint ou a transação for desfeito, o Django
+  descarta o callback junto com as linhas acumuladas.
+  """
+
+  def __init__(self, using):
+    super().__init__(using)
+    self.linhas = []
+
+  def executar(self):
+    HistoricoPedido.objects.using(self.using).bulk_create(self.linhas, batch_size=TAMANHO_LOTE)
+
+
+def registrar_transicao(pedido_id, anterior, atual, data=None, using=None):
+  using = using or router.db_for_write(HistoricoPedido)
+  linha = HistoricoPedido(
+    pedido_id=pedido_id, data_alteracao=data or timezone.localdate(), status_anterior=anterior, status_atual=atual,
+  )
+  if not connections[using].in_atomic_block:
+    # Fora de transação o on_commit rodaria na hora; grava direto.
+    linha.save(using=using)
+    return
+  GravacaoHistorico.da_transacao(using).linhas.append(linha)
+
+
+def status_salvo(pedido, created, update_fields=None, using=None):
+  if created or (update_fields is not None and 'status' not in update_fields):
+    return
+  anterior = pedido.valores_carregados().get('status', pedido.status)
+  if anterior != pedido.status:
+    registrar_transicao(pedido.pk, anterior, pedido.status, using=using)
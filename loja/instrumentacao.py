@@ -0,0 +1,146 @@
+import heapq
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils import timezone
+
+PADROES = {
+  # Fração das requisições medidas (0 desliga, 1 mede todas).
+  'AMOSTRAGEM': 0.0,
+  # Envia o cabeçalho Server-Timing nas requisições medidas, só a usuários staff: ele
+  # expõe o tempo de banco e o número de consultas.
+  'SERVER_TIMING': False,
+  # Quantas requisições medidas ficam guardadas para /loja/monitoramento/consultas/.
+  'REGISTROS': 200,
+  # Quantas consultas mais lentas cada registro guarda.
+  'LENTAS': 5,
+  # A partir de quantas execuções da mesma consulta ela é marcada como repetida (N+1).
+  'REPETICOES': 3,
+}
+
+_LISTA_IN = re.compile(r'\bIN \((?:%s, )*%s\)')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_ESPACOS = re.compile(r'\s+')
+
+
+def configuracao():
+  return {**PADROES, **getattr(settings, 'LOJA_INSTRUMENTACAO', {})}
+
+
+@lru_cache(maxsize=2048)
+def assinatura(sql):
+  """A consulta sem valores: execuções que só mudam os parâmetros têm a mesma assinatura."""
+  sql = _LISTA_IN.sub('IN (...)', sql)
+  sql = _LITERAL.sub('?', sql)
+  return _ESPACOS.sub(' ', sql).strip()
+
+
+class MedicaoConsultas:
+  """
+  Wrapper de ``connection.execute_wrapper`` que conta as consultas de uma requisição,
+  soma o tempo gasto no banco, agrupa as execuções por assinatura para achar consultas
+  repetidas e guarda as mais lentas.
+  """
+
+  def __init__(self, lentas=PADROES['LENTAS']):
+    self.consultas = 0
+    self.tempo = 0.0
+    self.por_assinatura = {}
+    self.lentas = []
+    self.quantas_lentas = lentas
+
+  def __call__(self, execute, sql, params, many, context):
+    inicio = time.perf_counter()
+    try:
+      return execute(sql, params, many, context)
+    finally:
+      duracao = time.perf_counter() - inicio
+      self.consultas += 1
+      self.tempo += duracao
+      chave = assinatura(sql)
+      vezes, total = self.por_assinatura.get(chave, (0, 0.0))
+      self.por_assinatura[chave] = (vezes + 1, total + duracao)
+      entrada = (duracao, self.consultas, sql, context['connection'].alias)
+      if len(self.lentas) < self.quantas_lentas:
+        heapq.heappush(self.lentas, entrada)
+      elif duracao > self.lentas[0][0]:
+        heapq.heapreplace(self.lentas, entrada)
+
+  def repetidas(self, minimo):
+    return sorted(
+      (
+        {'sql': sql, 'vezes': vezes, 'tempo_ms': round(total * 1000, 3)}
+        for sql, (vezes, total) in self.por_assinatura.items() if vezes >= minimo
+      ),
+      key=lambda consulta: (-consulta['vezes'], -consulta['tempo_ms']),
+    )
+
+  def mais_lentas(self):
+    return [
+      {'sql': sql, 'banco': alias, 'tempo_ms': round(duracao * 1000, 3)}
+      for duracao, _, sql, alias in sorted(self.lentas, reverse=True)
+    ]
+
+
+class Registros:
+  """Buffer circular, por processo, com as últimas requisições medidas."""
+
+  def __init__(self, tamanho):
+    self._registros = deque(maxlen=tamanho)
+    self._trava = threading.Lock()
+
+  def adicionar(self, registro):
+    with self._trava:
+      self._registros.append(registro)
+
+  def recentes(self, limite=None):
+    with self._trava:
+      registros = list(self._registros)
+    registros.reverse()
+    return registros if limite is None else registros[:max(limite, 0)]
+
+  def limpar(self):
+    with self._trava:
+      self._registros.clear()
+
+
+_registros = None
+_trava_registros = threading.Lock()
+
+
+def registros():
+  global _registros
+  if _registros is None:
+    with _trava_registros:
+      if _registros is None:
+        _registros = Registros(configuracao()['REGISTROS'])
+  return _registros
+
+
+def registrar(request, response, medicao, duracao, config):
+  registro = {
+    'data': timezone.now().isoformat(),
+    'metodo': request.method,
+    'caminho': request.path,
+    'status': response.status_code,
+    'tempo_ms': round(duracao * 1000, 3),
+    'consultas': medicao.consultas,
+    'tempo_db_ms': round(medicao.tempo * 1000, 3),
+    'repetidas': medicao.repetidas(config['REPETICOES']),
+    'lentas': medicao.mais_lentas(),
+  }
+  registros().adicionar(registro)
+  return registro
+
+
+def server_timing(registro):
+  repetidas = sum(consulta['vezes'] for consulta in registro['repetidas'])
+  return (
+    f'db;dur={registro["tempo_db_ms"]};desc="{registro["consultas"]} consultas", '
+    f'db-repetidas;desc="{repetidas} em {len(registro["repetidas"])} assinaturas", '
+    f'total;dur={registro["tempo_ms"]}'
+  )
@@ -0,0 +1,62 @@
+import datetime
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from loja import analise
+
+
+def data(valor):
+  try:
+    return datetime.date.fromisoformat(valor)
+  except ValueError:
+    raise CommandError(f"Data inválida: {valor}. Use AAAA-MM-DD.")
+
+
+RELATORIOS = {
+  'receita': lambda instantaneo, opcoes: analise.receita_por_dia(instantaneo, opcoes['inicio'], opcoes['fim']),
+  'cestas': lambda instantaneo, opcoes: analise.tamanho_cestas(instantaneo, opcoes['inicio'], opcoes['fim']),
+  'mais-vendidos': lambda instantaneo, opcoes: analise.mais_vendidos(
+    instantaneo, opcoes['inicio'], opcoes['fim'], limite=opcoes['limite'], criterio=opcoes['criterio'],
+  ),
+}
+
+
+class Command(BaseCommand):
+  help = "Atualiza o instantâneo colunar de pedidos e itens e imprime um relatório calculado sobre ele, em JSON."
+
+  def add_arguments(self, parser):
+    parser.add_argument('relatorio', nargs='?', choices=sorted(RELATORIOS))
+    parser.add_argument('--from', dest='inicio', help='Primeiro dia, inclusivo (AAAA-MM-DD).')
+    parser.add_argument('--to', dest='fim', help='Último dia, inclusivo (AAAA-MM-DD).')
+    parser.add_argument('--limite', type=int, default=10)
+    parser.add_argument('--criterio', choices=analise.CRITERIOS, default='receita')
+    parser.add_argument('--atualizar', action='store_true', help='Extrai um instantâneo novo mesmo que o atual valha.')
+    parser.add_argument('--max-idade', type=int, default=None, help='Segundos que o instantâneo do disco vale.')
+    parser.add_argument('--diretorio', default=None)
+    parser.add_argument('--database', default=None)
+    parser.add_argument('--tamanho-lote', type=int, default=None)
+
+  def handle(self, *args, **options):
+    if analise.np is None:
+      raise CommandError("loja_analise precisa do numpy: pip install -r requirements-analise.txt.")
+    if options['tamanho_lote'] is not None and options['tamanho_lote'] < 1:
+      raise CommandError("--tamanho-lote deve ser positivo.")
+    for opcao in ('inicio', 'fim'):
+      if options[opcao] is not None:
+        options[opcao] = data(options[opcao])
+
+    instantaneo = analise.instantaneo(
+      max_idade=options['max_idade'], atualizar=options['atualizar'], diretorio=options['diretorio'],
+      tamanho_lote=options['tamanho_lote'], using=options['database'],
+    )
+    if options['relatorio'] is None:
+      linhas = {tabela: len(next(iter(colunas.values()))) for tabela, colunas in instantaneo.tabelas.items()}
+      self.stdout.write(self.style.SUCCESS(
+        f"Instantâneo de {instantaneo.gerado_em:%Y-%m-%d %H:%M:%S}: "
+        + ', '.join(f"{quantas} {tabela}" for tabela, quantas in linhas.items()) + '.'
+      ))
+      return
+    resultado = RELATORIOS[options['relatorio']](instantaneo, options)
+    self.stdout.write(json.dumps(resultado, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2))
@@ -0,0 +1,28 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loja.historico import TAMANHO_LOTE, arquivar_historico
+
+
+def data(valor):
+  try:
+    return datetime.date.fromisoformat(valor)
+  except ValueError:
+    raise CommandError(f"Data inválida: {valor}. Use AAAA-MM-DD.")
+
+
+class Command(BaseCommand):
+  help = "Move para HistoricoPedidoArquivado o histórico de pedidos anterior a uma data."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--before', required=True, help='Data de corte, exclusiva (AAAA-MM-DD).')
+    parser.add_argument('--database', default=None)
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE)
+
+  def handle(self, *args, **options):
+    if options['tamanho_lote'] < 1:
+      raise CommandError("--tamanho-lote deve ser positivo.")
+    antes = data(options['before'])
+    movidos = arquivar_historico(antes, tamanho_lote=options['tamanho_lote'], using=options['database'])
+    self.stdout.write(self.style.SUCCESS(f"{movidos} linhas de histórico anteriores a {antes} arquivadas."))
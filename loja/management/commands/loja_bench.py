@@ -0,0 +1,71 @@
+import importlib
+import json
+import pkgutil
+
+from django.core.management.base import BaseCommand, CommandError
+
+import loja.benchmarks
+
+
+def benchmarks_disponiveis():
+  return sorted(
+    modulo.name for modulo in pkgutil.iter_modules(loja.benchmarks.__path__)
+    if not modulo.name.startswith(('_', 'test_'))
+  )
+
+
+def metricas(resultado, prefixo=''):
+  """Achata o resultado em {'a.b': valor} com as folhas numéricas."""
+  planas = {}
+  for chave, valor in resultado.items():
+    nome = f'{prefixo}{chave}'
+    if isinstance(valor, dict):
+      planas.update(metricas(valor, f'{nome}.'))
+    elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+      planas[nome] = valor
+  return planas
+
+
+class Command(BaseCommand):
+  help = "Executa um benchmark de loja.benchmarks contra o banco configurado."
+
+  def add_arguments(self, parser):
+    parser.add_argument('nome', help=f"Um de: {', '.join(benchmarks_disponiveis())}.")
+    parser.add_argument(
+      '--param', action='append', default=[], metavar='CHAVE=VALOR',
+      help='Parâmetro repassado ao benchmark; pode ser repetido.',
+    )
+    parser.add_argument('--saida', help='Grava o resultado em JSON neste arquivo.')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior; mostra a variação de cada métrica.')
+
+  def handle(self, *args, **options):
+    if options['nome'] not in benchmarks_disponiveis():
+      raise CommandError(f"Benchmark desconhecido: {options['nome']}.")
+    try:
+      parametros = dict(param.split('=', 1) for param in options['param'])
+    except ValueError:
+      raise CommandError("Parâmetros devem estar no formato CHAVE=VALOR.")
+
+    anterior = None
+    if options['comparar']:
+      try:
+        with open(options['comparar'], encoding='utf-8') as arquivo:
+          anterior = metricas(json.load(arquivo))
+      except (OSError, ValueError) as erro:
+        raise CommandError(f"Não foi possível ler {options['comparar']}: {erro}")
+
+    modulo = importlib.import_module(f"loja.benchmarks.{options['nome']}")
+    resultado = modulo.executar(**parametros)
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False, default=str)
+    self.stdout.write(texto)
+    if options['saida']:
+      with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+        arquivo.write(texto + '\n')
+
+    if anterior is not None:
+      for nome, valor in metricas(resultado).items():
+        if nome not in anterior:
+          continue
+        antes = anterior[nome]
+        variacao = f"{(valor - antes) / antes:+.1%}" if antes else "n/a"
+        self.stdout.write(f"{nome}: {antes} -> {valor} ({variacao})")
@@ -0,0 +1,39 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loja.exportacao import FORMATOS, TAMANHO_LOTE, exportar, periodo_do_mes
+
+
+class Command(BaseCommand):
+  help = "Exporta os pedidos de um mês, com itens, pagamentos e fretes, em CSV ou JSONL."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--mes', required=True, help='Mês exportado (AAAA-MM).')
+    parser.add_argument('--formato', choices=FORMATOS, default='csv')
+    parser.add_argument('--gzip', action='store_true', help='Comprime a saída com gzip.')
+    parser.add_argument('--saida', default='-', help='Arquivo de destino; "-" para a saída padrão.')
+    parser.add_argument('--database', default=None)
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE)
+
+  def handle(self, *args, **options):
+    try:
+      inicio, fim = periodo_do_mes(options['mes'])
+    except ValueError:
+      raise CommandError(f"Mês inválido: {options['mes']}. Use AAAA-MM.")
+
+    blocos = exportar(
+      inicio, fim, formato=options['formato'], comprimir=options['gzip'],
+      tamanho_lote=options['tamanho_lote'], using=options['database'],
+    )
+    if options['saida'] == '-':
+      destino = sys.stdout.buffer
+      for bloco in blocos:
+        destino.write(bloco)
+      destino.flush()
+      return
+
+    with open(options['saida'], 'wb') as arquivo:
+      for bloco in blocos:
+        arquivo.write(bloco)
+    self.stderr.write(self.style.SUCCESS(f"Pedidos de {options['mes']} exportados para {options['saida']}."))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from loja.services import TAMANHO_LOTE, gerar_hashes_pendentes
+
+
+class Command(BaseCommand):
+  help = "Gera o hash das senhas de usuários ainda gravadas em texto, com o custo configurado."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--database', default=None)
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE)
+    parser.add_argument(
+      '--workers', type=int, default=1,
+      help='Processos que calculam os hashes; com 1 (padrão) o hash roda no próprio processo.',
+    )
+
+  def handle(self, *args, **options):
+    for opcao in ('workers', 'tamanho_lote'):
+      if options[opcao] < 1:
+        raise CommandError(f"--{opcao.replace('_', '-')} deve ser positivo.")
+    trocadas = gerar_hashes_pendentes(
+      tamanho_lote=options['tamanho_lote'], workers=options['workers'], using=options['database'],
+    )
+    self.stdout.write(self.style.SUCCESS(f"{trocadas} senhas em texto trocadas pelo hash."))
@@ -0,0 +1,62 @@
+import csv
+import sys
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loja.services import TAMANHO_LOTE, bulk_import_users
+
+COLUNAS = ('nome', 'email', 'senha')
+
+
+class Command(BaseCommand):
+  help = "Importa usuários de um CSV (nome, email, senha) e grava as linhas recusadas num CSV à parte."
+
+  def add_arguments(self, parser):
+    parser.add_argument('arquivo', help='CSV com cabeçalho nome,email,senha; "-" para a entrada padrão.')
+    parser.add_argument(
+      '--rejeitados', help='CSV das linhas recusadas, com o motivo (padrão: <arquivo>.rejeitados.csv).',
+    )
+    parser.add_argument(
+      '--workers', type=int, default=1,
+      help='Processos que calculam os hashes; com 1 (padrão) o hash roda no próprio processo.',
+    )
+    parser.add_argument('--database', default=None)
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE)
+
+  def handle(self, *args, **options):
+    for opcao in ('workers', 'tamanho_lote'):
+      if options[opcao] < 1:
+        raise CommandError(f"--{opcao.replace('_', '-')} deve ser positivo.")
+    caminho_rejeitados = options['rejeitados'] or (
+      'rejeitados.csv' if options['arquivo'] == '-' else f"{options['arquivo']}.rejeitados.csv"
+    )
+
+    try:
+      if options['arquivo'] == '-':
+        entrada = nullcontext(sys.stdin)
+      else:
+        entrada = open(options['arquivo'], encoding='utf-8', newline='')
+    except OSError as erro:
+      raise CommandError(f"Não foi possível ler {options['arquivo']}: {erro}")
+    with entrada as arquivo, open(caminho_rejeitados, 'w', encoding='utf-8', newline='') as saida:
+      leitor = csv.DictReader(arquivo)
+      faltando = set(COLUNAS) - set(leitor.fieldnames or ())
+      if faltando:
+        raise CommandError(f"Colunas ausentes no CSV: {', '.join(sorted(faltando))}.")
+      rejeitados = csv.writer(saida)
+      # A senha recusada não vai para o relatório.
+      rejeitados.writerow(('linha', 'nome', 'email', 'motivo'))
+
+      def ao_rejeitar(indice, linha, mensagens):
+        # +2: o cabeçalho é a linha 1 do arquivo.
+        rejeitados.writerow((indice + 2, linha.get('nome'), linha.get('email'), ' '.join(mensagens)))
+
+      resultado = bulk_import_users(
+        leitor, tamanho_lote=options['tamanho_lote'], workers=options['workers'], ao_rejeitar=ao_rejeitar,
+        using=options['database'],
+      )
+
+    self.stdout.write(self.style.SUCCESS(
+      f"{resultado.criados} usuários importados, {len(resultado.erros)} recusados (ver {caminho_rejeitados})."
+    ))
@@ -0,0 +1,112 @@
+import datetime
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from loja.models import (
+  Avaliacao, HistoricoPedido, ItemPedido, Pagamento, Pedido, Produto, ServicoFretagem,
+)
+
+DATA_REFERENCIA = datetime.date(2024, 1, 1)
+
+# Consultas canônicas da loja. Cada entrada gera o queryset que será submetido ao EXPLAIN;
+# os valores dos filtros são apenas representativos.
+CONSULTAS = [
+  ('pedidos do usuário por data',
+   lambda: Pedido.objects.filter(usuario_id=1).order_by('-data_pedido')),
+  ('pedidos por status e período',
+   lambda: Pedido.objects.filter(status='Pendente', data_pedido__gte=DATA_REFERENCIA)),
+  ('fila de pedidos pendentes',
+   lambda: Pedido.objects.filter(status='Pendente').order_by('data_pedido')),
+  ('histórico do pedido',
+   lambda: HistoricoPedido.objects.filter(pedido_id=1).order_by('data_alteracao')),
+  ('histórico por período',
+   lambda: HistoricoPedido.objects.filter(data_alteracao__lt=DATA_REFERENCIA)),
+  ('itens do pedido',
+   lambda: ItemPedido.objects.filter(pedido_id=1)),
+  ('vendas do produto',
+   lambda: ItemPedido.objects.filter(produto_id=1).values('pedido_id')),
+  ('pagamentos do pedido',
+   lambda: Pagamento.objects.filter(pedido_id=1).order_by('data_pagamento')),
+  ('pagamentos por forma e período',
+   lambda: Pagamento.objects.filter(forma_pagamento='Pix', data_pagamento__gte=DATA_REFERENCIA)),
+  ('avaliações do produto por nota',
+   lambda: Avaliacao.objects.filter(produto_id=1, nota__gte=4)),
+  ('avaliações do usuário',
+   lambda: Avaliacao.objects.filter(usuario_id=1, produto_id=1)),
+  ('fretes do pedido',
+   lambda: ServicoFretagem.objects.filter(pedido_id=1)),
+  ('produtos do fornecedor',
+   lambda: Produto.objects.filter(fornecedor_id=1)),
+]
+
+SEEK = 'seek'
+VARREDURA_INDICE = 'index_scan'
+VARREDURA = 'scan'
+
+
+def classificar_plano(vendor, plano):
+  """Classifica a saída do EXPLAIN em seek, varredura de índice ou varredura completa."""
+  if vendor == 'mysql':
+    acessos = re.findall(r'"access_type":\s*"(\w+)"', plano)
+    if 'ALL' in acessos:
+      return VARREDURA
+    if 'index' in acessos:
+      return VARREDURA_INDICE
+    return SEEK
+  if vendor == 'postgresql':
+    if 'Seq Scan' in plano:
+      return VARREDURA
+    return SEEK
+  if vendor == 'sqlite':
+    varreduras = re.findall(r'\bSCAN (\S+)( USING (?:COVERING )?INDEX)?', plano)
+    if any(not indice for _, indice in varreduras):
+      return VARREDURA
+    if varreduras:
+      return VARREDURA_INDICE
+    return SEEK
+  raise CommandError(f"Banco de dados '{vendor}' não suportado pela auditoria.")
+
+
+class Command(BaseCommand):
+  help = (
+    "Executa EXPLAIN nas consultas canônicas da loja e aponta as que varrem a tabela "
+    "em vez de buscar pelo índice. Em tabelas quase vazias o otimizador pode preferir "
+    "a varredura; rode contra uma base com volume representativo."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument('--database', default='default')
+    parser.add_argument(
+      '--falhar', action='store_true',
+      help='Encerra com erro se alguma consulta fizer varredura completa.',
+    )
+    parser.add_argument('--verboso', action='store_true', help='Mostra o plano de cada consulta.')
+
+  def handle(self, *args, **options):
+    alias = options['database']
+    vendor = connections[alias].vendor
+    formato = 'JSON' if vendor == 'mysql' else None
+
+    varreduras = []
+    for nome, consulta in CONSULTAS:
+      plano = consulta().using(alias).explain(format=formato)
+      classe = classificar_plano(vendor, plano)
+      if classe == VARREDURA:
+        varreduras.append(nome)
+        self.stdout.write(self.style.ERROR(f"[VARREDURA] {nome}"))
+      elif classe == VARREDURA_INDICE:
+        self.stdout.write(self.style.WARNING(f"[ÍNDICE]    {nome}"))
+      else:
+        self.stdout.write(self.style.SUCCESS(f"[SEEK]      {nome}"))
+      if options['verboso']:
+        self.stdout.write(plano)
+
+    if varreduras:
+      mensagem = f"{len(varreduras)} de {len(CONSULTAS)} consultas fazem varredura completa."
+      if options['falhar']:
+        raise CommandError(mensagem)
+      self.stdout.write(self.style.WARNING(mensagem))
+    else:
+      self.stdout.write(self.style.SUCCESS("Todas as consultas usam índices."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from loja.avaliacoes import TAMANHO_LOTE, reconstruir_resumos
+
+
+class Command(BaseCommand):
+  help = "Reconstrói ResumoAvaliacaoProduto a partir de todas as avaliações."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--database', default=None)
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE)
+
+  def handle(self, *args, **options):
+    gravados = reconstruir_resumos(tamanho_lote=options['tamanho_lote'], using=options['database'])
+    self.stdout.write(self.style.SUCCESS(f"{gravados} resumos de avaliação reconstruídos."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from loja.busca import TAMANHO_LOTE, reconstruir_indice
+
+
+class Command(BaseCommand):
+  help = "Reconstrói o índice de busca de produtos (TermoBusca) a partir de todos os produtos."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--database', default=None)
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE)
+
+  def handle(self, *args, **options):
+    indexados = reconstruir_indice(tamanho_lote=options['tamanho_lote'], using=options['database'])
+    self.stdout.write(self.style.SUCCESS(f"{indexados} produtos indexados para a busca."))
@@ -0,0 +1,49 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from loja.models import Pedido
+from loja.services import lotes_por_chave
+from loja.totais import recalcular_totais
+
+
+class Command(BaseCommand):
+  help = "Reconcilia Pedido.valor_total e Pedido.quantidade_itens com os itens e fretes gravados."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--database', default='default')
+    parser.add_argument('--tamanho-lote', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--simular', action='store_true', help='Apenas conta as divergências.')
+
+  def handle(self, *args, **options):
+    alias = options['database']
+    aplicar = not options['simular']
+
+    def reconciliar(pedido_ids):
+      try:
+        return recalcular_totais(pedido_ids, using=alias, aplicar=aplicar)
+      finally:
+        # Cada thread abre sua própria conexão; fecha ao terminar o lote.
+        if options['workers'] > 1:
+          connections[alias].close()
+
+    ids = Pedido.objects.using(alias).values_list('pk', flat=True)
+    lotes = lotes_por_chave(ids, options['tamanho_lote'])
+    if options['workers'] > 1:
+      divergentes = 0
+      with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+        # Limita os lotes em voo para manter a memória constante.
+        pendentes = set()
+        for lote in lotes:
+          if len(pendentes) >= 2 * options['workers']:
+            concluidos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            divergentes += sum(futuro.result() for futuro in concluidos)
+          pendentes.add(executor.submit(reconciliar, lote))
+        divergentes += sum(futuro.result() for futuro in pendentes)
+    else:
+      divergentes = sum(map(reconciliar, lotes))
+
+    acao = "encontrados" if options['simular'] else "corrigidos"
+    self.stdout.write(self.style.SUCCESS(f"{divergentes} pedidos divergentes {acao}."))
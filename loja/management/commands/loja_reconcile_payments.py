@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from loja.conciliacao import TAMANHO_LOTE, conciliar
+
+
+class Command(BaseCommand):
+  help = "Concilia os pagamentos com o total de cada pedido e atualiza valor_pago e situacao_pagamento."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--database', default=None)
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE)
+    parser.add_argument(
+      '--recomecar', action='store_true', help='Ignora o ponto de retomada de uma execução interrompida.',
+    )
+
+  def handle(self, *args, **options):
+    if options['tamanho_lote'] < 1:
+      raise CommandError("--tamanho-lote deve ser positivo.")
+    resultado = conciliar(
+      tamanho_lote=options['tamanho_lote'], recomecar=options['recomecar'], using=options['database'],
+    )
+    for situacao, quantidade in sorted(resultado.situacoes.items()):
+      self.stdout.write(f"{situacao}: {quantidade}")
+    self.stdout.write(self.style.SUCCESS(
+      f"{resultado.pedidos} pedidos conciliados, {resultado.alterados} atualizados."
+    ))
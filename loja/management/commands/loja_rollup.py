@@ -0,0 +1,64 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loja.consolidados import DIAS_POR_TAREFA, TAMANHO_LOTE, reconstruir_pendentes, reconstruir_periodo
+
+
+def data(valor):
+  try:
+    return datetime.date.fromisoformat(valor)
+  except ValueError:
+    raise CommandError(f"Data inválida: {valor}. Use AAAA-MM-DD.")
+
+
+class Command(BaseCommand):
+  help = "Reconstrói os consolidados diários de vendas e pagamentos de um período, em paralelo."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--from', dest='inicio', help='Primeiro dia, inclusivo (AAAA-MM-DD).')
+    parser.add_argument('--to', dest='fim', help='Último dia, inclusivo (AAAA-MM-DD).')
+    parser.add_argument(
+      '--pendentes', action='store_true',
+      help='Reconstrói só os dias marcados por deltas que não obtiveram a trava, em vez de --from/--to.',
+    )
+    parser.add_argument('--workers', type=int, default=1, help='Processos que reconstroem períodos ao mesmo tempo.')
+    parser.add_argument('--dias-por-tarefa', type=int, default=DIAS_POR_TAREFA)
+    parser.add_argument('--database', default=None)
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE)
+
+  def handle(self, *args, **options):
+    for opcao in ('workers', 'dias_por_tarefa', 'tamanho_lote'):
+      if options[opcao] < 1:
+        raise CommandError(f"--{opcao.replace('_', '-')} deve ser positivo.")
+    if options['pendentes']:
+      if options['inicio'] or options['fim']:
+        raise CommandError("--pendentes não aceita --from/--to.")
+      return self.pendentes(options)
+    if not (options['inicio'] and options['fim']):
+      raise CommandError("Informe --from e --to, ou --pendentes.")
+    inicio, fim = data(options['inicio']), data(options['fim'])
+    if inicio > fim:
+      raise CommandError("--from deve ser anterior ou igual a --to.")
+
+    linhas = tarefas = 0
+    for comeco, final, gravadas in reconstruir_periodo(
+      inicio, fim, dias_por_tarefa=options['dias_por_tarefa'], workers=options['workers'],
+      tamanho_lote=options['tamanho_lote'], using=options['database'],
+    ):
+      tarefas += 1
+      linhas += gravadas
+      if options['verbosity'] > 1:
+        self.stdout.write(f"{comeco} a {final}: {gravadas} linhas")
+    self.stdout.write(self.style.SUCCESS(
+      f"Consolidados de {inicio} a {fim} reconstruídos: {linhas} linhas em {tarefas} tarefas."
+    ))
+
+  def pendentes(self, options):
+    dias = linhas = 0
+    for dia, gravadas in reconstruir_pendentes(tamanho_lote=options['tamanho_lote'], using=options['database']):
+      dias += 1
+      linhas += gravadas
+      if options['verbosity'] > 1:
+        self.stdout.write(f"{dia}: {gravadas} linhas")
+    self.stdout.write(self.style.SUCCESS(f"{dias} dias pendentes reconstruídos: {linhas} linhas."))
@@ -0,0 +1,44 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loja.sinteticos import TAMANHO_LOTE, Escala, popular
+
+
+class Command(BaseCommand):
+  help = "Gera dados sintéticos e reprodutíveis para todos os modelos da loja, com inserções em lote."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--pedidos', type=int, default=10_000)
+    parser.add_argument('--usuarios', type=int, help='Padrão: pedidos / 5.')
+    parser.add_argument('--produtos', type=int, help='Padrão: pedidos / 20.')
+    parser.add_argument('--fornecedores', type=int, help='Padrão: produtos / 200.')
+    parser.add_argument('--variacoes', type=int, default=3, help='Especificações por produto.')
+    parser.add_argument('--avaliacoes', type=int, help='Padrão: pedidos / 4.')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--inicio', default='2023-01-01', help='Data do pedido mais antigo (AAAA-MM-DD).')
+    parser.add_argument('--dias', type=int, default=730, help='Período coberto pelas datas dos pedidos.')
+    parser.add_argument('--sem-derivados', action='store_true', help='Não reconstrói resumos de avaliação e busca.')
+    parser.add_argument('--database', default=None)
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE)
+
+  def handle(self, *args, **options):
+    if options['tamanho_lote'] < 1 or options['dias'] < 1:
+      raise CommandError("--tamanho-lote e --dias devem ser positivos.")
+    try:
+      inicio = datetime.date.fromisoformat(options['inicio'])
+      escala = Escala(**{
+        campo: options[campo]
+        for campo in ('pedidos', 'usuarios', 'produtos', 'fornecedores', 'variacoes', 'avaliacoes')
+        if options[campo] is not None
+      })
+    except ValueError as erro:
+      raise CommandError(str(erro))
+
+    criados = popular(
+      escala, semente=options['semente'], derivados=not options['sem_derivados'],
+      tamanho_lote=options['tamanho_lote'], using=options['database'], inicio=inicio, dias=options['dias'],
+    )
+    for modelo, quantidade in criados.items():
+      self.stdout.write(f"{modelo}: {quantidade}")
+    self.stdout.write(self.style.SUCCESS(f"{sum(criados.values())} linhas geradas com a semente {options['semente']}."))
@@ -0,0 +1,116 @@
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+
+from loja import instrumentacao, routers
+
+COOKIE_PRIMARIO = 'loja_primario'
+
+
+class FixarPrimarioMiddleware:
+  """
+  Isola o estado de read-your-writes de ``loja.routers`` por requisição. Quem escreveu
+  recebe um cookie curto que mantém as próximas requisições (ex.: o redirect após salvar
+  no admin) lendo do primário enquanto a réplica alcança. Nos dois modos, síncrono e
+  assíncrono, o escopo é aberto e fechado no contexto da própria requisição.
+  """
+
+  sync_capable = True
+  async_capable = True
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    if iscoroutinefunction(get_response):
+      markcoroutinefunction(self)
+
+  def _fixar(self, response):
+    config = routers.configuracao()
+    if routers.escreveu() and routers.replica_ativa(config) and config['FIXAR_POR']:
+      response.set_cookie(COOKIE_PRIMARIO, '1', max_age=config['FIXAR_POR'], httponly=True, samesite='Lax')
+    return response
+
+  def __call__(self, request):
+    if iscoroutinefunction(self):
+      return self.__acall__(request)
+    with routers.escopo_requisicao(fixado=COOKIE_PRIMARIO in request.COOKIES):
+      return self._fixar(self.get_response(request))
+
+  async def __acall__(self, request):
+    # As escritas feitas em sync_to_async voltam para este contexto (o asgiref copia as
+    # ContextVars de volta), então escreveu() vale aqui também.
+    with routers.escopo_requisicao(fixado=COOKIE_PRIMARIO in request.COOKIES):
+      return self._fixar(await self.get_response(request))
+
+
+class InstrumentacaoConsultasMiddleware:
+  """
+  Mede, numa amostra das requisições, quantas consultas SQL foram feitas, o tempo no
+  banco, as consultas repetidas (N+1) e as mais lentas. O resultado vai para o buffer de
+  ``loja.instrumentacao`` e, com SERVER_TIMING ligado, para o cabeçalho Server-Timing
+  das respostas a usuários staff. Fora da amostra a requisição
+  passa direto, sem wrapper nas conexões. Respostas em fluxo só contam as consultas
+  feitas antes do primeiro byte. Funciona nos dois modos, para o ASGI não adaptar a
+  pilha inteira para síncrona por causa dele.
+  """
+
+  sync_capable = True
+  async_capable = True
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    if iscoroutinefunction(get_response):
+      markcoroutinefunction(self)
+
+  def _amostra(self):
+    config = instrumentacao.configuracao()
+    if config['AMOSTRAGEM'] <= 0 or random.random() >= config['AMOSTRAGEM']:
+      return None
+    return config
+
+  def _medir(self, medicao):
+    pilha = ExitStack()
+    for alias in connections:
+      pilha.enter_context(connections[alias].execute_wrapper(medicao))
+    return pilha
+
+  def _registrar(self, request, response, medicao, inicio, config, usuario):
+    registro = instrumentacao.registrar(request, response, medicao, time.perf_counter() - inicio, config)
+    if config['SERVER_TIMING'] and usuario is not None and usuario.is_active and usuario.is_staff:
+      response['Server-Timing'] = instrumentacao.server_timing(registro)
+    return response
+
+  def __call__(self, request):
+    if iscoroutinefunction(self):
+      return self.__acall__(request)
+    config = self._amostra()
+    if config is None:
+      return self.get_response(request)
+
+    medicao = instrumentacao.MedicaoConsultas(config['LENTAS'])
+    inicio = time.perf_counter()
+    with self._medir(medicao):
+      response = self.get_response(request)
+    usuario = getattr(request, 'user', None) if config['SERVER_TIMING'] else None
+    return self._registrar(request, response, medicao, inicio, config, usuario)
+
+  async def __acall__(self, request):
+    config = self._amostra()
+    if config is None:
+      return await self.get_response(request)
+
+    medicao = instrumentacao.MedicaoConsultas(config['LENTAS'])
+    inicio = time.perf_counter()
+    # As conexões são por thread: o wrapper vai na thread em que o ORM assíncrono roda as
+    # consultas (sync_to_async com thread_sensitive), e é removido nela.
+    pilha = await sync_to_async(self._medir)(medicao)
+    try:
+      response = await self.get_response(request)
+    finally:
+      await sync_to_async(pilha.close)()
+    usuario = None
+    if config['SERVER_TIMING'] and hasattr(request, 'auser'):
+      usuario = await request.auser()
+    return self._registrar(request, response, medicao, inicio, config, usuario)
@@ -0,0 +1,101 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loja', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historicopedido',
+            name='pedido',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='loja.pedido'),
+        ),
+        migrations.AlterField(
+            model_name='itempedido',
+            name='especificacao',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='loja.especificacaoproduto'),
+        ),
+        migrations.AlterField(
+            model_name='itempedido',
+            name='pedido',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='loja.pedido'),
+        ),
+        migrations.AlterField(
+            model_name='itempedido',
+            name='produto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='loja.produto'),
+        ),
+        migrations.AlterField(
+            model_name='pagamento',
+            name='pedido',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='loja.pedido'),
+        ),
+        migrations.AlterField(
+            model_name='pedido',
+            name='usuario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='loja.usuario'),
+        ),
+        migrations.AlterField(
+            model_name='servicofretagem',
+            name='pedido',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='loja.pedido'),
+        ),
+        migrations.AddIndex(
+            model_name='avaliacao',
+            index=models.Index(fields=['produto', 'nota'], name='avaliacao_produto_nota_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='avaliacao',
+            index=models.Index(fields=['usuario', 'produto'], name='avaliacao_usuario_prod_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='avaliacao',
+            index=models.Index(condition=models.Q(('comentario__isnull', False)), fields=['produto'], name='avaliacao_comentada_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicopedido',
+            index=models.Index(fields=['pedido', 'data_alteracao'], name='historico_pedido_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicopedido',
+            index=models.Index(fields=['data_alteracao'], name='historico_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itempedido',
+            index=models.Index(fields=['pedido', 'produto'], name='item_pedido_produto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itempedido',
+            index=models.Index(fields=['produto', 'pedido'], name='item_produto_pedido_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(fields=['pedido', 'data_pagamento'], name='pagamento_pedido_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(fields=['forma_pagamento', 'data_pagamento'], name='pagamento_forma_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['usuario', 'data_pedido'], name='pedido_usuario_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['status', 'data_pedido'], name='pedido_status_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['data_pedido', 'id'], name='pedido_data_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(condition=models.Q(('status', 'Pendente')), fields=['data_pedido'], name='pedido_pendente_data_idx'),
+        ),
+    ]
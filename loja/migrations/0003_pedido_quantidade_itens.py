@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loja', '0002_indices_compostos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='quantidade_itens',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def preencher_resumos(apps, schema_editor):
+    Avaliacao = apps.get_model('loja', 'Avaliacao')
+    ResumoAvaliacaoProduto = apps.get_model('loja', 'ResumoAvaliacaoProduto')
+    alias = schema_editor.connection.alias
+    resumos = {}
+    contagens = (
+        Avaliacao.objects.using(alias)
+        .values_list('produto_id', 'nota')
+        .annotate(quantidade=models.Count('pk'))
+        .order_by()
+    )
+    for produto_id, nota, quantidade in contagens:
+        resumo = resumos.setdefault(produto_id, ResumoAvaliacaoProduto(produto_id=produto_id))
+        resumo.total += quantidade
+        resumo.soma += nota * quantidade
+        if 0 <= nota <= 5:
+            setattr(resumo, f'nota_{nota}', getattr(resumo, f'nota_{nota}') + quantidade)
+    ResumoAvaliacaoProduto.objects.using(alias).bulk_create(resumos.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loja', '0003_pedido_quantidade_itens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoAvaliacaoProduto',
+            fields=[
+                ('produto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumo_avaliacoes', serialize=False, to='loja.produto')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('soma', models.PositiveBigIntegerField(default=0)),
+                ('nota_0', models.PositiveIntegerField(default=0)),
+                ('nota_1', models.PositiveIntegerField(default=0)),
+                ('nota_2', models.PositiveIntegerField(default=0)),
+                ('nota_3', models.PositiveIntegerField(default=0)),
+                ('nota_4', models.PositiveIntegerField(default=0)),
+                ('nota_5', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(preencher_resumos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loja', '0004_resumo_avaliacao_produto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoricoPedidoArquivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('data_alteracao', models.DateField()),
+                ('status_anterior', models.CharField(max_length=50)),
+                ('status_atual', models.CharField(max_length=50)),
+                ('pedido', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='historico_arquivado', to='loja.pedido')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['pedido', 'data_alteracao'], name='historico_arq_pedido_data_idx')],
+            },
+        ),
+    ]
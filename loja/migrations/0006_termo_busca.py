@@ -0,0 +1,78 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:54
+
+import re
+import unicodedata
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Cópia do tokenizador de loja.busca como era nesta migração; a migração não importa
+# código da app, que pode mudar depois dela.
+TAMANHO_TERMO = 64
+PESO_NOME = 3
+PESO_DESCRICAO = 1
+STOPWORDS = frozenset(
+    'a ao aos as com da das de do dos e em na nas no nos o os ou para por pra que se sem um uma'.split()
+)
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def normalizar(texto):
+    decomposto = unicodedata.normalize('NFKD', texto or '').lower()
+    sem_acento = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return [
+        token[:TAMANHO_TERMO] for token in _TOKEN.findall(sem_acento)
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def termos(nome, descricao):
+    pesos = Counter()
+    for token in normalizar(nome):
+        pesos[token] += PESO_NOME
+    for token in normalizar(descricao):
+        pesos[token] += PESO_DESCRICAO
+    return pesos
+
+
+def preencher_indice(apps, schema_editor):
+    Produto = apps.get_model('loja', 'Produto')
+    TermoBusca = apps.get_model('loja', 'TermoBusca')
+    alias = schema_editor.connection.alias
+    produtos = Produto.objects.using(alias).values_list('pk', 'nome', 'descricao').order_by('pk')
+    ultimo = 0
+    # Lotes por pk: o iterator() do mysqlclient traria a tabela inteira para a memória.
+    while lote := list(produtos.filter(pk__gt=ultimo)[:1000]):
+        TermoBusca.objects.using(alias).bulk_create(
+            [
+                TermoBusca(produto_id=pk, termo=termo, peso=peso)
+                for pk, nome, descricao in lote
+                for termo, peso in termos(nome, descricao).items()
+            ],
+            batch_size=1000,
+        )
+        ultimo = lote[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loja', '0005_historico_pedido_arquivado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermoBusca',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termo', models.CharField(max_length=64)),
+                ('peso', models.PositiveIntegerField()),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='termos_busca', to='loja.produto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('termo', 'produto'), name='termo_busca_termo_produto_uniq')],
+            },
+        ),
+        migrations.RunPython(preencher_indice, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+# valor_pago e situacao_pagamento começam zerados em todos os pedidos; preencha com
+# manage.py loja_reconcile_payments depois de migrar (em lotes, retomável).
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loja', '0006_termo_busca'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgressoConciliacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=50, unique=True)),
+                ('ultimo_pedido_id', models.BigIntegerField(default=0)),
+                ('pedidos_processados', models.PositiveBigIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='situacao_pagamento',
+            field=models.CharField(default='Sem pagamento', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='valor_pago',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['situacao_pagamento', 'data_pedido'], name='pedido_situacao_pag_data_idx'),
+        ),
+    ]
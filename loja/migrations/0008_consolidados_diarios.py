@@ -0,0 +1,57 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loja', '0007_conciliacao_pagamentos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PagamentoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('forma_pagamento', models.CharField(max_length=50)),
+                ('quantidade', models.IntegerField(default=0)),
+                ('valor', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('data', 'forma_pagamento'), name='pagamento_diario_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VendaDiariaFornecedor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('itens', models.IntegerField(default=0)),
+                ('unidades', models.IntegerField(default=0)),
+                ('receita', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('fornecedor', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='loja.fornecedor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['data'], name='venda_diaria_fornec_data_idx')],
+                'constraints': [models.UniqueConstraint(fields=('fornecedor', 'data'), name='venda_diaria_fornecedor_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VendaDiariaProduto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('itens', models.IntegerField(default=0)),
+                ('unidades', models.IntegerField(default=0)),
+                ('receita', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('produto', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='loja.produto')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['data'], name='venda_diaria_produto_data_idx')],
+                'constraints': [models.UniqueConstraint(fields=('produto', 'data'), name='venda_diaria_produto_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loja', '0008_consolidados_diarios'),
+    ]
+
+    operations = [
+        # As linhas existentes guardam a senha em texto e ficam com o default True; o hash
+        # com o custo configurado sai de manage.py loja_hash_passwords, em lotes, fora da
+        # migração.
+        migrations.AddField(
+            model_name='usuario',
+            name='senha_em_texto',
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loja', '0009_usuario_senha_em_texto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiaConsolidadoPendente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(db_index=True)),
+                ('registrado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -1,15 +1,154 @@
-from django.db import models
+from django.contrib.auth.hashers import make_password
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from loja import senhas
+
+
+class RastreiaValoresCarregados(models.Model):
+  """
+  Guarda os valores lidos do banco (ou gravados pelo último save) para que os sinais
+  calculem deltas sem um SELECT extra.
+  """
+
+  class Meta:
+    abstract = True
+
+  @classmethod
+  def from_db(cls, db, field_names, values):
+    instancia = super().from_db(db, field_names, values)
+    instancia._valores_carregados = {
+      nome: valor for nome, valor in zip(field_names, values) if valor is not models.DEFERRED
+    }
+    return instancia
+
+  def valores_carregados(self):
+    return getattr(self, '_valores_carregados', {})
+
+  def _guardar_valores(self, campos=None):
+    diferidos = self.get_deferred_fields()
+    valores = dict(self.valores_carregados())
+    for campo in self._meta.concrete_fields:
+      if campo.attname in diferidos:
+        continue
+      if campos is None or campo.name in campos or campo.attname in campos:
+        valores[campo.attname] = getattr(self, campo.attname)
+    self._valores_carregados = valores
+
+  def save(self, *args, **kwargs):
+    if not self._state.adding and not self.valores_carregados():
+      # Instância montada à mão com pk: busca o estado persistido uma única vez.
+      atuais = type(self)._base_manager.using(kwargs.get('using') or self._state.db)
+      self._valores_carregados = atuais.filter(pk=self.pk).values(
+        *[campo.attname for campo in self._meta.concrete_fields]
+      ).first() or {}
+    super().save(*args, **kwargs)
+    self._guardar_valores(kwargs.get('update_fields'))
+
+  def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+    super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+    self._guardar_valores(fields)
+
+
+class RelacionadosQuerySet(models.QuerySet):
+  """``with_related()`` aplica o select_related que o __str__ e as listagens do modelo precisam."""
+  relacionados = ()
+
+  def with_related(self):
+    return self.select_related(*self.relacionados)
+
+
+class EspecificacaoProdutoQuerySet(RelacionadosQuerySet):
+  relacionados = ('produto',)
+
+
+class PedidoQuerySet(models.QuerySet):
+
+  def alterar_status(self, novo_status, data=None):
+    """
+    Troca o status de todos os pedidos do queryset com um único UPDATE e grava o
+    histórico com um único bulk_create, na mesma transação. Os status anteriores vêm de
+    um SELECT ... FOR UPDATE, que impede mudanças concorrentes até o commit. Pedidos que
+    já estão em ``novo_status`` ficam de fora. Devolve quantos pedidos mudaram.
+    """
+    data = data or timezone.localdate()
+    using = self.select_for_update().db
+    pendentes = self.using(using).exclude(status=novo_status)
+    with transaction.atomic(using=using):
+      anteriores = list(pendentes.select_for_update().order_by('pk').values_list('pk', 'status'))
+      if not anteriores:
+        return 0
+      # Só as linhas travadas acima: uma que passe a casar com o queryset depois do
+      # SELECT mudaria de status sem linha no histórico.
+      self.model._base_manager.using(using).filter(pk__in=[pk for pk, _ in anteriores]).update(status=novo_status)
+      HistoricoPedido.objects.using(using).bulk_create([
+        HistoricoPedido(pedido_id=pk, data_alteracao=data, status_anterior=anterior, status_atual=novo_status)
+        for pk, anterior in anteriores
+      ], batch_size=1000)
+    return len(anteriores)
+
+
+class ItemPedidoQuerySet(RelacionadosQuerySet):
+  relacionados = ('pedido', 'produto', 'especificacao')
+
+
+class PagamentoQuerySet(RelacionadosQuerySet):
+  relacionados = ('pedido',)
+
+
+class AvaliacaoQuerySet(RelacionadosQuerySet):
+  relacionados = ('produto', 'usuario')
+
+
+class HistoricoPedidoQuerySet(RelacionadosQuerySet):
+  relacionados = ('pedido',)
+
+
+class ServicoFretagemQuerySet(RelacionadosQuerySet):
+  relacionados = ('pedido',)
+
 
 class Usuario(models.Model):
   nome = models.CharField(max_length=100)
   email = models.EmailField(unique=True)
+  # Hash no formato do Django (algoritmo$...), ou a senha em texto enquanto senha_em_texto for True.
   senha = models.CharField(max_length=255)
+  # Diz explicitamente o que ``senha`` guarda, em vez de adivinhar pelo formato: True para
+  # texto, que o save() troca pelo hash. Quem grava um hash pronto (importações) passa
+  # False. As senhas anteriores à migração 0009 ficam True até manage.py
+  # loja_hash_passwords ou o próximo login.
+  senha_em_texto = models.BooleanField(default=True)
+
+  _senha_bruta = None
+
+  def definir_senha(self, senha):
+    self._senha_bruta = senha
+    self.senha = make_password(senha)
+    self.senha_em_texto = False
+
+  def verificar_senha(self, senha):
+    """Confere a senha e, se o hash estiver desatualizado, grava o novo (loja.senhas)."""
+    confere, novo = senhas.conferir(senha, self.senha, em_texto=self.senha_em_texto)
+    if novo:
+      self.senha, self.senha_em_texto = novo, False
+      type(self)._base_manager.using(self._state.db).filter(pk=self.pk).update(senha=novo, senha_em_texto=False)
+    return confere
 
   def clean(self):
-    if len(self.senha) < 8:
+    # O tamanho só pode ser conferido na senha em texto, antes de virar hash.
+    senha = self._senha_bruta
+    if senha is None and self.senha_em_texto:
+      senha = self.senha
+    if senha is not None and len(senha) < 8:
       raise ValidationError("Senha deve ter pelo menos 8 caracteres.")
 
+  def save(self, *args, **kwargs):
+    if self.senha_em_texto:
+      self.definir_senha(self.senha)
+    super().save(*args, **kwargs)
+    self._senha_bruta = None
+
   def __str__(self):
     return self.nome
 
@@ -29,7 +168,7 @@ class Fornecedor(models.Model):
     return self.nome
 
 
-class Produto(models.Model):
+class Produto(RastreiaValoresCarregados):
   nome = models.CharField(max_length=100)
   descricao = models.TextField()
   preco = models.DecimalField(max_digits=10, decimal_places=2)
@@ -46,39 +185,99 @@ class Produto(models.Model):
     return self.nome
 
 
-class EspecificacaoProduto(models.Model):
+class TermoBusca(models.Model):
+  """
+  Índice invertido da busca de produtos (loja.busca): um termo normalizado, sem acentos,
+  por produto, com o peso das ocorrências no nome e na descrição.
+  """
+  termo = models.CharField(max_length=64)
+  produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='termos_busca')
+  peso = models.PositiveIntegerField()
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(fields=['termo', 'produto'], name='termo_busca_termo_produto_uniq'),
+    ]
+
+  def __str__(self):
+    return f"{self.termo} - Produto {self.produto_id}"
+
+
+class EspecificacaoProduto(RastreiaValoresCarregados):
   produto = models.ForeignKey(Produto, on_delete=models.CASCADE)
   tamanho = models.CharField(max_length=10)
   cor = models.CharField(max_length=50)
   personalizacao = models.CharField(max_length=255, blank=True, null=True)
   preco_adicional = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
 
+  objects = EspecificacaoProdutoQuerySet.as_manager()
+
   def __str__(self):
     return f"{self.produto.nome} - {self.tamanho}/{self.cor}"
 
 
-class Pedido(models.Model):
+class Pedido(RastreiaValoresCarregados):
+  SEM_PAGAMENTO = 'Sem pagamento'
+  PARCIAL = 'Parcial'
+  QUITADO = 'Quitado'
+  EXCEDENTE = 'Excedente'
+
   usuario = models.ForeignKey(Usuario, on_delete=models.PROTECT)
   data_pedido = models.DateField()
+  # Mantidos pelos sinais de ItemPedido, EspecificacaoProduto e ServicoFretagem (loja.totais).
   valor_total = models.DecimalField(max_digits=10, decimal_places=2)
+  quantidade_itens = models.PositiveIntegerField(default=0)
   status = models.CharField(max_length=50)
   endereco_entrega = models.CharField(max_length=255)
+  # Mantidos pela conciliação de pagamentos (loja.conciliacao, manage.py loja_reconcile_payments),
+  # não a cada Pagamento gravado: entre duas execuções podem estar desatualizados.
+  valor_pago = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+  situacao_pagamento = models.CharField(max_length=20, default=SEM_PAGAMENTO)
+
+  objects = PedidoQuerySet.as_manager()
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['usuario', 'data_pedido'], name='pedido_usuario_data_idx'),
+      models.Index(fields=['status', 'data_pedido'], name='pedido_status_data_idx'),
+      models.Index(fields=['data_pedido', 'id'], name='pedido_data_id_idx'),
+      models.Index(fields=['situacao_pagamento', 'data_pedido'], name='pedido_situacao_pag_data_idx'),
+      # Parcial: a fila de pedidos pendentes é pequena comparada ao histórico.
+      models.Index(
+        fields=['data_pedido'],
+        condition=models.Q(status='Pendente'),
+        name='pedido_pendente_data_idx',
+      ),
+    ]
 
   def clean(self):
     if self.valor_total < 0:
       raise ValidationError("Valor total não pode ser negativo.")
 
+  def alterar_status(self, novo_status, using=None):
+    """Grava só o status; o HistoricoPedido da transição é registrado pelo post_save (loja.historico)."""
+    self.status = novo_status
+    self.save(update_fields=['status'], using=using)
+
   def __str__(self):
     return f"Pedido {self.id} - {self.status}"
 
 
-class ItemPedido(models.Model):
+class ItemPedido(RastreiaValoresCarregados):
   pedido = models.ForeignKey(Pedido, on_delete=models.PROTECT)
   produto = models.ForeignKey(Produto, on_delete=models.PROTECT)
   especificacao = models.ForeignKey(EspecificacaoProduto, on_delete=models.PROTECT, blank=True, null=True)
   quantidade = models.IntegerField()
   preco_unitario = models.DecimalField(max_digits=10, decimal_places=2)
 
+  objects = ItemPedidoQuerySet.as_manager()
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['pedido', 'produto'], name='item_pedido_produto_idx'),
+      models.Index(fields=['produto', 'pedido'], name='item_produto_pedido_idx'),
+    ]
+
   def clean(self):
     if self.quantidade < 0:
       raise ValidationError("Quantidade não pode ser negativa.")
@@ -86,29 +285,50 @@ class ItemPedido(models.Model):
       raise ValidationError("Preço unitário não pode ser negativo.")
 
   def __str__(self):
-    return f"Item {self.id} - Pedido {self.pedido.id}"
+    return f"Item {self.id} - Pedido {self.pedido_id}"
 
 
-class Pagamento(models.Model):
+class Pagamento(RastreiaValoresCarregados):
   pedido = models.ForeignKey(Pedido, on_delete=models.PROTECT)
   forma_pagamento = models.CharField(max_length=50)
   data_pagamento = models.DateField()
   valor_pagamento = models.DecimalField(max_digits=10, decimal_places=2)
 
+  objects = PagamentoQuerySet.as_manager()
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['pedido', 'data_pagamento'], name='pagamento_pedido_data_idx'),
+      models.Index(fields=['forma_pagamento', 'data_pagamento'], name='pagamento_forma_data_idx'),
+    ]
+
   def clean(self):
     if self.valor_pagamento < 0:
       raise ValidationError("Valor do pagamento não pode ser negativo.")
 
   def __str__(self):
-    return f"Pagamento {self.id} - Pedido {self.pedido.id}"
+    return f"Pagamento {self.id} - Pedido {self.pedido_id}"
 
 
-class Avaliacao(models.Model):
+class Avaliacao(RastreiaValoresCarregados):
   produto = models.ForeignKey(Produto, on_delete=models.CASCADE)
   usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
   nota = models.IntegerField(null=False)
   comentario = models.TextField(blank=True, null=True)
 
+  objects = AvaliacaoQuerySet.as_manager()
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['produto', 'nota'], name='avaliacao_produto_nota_idx'),
+      models.Index(fields=['usuario', 'produto'], name='avaliacao_usuario_prod_idx'),
+      models.Index(
+        fields=['produto'],
+        condition=models.Q(comentario__isnull=False),
+        name='avaliacao_comentada_idx',
+      ),
+    ]
+
   def clean(self):
     if not (0 <= self.nota <= 5):
       raise ValidationError("A nota deve estar entre 0 e 5.")
@@ -117,23 +337,84 @@ class Avaliacao(models.Model):
     return f"Avaliação {self.id} - {self.produto.nome}"
 
 
+class ResumoAvaliacaoProduto(models.Model):
+  # Mantido pelos sinais de Avaliacao (loja.avaliacoes); reconstruído por loja_rebuild_ratings.
+  produto = models.OneToOneField(
+    Produto, on_delete=models.CASCADE, primary_key=True, related_name='resumo_avaliacoes',
+  )
+  total = models.PositiveIntegerField(default=0)
+  soma = models.PositiveBigIntegerField(default=0)
+  nota_0 = models.PositiveIntegerField(default=0)
+  nota_1 = models.PositiveIntegerField(default=0)
+  nota_2 = models.PositiveIntegerField(default=0)
+  nota_3 = models.PositiveIntegerField(default=0)
+  nota_4 = models.PositiveIntegerField(default=0)
+  nota_5 = models.PositiveIntegerField(default=0)
+
+  @property
+  def media(self):
+    if not self.total:
+      return None
+    return self.soma / self.total
+
+  @property
+  def histograma(self):
+    return [getattr(self, f'nota_{nota}') for nota in range(6)]
+
+  def __str__(self):
+    return f"Resumo de avaliações - Produto {self.produto_id}"
+
+
 class HistoricoPedido(models.Model):
   pedido = models.ForeignKey(Pedido, on_delete=models.PROTECT)
   data_alteracao = models.DateField(null=False, blank=False)
   status_anterior = models.CharField(max_length=50)
   status_atual = models.CharField(max_length=50)
 
+  objects = HistoricoPedidoQuerySet.as_manager()
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['pedido', 'data_alteracao'], name='historico_pedido_data_idx'),
+      models.Index(fields=['data_alteracao'], name='historico_data_idx'),
+    ]
+
+  def __str__(self):
+    return f"Histórico {self.id} - Pedido {self.pedido_id}"
+
+
+class HistoricoPedidoArquivado(models.Model):
+  """
+  Linhas antigas de HistoricoPedido movidas por ``manage.py loja_archive_history``,
+  com o mesmo id. Consulte o histórico completo com ``loja.historico.historico_pedido``.
+  """
+  id = models.BigIntegerField(primary_key=True)
+  # O índice composto abaixo já atende às buscas por pedido.
+  pedido = models.ForeignKey(Pedido, on_delete=models.PROTECT, related_name='historico_arquivado', db_index=False)
+  data_alteracao = models.DateField()
+  status_anterior = models.CharField(max_length=50)
+  status_atual = models.CharField(max_length=50)
+
+  objects = HistoricoPedidoQuerySet.as_manager()
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['pedido', 'data_alteracao'], name='historico_arq_pedido_data_idx'),
+    ]
+
   def __str__(self):
-    return f"Histórico {self.id} - Pedido {self.pedido.id}"
+    return f"Histórico arquivado {self.id} - Pedido {self.pedido_id}"
 
 
-class ServicoFretagem(models.Model):
+class ServicoFretagem(RastreiaValoresCarregados):
   nome_transportadora = models.CharField(max_length=100)
   preco_fretagem = models.DecimalField(max_digits=10, decimal_places=2)
   tipo_servico = models.CharField(max_length=50)
   pedido = models.ForeignKey(Pedido, on_delete=models.PROTECT)
   prazo_entrega = models.IntegerField()
 
+  objects = ServicoFretagemQuerySet.as_manager()
+
   def clean(self):
     if self.preco_fretagem < 0:
       raise ValidationError("Preço da fretagem não pode ser negativo.")
@@ -142,3 +423,84 @@ class ServicoFretagem(models.Model):
 
   def __str__(self):
     return self.nome_transportadora
+
+
+class ProgressoConciliacao(models.Model):
+  """Ponto de retomada da conciliação de pagamentos: o último pedido já conciliado."""
+  nome = models.CharField(max_length=50, unique=True)
+  ultimo_pedido_id = models.BigIntegerField(default=0)
+  pedidos_processados = models.PositiveBigIntegerField(default=0)
+  atualizado_em = models.DateTimeField(auto_now=True)
+
+  def __str__(self):
+    return f"Conciliação {self.nome} - até o pedido {self.ultimo_pedido_id}"
+
+
+class VendaDiariaProduto(models.Model):
+  """Vendas de um produto num dia (data do pedido), mantidas por loja.consolidados."""
+  data = models.DateField()
+  produto = models.ForeignKey(Produto, on_delete=models.CASCADE, db_index=False)
+  itens = models.IntegerField(default=0)
+  unidades = models.IntegerField(default=0)
+  receita = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(fields=['produto', 'data'], name='venda_diaria_produto_uniq'),
+    ]
+    indexes = [
+      models.Index(fields=['data'], name='venda_diaria_produto_data_idx'),
+    ]
+
+  def __str__(self):
+    return f"Vendas de {self.data} - Produto {self.produto_id}"
+
+
+class VendaDiariaFornecedor(models.Model):
+  """Vendas dos produtos de um fornecedor num dia (data do pedido), mantidas por loja.consolidados."""
+  data = models.DateField()
+  fornecedor = models.ForeignKey(Fornecedor, on_delete=models.CASCADE, db_index=False)
+  itens = models.IntegerField(default=0)
+  unidades = models.IntegerField(default=0)
+  receita = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(fields=['fornecedor', 'data'], name='venda_diaria_fornecedor_uniq'),
+    ]
+    indexes = [
+      models.Index(fields=['data'], name='venda_diaria_fornec_data_idx'),
+    ]
+
+  def __str__(self):
+    return f"Vendas de {self.data} - Fornecedor {self.fornecedor_id}"
+
+
+class PagamentoDiario(models.Model):
+  """Pagamentos recebidos num dia por forma de pagamento, mantidos por loja.consolidados."""
+  data = models.DateField()
+  forma_pagamento = models.CharField(max_length=50)
+  quantidade = models.IntegerField(default=0)
+  valor = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(fields=['data', 'forma_pagamento'], name='pagamento_diario_uniq'),
+    ]
+
+  def __str__(self):
+    return f"Pagamentos de {self.data} - {self.forma_pagamento}"
+
+
+class DiaConsolidadoPendente(models.Model):
+  """
+  Dia cujos consolidados ficaram sem um delta (a trava do dia não foi obtida a tempo) e
+  precisam ser reconstruídos; manage.py loja_rollup --pendentes os reconstrói e apaga.
+  Uma linha por delta perdido, sem unicidade, para que o registro nunca espere por
+  outra transação.
+  """
+  data = models.DateField(db_index=True)
+  registrado_em = models.DateTimeField(auto_now_add=True)
+
+  def __str__(self):
+    return f"Consolidados de {self.data} pendentes"
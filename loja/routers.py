@@ -0,0 +1,115 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections, router
+
+PADROES = {
+  'PRIMARIO': 'default',
+  'ALIAS': 'replica',
+  # Modelos (app_label.model_name) cujas leituras vão sempre para a réplica, inclusive
+  # fora de usar_replica(). Vazio por padrão: um modelo só entra aqui se nenhuma tela lê
+  # dele logo depois de outra requisição escrever (a réplica pode estar atrasada).
+  'MODELOS': (),
+  # Segundos em que as requisições seguintes de quem escreveu continuam lendo do primário.
+  'FIXAR_POR': 5,
+}
+
+_escreveu = ContextVar('loja_escreveu', default=False)
+_fixado = ContextVar('loja_primario_fixado', default=False)
+_replica_forcada = ContextVar('loja_replica_forcada', default=False)
+
+
+def configuracao():
+  return {**PADROES, **getattr(settings, 'LOJA_REPLICA', {})}
+
+
+def replica_ativa(config=None):
+  config = config or configuracao()
+  return bool(config['ALIAS']) and config['ALIAS'] in connections.settings
+
+
+def escreveu():
+  return _escreveu.get()
+
+
+def primario_fixado():
+  return _escreveu.get() or _fixado.get()
+
+
+@contextmanager
+def escopo_requisicao(fixado=False):
+  """Começa sem escritas registradas e, ao sair, esquece as que ocorreram dentro do escopo."""
+  tokens = (_escreveu.set(False), _fixado.set(fixado))
+  try:
+    yield
+  finally:
+    _fixado.reset(tokens[1])
+    _escreveu.reset(tokens[0])
+
+
+@contextmanager
+def usar_replica():
+  """Envia à réplica as leituras de qualquer modelo, salvo se o contexto já escreveu no primário."""
+  token = _replica_forcada.set(True)
+  try:
+    yield
+  finally:
+    _replica_forcada.reset(token)
+
+
+def banco_de_leitura(model):
+  """
+  O banco em que ``usar_replica()`` leria ``model``. Para relatórios que consultam fora do
+  bloco with, como as respostas em fluxo, que passam o alias com ``using``.
+  """
+  with usar_replica():
+    return router.db_for_read(model)
+
+
+class RoteadorReplica:
+  """
+  Leituras dentro de ``usar_replica()``, e dos modelos de ``MODELOS``, vão para a réplica
+  configurada em ``LOJA_REPLICA``. Escritas vão para o primário e
+  fixam as leituras seguintes do mesmo contexto nele (read-your-writes), assim como
+  leituras dentro de uma transação aberta no primário. Sem a réplica em ``DATABASES``
+  o roteador não interfere.
+  """
+
+  def db_for_read(self, model, **hints):
+    config = configuracao()
+    if not replica_ativa(config):
+      return None
+    if primario_fixado() or connections[config['PRIMARIO']].in_atomic_block:
+      return config['PRIMARIO']
+    instancia = hints.get('instance')
+    if instancia is not None and instancia._state.db:
+      return None
+    if _replica_forcada.get() or model._meta.label_lower in config['MODELOS']:
+      return config['ALIAS']
+    return config['PRIMARIO']
+
+  def db_for_write(self, model, **hints):
+    config = configuracao()
+    if not replica_ativa(config):
+      return None
+    instancia = hints.get('instance')
+    # Atribuir uma FK também consulta db_for_write, com o objeto relacionado como dica;
+    # isso não é uma escrita.
+    if instancia is None or isinstance(instancia, model):
+      _escreveu.set(True)
+    return config['PRIMARIO']
+
+  def allow_relation(self, obj1, obj2, **hints):
+    config = configuracao()
+    if not replica_ativa(config):
+      return None
+    bancos = {config['PRIMARIO'], config['ALIAS']}
+    if obj1._state.db in bancos and obj2._state.db in bancos:
+      return True
+    return None
+
+  def allow_migrate(self, db, app_label, model_name=None, **hints):
+    if db == configuracao()['ALIAS']:
+      return False
+    return None
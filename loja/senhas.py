@@ -0,0 +1,102 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password, make_password
+from django.db import router
+from django.utils.crypto import constant_time_compare
+
+PADROES = {
+  # Iterações do PBKDF2 (loja.senhas.PBKDF2Loja); None usa o padrão da versão do Django.
+  # Hashes com outro número são refeitos no próximo login bem-sucedido.
+  'ITERACOES': None,
+  # Threads que verificam senhas para as views assíncronas; limita quantos hashes rodam
+  # ao mesmo tempo por processo, e os demais logins esperam na fila sem travar o loop.
+  'WORKERS': 4,
+}
+
+
+def configuracao():
+  return {**PADROES, **getattr(settings, 'LOJA_SENHAS', {})}
+
+
+class PBKDF2Loja(PBKDF2PasswordHasher):
+  """O PBKDF2 do Django, com o custo lido de LOJA_SENHAS['ITERACOES']."""
+
+  @property
+  def iterations(self):
+    return configuracao()['ITERACOES'] or PBKDF2PasswordHasher.iterations
+
+
+def conferir(senha, hash_atual, em_texto=False):
+  """
+  (confere, novo_hash): ``novo_hash`` vem preenchido quando a senha confere mas o hash
+  usa outro algoritmo ou custo e deve ser trocado. Com ``em_texto``, ``hash_atual`` é
+  uma senha legada ainda em texto (Usuario.senha_em_texto), e o hash vem sempre que ela
+  confere. Só CPU, nenhum acesso ao banco.
+  """
+  if hash_atual is None:
+    # Calcula um hash mesmo assim, para o tempo de resposta não revelar quais emails existem.
+    make_password(senha)
+    return False, None
+  if em_texto:
+    novo = make_password(senha)
+    if constant_time_compare(senha, hash_atual):
+      return True, novo
+    return False, None
+  novo = []
+  confere = check_password(senha, hash_atual, setter=lambda senha: novo.append(make_password(senha)))
+  return confere, novo[0] if novo else None
+
+
+def _usuarios(using):
+  from loja.models import Usuario
+
+  return Usuario.objects.using(using or router.db_for_write(Usuario))
+
+
+def _por_email(email, using):
+  return _usuarios(using).filter(email__iexact=email.strip()).only('pk', 'nome', 'email', 'senha', 'senha_em_texto')
+
+
+def autenticar(email, senha, using=None):
+  """
+  O Usuario com ``email`` se ``senha`` confere; None caso contrário. Custa uma consulta,
+  mais um UPDATE só da senha quando o hash é refeito.
+  """
+  usuario = _por_email(email, using).first()
+  atual = (usuario.senha, usuario.senha_em_texto) if usuario else (None,)
+  confere, novo = conferir(senha, *atual)
+  if novo:
+    usuario.senha, usuario.senha_em_texto = novo, False
+    _usuarios(using).filter(pk=usuario.pk).update(senha=novo, senha_em_texto=False)
+  return usuario if confere else None
+
+
+_executor = None
+_trava_executor = threading.Lock()
+
+
+def executor():
+  global _executor
+  if _executor is None:
+    with _trava_executor:
+      if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=configuracao()['WORKERS'], thread_name_prefix='loja-senhas')
+  return _executor
+
+
+async def aautenticar(email, senha, using=None):
+  """
+  Versão assíncrona de autenticar: as consultas usam o ORM assíncrono e o hash (CPU, na
+  casa de centenas de ms) roda no executor limitado, fora do loop de eventos.
+  """
+  usuario = await _por_email(email, using).afirst()
+  loop = asyncio.get_running_loop()
+  atual = (usuario.senha, usuario.senha_em_texto) if usuario else (None,)
+  confere, novo = await loop.run_in_executor(executor(), conferir, senha, *atual)
+  if novo:
+    usuario.senha, usuario.senha_em_texto = novo, False
+    await _usuarios(using).filter(pk=usuario.pk).aupdate(senha=novo, senha_em_texto=False)
+  return usuario if confere else None
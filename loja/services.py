@@ -0,0 +1,374 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from functools import reduce
+from itertools import islice
+from operator import or_
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, IntegrityError, connections, router, transaction
+from django.db.models import Model, Q
+
+from loja import consolidados
+from loja.models import EspecificacaoProduto, ItemPedido, Pagamento, Pedido, Produto, Usuario
+
+TAMANHO_LOTE = 500
+
+
+def em_lotes(iteravel, tamanho):
+  iterador = iter(iteravel)
+  while lote := list(islice(iterador, tamanho)):
+    yield lote
+
+
+def _chave(campos, linha):
+  if isinstance(linha, Model):
+    return tuple(getattr(linha, campo) for campo in campos)
+  if isinstance(linha, dict):
+    return tuple(linha[campo] for campo in campos)
+  if isinstance(linha, tuple):
+    return linha[:len(campos)]
+  return (linha,)
+
+
+def _depois(campos, chave):
+  """``campos > chave`` na ordem lexicográfica, como Q."""
+  return reduce(or_, (
+    Q(**dict(zip(campos[:indice], chave[:indice])), **{f'{campos[indice]}__gt': chave[indice]})
+    for indice in range(len(campos))
+  ))
+
+
+def lotes_por_chave(queryset, tamanho, campos=('pk',)):
+  """
+  Lê ``queryset`` em lotes de até ``tamanho`` linhas ordenadas por ``campos`` (únicos em
+  conjunto), cada lote uma consulta que recomeça depois da última chave lida, como a
+  paginação da API de pedidos. O iterator() não serve para isso no MySQL: o mysqlclient
+  traz o resultado inteiro para o cliente antes da primeira linha. Aceita instâncias,
+  values() e values_list() que comece pelos ``campos``; o prefetch_related roda por lote.
+  """
+  queryset = queryset.order_by(*campos)
+  ultima = None
+  while True:
+    lote = list((queryset if ultima is None else queryset.filter(_depois(campos, ultima)))[:tamanho])
+    if lote:
+      yield lote
+    if len(lote) < tamanho:
+      return
+    ultima = _chave(campos, lote[-1])
+
+
+def _mensagens(erro):
+  if isinstance(erro, ValidationError):
+    return erro.messages
+  return [str(erro)]
+
+
+@dataclass
+class ResultadoImportacao:
+  criados: int = 0
+  erros: list = field(default_factory=list)
+
+  def registrar_erro(self, indice, mensagens):
+    self.erros.append((indice, mensagens))
+
+
+def _validar(instancia, excluir):
+  # As FKs são conferidas em lote pelo chamador; o full_clean() faria uma consulta por linha.
+  instancia.clean_fields(exclude=excluir)
+  instancia.clean()
+
+
+def _conferir_formato(linha):
+  # Antes das consultas do lote, que leem as linhas e seus itens como dicionários.
+  if not isinstance(linha, dict):
+    raise ValidationError(f"A linha deve ser um objeto, não {type(linha).__name__}.")
+  for campo in ('itens', 'pagamentos'):
+    valores = linha.get(campo, [])
+    if not isinstance(valores, list) or not all(isinstance(valor, dict) for valor in valores):
+      raise ValidationError(f"O campo {campo} deve ser uma lista de objetos.")
+
+
+def _montar_pedido(linha, usuarios, produtos, especificacoes):
+  if linha.get('usuario') not in usuarios:
+    raise ValidationError(f"Usuário {linha.get('usuario')} não existe.")
+
+  pedido = Pedido(
+    usuario_id=linha['usuario'],
+    data_pedido=linha.get('data_pedido'),
+    valor_total=linha.get('valor_total', 0),
+    status=linha.get('status'),
+    endereco_entrega=linha.get('endereco_entrega'),
+  )
+
+  itens, valor_itens = [], 0
+  for dados in linha.get('itens', []):
+    if dados.get('produto') not in produtos:
+      raise ValidationError(f"Produto {dados.get('produto')} não existe.")
+    especificacao = dados.get('especificacao')
+    produto_especificacao, preco_adicional = especificacoes.get(especificacao, (None, 0))
+    if especificacao is not None and produto_especificacao != dados['produto']:
+      raise ValidationError(f"Especificação {especificacao} não pertence ao produto {dados['produto']}.")
+    item = ItemPedido(
+      produto_id=dados['produto'],
+      especificacao_id=especificacao,
+      quantidade=dados.get('quantidade'),
+      preco_unitario=dados.get('preco_unitario'),
+    )
+    _validar(item, excluir=['pedido', 'produto', 'especificacao'])
+    itens.append(item)
+    valor_itens += item.quantidade * (item.preco_unitario + preco_adicional)
+
+  # bulk_create não dispara os sinais de loja.totais: os campos mantidos são preenchidos aqui.
+  pedido.quantidade_itens = sum(item.quantidade for item in itens)
+  if 'valor_total' not in linha:
+    pedido.valor_total = valor_itens
+  _validar(pedido, excluir=['usuario'])
+
+  pagamentos = []
+  for dados in linha.get('pagamentos', []):
+    pagamento = Pagamento(
+      forma_pagamento=dados.get('forma_pagamento'),
+      data_pagamento=dados.get('data_pagamento'),
+      valor_pagamento=dados.get('valor_pagamento'),
+    )
+    _validar(pagamento, excluir=['pedido'])
+    pagamentos.append(pagamento)
+
+  return pedido, itens, pagamentos
+
+
+def _gravar_lote(montados, alias):
+  pedidos = [pedido for pedido, _, _ in montados]
+  with transaction.atomic(using=alias):
+    if connections[alias].features.can_return_rows_from_bulk_insert:
+      Pedido.objects.using(alias).bulk_create(pedidos)
+    else:
+      # Sem retorno de PKs no bulk_create (MySQL), os pedidos precisam de um INSERT cada
+      # para que itens e pagamentos possam referenciá-los; os filhos continuam em lote.
+      for pedido in pedidos:
+        pedido.save(using=alias, force_insert=True)
+
+    itens, pagamentos = [], []
+    for pedido, itens_pedido, pagamentos_pedido in montados:
+      for filho in itens_pedido + pagamentos_pedido:
+        filho.pedido = pedido
+      itens.extend(itens_pedido)
+      pagamentos.extend(pagamentos_pedido)
+    ItemPedido.objects.using(alias).bulk_create(itens)
+    Pagamento.objects.using(alias).bulk_create(pagamentos)
+    consolidados.vendas_importadas(pedidos, itens, pagamentos, using=alias)
+
+
+def _descartar_pks(montado):
+  # O lote desfeito deixa nas instâncias as PKs e o estado de gravadas.
+  pedido, itens, pagamentos = montado
+  for instancia in (pedido, *itens, *pagamentos):
+    instancia.pk = None
+    instancia._state.adding = True
+
+
+def bulk_import_orders(linhas, tamanho_lote=TAMANHO_LOTE):
+  """
+  Importa pedidos com seus itens e pagamentos em lotes.
+
+  Cada linha é um dicionário com os campos de Pedido (``usuario`` é o id), uma lista
+  ``itens`` (``produto``, ``especificacao`` opcional, ``quantidade``, ``preco_unitario``)
+  e uma lista ``pagamentos``. Sem ``valor_total``, o total é calculado pelos itens.
+  Linhas inválidas são reportadas em ``erros`` como ``(indice, mensagens)`` sem
+  interromper o restante do lote. Se o banco recusar o lote, ele é regravado linha a
+  linha, cada uma na sua transação (ou savepoint), e o erro fica só na linha que o causou.
+  """
+  alias = router.db_for_write(Pedido)
+  resultado = ResultadoImportacao()
+
+  for lote in em_lotes(enumerate(linhas), tamanho_lote):
+    validas = []
+    for indice, linha in lote:
+      try:
+        _conferir_formato(linha)
+      except ValidationError as erro:
+        resultado.registrar_erro(indice, _mensagens(erro))
+      else:
+        validas.append((indice, linha))
+    lote = validas
+
+    usuario_ids = {linha.get('usuario') for _, linha in lote}
+    produto_ids, especificacao_ids = set(), set()
+    for _, linha in lote:
+      for item in linha.get('itens', []):
+        produto_ids.add(item.get('produto'))
+        especificacao_ids.add(item.get('especificacao'))
+    especificacao_ids.discard(None)
+
+    usuarios = set(Usuario.objects.using(alias).filter(pk__in=usuario_ids).values_list('pk', flat=True))
+    produtos = set(Produto.objects.using(alias).filter(pk__in=produto_ids).values_list('pk', flat=True))
+    especificacoes = {
+      pk: (produto_id, preco_adicional)
+      for pk, produto_id, preco_adicional in EspecificacaoProduto.objects.using(alias)
+      .filter(pk__in=especificacao_ids)
+      .values_list('pk', 'produto_id', 'preco_adicional')
+    }
+
+    montados, indices = [], []
+    for indice, linha in lote:
+      try:
+        montados.append(_montar_pedido(linha, usuarios, produtos, especificacoes))
+        indices.append(indice)
+      except (ValidationError, KeyError, TypeError) as erro:
+        resultado.registrar_erro(indice, _mensagens(erro))
+
+    if not montados:
+      continue
+    try:
+      _gravar_lote(montados, alias)
+    except DatabaseError:
+      for indice, montado in zip(indices, montados):
+        _descartar_pks(montado)
+        try:
+          _gravar_lote([montado], alias)
+        except DatabaseError as erro:
+          resultado.registrar_erro(indice, _mensagens(erro))
+        else:
+          resultado.criados += 1
+    else:
+      resultado.criados += len(montados)
+
+  resultado.erros.sort(key=lambda erro: erro[0])
+  return resultado
+
+
+def normalizar_email(email):
+  """Forma canônica do email para comparar e gravar: sem espaços nas pontas e em minúsculas."""
+  return email.strip().lower()
+
+
+def _iniciar_processo():
+  django.setup()
+
+
+def _criar_pool(workers):
+  # Os processos são criados por fork e herdariam os sockets das conexões abertas, que o
+  # filho poderia fechar ao sair. Fecha as que estão fora de transação e sobe os
+  # processos agora (o ProcessPoolExecutor só os cria na primeira tarefa).
+  for conexao in connections.all(initialized_only=True):
+    if not conexao.in_atomic_block:
+      conexao.close()
+  pool = ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_processo)
+  pool.submit(int).result()
+  return pool
+
+
+def _hashes(senhas, pool, workers):
+  if pool is None:
+    return [make_password(senha) for senha in senhas]
+  return list(pool.map(make_password, senhas, chunksize=max(1, len(senhas) // (workers * 4))))
+
+
+def _montar_usuario(linha, vistos):
+  email = normalizar_email(linha.get('email') or '')
+  if email in vistos:
+    raise ValidationError(f"Email {email} repetido na linha {vistos[email]}.")
+  usuario = Usuario(nome=linha.get('nome'), email=email, senha=linha.get('senha'))
+  # A unicidade do email é conferida em lote pelo chamador.
+  _validar(usuario, excluir=None)
+  return usuario
+
+
+def bulk_import_users(linhas, tamanho_lote=TAMANHO_LOTE, workers=1, ao_rejeitar=None, using=None):
+  """
+  Importa usuários em lotes a partir de dicionários com ``nome``, ``email`` e ``senha``
+  (em texto). Os emails são normalizados e os repetidos no próprio arquivo são recusados
+  em memória; os que já existem no banco são descobertos com um único ``IN`` por lote.
+  O hash das senhas, que domina o custo, roda em ``workers`` processos, e cada lote é
+  gravado com um ``bulk_create``. Se outra transação gravar um dos emails entre a
+  consulta e o INSERT, o lote é regravado linha a linha e só a linha em conflito é
+  recusada.
+
+  Linhas recusadas vão para ``erros`` como ``(indice, mensagens)`` e, se dado, para
+  ``ao_rejeitar(indice, linha, mensagens)`` assim que são recusadas.
+  """
+  alias = using or router.db_for_write(Usuario)
+  resultado = ResultadoImportacao()
+  vistos = {}
+
+  def rejeitar(indice, linha, mensagens):
+    resultado.registrar_erro(indice, mensagens)
+    if ao_rejeitar is not None:
+      ao_rejeitar(indice, linha, mensagens)
+
+  pool = _criar_pool(workers) if workers > 1 else None
+  with pool or nullcontext():
+    for lote in em_lotes(enumerate(linhas), tamanho_lote):
+      montados = []
+      for indice, linha in lote:
+        try:
+          usuario = _montar_usuario(linha, vistos)
+        except (ValidationError, AttributeError, TypeError) as erro:
+          rejeitar(indice, linha, _mensagens(erro))
+          continue
+        vistos[usuario.email] = indice
+        montados.append((indice, linha, usuario))
+
+      if not montados:
+        continue
+      existentes = set(
+        Usuario.objects.using(alias)
+        .filter(email__in=[usuario.email for _, _, usuario in montados])
+        .values_list('email', flat=True)
+      )
+      novos = []
+      for indice, linha, usuario in montados:
+        if usuario.email in existentes:
+          rejeitar(indice, linha, [f"Já existe um usuário com o email {usuario.email}."])
+        else:
+          novos.append((indice, linha, usuario))
+      if not novos:
+        continue
+
+      hashes = _hashes([usuario.senha for _, _, usuario in novos], pool, workers)
+      for (_, _, usuario), hash_senha in zip(novos, hashes):
+        usuario.senha, usuario.senha_em_texto = hash_senha, False
+      try:
+        with transaction.atomic(using=alias):
+          Usuario.objects.using(alias).bulk_create([usuario for _, _, usuario in novos])
+      except IntegrityError:
+        for indice, linha, usuario in novos:
+          try:
+            with transaction.atomic(using=alias):
+              Usuario.objects.using(alias).bulk_create([usuario])
+          except IntegrityError:
+            rejeitar(indice, linha, [f"Já existe um usuário com o email {usuario.email}."])
+          else:
+            resultado.criados += 1
+      else:
+        resultado.criados += len(novos)
+
+  resultado.erros.sort(key=lambda erro: erro[0])
+  return resultado
+
+
+def gerar_hashes_pendentes(tamanho_lote=TAMANHO_LOTE, workers=1, using=None):
+  """
+  Troca pelo hash, com o custo configurado, as senhas ainda em texto
+  (Usuario.senha_em_texto), em lotes pela chave primária e com o hash em ``workers``
+  processos como em bulk_import_users. Cada linha só é regravada se continuar com a
+  mesma senha em texto, para não desfazer um login ou definir_senha concorrente.
+  Devolve quantas senhas foram trocadas.
+  """
+  alias = using or router.db_for_write(Usuario)
+  usuarios = Usuario.objects.using(alias)
+  pendentes = usuarios.filter(senha_em_texto=True).values_list('pk', 'senha')
+  trocadas = 0
+  pool = _criar_pool(workers) if workers > 1 else None
+  with pool or nullcontext():
+    for lote in lotes_por_chave(pendentes, tamanho_lote):
+      hashes = _hashes([senha for _, senha in lote], pool, workers)
+      with transaction.atomic(using=alias):
+        for (pk, senha), hash_senha in zip(lote, hashes):
+          trocadas += usuarios.filter(pk=pk, senha_em_texto=True, senha=senha).update(
+            senha=hash_senha, senha_em_texto=False,
+          )
+  return trocadas
@@ -0,0 +1,119 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from loja import avaliacoes, busca, catalogo, consolidados, facetas, historico, totais
+from loja.models import (
+  Avaliacao, EspecificacaoProduto, Fornecedor, ItemPedido, Pagamento, Pedido, Produto, ServicoFretagem,
+)
+
+
+@receiver(post_save, sender=ItemPedido)
+def atualizar_totais_item(sender, instance, created, using, **kwargs):
+  totais.item_salvo(instance, created, using=using)
+
+
+@receiver(post_delete, sender=ItemPedido)
+def descontar_totais_item(sender, instance, using, **kwargs):
+  totais.item_removido(instance, using=using)
+
+
+@receiver(post_save, sender=EspecificacaoProduto)
+def atualizar_totais_especificacao(sender, instance, created, using, **kwargs):
+  totais.especificacao_salva(instance, created, using=using)
+
+
+@receiver(post_save, sender=ServicoFretagem)
+def atualizar_totais_frete(sender, instance, created, using, **kwargs):
+  totais.frete_salvo(instance, created, using=using)
+
+
+@receiver(post_delete, sender=ServicoFretagem)
+def descontar_totais_frete(sender, instance, using, **kwargs):
+  totais.frete_removido(instance, using=using)
+
+
+@receiver(post_save, sender=Avaliacao)
+def atualizar_resumo_avaliacao(sender, instance, created, using, **kwargs):
+  avaliacoes.avaliacao_salva(instance, created, using=using)
+
+
+@receiver(post_delete, sender=Avaliacao)
+def descontar_resumo_avaliacao(sender, instance, using, **kwargs):
+  avaliacoes.avaliacao_removida(instance, using=using)
+
+
+@receiver(post_save, sender=Pedido)
+def registrar_historico_status(sender, instance, created, update_fields, using, **kwargs):
+  historico.status_salvo(instance, created, update_fields, using=using)
+
+
+@receiver(post_save, sender=Produto)
+def indexar_busca_produto(sender, instance, created, using, **kwargs):
+  busca.produto_salvo(instance, created, using=using)
+
+
+@receiver(post_save, sender=Produto)
+@receiver(post_delete, sender=Produto)
+def invalidar_catalogo_produto(sender, instance, using, **kwargs):
+  catalogo.invalidar_produtos([instance.pk], using=using)
+
+
+@receiver(post_save, sender=EspecificacaoProduto)
+@receiver(post_delete, sender=EspecificacaoProduto)
+def invalidar_catalogo_especificacao(sender, instance, using, **kwargs):
+  produto_anterior = instance.valores_carregados().get('produto_id', instance.produto_id)
+  catalogo.invalidar_produtos({instance.produto_id, produto_anterior}, using=using)
+
+
+@receiver(post_save, sender=Avaliacao)
+@receiver(post_delete, sender=Avaliacao)
+def invalidar_catalogo_avaliacao(sender, instance, using, **kwargs):
+  catalogo.invalidar_produtos([instance.produto_id], using=using)
+
+
+@receiver(post_save, sender=Fornecedor)
+@receiver(post_delete, sender=Fornecedor)
+def invalidar_catalogo_fornecedor(sender, instance, using, **kwargs):
+  produto_ids = Produto.objects.using(using).filter(fornecedor_id=instance.pk).values_list('pk', flat=True)
+  catalogo.invalidar_produtos(produto_ids, using=using)
+
+
+@receiver(post_save, sender=Produto)
+def atualizar_facetas_produto(sender, instance, created, using, **kwargs):
+  facetas.produto_salvo(instance, created, using=using)
+
+
+@receiver(post_delete, sender=Produto)
+def remover_facetas_produto(sender, instance, using, **kwargs):
+  facetas.produtos_alterados([instance.pk], using=using)
+
+
+@receiver(post_save, sender=EspecificacaoProduto)
+@receiver(post_delete, sender=EspecificacaoProduto)
+def atualizar_facetas_especificacao(sender, instance, using, **kwargs):
+  facetas.especificacao_alterada(instance, using=using)
+
+
+@receiver(post_save, sender=ItemPedido)
+def atualizar_consolidados_item(sender, instance, created, using, **kwargs):
+  consolidados.item_salvo(instance, created, using=using)
+
+
+@receiver(post_delete, sender=ItemPedido)
+def descontar_consolidados_item(sender, instance, using, **kwargs):
+  consolidados.item_removido(instance, using=using)
+
+
+@receiver(post_save, sender=Pedido)
+def mover_consolidados_pedido(sender, instance, created, update_fields, using, **kwargs):
+  consolidados.pedido_salvo(instance, created, update_fields, using=using)
+
+
+@receiver(post_save, sender=Pagamento)
+def atualizar_consolidados_pagamento(sender, instance, created, using, **kwargs):
+  consolidados.pagamento_salvo(instance, created, using=using)
+
+
+@receiver(post_delete, sender=Pagamento)
+def descontar_consolidados_pagamento(sender, instance, using, **kwargs):
+  consolidados.pagamento_removido(instance, using=using)
@@ -0,0 +1,279 @@
+import datetime
+import random
+from dataclasses import dataclass, fields
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import router, transaction
+from django.db.models import Max
+
+from loja.avaliacoes import reconstruir_resumos
+from loja.busca import reconstruir_indice
+from loja.consolidados import reconstruir as reconstruir_consolidados
+from loja.models import (
+  Avaliacao, EspecificacaoProduto, Fornecedor, HistoricoPedido, HistoricoPedidoArquivado, ItemPedido, Pagamento,
+  Pedido, Produto, ServicoFretagem, Usuario,
+)
+
+TAMANHO_LOTE = 5000
+# Senha de todos os usuários gerados (benchmarks de login).
+SENHA_SINTETICA = 'senha-sintetica'
+
+NOMES = 'Ana Bruno Carla Diego Elisa Fábio Gabriela Heitor Isabela João Larissa Marcos Natália Otávio Paula Rafael'.split()
+SOBRENOMES = 'Silva Souza Oliveira Santos Lima Pereira Costa Almeida Ferreira Ribeiro Carvalho Gomes Martins'.split()
+RUAS = 'Rua das Flores|Avenida Brasil|Rua XV de Novembro|Avenida Paulista|Rua da Praia|Rua Sete de Setembro'.split('|')
+TIPOS = 'Camiseta Calça Bermuda Jaqueta Moletom Vestido Saia Blusa Camisa Regata Boné Tênis'.split()
+MATERIAIS = 'algodão linho poliéster couro jeans malha lã seda viscose sarja'.split()
+ESTILOS = 'básico esportivo casual social estampado listrado térmico leve clássico confortável'.split()
+TAMANHOS = ('PP', 'P', 'M', 'G', 'GG')
+CORES = ('Azul', 'Vermelho', 'Verde', 'Preto', 'Branco', 'Cinza', 'Amarelo', 'Rosa', 'Bege')
+FORMAS_PAGAMENTO = ('Pix', 'Cartão de Crédito', 'Boleto', 'Cartão de Débito')
+TRANSPORTADORAS = (('Correios', 'PAC', 8), ('Correios', 'SEDEX', 3), ('Jadlog', 'Expresso', 4), ('Loggi', 'Padrão', 5))
+COMENTARIOS = ('Gostei muito.', 'Tecido bom, veste bem.', 'Chegou antes do prazo.', 'A cor é diferente da foto.')
+
+# Status e a sequência de transições que leva até ele, com a frequência de cada um.
+FLUXO = ('Pendente', 'Pago', 'Enviado', 'Entregue')
+STATUS = {'Pendente': 0.10, 'Pago': 0.10, 'Enviado': 0.15, 'Entregue': 0.58, 'Cancelado': 0.07}
+
+
+@dataclass
+class Escala:
+  """Quantidade de linhas geradas; o que não for dado é proporcional ao número de pedidos."""
+  pedidos: int = 10_000
+  usuarios: int = None
+  fornecedores: int = None
+  produtos: int = None
+  variacoes: int = 3
+  avaliacoes: int = None
+
+  def __post_init__(self):
+    if self.usuarios is None:
+      self.usuarios = max(1, self.pedidos // 5)
+    if self.produtos is None:
+      self.produtos = max(1, self.pedidos // 20)
+    if self.fornecedores is None:
+      self.fornecedores = max(1, self.produtos // 200)
+    if self.avaliacoes is None:
+      self.avaliacoes = self.pedidos // 4
+    for campo in fields(self):
+      if getattr(self, campo.name) < 0:
+        raise ValueError(f"Escala inválida: {campo.name} não pode ser negativo.")
+    if self.pedidos and not (self.usuarios and self.produtos):
+      raise ValueError("Pedidos precisam de pelo menos um usuário e um produto.")
+    if self.produtos and not self.fornecedores:
+      raise ValueError("Produtos precisam de pelo menos um fornecedor.")
+
+
+def _proximo_id(*modelos, using):
+  return 1 + max(modelo.objects.using(using).aggregate(maior=Max('pk'))['maior'] or 0 for modelo in modelos)
+
+
+def _centavos(gerador, minimo, maximo):
+  return Decimal(gerador.randint(minimo, maximo)).scaleb(-2)
+
+
+def _pessoa(gerador):
+  return f'{gerador.choice(NOMES)} {gerador.choice(SOBRENOMES)}'
+
+
+def _endereco(gerador):
+  return f'{gerador.choice(RUAS)}, {gerador.randint(1, 3000)}'
+
+
+class GeradorLoja:
+  """
+  Gera uma loja sintética reprodutível: a mesma semente e a mesma escala produzem os
+  mesmos dados. As linhas recebem ids explícitos, a partir do maior id já gravado, então
+  as FKs são montadas em memória e cada lote vira um ``bulk_create`` por modelo, sem ler
+  de volta o que foi inserido. Os totais dos pedidos já saem calculados; ``bulk_create``
+  não dispara os sinais, e os derivados (resumos, índice de busca e consolidados diários)
+  são refeitos no fim.
+  """
+
+  def __init__(self, escala, semente=42, inicio=datetime.date(2023, 1, 1), dias=730,
+               tamanho_lote=TAMANHO_LOTE, using=None):
+    self.escala = escala
+    self.gerador = random.Random(semente)
+    self.inicio = inicio
+    self.dias = dias
+    self.tamanho_lote = tamanho_lote
+    self.using = using or router.db_for_write(Pedido)
+    self.criados = {}
+
+  def _gravar(self, modelo, linhas):
+    modelo.objects.using(self.using).bulk_create(linhas, batch_size=self.tamanho_lote)
+    nome = modelo._meta.object_name
+    self.criados[nome] = self.criados.get(nome, 0) + len(linhas)
+
+  def _em_lotes(self, quantidade, montar):
+    for inicio in range(0, quantidade, self.tamanho_lote):
+      with transaction.atomic(using=self.using):
+        montar(range(inicio, min(inicio + self.tamanho_lote, quantidade)))
+
+  def _reservar_ids(self):
+    proximos = {
+      'fornecedor': _proximo_id(Fornecedor, using=self.using),
+      'usuario': _proximo_id(Usuario, using=self.using),
+      'produto': _proximo_id(Produto, using=self.using),
+      'especificacao': _proximo_id(EspecificacaoProduto, using=self.using),
+      'pedido': _proximo_id(Pedido, using=self.using),
+      'item': _proximo_id(ItemPedido, using=self.using),
+      'pagamento': _proximo_id(Pagamento, using=self.using),
+      'frete': _proximo_id(ServicoFretagem, using=self.using),
+      # O arquivo herda os ids do histórico vivo; os novos não podem colidir com nenhum dos dois.
+      'historico': _proximo_id(HistoricoPedido, HistoricoPedidoArquivado, using=self.using),
+      'avaliacao': _proximo_id(Avaliacao, using=self.using),
+    }
+    self.primeiros = dict(proximos)
+    self.proximos = proximos
+
+  def _proximo(self, chave):
+    self.proximos[chave] += 1
+    return self.proximos[chave] - 1
+
+  def gerar(self, derivados=True):
+    self._reservar_ids()
+    self._fornecedores()
+    self._usuarios()
+    self._produtos()
+    self._em_lotes(self.escala.pedidos, self._pedidos)
+    self._em_lotes(self.escala.avaliacoes, self._avaliacoes)
+    if derivados:
+      reconstruir_resumos(using=self.using)
+      reconstruir_indice(using=self.using)
+      # Pagamentos caem até dois dias depois do pedido.
+      fim = self.inicio + datetime.timedelta(days=self.dias + 1)
+      reconstruir_consolidados(self.inicio, fim, tamanho_lote=self.tamanho_lote, using=self.using)
+    return self.criados
+
+  def _fornecedores(self):
+    base = self.primeiros['fornecedor']
+    self.fornecedor_ids = [base + i for i in range(self.escala.fornecedores)]
+    self._gravar(Fornecedor, [
+      Fornecedor(
+        pk=pk, nome=f'{self.gerador.choice(SOBRENOMES)} Confecções {pk}',
+        telefone=f'11{self.gerador.randint(10**8, 10**9 - 1)}', email=f'contato{pk}@fornecedor.example.com',
+        endereco=_endereco(self.gerador), cnpj=f'{self.gerador.randint(0, 10**14 - 1):014d}',
+      )
+      for pk in self.fornecedor_ids
+    ])
+
+  def _usuarios(self):
+    base = self.primeiros['usuario']
+    # bulk_create não passa pelo save(), que faria o hash: todos recebem o mesmo, calculado
+    # uma vez com sal da semente (um hash por usuário custaria o PBKDF2 inteiro de cada um).
+    senha = make_password(SENHA_SINTETICA, salt=f'{self.gerador.getrandbits(64):016x}')
+
+    def montar(indices):
+      self._gravar(Usuario, [
+        Usuario(
+          pk=base + i, nome=_pessoa(self.gerador), email=f'usuario{base + i}@example.com', senha=senha,
+          senha_em_texto=False,
+        )
+        for i in indices
+      ])
+
+    self._em_lotes(self.escala.usuarios, montar)
+
+  def _produtos(self):
+    gerador, variacoes = self.gerador, self.escala.variacoes
+    base, base_especificacao = self.primeiros['produto'], self.primeiros['especificacao']
+    # Preço de cada produto e adicional de cada variação, para montar itens e totais sem consultar o banco.
+    self.precos, self.adicionais = [], []
+
+    def montar(indices):
+      produtos, especificacoes = [], []
+      for i in indices:
+        preco = _centavos(gerador, 1990, 49990)
+        self.precos.append(preco)
+        produtos.append(Produto(
+          pk=base + i, nome=f'{gerador.choice(TIPOS)} {gerador.choice(MATERIAIS)} {gerador.choice(ESTILOS)}',
+          descricao=' '.join(gerador.choice(MATERIAIS + ESTILOS) for _ in range(12)), preco=preco,
+          estoque=gerador.randint(0, 500), fornecedor_id=gerador.choice(self.fornecedor_ids),
+        ))
+        for v in range(variacoes):
+          adicional = gerador.choice((Decimal('0.00'), Decimal('0.00'), _centavos(gerador, 500, 3000)))
+          self.adicionais.append(adicional)
+          especificacoes.append(EspecificacaoProduto(
+            pk=base_especificacao + i * variacoes + v, produto_id=base + i, tamanho=gerador.choice(TAMANHOS),
+            cor=gerador.choice(CORES), preco_adicional=adicional,
+            personalizacao=None if gerador.random() < 0.9 else 'Bordado com nome',
+          ))
+      self._gravar(Produto, produtos)
+      self._gravar(EspecificacaoProduto, especificacoes)
+
+    self._em_lotes(self.escala.produtos, montar)
+
+  def _pedidos(self, indices):
+    gerador, variacoes = self.gerador, self.escala.variacoes
+    pedidos, itens, pagamentos, fretes, historico = [], [], [], [], []
+    status_possiveis, pesos = list(STATUS), list(STATUS.values())
+    for i in indices:
+      pedido_id = self.primeiros['pedido'] + i
+      data = self.inicio + datetime.timedelta(days=gerador.randrange(self.dias))
+      status = gerador.choices(status_possiveis, pesos)[0]
+      total, quantidade_total = Decimal('0.00'), 0
+      for _ in range(gerador.randint(1, 4)):
+        produto = gerador.randrange(self.escala.produtos)
+        especificacao = None
+        adicional = Decimal('0.00')
+        if variacoes and gerador.random() < 0.8:
+          especificacao = produto * variacoes + gerador.randrange(variacoes)
+          adicional = self.adicionais[especificacao]
+        quantidade = gerador.randint(1, 3)
+        total += quantidade * (self.precos[produto] + adicional)
+        quantidade_total += quantidade
+        itens.append(ItemPedido(
+          pk=self._proximo('item'), pedido_id=pedido_id, produto_id=self.primeiros['produto'] + produto,
+          especificacao_id=None if especificacao is None else self.primeiros['especificacao'] + especificacao,
+          quantidade=quantidade, preco_unitario=self.precos[produto],
+        ))
+      transportadora, servico, prazo = gerador.choice(TRANSPORTADORAS)
+      preco_frete = _centavos(gerador, 990, 4990)
+      total += preco_frete
+      fretes.append(ServicoFretagem(
+        pk=self._proximo('frete'), pedido_id=pedido_id, nome_transportadora=transportadora, tipo_servico=servico,
+        preco_fretagem=preco_frete, prazo_entrega=prazo,
+      ))
+      pago = status in FLUXO[1:]
+      pedidos.append(Pedido(
+        pk=pedido_id, usuario_id=self.primeiros['usuario'] + gerador.randrange(self.escala.usuarios), data_pedido=data,
+        valor_total=total, quantidade_itens=quantidade_total, status=status, endereco_entrega=_endereco(gerador),
+        valor_pago=total if pago else Decimal('0.00'),
+        situacao_pagamento=Pedido.QUITADO if pago else Pedido.SEM_PAGAMENTO,
+      ))
+      if pago:
+        pagamentos.append(Pagamento(
+          pk=self._proximo('pagamento'), pedido_id=pedido_id, forma_pagamento=gerador.choice(FORMAS_PAGAMENTO),
+          data_pagamento=data + datetime.timedelta(days=gerador.randint(0, 2)), valor_pagamento=total,
+        ))
+      etapas = ('Pendente', 'Cancelado') if status == 'Cancelado' else FLUXO[:FLUXO.index(status) + 1]
+      for passo, (anterior, atual) in enumerate(zip(etapas, etapas[1:]), start=1):
+        historico.append(HistoricoPedido(
+          pk=self._proximo('historico'), pedido_id=pedido_id, data_alteracao=data + datetime.timedelta(days=passo),
+          status_anterior=anterior, status_atual=atual,
+        ))
+
+    self._gravar(Pedido, pedidos)
+    self._gravar(ItemPedido, itens)
+    self._gravar(ServicoFretagem, fretes)
+    self._gravar(Pagamento, pagamentos)
+    self._gravar(HistoricoPedido, historico)
+
+  def _avaliacoes(self, indices):
+    gerador = self.gerador
+    self._gravar(Avaliacao, [
+      Avaliacao(
+        pk=self.primeiros['avaliacao'] + i, produto_id=self.primeiros['produto'] + gerador.randrange(self.escala.produtos),
+        usuario_id=self.primeiros['usuario'] + gerador.randrange(self.escala.usuarios),
+        nota=gerador.choices(range(6), (2, 3, 5, 15, 35, 40))[0],
+        comentario=gerador.choice(COMENTARIOS) if gerador.random() < 0.4 else None,
+      )
+      for i in indices
+    ])
+
+
+def popular(escala=None, semente=42, derivados=True, tamanho_lote=TAMANHO_LOTE, using=None, **opcoes):
+  """Gera a loja sintética e devolve quantas linhas de cada modelo foram criadas."""
+  gerador = GeradorLoja(escala or Escala(), semente=semente, tamanho_lote=tamanho_lote, using=using, **opcoes)
+  return gerador.gerar(derivados=derivados)
@@ -0,0 +1,26 @@
+import pytest
+from django.core.cache import cache
+from loja import catalogo
+from loja.views import SESSAO_USUARIO
+
+@pytest.fixture(autouse=True)
+def senhas_rapidas(settings):
+    # Usuario.save() gera hash de toda senha; com o custo padrão do PBKDF2 a suíte levaria minutos.
+    settings.LOJA_SENHAS = {"ITERACOES": 1000, "WORKERS": 2}
+
+@pytest.fixture(autouse=True)
+def catalogo_limpo(monkeypatch):
+    # A página de produto das views vem do cache, e os ids se repetem entre testes.
+    cache.clear()
+    monkeypatch.setattr(catalogo, "_catalogo", None)
+    yield
+    cache.clear()
+
+@pytest.fixture
+def entrar_como(client):
+    # Guarda o Usuario na sessão do client, como login_async faz.
+    def entrar(usuario):
+        sessao = client.session
+        sessao[SESSAO_USUARIO] = usuario.pk
+        sessao.save()
+    return entrar
@@ -0,0 +1,122 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from loja import admin as loja_admin
+from loja.models import (
+    EspecificacaoProduto, Fornecedor, ItemPedido, Pagamento, Pedido, Produto, Usuario,
+)
+
+MODELOS = [
+    "usuario", "fornecedor", "produto", "especificacaoproduto", "pedido", "itempedido",
+    "pagamento", "avaliacao", "resumoavaliacaoproduto", "historicopedido", "historicopedidoarquivado",
+    "servicofretagem", "vendadiariaproduto", "vendadiariafornecedor", "pagamentodiario",
+]
+
+@pytest.fixture
+def produto():
+    fornecedor = Fornecedor.objects.create(
+        nome="Test Supplier",
+        telefone="123456789",
+        email="fornecedor@example.com",
+        endereco="Rua Teste, 123",
+        cnpj="12345678901234"
+    )
+    return Produto.objects.create(
+        nome="Test Product",
+        descricao="Test Description",
+        preco=10.0,
+        estoque=10,
+        fornecedor=fornecedor
+    )
+
+@pytest.fixture
+def pedido():
+    usuario = Usuario.objects.create(nome="Test User", email="testuser@example.com", senha="password123")
+    return Pedido.objects.create(
+        usuario=usuario, data_pedido="2024-12-18", valor_total=0, status="Pendente", endereco_entrega="Rua Teste, 123"
+    )
+
+def adicionar_itens(pedido, produto, quantidade):
+    especificacao = EspecificacaoProduto.objects.create(produto=produto, tamanho="M", cor="Azul")
+    for _ in range(quantidade):
+        ItemPedido.objects.create(
+            pedido=pedido, produto=produto, especificacao=especificacao, quantidade=1, preco_unitario=10.0
+        )
+        Pagamento.objects.create(
+            pedido=pedido, forma_pagamento="Pix", data_pagamento="2024-12-18", valor_pagamento=10.0
+        )
+
+def consultas(admin_client, url):
+    with CaptureQueriesContext(connection) as contexto:
+        resposta = admin_client.get(url)
+    assert resposta.status_code == 200
+    return len(contexto)
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("modelo", MODELOS)
+def test_changelist_de_todos_os_modelos(admin_client, modelo):
+    resposta = admin_client.get(reverse(f"admin:loja_{modelo}_changelist"))
+    assert resposta.status_code == 200
+
+@pytest.mark.django_db
+def test_usuario_senha_so_por_definir_senha(admin_client):
+    adicionar = reverse("admin:loja_usuario_add")
+    assert 'name="senha"' not in admin_client.get(adicionar).content.decode()
+
+    resposta = admin_client.post(adicionar, {"nome": "Novo", "email": "novo@example.com", "nova_senha": "curta"})
+    assert resposta.status_code == 200
+    assert "Senha deve ter pelo menos 8 caracteres." in resposta.content.decode()
+
+    admin_client.post(adicionar, {"nome": "Novo", "email": "novo@example.com", "nova_senha": "password123"})
+    usuario = Usuario.objects.get(email="novo@example.com")
+    assert usuario.verificar_senha("password123")
+
+    # Sem nova_senha o hash fica como está; um "senha" enviado é ignorado.
+    alterar = reverse("admin:loja_usuario_change", args=(usuario.pk,))
+    admin_client.post(alterar, {"nome": "Outro", "email": "novo@example.com", "senha": "texto", "nova_senha": ""})
+    alterado = Usuario.objects.get()
+    assert (alterado.nome, alterado.senha) == ("Outro", usuario.senha)
+
+    admin_client.post(alterar, {"nome": "Outro", "email": "novo@example.com", "nova_senha": "outrasenha"})
+    assert Usuario.objects.get().verificar_senha("outrasenha")
+
+@pytest.mark.django_db
+def test_changelist_de_itens_nao_cresce_com_as_linhas(admin_client, pedido, produto):
+    url = reverse("admin:loja_itempedido_changelist")
+    adicionar_itens(pedido, produto, 2)
+    admin_client.get(url)
+    poucas = consultas(admin_client, url)
+
+    adicionar_itens(pedido, produto, 10)
+    assert consultas(admin_client, url) == poucas
+
+@pytest.mark.django_db
+def test_inlines_do_pedido_nao_crescem_com_as_linhas(admin_client, pedido, produto):
+    url = reverse("admin:loja_pedido_change", args=[pedido.pk])
+    adicionar_itens(pedido, produto, 2)
+    admin_client.get(url)
+    poucas = consultas(admin_client, url)
+
+    adicionar_itens(pedido, produto, 10)
+    assert consultas(admin_client, url) == poucas
+
+@pytest.mark.django_db
+def test_inline_pre_carregado_mantem_link_do_raw_id(admin_client, pedido, produto):
+    adicionar_itens(pedido, produto, 1)
+    resposta = admin_client.get(reverse("admin:loja_pedido_change", args=[pedido.pk]))
+
+    assert reverse("admin:loja_produto_change", args=[produto.pk]) in resposta.content.decode()
+
+@pytest.mark.django_db
+def test_paginador_estimado(monkeypatch, pedido):
+    monkeypatch.setattr(loja_admin, "estimar_linhas", lambda modelo, alias: 5_000_000)
+
+    assert loja_admin.PaginadorEstimado(Pedido.objects.order_by("pk"), 50).count == 5_000_000
+    assert loja_admin.PaginadorEstimado(Pedido.objects.filter(status="Pendente").order_by("pk"), 50).count == 1
+
+@pytest.mark.django_db
+def test_paginador_estimado_abaixo_do_limiar(monkeypatch, pedido):
+    monkeypatch.setattr(loja_admin, "estimar_linhas", lambda modelo, alias: 10)
+
+    assert loja_admin.PaginadorEstimado(Pedido.objects.order_by("pk"), 50).count == 1
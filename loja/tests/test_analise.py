@@ -0,0 +1,144 @@
+import datetime
+import io
+import json
+from decimal import Decimal
+import pytest
+from django.core.management import call_command
+from loja import analise
+from loja.models import Fornecedor, ItemPedido, Pedido, Produto, Usuario
+
+np = pytest.importorskip("numpy")
+
+DIA = datetime.date(2024, 3, 1)
+SEGUINTE = datetime.date(2024, 3, 2)
+
+@pytest.fixture(autouse=True)
+def diretorio(tmp_path, settings):
+    settings.LOJA_ANALISE = {"DIRETORIO": str(tmp_path / "analise"), "TAMANHO_LOTE": 2, "MAX_IDADE": 3600}
+    return tmp_path / "analise"
+
+@pytest.fixture
+def loja():
+    usuario = Usuario.objects.create(nome="Test User", email="testuser@example.com", senha="password123")
+    fornecedor = Fornecedor.objects.create(
+        nome="Test Supplier", telefone="123456789", email="fornecedor@example.com",
+        endereco="Rua Teste, 123", cnpj="12345678901234",
+    )
+    produtos = [
+        Produto.objects.create(nome=f"Produto {i}", descricao="Teste", preco=10.0, estoque=10, fornecedor=fornecedor)
+        for i in range(3)
+    ]
+    # (data, [(produto, quantidade, preço)]) de cada pedido.
+    cestas = [
+        (DIA, [(0, 2, "10.00"), (1, 1, "5.50")]),
+        (DIA, [(0, 1, "10.00")]),
+        (SEGUINTE, [(2, 5, "1.99"), (1, 3, "5.50"), (0, 1, "10.00")]),
+    ]
+    for data, itens in cestas:
+        pedido = Pedido.objects.create(
+            usuario=usuario, data_pedido=data, valor_total=0, status="Pendente", endereco_entrega="Rua Teste, 123",
+        )
+        for produto, quantidade, preco in itens:
+            ItemPedido.objects.create(
+                pedido=pedido, produto=produtos[produto], quantidade=quantidade, preco_unitario=preco,
+            )
+    return fornecedor, produtos
+
+@pytest.mark.django_db
+def test_extrair_em_lotes_mantem_todas_as_linhas(loja):
+    instantaneo = analise.extrair()
+
+    assert list(instantaneo["pedidos"]["id"]) == list(Pedido.objects.order_by("pk").values_list("pk", flat=True))
+    assert len(instantaneo["itens"]["receita"]) == 6
+    assert instantaneo["itens"]["receita"].dtype == np.int64
+    assert int(instantaneo["itens"]["receita"].sum()) == 2000 + 550 + 1000 + 995 + 1650 + 1000
+
+@pytest.mark.django_db
+def test_receita_por_dia_bate_com_o_orm(loja):
+    instantaneo = analise.extrair()
+
+    relatorio = analise.receita_por_dia(instantaneo)
+
+    totais = {}
+    for pedido in Pedido.objects.all():
+        dia = totais.setdefault(pedido.data_pedido, [0, 0, Decimal("0.00")])
+        dia[0] += 1
+        dia[1] += pedido.quantidade_itens
+        dia[2] += pedido.valor_total
+    assert relatorio == [
+        {"data": data, "pedidos": pedidos, "unidades": unidades, "receita": receita}
+        for data, (pedidos, unidades, receita) in sorted(totais.items())
+    ]
+    assert analise.receita_por_dia(instantaneo, inicio=SEGUINTE)[0]["pedidos"] == 1
+
+@pytest.mark.django_db
+def test_tamanho_cestas(loja):
+    cestas = analise.tamanho_cestas(analise.extrair())
+
+    assert cestas["pedidos"] == 3
+    assert cestas["distribuicao"] == {1: 1, 3: 1, 9: 1}
+    assert cestas["mediana_unidades"] == 3.0
+    assert cestas["media_itens"] == 2.0
+    assert analise.tamanho_cestas(analise.extrair(), inicio=datetime.date(2030, 1, 1))["pedidos"] == 0
+
+@pytest.mark.django_db
+def test_mais_vendidos(loja):
+    fornecedor, produtos = loja
+    instantaneo = analise.extrair()
+
+    por_receita = analise.mais_vendidos(instantaneo, limite=2)
+    assert por_receita == [
+        {
+            "produto_id": produtos[0].id, "fornecedor_id": fornecedor.id, "itens": 3, "unidades": 4,
+            "receita": Decimal("40.00"),
+        },
+        {
+            "produto_id": produtos[1].id, "fornecedor_id": fornecedor.id, "itens": 2, "unidades": 4,
+            "receita": Decimal("22.00"),
+        },
+    ]
+    por_unidades = analise.mais_vendidos(instantaneo, criterio="unidades", inicio=SEGUINTE)
+    assert [linha["produto_id"] for linha in por_unidades] == [produtos[2].id, produtos[1].id, produtos[0].id]
+    with pytest.raises(ValueError):
+        analise.mais_vendidos(instantaneo, criterio="margem")
+
+@pytest.mark.django_db
+def test_instantaneo_reaproveita_o_disco_mapeado(loja, diretorio, django_assert_num_queries):
+    primeiro = analise.instantaneo()
+    assert isinstance(primeiro["itens"]["receita"], np.memmap)
+
+    with django_assert_num_queries(0):
+        segundo = analise.instantaneo()
+    assert segundo.gerado_em == primeiro.gerado_em
+    assert analise.mais_vendidos(segundo) == analise.mais_vendidos(analise.extrair())
+
+    terceiro = analise.instantaneo(atualizar=True)
+    analise.instantaneo(atualizar=True)
+    assert terceiro.gerado_em > primeiro.gerado_em
+    # Só a geração vigente e a anterior ficam no disco.
+    assert len([pasta for pasta in diretorio.iterdir() if pasta.is_dir()]) == 2
+
+@pytest.mark.django_db
+def test_instantaneo_expirado_e_extraido_de_novo(loja):
+    primeiro = analise.instantaneo()
+    Pedido.objects.create(
+        usuario=Usuario.objects.get(), data_pedido=DIA, valor_total=0, status="Pendente", endereco_entrega="Rua",
+    )
+
+    assert len(analise.instantaneo()["pedidos"]["id"]) == 3
+    novo = analise.instantaneo(max_idade=0)
+    assert novo.gerado_em > primeiro.gerado_em
+    assert len(novo["pedidos"]["id"]) == 4
+
+@pytest.mark.django_db
+def test_comando_loja_analise(loja):
+    saida = io.StringIO()
+    call_command("loja_analise", stdout=saida)
+    assert "3 pedidos, 6 itens, 3 produtos" in saida.getvalue()
+
+    saida = io.StringIO()
+    call_command(
+        "loja_analise", "mais-vendidos", "--limite", "1", "--criterio", "unidades", "--from", "2024-03-02",
+        stdout=saida,
+    )
+    assert json.loads(saida.getvalue())[0]["unidades"] == 5
@@ -0,0 +1,127 @@
+import json
+import pytest
+from django.urls import reverse
+from loja.models import Avaliacao, Fornecedor, ItemPedido, Pedido, Produto, Usuario
+
+@pytest.fixture
+def usuario():
+    return Usuario.objects.create(
+        nome="Test User",
+        email="testuser@example.com",
+        senha="password123"
+    )
+
+@pytest.fixture
+def produto():
+    fornecedor = Fornecedor.objects.create(
+        nome="Test Supplier",
+        telefone="123456789",
+        email="fornecedor@example.com",
+        endereco="Rua Teste, 123",
+        cnpj="12345678901234"
+    )
+    return Produto.objects.create(
+        nome="Test Product",
+        descricao="Test Description",
+        preco=10.0,
+        estoque=10,
+        fornecedor=fornecedor
+    )
+
+def obter(client, nome, **parametros):
+    resposta = client.get(reverse(f"loja:{nome}"), parametros)
+    assert resposta.status_code == 200
+    return json.loads(b"".join(resposta.streaming_content))
+
+def percorrer(client, nome, **parametros):
+    resultados, proximo = [], None
+    while True:
+        if proximo:
+            parametros["depois"] = proximo
+        pagina = obter(client, nome, **parametros)
+        resultados.extend(pagina["resultados"])
+        proximo = pagina["proximo"]
+        if proximo is None:
+            return resultados
+
+@pytest.mark.django_db
+def test_api_produtos_paginacao_por_chave(client, produto):
+    for i in range(4):
+        Produto.objects.create(nome=f"Produto {i}", descricao="-", preco=1, estoque=1, fornecedor=produto.fornecedor)
+
+    pagina = obter(client, "api_produtos", limite=2)
+    assert len(pagina["resultados"]) == 2
+    assert pagina["proximo"] == pagina["resultados"][-1]["id"]
+
+    ids = [p["id"] for p in percorrer(client, "api_produtos", limite=2)]
+    assert ids == list(Produto.objects.order_by("id").values_list("id", flat=True))
+
+@pytest.mark.django_db
+def test_api_pedidos_com_itens(client, entrar_como, usuario, produto, django_assert_max_num_queries):
+    for dia in (20, 18, 18, 19, 18):
+        pedido = Pedido.objects.create(
+            usuario=usuario, data_pedido=f"2024-12-{dia}", valor_total=0,
+            status="Pendente", endereco_entrega="Rua Teste, 123"
+        )
+        ItemPedido.objects.create(pedido=pedido, produto=produto, quantidade=1, preco_unitario=10.0)
+    entrar_como(usuario)
+
+    # Sessão, pedidos e itens.
+    with django_assert_max_num_queries(3):
+        pagina = obter(client, "api_pedidos", limite=2)
+    assert pagina["proximo"] == f"2024-12-18_{pagina['resultados'][-1]['id']}"
+    assert len(pagina["resultados"][0]["itens"]) == 1
+
+    pedidos = percorrer(client, "api_pedidos", limite=2)
+    chaves = [(p["data_pedido"], p["id"]) for p in pedidos]
+    assert chaves == sorted(chaves)
+    assert len(chaves) == 5
+
+def criar_pedidos(usuario, quantidade):
+    return [
+        Pedido.objects.create(
+            usuario=usuario, data_pedido="2024-12-18", valor_total=0, status="Pendente", endereco_entrega="Rua Teste, 123"
+        )
+        for _ in range(quantidade)
+    ]
+
+@pytest.mark.django_db
+def test_api_pedidos_exige_login(client, usuario):
+    criar_pedidos(usuario, 1)
+    assert client.get(reverse("loja:api_pedidos")).status_code == 401
+    assert client.get(reverse("loja:api_pedidos"), {"usuario": usuario.pk}).status_code == 401
+
+@pytest.mark.django_db
+def test_api_pedidos_so_do_usuario_da_sessao(client, entrar_como, usuario):
+    outro = Usuario.objects.create(nome="Outro", email="outro@example.com", senha="password123")
+    meus = criar_pedidos(usuario, 2)
+    criar_pedidos(outro, 3)
+    entrar_como(usuario)
+
+    assert [p["id"] for p in percorrer(client, "api_pedidos", limite=1)] == [p.pk for p in meus]
+    assert obter(client, "api_pedidos", usuario=outro.pk)["resultados"] == []
+
+@pytest.mark.django_db
+def test_api_pedidos_staff_ve_todos(admin_client, usuario):
+    outro = Usuario.objects.create(nome="Outro", email="outro@example.com", senha="password123")
+    criar_pedidos(usuario, 2)
+    dele = criar_pedidos(outro, 3)
+
+    assert len(percorrer(admin_client, "api_pedidos")) == 5
+    assert [p["id"] for p in percorrer(admin_client, "api_pedidos", usuario=outro.pk)] == [p.pk for p in dele]
+
+@pytest.mark.django_db
+def test_api_avaliacoes_por_produto(client, usuario, produto):
+    outro = Produto.objects.create(nome="Outro", descricao="-", preco=1, estoque=1, fornecedor=produto.fornecedor)
+    for nota in range(3):
+        Avaliacao.objects.create(produto=produto, usuario=usuario, nota=nota)
+    Avaliacao.objects.create(produto=outro, usuario=usuario, nota=5)
+
+    avaliacoes = percorrer(client, "api_avaliacoes", produto=produto.id, limite=1)
+
+    assert [a["nota"] for a in avaliacoes] == [0, 1, 2]
+
+@pytest.mark.django_db
+def test_api_parametro_invalido(admin_client, client):
+    assert admin_client.get(reverse("loja:api_pedidos"), {"depois": "ontem"}).status_code == 400
+    assert client.get(reverse("loja:api_produtos"), {"limite": "muitos"}).status_code == 400
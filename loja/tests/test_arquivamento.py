@@ -0,0 +1,69 @@
+import datetime
+import pytest
+from django.core.management import CommandError, call_command
+from loja.historico import arquivar_historico, historico_pedido
+from loja.models import HistoricoPedido, HistoricoPedidoArquivado, Pedido, Usuario
+
+@pytest.fixture
+def pedido():
+    usuario = Usuario.objects.create(nome="Test User", email="testuser@example.com", senha="password123")
+    return Pedido.objects.create(
+        usuario=usuario, data_pedido="2024-01-01", valor_total=100.0, status="Pendente", endereco_entrega="Rua Teste, 123"
+    )
+
+@pytest.fixture
+def historico(pedido):
+    inicio = datetime.date(2024, 1, 1)
+    return [
+        HistoricoPedido.objects.create(
+            pedido=pedido,
+            data_alteracao=inicio + datetime.timedelta(days=dia),
+            status_anterior=f"Status {dia}",
+            status_atual=f"Status {dia + 1}",
+        )
+        for dia in range(5)
+    ]
+
+@pytest.mark.django_db
+def test_arquivar_move_linhas_antigas_em_lotes(historico, django_assert_max_num_queries):
+    # Por lote: SAVEPOINT, SELECT, INSERT, DELETE e RELEASE; o último lote vem vazio.
+    with django_assert_max_num_queries(3 * 5 + 3):
+        movidos = arquivar_historico(datetime.date(2024, 1, 4), tamanho_lote=1)
+
+    assert movidos == 3
+    assert sorted(HistoricoPedidoArquivado.objects.values_list("id", flat=True)) == [h.id for h in historico[:3]]
+    assert sorted(HistoricoPedido.objects.values_list("id", flat=True)) == [h.id for h in historico[3:]]
+    arquivado = HistoricoPedidoArquivado.objects.get(id=historico[0].id)
+    assert (arquivado.pedido_id, arquivado.data_alteracao, arquivado.status_atual) == (
+        historico[0].pedido_id, historico[0].data_alteracao, historico[0].status_atual
+    )
+
+@pytest.mark.django_db
+def test_arquivar_sem_linhas_antigas(historico):
+    assert arquivar_historico(datetime.date(2023, 1, 1)) == 0
+    assert HistoricoPedido.objects.count() == 5
+
+@pytest.mark.django_db
+def test_historico_pedido_une_vivo_e_arquivado(pedido, historico, django_assert_num_queries):
+    arquivar_historico(datetime.date(2024, 1, 3))
+    with django_assert_num_queries(1):
+        linhas = list(historico_pedido(pedido.pk))
+
+    assert [linha["id"] for linha in linhas] == [h.id for h in reversed(historico)]
+    assert [linha["arquivado"] for linha in linhas] == [False, False, False, True, True]
+
+@pytest.mark.django_db
+def test_status_pedido_inclui_historico_arquivado(client, entrar_como, pedido, historico):
+    entrar_como(pedido.usuario)
+    arquivar_historico(datetime.date(2024, 1, 6))
+    resposta = client.get(f"/loja/api/pedidos/{pedido.pk}/status/")
+    assert [h["status_atual"] for h in resposta.json()["historico"]] == [f"Status {dia}" for dia in range(5, 0, -1)]
+
+@pytest.mark.django_db
+def test_comando_arquivar(historico, capsys):
+    call_command("loja_archive_history", "--before", "2024-01-03", "--tamanho-lote", "10")
+    assert "2 linhas" in capsys.readouterr().out
+    assert HistoricoPedidoArquivado.objects.count() == 2
+
+    with pytest.raises(CommandError):
+        call_command("loja_archive_history", "--before", "03/01/2024")
@@ -0,0 +1,115 @@
+import json
+import logging
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import reverse
+from loja.models import EspecificacaoProduto, Fornecedor, HistoricoPedido, Pedido, Produto, Usuario
+
+@pytest.fixture
+def produto():
+    fornecedor = Fornecedor.objects.create(
+        nome="Test Supplier",
+        telefone="123456789",
+        email="fornecedor@example.com",
+        endereco="Rua Teste, 123",
+        cnpj="12345678901234"
+    )
+    produto = Produto.objects.create(
+        nome="Test Product",
+        descricao="Test Description",
+        preco=10.0,
+        estoque=10,
+        fornecedor=fornecedor
+    )
+    EspecificacaoProduto.objects.create(produto=produto, tamanho="M", cor="Azul", preco_adicional=2)
+    return produto
+
+@pytest.fixture
+def pedido():
+    usuario = Usuario.objects.create(nome="Test User", email="testuser@example.com", senha="password123")
+    pedido = Pedido.objects.create(usuario=usuario, data_pedido="2024-01-01", status="Pendente", valor_total=0)
+    HistoricoPedido.objects.create(
+        pedido=pedido, data_alteracao="2024-01-01", status_anterior="Novo", status_atual="Pendente"
+    )
+    return pedido
+
+def obter(client, nome, *args, status=200):
+    resposta = client.get(reverse(f"loja:{nome}", args=args))
+    assert resposta.status_code == status
+    return json.loads(resposta.content)
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("nome", ["api_produto", "api_async_produto"])
+def test_produto_detalhe(client, produto, nome):
+    dados = obter(client, nome, produto.pk)
+    assert dados["nome"] == "Test Product"
+    assert dados["fornecedor"]["nome"] == "Test Supplier"
+    assert [e["cor"] for e in dados["especificacoes"]] == ["Azul"]
+    assert dados["avaliacoes"]["total"] == 0
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("nome", ["api_produto", "api_async_produto"])
+def test_produto_detalhe_inexistente(client, nome):
+    assert "erro" in obter(client, nome, 999999, status=404)
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("nome", ["api_produto", "api_async_produto"])
+def test_produto_detalhe_vem_do_cache_com_estoque_atual(client, produto, nome, django_assert_num_queries):
+    obter(client, nome, produto.pk)
+    # update() não passa pelos sinais, então o cache não é invalidado: só o estoque é relido.
+    Produto.objects.filter(pk=produto.pk).update(estoque=3, nome="Outro Nome")
+
+    with django_assert_num_queries(1):
+        dados = obter(client, nome, produto.pk)
+    assert (dados["estoque"], dados["nome"]) == (3, "Test Product")
+
+@pytest.mark.django_db
+def test_produto_detalhe_async_igual_ao_sincrono(client, produto):
+    assert obter(client, "api_async_produto", produto.pk) == obter(client, "api_produto", produto.pk)
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("nome", ["api_status_pedido", "api_async_status_pedido"])
+def test_status_pedido(client, entrar_como, pedido, nome):
+    entrar_como(pedido.usuario)
+    dados = obter(client, nome, pedido.pk)
+    assert dados["status"] == "Pendente"
+    assert [h["status_atual"] for h in dados["historico"]] == ["Pendente"]
+    assert obter(client, nome, 999999, status=404)
+
+@pytest.mark.django_db
+def test_produtos_async_paginacao(client, produto):
+    for i in range(2):
+        Produto.objects.create(nome=f"Produto {i}", descricao="-", preco=1, estoque=1, fornecedor=produto.fornecedor)
+
+    primeira = client.get(reverse("loja:api_async_produtos"), {"limite": 2}).json()
+    assert len(primeira["resultados"]) == 2
+    segunda = client.get(reverse("loja:api_async_produtos"), {"limite": 2, "depois": primeira["proximo"]}).json()
+    assert segunda["proximo"] is None
+    ids = [p["id"] for p in primeira["resultados"] + segunda["resultados"]]
+    assert ids == list(Produto.objects.order_by("id").values_list("id", flat=True))
+
+    assert client.get(reverse("loja:api_async_produtos"), {"limite": "x"}).status_code == 400
+
+@pytest.mark.django_db(transaction=True)
+def test_produto_detalhe_pelo_handler_asgi(produto):
+    resposta = async_to_sync(AsyncClient().get)(reverse("loja:api_async_produto", args=[produto.pk]))
+    assert resposta.status_code == 200
+    assert resposta.json()["id"] == produto.pk
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("nome", ["api_status_pedido", "api_async_status_pedido"])
+def test_status_pedido_so_do_dono(client, admin_client, entrar_como, pedido, nome):
+    assert obter(client, nome, pedido.pk, status=401)
+    entrar_como(Usuario.objects.create(nome="Outro", email="outro@example.com", senha="password123"))
+    assert obter(client, nome, pedido.pk, status=404)
+    assert obter(admin_client, nome, pedido.pk)["status"] == "Pendente"
+
+@pytest.mark.django_db
+def test_pilha_asgi_sem_middleware_adaptado(caplog, settings, produto):
+    # Com DEBUG o Django registra cada middleware que precisou adaptar de um modo para o outro.
+    settings.DEBUG = True
+    with caplog.at_level(logging.DEBUG, logger="django.request"):
+        resposta = async_to_sync(AsyncClient().get)(reverse("loja:api_async_produto", args=[produto.pk]))
+    assert resposta.status_code == 200
+    assert not [registro.getMessage() for registro in caplog.records if "adapted" in registro.getMessage()]
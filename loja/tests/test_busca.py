@@ -0,0 +1,88 @@
+import json
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from loja.busca import buscar, normalizar, termos
+from loja.models import Fornecedor, Produto, TermoBusca
+
+@pytest.fixture
+def fornecedor():
+    return Fornecedor.objects.create(
+        nome="Test Supplier",
+        telefone="123456789",
+        email="fornecedor@example.com",
+        endereco="Rua Teste, 123",
+        cnpj="12345678901234"
+    )
+
+def criar(fornecedor, nome, descricao="-", preco=10):
+    return Produto.objects.create(nome=nome, descricao=descricao, preco=preco, estoque=1, fornecedor=fornecedor)
+
+def ids(resultados):
+    return [r["id"] for r in resultados]
+
+def test_normalizar_remove_acentos_e_stopwords():
+    assert normalizar("Camiseta de Algodão, CAMISETA básica!") == ["camiseta", "algodao", "camiseta", "basica"]
+    assert termos("Calça Jeans", "calça confortável") == {"calca": 4, "jeans": 3, "confortavel": 1}
+
+@pytest.mark.django_db
+def test_indice_atualizado_ao_salvar(fornecedor):
+    produto = criar(fornecedor, "Camiseta Azul")
+    assert set(TermoBusca.objects.filter(produto=produto).values_list("termo", flat=True)) == {"camiseta", "azul"}
+
+    produto.nome = "Camiseta Verde"
+    produto.save()
+    assert set(TermoBusca.objects.filter(produto=produto).values_list("termo", flat=True)) == {"camiseta", "verde"}
+
+@pytest.mark.django_db
+def test_salvar_sem_mudar_texto_nao_reindexa(fornecedor, django_assert_num_queries):
+    produto = Produto.objects.get(pk=criar(fornecedor, "Camiseta Azul").pk)
+    produto.estoque = 5
+    with django_assert_num_queries(1):
+        produto.save(update_fields=["estoque"])
+
+@pytest.mark.django_db
+def test_buscar_exige_todos_os_termos_e_ordena_por_relevancia(fornecedor):
+    no_nome = criar(fornecedor, "Camiseta Algodão", "Básica")
+    na_descricao = criar(fornecedor, "Camiseta", "Feita de algodão")
+    criar(fornecedor, "Calça Jeans", "Algodão")
+
+    assert ids(buscar("algodao camisetá")) == [no_nome.pk, na_descricao.pk]
+    assert ids(buscar("camiseta linho")) == []
+    assert buscar("de a o") == []
+
+@pytest.mark.django_db
+def test_buscar_filtra_por_preco_e_fornecedor(fornecedor):
+    outro = Fornecedor.objects.create(nome="Outro", telefone="1", email="o@example.com", endereco="-", cnpj="1" * 14)
+    barata = criar(fornecedor, "Camiseta", preco=10)
+    cara = criar(fornecedor, "Camiseta", preco=100)
+    de_outro = criar(outro, "Camiseta", preco=50)
+
+    assert ids(buscar("camiseta", preco_max=60)) == sorted([barata.pk, de_outro.pk])
+    assert ids(buscar("camiseta", preco_min=60)) == [cara.pk]
+    assert ids(buscar("camiseta", fornecedor=outro.pk)) == [de_outro.pk]
+
+@pytest.mark.django_db
+def test_buscar_usa_consultas_fixas(fornecedor, django_assert_num_queries):
+    for i in range(10):
+        criar(fornecedor, f"Camiseta Azul {i}")
+    # Frequência dos termos, ranking e os dados dos produtos.
+    with django_assert_num_queries(3):
+        assert len(buscar("camiseta azul", limite=5)) == 5
+
+@pytest.mark.django_db
+def test_api_busca(client, fornecedor):
+    produto = criar(fornecedor, "Camiseta Azul")
+    resposta = client.get(reverse("loja:api_busca_produtos"), {"q": "azul"})
+    assert ids(json.loads(b"".join(resposta.streaming_content))["resultados"]) == [produto.pk]
+    assert client.get(reverse("loja:api_busca_produtos"), {"q": "azul", "preco_min": "x"}).status_code == 400
+
+@pytest.mark.django_db
+def test_reconstruir_indice(fornecedor, capsys):
+    produto = criar(fornecedor, "Camiseta Azul")
+    outros = [criar(fornecedor, f"Bermuda Verde {i}") for i in range(2)]
+    TermoBusca.objects.all().delete()
+    call_command("loja_rebuild_search", "--tamanho-lote", "2")
+    assert "3 produtos" in capsys.readouterr().out
+    assert ids(buscar("azul")) == [produto.pk]
+    assert sorted(ids(buscar("verde"))) == [outro.pk for outro in outros]
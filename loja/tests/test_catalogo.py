@@ -0,0 +1,116 @@
+import pytest
+from django.core.cache import cache
+from loja import catalogo
+from loja.catalogo import LRU, CatalogoCache
+from loja.models import Avaliacao, EspecificacaoProduto, Fornecedor, Produto, Usuario
+
+@pytest.fixture(autouse=True)
+def cache_limpo(monkeypatch):
+    cache.clear()
+    monkeypatch.setattr(catalogo, "_catalogo", CatalogoCache())
+    yield
+    cache.clear()
+
+@pytest.fixture
+def fornecedor():
+    return Fornecedor.objects.create(
+        nome="Test Supplier",
+        telefone="123456789",
+        email="fornecedor@example.com",
+        endereco="Rua Teste, 123",
+        cnpj="12345678901234"
+    )
+
+@pytest.fixture
+def produto(fornecedor):
+    return Produto.objects.create(
+        nome="Test Product",
+        descricao="Test Description",
+        preco=10.0,
+        estoque=10,
+        fornecedor=fornecedor
+    )
+
+@pytest.mark.django_db
+def test_obter_produto_usa_cache(produto, django_assert_num_queries):
+    EspecificacaoProduto.objects.create(produto=produto, tamanho="M", cor="Azul")
+
+    dados = catalogo.obter_produto(produto.id)
+    with django_assert_num_queries(0):
+        assert catalogo.obter_produto(produto.id) == dados
+
+    assert dados["fornecedor"]["nome"] == "Test Supplier"
+    assert len(dados["especificacoes"]) == 1
+    assert catalogo.estatisticas()["misses"] == 1
+    assert catalogo.estatisticas()["hits_lru"] == 1
+
+@pytest.mark.django_db
+def test_cache_compartilhado_entre_processos(produto):
+    catalogo.obter_produto(produto.id)
+    outro_processo = CatalogoCache()
+
+    outro_processo.obter(produto.id)
+
+    assert outro_processo.estatisticas()["hits_cache"] == 1
+
+@pytest.mark.django_db
+def test_invalidacao_por_produto(produto):
+    catalogo.obter_produto(produto.id)
+
+    produto.nome = "Novo Nome"
+    produto.save()
+
+    assert catalogo.obter_produto(produto.id)["nome"] == "Novo Nome"
+
+@pytest.mark.django_db
+def test_invalidacao_em_outro_processo(produto):
+    outro_processo = CatalogoCache()
+    outro_processo.obter(produto.id)
+
+    produto.nome = "Novo Nome"
+    produto.save()
+
+    assert outro_processo.obter(produto.id)["nome"] == "Novo Nome"
+
+@pytest.mark.django_db
+def test_invalidacao_por_avaliacao_e_especificacao(produto):
+    usuario = Usuario.objects.create(nome="Test User", email="testuser@example.com", senha="password123")
+    catalogo.obter_produto(produto.id)
+
+    Avaliacao.objects.create(produto=produto, usuario=usuario, nota=4)
+    assert catalogo.obter_produto(produto.id)["avaliacoes"] == {"media": 4, "total": 1, "histograma": [0, 0, 0, 0, 1, 0]}
+
+    EspecificacaoProduto.objects.create(produto=produto, tamanho="G", cor="Preto")
+    assert len(catalogo.obter_produto(produto.id)["especificacoes"]) == 1
+
+@pytest.mark.django_db
+def test_invalidacao_por_fornecedor(produto, fornecedor):
+    catalogo.obter_produto(produto.id)
+
+    fornecedor.nome = "Outro Fornecedor"
+    fornecedor.save()
+
+    assert catalogo.obter_produto(produto.id)["fornecedor"]["nome"] == "Outro Fornecedor"
+
+def test_lru_descarta_o_menos_usado():
+    lru = LRU(2)
+    lru.guardar(1, "v", "a")
+    lru.guardar(2, "v", "b")
+    lru.obter(1, "v")
+    lru.guardar(3, "v", "c")
+
+    assert lru.obter(2, "v") is None
+    assert lru.obter(1, "v") == "a"
+    assert lru.obter(1, "outra versao") is None
+
+def test_lru_expira_pelo_ttl(monkeypatch):
+    agora = [100.0]
+    monkeypatch.setattr(catalogo.time, "monotonic", lambda: agora[0])
+    lru = LRU(2, ttl=30)
+    lru.guardar(1, "v", "a")
+
+    agora[0] += 29
+    assert lru.obter(1, "v") == "a"
+    agora[0] += 1
+    assert lru.obter(1, "v") is None
+    assert len(lru) == 0
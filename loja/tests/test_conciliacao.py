@@ -0,0 +1,101 @@
+import io
+from decimal import Decimal
+import pytest
+from django.core.management import call_command
+from loja import conciliacao
+from loja.conciliacao import conciliar, situacao
+from loja.models import Pagamento, Pedido, ProgressoConciliacao, Usuario
+
+@pytest.fixture
+def pedidos():
+    usuario = Usuario.objects.create(nome="Test User", email="testuser@example.com", senha="password123")
+    # valor_total de cada pedido e os pagamentos recebidos.
+    casos = [(100, []), (100, [40]), (100, [60, 40]), (100, [80, 50]), (0, [])]
+    criados = []
+    for valor_total, pagamentos in casos:
+        pedido = Pedido.objects.create(
+            usuario=usuario, data_pedido="2024-01-01", valor_total=valor_total, status="Pendente",
+            endereco_entrega="Rua Teste, 123",
+        )
+        for valor in pagamentos:
+            Pagamento.objects.create(pedido=pedido, forma_pagamento="Pix", data_pagamento="2024-01-02", valor_pagamento=valor)
+        criados.append(pedido)
+    return criados
+
+def situacoes(pedidos):
+    por_pk = dict(Pedido.objects.values_list("pk", "situacao_pagamento"))
+    return [por_pk[pedido.pk] for pedido in pedidos]
+
+def test_situacao():
+    assert situacao(Decimal("10"), Decimal("0")) == Pedido.SEM_PAGAMENTO
+    assert situacao(Decimal("10"), Decimal("5")) == Pedido.PARCIAL
+    assert situacao(Decimal("10"), Decimal("10")) == Pedido.QUITADO
+    assert situacao(Decimal("10"), Decimal("11")) == Pedido.EXCEDENTE
+    assert situacao(Decimal("0"), Decimal("0")) == Pedido.SEM_PAGAMENTO
+    assert situacao(Decimal("0"), Decimal("1")) == Pedido.EXCEDENTE
+
+@pytest.mark.django_db
+def test_conciliar_marca_cada_pedido(pedidos):
+    resultado = conciliar(tamanho_lote=2)
+
+    assert situacoes(pedidos) == [
+        Pedido.SEM_PAGAMENTO, Pedido.PARCIAL, Pedido.QUITADO, Pedido.EXCEDENTE, Pedido.SEM_PAGAMENTO,
+    ]
+    assert Pedido.objects.get(pk=pedidos[3].pk).valor_pago == Decimal("130.00")
+    assert resultado.pedidos == 5
+    # O primeiro e o último (total zero, sem pagamentos) já estavam "Sem pagamento".
+    assert resultado.alterados == 3
+    assert resultado.situacoes[Pedido.QUITADO] == 1
+    assert not ProgressoConciliacao.objects.exists()
+
+@pytest.mark.django_db
+def test_segunda_execucao_nao_altera_nada(pedidos, django_assert_num_queries):
+    conciliar()
+    # get_or_create do progresso (4); a faixa com SAVEPOINT, SELECT dos pedidos, GROUP BY
+    # dos pagamentos, UPDATE do progresso e RELEASE, sem UPDATE de pedidos; a faixa vazia.
+    with django_assert_num_queries(4 + 5 + 4):
+        resultado = conciliar(tamanho_lote=10)
+    assert resultado.alterados == 0
+
+@pytest.mark.django_db
+def test_uma_agregacao_por_faixa(pedidos, django_assert_num_queries):
+    # get_or_create (4), 2 faixas com SAVEPOINT, SELECT, GROUP BY, UPDATE em lote,
+    # progresso e RELEASE (2 x 6), a terceira sem UPDATE (5), pois o único pedido dela não
+    # muda, e a faixa vazia (SAVEPOINT, SELECT, DELETE, RELEASE).
+    with django_assert_num_queries(4 + 2 * 6 + 5 + 4):
+        conciliar(tamanho_lote=2)
+
+@pytest.mark.django_db
+def test_retoma_de_onde_parou(pedidos, monkeypatch):
+    original = conciliacao.conciliar_lote
+    chamadas = []
+
+    def falha_na_segunda(lote, using, resultado):
+        chamadas.append(lote[0][0])
+        if len(chamadas) == 2:
+            raise RuntimeError("queda")
+        original(lote, using, resultado)
+
+    monkeypatch.setattr(conciliacao, "conciliar_lote", falha_na_segunda)
+    with pytest.raises(RuntimeError):
+        conciliar(tamanho_lote=2)
+    progresso = ProgressoConciliacao.objects.get()
+    assert progresso.ultimo_pedido_id == pedidos[1].pk
+    assert situacoes(pedidos)[2:4] == [Pedido.SEM_PAGAMENTO, Pedido.SEM_PAGAMENTO]
+
+    monkeypatch.setattr(conciliacao, "conciliar_lote", original)
+    resultado = conciliar(tamanho_lote=2)
+    assert resultado.pedidos == 3
+    assert situacoes(pedidos)[2:4] == [Pedido.QUITADO, Pedido.EXCEDENTE]
+
+@pytest.mark.django_db
+def test_recomecar_ignora_o_progresso(pedidos):
+    ProgressoConciliacao.objects.create(nome=conciliacao.PROGRESSO, ultimo_pedido_id=pedidos[-1].pk)
+    assert conciliar(recomecar=True).pedidos == 5
+
+@pytest.mark.django_db
+def test_comando(pedidos):
+    saida = io.StringIO()
+    call_command("loja_reconcile_payments", tamanho_lote=2, stdout=saida)
+    assert "5 pedidos conciliados, 3 atualizados." in saida.getvalue()
+    assert "Parcial: 1" in saida.getvalue()
@@ -0,0 +1,256 @@
+import datetime
+import io
+from decimal import Decimal
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from loja.consolidados import ESPERA_TRAVA, ESPERA_TRAVA_DELTA, DeltasConsolidados, consultar, periodos, reconstruir
+from loja.models import (
+    DiaConsolidadoPendente, Fornecedor, ItemPedido, Pagamento, PagamentoDiario, Pedido, Produto, Usuario, VendaDiariaFornecedor,
+    VendaDiariaProduto,
+)
+from loja.services import bulk_import_orders
+
+DIA = datetime.date(2024, 3, 1)
+SEGUINTE = datetime.date(2024, 3, 2)
+
+@pytest.fixture
+def loja():
+    usuario = Usuario.objects.create(nome="Test User", email="testuser@example.com", senha="password123")
+    fornecedor = Fornecedor.objects.create(
+        nome="Test Supplier", telefone="123456789", email="fornecedor@example.com",
+        endereco="Rua Teste, 123", cnpj="12345678901234",
+    )
+    produtos = [
+        Produto.objects.create(nome=f"Produto {i}", descricao="Teste", preco=10.0, estoque=10, fornecedor=fornecedor)
+        for i in range(2)
+    ]
+    return usuario, fornecedor, produtos
+
+def novo_pedido(usuario, data=DIA):
+    return Pedido.objects.create(
+        usuario=usuario, data_pedido=data, valor_total=0, status="Pendente", endereco_entrega="Rua Teste, 123",
+    )
+
+def linhas(modelo):
+    campos = [campo.attname for campo in modelo._meta.concrete_fields if campo.name != "id"]
+    return sorted(modelo.objects.exclude(**{campos[-1]: 0}).values_list(*campos))
+
+def todas():
+    return [linhas(modelo) for modelo in (VendaDiariaProduto, VendaDiariaFornecedor, PagamentoDiario)]
+
+def test_periodos():
+    assert list(periodos(DIA, datetime.date(2024, 3, 5), 2)) == [
+        (DIA, SEGUINTE), (datetime.date(2024, 3, 3), datetime.date(2024, 3, 4)),
+        (datetime.date(2024, 3, 5), datetime.date(2024, 3, 5)),
+    ]
+    assert list(periodos(SEGUINTE, DIA, 7)) == []
+
+@pytest.mark.django_db
+def test_manutencao_incremental_bate_com_reconstrucao(loja, django_capture_on_commit_callbacks):
+    usuario, fornecedor, (produto, outro) = loja
+    with django_capture_on_commit_callbacks(execute=True):
+        pedido = novo_pedido(usuario)
+        item = ItemPedido.objects.create(pedido=pedido, produto=produto, quantidade=2, preco_unitario=10)
+        ItemPedido.objects.create(pedido=pedido, produto=outro, quantidade=1, preco_unitario="5.50")
+        removido = ItemPedido.objects.create(
+            pedido=novo_pedido(usuario, SEGUINTE), produto=produto, quantidade=4, preco_unitario=10,
+        )
+        Pagamento.objects.create(pedido=pedido, forma_pagamento="Pix", data_pagamento=DIA, valor_pagamento="25.50")
+    with django_capture_on_commit_callbacks(execute=True):
+        item.quantidade = 3
+        item.save()
+        removido.delete()
+
+    assert VendaDiariaProduto.objects.get(data=DIA, produto=produto).receita == Decimal("30.00")
+    assert VendaDiariaFornecedor.objects.get(data=DIA, fornecedor=fornecedor).unidades == 4
+    assert PagamentoDiario.objects.get(data=DIA, forma_pagamento="Pix").valor == Decimal("25.50")
+    incremental = todas()
+    assert reconstruir(DIA, SEGUINTE) == 4
+    assert todas() == incremental
+
+@pytest.mark.django_db
+def test_deltas_aplicados_so_no_commit(loja, django_capture_on_commit_callbacks):
+    usuario, _, (produto, _) = loja
+    pedido = novo_pedido(usuario)
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        for _ in range(3):
+            ItemPedido.objects.create(pedido=pedido, produto=produto, quantidade=1, preco_unitario=10)
+        assert not VendaDiariaProduto.objects.exists()
+
+    # Um único callback para a transação, com os três itens somados na mesma linha.
+    assert len([callback for callback in callbacks if isinstance(callback, DeltasConsolidados)]) == 1
+    venda = VendaDiariaProduto.objects.get()
+    assert (venda.itens, venda.unidades, venda.receita) == (3, 3, Decimal("30.00"))
+
+@pytest.mark.django_db
+def test_savepoint_desfeito_descarta_deltas(loja, django_capture_on_commit_callbacks):
+    usuario, _, (produto, _) = loja
+    pedido = novo_pedido(usuario)
+    with django_capture_on_commit_callbacks(execute=True):
+        ItemPedido.objects.create(pedido=pedido, produto=produto, quantidade=1, preco_unitario=10)
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                ItemPedido.objects.create(pedido=pedido, produto=produto, quantidade=5, preco_unitario=10)
+                raise RuntimeError
+
+    assert VendaDiariaProduto.objects.get().unidades == 1
+
+@pytest.mark.django_db
+def test_troca_de_data_move_as_vendas(loja, django_capture_on_commit_callbacks):
+    usuario, fornecedor, (produto, _) = loja
+    with django_capture_on_commit_callbacks(execute=True):
+        pedido = novo_pedido(usuario)
+        ItemPedido.objects.create(pedido=pedido, produto=produto, quantidade=2, preco_unitario=10)
+    with django_capture_on_commit_callbacks(execute=True):
+        pedido.data_pedido = SEGUINTE
+        pedido.save()
+
+    assert VendaDiariaProduto.objects.get(data=DIA).itens == 0
+    assert VendaDiariaFornecedor.objects.get(data=SEGUINTE, fornecedor=fornecedor).receita == Decimal("20.00")
+    incremental = todas()
+    reconstruir(DIA, SEGUINTE)
+    assert todas() == incremental
+
+@pytest.mark.django_db
+def test_importacao_em_lote_atualiza_consolidados(loja, django_capture_on_commit_callbacks):
+    usuario, _, (produto, _) = loja
+    linha = {
+        "usuario": usuario.id, "data_pedido": "2024-03-01", "valor_total": "20.00", "status": "Pendente",
+        "endereco_entrega": "Rua Teste, 123",
+        "itens": [{"produto": produto.id, "quantidade": 2, "preco_unitario": "10.00"}],
+        "pagamentos": [{"forma_pagamento": "Pix", "data_pagamento": "2024-03-02", "valor_pagamento": "20.00"}],
+    }
+    with django_capture_on_commit_callbacks(execute=True):
+        bulk_import_orders([linha] * 3, tamanho_lote=2)
+
+    assert VendaDiariaProduto.objects.get(data=DIA).unidades == 6
+    assert PagamentoDiario.objects.get(data=SEGUINTE).quantidade == 3
+    incremental = todas()
+    reconstruir(DIA, SEGUINTE)
+    assert todas() == incremental
+
+@pytest.mark.django_db
+def test_reconstruir_so_mexe_no_periodo(loja):
+    usuario, _, (produto, _) = loja
+    # Sem capturar o on_commit: os consolidados só existem depois da reconstrução.
+    for data in (DIA, SEGUINTE):
+        ItemPedido.objects.create(pedido=novo_pedido(usuario, data), produto=produto, quantidade=1, preco_unitario=10)
+    VendaDiariaProduto.objects.create(data=SEGUINTE, produto=produto, itens=9, unidades=9, receita=90)
+
+    assert reconstruir(DIA, DIA) == 2
+    assert VendaDiariaProduto.objects.get(data=DIA).itens == 1
+    assert VendaDiariaProduto.objects.get(data=SEGUINTE).itens == 9
+
+class Travas(list):
+    def __init__(self):
+        super().__init__()
+        self.esperas = []
+        # Nomes cujo GET_LOCK falha, como se outra conexão segurasse a trava.
+        self.recusadas = set()
+
+    def get_lock(self, nome, espera):
+        self.esperas.append(espera)
+        if nome in self.recusadas:
+            return 0
+        self.append(("GET", nome))
+        return 1
+
+@pytest.fixture
+def travas(monkeypatch):
+    # GET_LOCK e RELEASE_LOCK do MySQL, registradas no SQLite para anotar a ordem das chamadas.
+    chamadas = Travas()
+    connection.ensure_connection()
+    connection.connection.create_function("GET_LOCK", 2, chamadas.get_lock)
+    connection.connection.create_function("RELEASE_LOCK", 1, lambda nome: chamadas.append(("RELEASE", nome)) or 1)
+    monkeypatch.setattr(connection, "vendor", "mysql")
+    return chamadas
+
+@pytest.mark.django_db
+def test_reconstrucao_e_deltas_travam_os_dias(loja, travas, django_capture_on_commit_callbacks):
+    usuario, _, (produto, _) = loja
+    reconstruir(DIA, SEGUINTE)
+    assert travas == [
+        ("GET", "loja_consolidados_2024-03-01"), ("GET", "loja_consolidados_2024-03-02"),
+        ("RELEASE", "loja_consolidados_2024-03-02"), ("RELEASE", "loja_consolidados_2024-03-01"),
+    ]
+
+    travas.clear()
+    with django_capture_on_commit_callbacks(execute=True):
+        ItemPedido.objects.create(pedido=novo_pedido(usuario, SEGUINTE), produto=produto, quantidade=1, preco_unitario=10)
+        assert travas == []
+    assert travas == [("GET", "loja_consolidados_2024-03-02"), ("RELEASE", "loja_consolidados_2024-03-02")]
+    assert travas.esperas == [ESPERA_TRAVA, ESPERA_TRAVA, ESPERA_TRAVA_DELTA]
+
+@pytest.mark.django_db
+def test_delta_sem_trava_marca_o_dia(loja, travas, django_capture_on_commit_callbacks, caplog):
+    usuario, _, (produto, _) = loja
+    with django_capture_on_commit_callbacks(execute=True):
+        ItemPedido.objects.create(pedido=novo_pedido(usuario, DIA), produto=produto, quantidade=1, preco_unitario=10)
+    travas.recusadas = {"loja_consolidados_2024-03-02"}
+
+    with django_capture_on_commit_callbacks(execute=True):
+        ItemPedido.objects.create(pedido=novo_pedido(usuario, SEGUINTE), produto=produto, quantidade=2, preco_unitario=10)
+        ItemPedido.objects.create(pedido=novo_pedido(usuario, DIA), produto=produto, quantidade=3, preco_unitario=10)
+
+    # Nenhum delta da transação é aplicado, nem o do dia que estava livre.
+    assert travas == [
+        ("GET", "loja_consolidados_2024-03-01"), ("RELEASE", "loja_consolidados_2024-03-01"),
+        ("GET", "loja_consolidados_2024-03-01"), ("RELEASE", "loja_consolidados_2024-03-01"),
+    ]
+    assert list(VendaDiariaProduto.objects.values_list("data", "unidades")) == [(DIA, 1)]
+    assert sorted(DiaConsolidadoPendente.objects.values_list("data", flat=True)) == [DIA, SEGUINTE]
+    assert "2024-03-01, 2024-03-02" in caplog.text
+
+    travas.recusadas = set()
+    saida = io.StringIO()
+    call_command("loja_rollup", "--pendentes", stdout=saida)
+
+    assert "2 dias pendentes reconstruídos: 4 linhas." in saida.getvalue()
+    assert sorted(VendaDiariaProduto.objects.values_list("data", "unidades")) == [(DIA, 4), (SEGUINTE, 2)]
+    assert not DiaConsolidadoPendente.objects.exists()
+
+@pytest.mark.django_db
+def test_reconstrucao_mantem_marcas_posteriores(loja):
+    DiaConsolidadoPendente.objects.create(data=DIA)
+    reconstruir(DIA, SEGUINTE)
+    assert not DiaConsolidadoPendente.objects.exists()
+
+    DiaConsolidadoPendente.objects.create(data=SEGUINTE)
+    reconstruir(DIA, DIA)
+    assert list(DiaConsolidadoPendente.objects.values_list("data", flat=True)) == [SEGUINTE]
+
+@pytest.mark.django_db
+def test_consultar(loja):
+    usuario, _, (produto, outro) = loja
+    for data, item_produto in ((DIA, produto), (SEGUINTE, produto), (SEGUINTE, outro)):
+        ItemPedido.objects.create(pedido=novo_pedido(usuario, data), produto=item_produto, quantidade=2, preco_unitario=10)
+    reconstruir(DIA, SEGUINTE)
+
+    assert consultar("produto", DIA, SEGUINTE) == [
+        {"produto_id": produto.id, "itens": 2, "unidades": 4, "receita": Decimal("40.00")},
+        {"produto_id": outro.id, "itens": 1, "unidades": 2, "receita": Decimal("20.00")},
+    ]
+    por_dia = consultar("produto", DIA, SEGUINTE, chave=produto.id, por_dia=True)
+    assert [(linha["data"], linha["unidades"]) for linha in por_dia] == [(DIA, 2), (SEGUINTE, 2)]
+
+@pytest.mark.django_db
+def test_comando_loja_rollup(loja):
+    usuario, _, (produto, _) = loja
+    pedido = novo_pedido(usuario)
+    ItemPedido.objects.create(pedido=pedido, produto=produto, quantidade=1, preco_unitario=10)
+    Pagamento.objects.create(pedido=pedido, forma_pagamento="Pix", data_pagamento=SEGUINTE, valor_pagamento=10)
+    saida = io.StringIO()
+
+    call_command("loja_rollup", "--from", "2024-03-01", "--to", "2024-03-10", "--dias-por-tarefa", "3", stdout=saida)
+
+    assert "3 linhas em 4 tarefas" in saida.getvalue()
+    assert PagamentoDiario.objects.get().valor == Decimal("10.00")
+    with pytest.raises(CommandError):
+        call_command("loja_rollup", "--from", "2024-03-10", "--to", "2024-03-01")
+    with pytest.raises(CommandError):
+        call_command("loja_rollup", "--from", "2024-03-01", "--to", "2024-03-10", "--workers", "0")
+    with pytest.raises(CommandError):
+        call_command("loja_rollup", "--from", "2024-03-01")
+    with pytest.raises(CommandError):
+        call_command("loja_rollup", "--pendentes", "--from", "2024-03-01", "--to", "2024-03-10")
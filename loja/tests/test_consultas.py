@@ -0,0 +1,102 @@
+import pytest
+from loja.models import (
+    Avaliacao, EspecificacaoProduto, Fornecedor, HistoricoPedido, ItemPedido, Pagamento, Pedido, Produto,
+    ServicoFretagem, Usuario,
+)
+
+QUANTIDADE = 10
+
+@pytest.fixture
+def usuario():
+    return Usuario.objects.create(
+        nome="Test User",
+        email="testuser@example.com",
+        senha="password123"
+    )
+
+@pytest.fixture
+def produtos():
+    fornecedor = Fornecedor.objects.create(
+        nome="Test Supplier",
+        telefone="123456789",
+        email="fornecedor@example.com",
+        endereco="Rua Teste, 123",
+        cnpj="12345678901234"
+    )
+    return [
+        Produto.objects.create(
+            nome=f"Produto {i}", descricao="Test Description", preco=10.0, estoque=10, fornecedor=fornecedor
+        )
+        for i in range(QUANTIDADE)
+    ]
+
+@pytest.fixture
+def pedidos(usuario):
+    return [
+        Pedido.objects.create(
+            usuario=usuario, data_pedido="2024-12-18", valor_total=0, status="Pendente",
+            endereco_entrega="Rua Teste, 123"
+        )
+        for _ in range(QUANTIDADE)
+    ]
+
+def renderizar(queryset):
+    return [str(objeto) for objeto in queryset]
+
+@pytest.mark.django_db
+def test_especificacoes_em_uma_consulta(produtos, django_assert_num_queries):
+    for produto in produtos:
+        EspecificacaoProduto.objects.create(produto=produto, tamanho="M", cor="Azul")
+
+    with django_assert_num_queries(1):
+        linhas = renderizar(EspecificacaoProduto.objects.with_related())
+
+    assert "Produto 0 - M/Azul" in linhas
+
+@pytest.mark.django_db
+def test_itens_em_uma_consulta(pedidos, produtos, django_assert_num_queries):
+    for pedido, produto in zip(pedidos, produtos):
+        ItemPedido.objects.create(pedido=pedido, produto=produto, quantidade=1, preco_unitario=10.0)
+
+    with django_assert_num_queries(1):
+        renderizar(ItemPedido.objects.all())
+    with django_assert_num_queries(1):
+        renderizar(ItemPedido.objects.with_related())
+
+@pytest.mark.django_db
+def test_pagamentos_em_uma_consulta(pedidos, django_assert_num_queries):
+    for pedido in pedidos:
+        Pagamento.objects.create(
+            pedido=pedido, forma_pagamento="Pix", data_pagamento="2024-12-18", valor_pagamento=10.0
+        )
+
+    with django_assert_num_queries(1):
+        renderizar(Pagamento.objects.all())
+
+@pytest.mark.django_db
+def test_avaliacoes_em_uma_consulta(usuario, produtos, django_assert_num_queries):
+    for produto in produtos:
+        Avaliacao.objects.create(produto=produto, usuario=usuario, nota=5)
+
+    with django_assert_num_queries(1):
+        renderizar(Avaliacao.objects.with_related())
+
+@pytest.mark.django_db
+def test_historicos_em_uma_consulta(pedidos, django_assert_num_queries):
+    for pedido in pedidos:
+        HistoricoPedido.objects.create(
+            pedido=pedido, data_alteracao="2024-12-19", status_anterior="Pendente", status_atual="Enviado"
+        )
+
+    with django_assert_num_queries(1):
+        renderizar(HistoricoPedido.objects.all())
+
+@pytest.mark.django_db
+def test_fretes_em_uma_consulta(pedidos, django_assert_num_queries):
+    for pedido in pedidos:
+        ServicoFretagem.objects.create(
+            nome_transportadora="Correios", preco_fretagem=10.0, tipo_servico="PAC", pedido=pedido, prazo_entrega=5
+        )
+
+    with django_assert_num_queries(1):
+        [(frete.pedido.status, str(frete)) for frete in ServicoFretagem.objects.with_related()]
@@ -0,0 +1,85 @@
+import pytest
+from loja.estoque import (
+    EstoqueInsuficiente, criar_itens_com_reserva, liberar_estoque, remover_itens_com_liberacao, reservar_estoque,
+)
+from loja.models import Fornecedor, ItemPedido, Pedido, Produto, Usuario
+
+@pytest.fixture
+def fornecedor():
+    return Fornecedor.objects.create(
+        nome="Test Supplier",
+        telefone="123456789",
+        email="fornecedor@example.com",
+        endereco="Rua Teste, 123",
+        cnpj="12345678901234"
+    )
+
+@pytest.fixture
+def produtos(fornecedor):
+    return [
+        Produto.objects.create(
+            nome=f"Produto {i}", descricao="Test Description", preco=10.0, estoque=5, fornecedor=fornecedor
+        )
+        for i in range(2)
+    ]
+
+@pytest.fixture
+def pedido():
+    usuario = Usuario.objects.create(nome="Test User", email="testuser@example.com", senha="password123")
+    return Pedido.objects.create(
+        usuario=usuario, data_pedido="2024-12-18", valor_total=0, status="Pendente", endereco_entrega="Rua Teste, 123"
+    )
+
+def estoques(produtos):
+    return [Produto.objects.get(pk=produto.pk).estoque for produto in produtos]
+
+@pytest.mark.django_db
+def test_reservar_estoque_varios_produtos_em_uma_consulta(produtos, django_assert_num_queries):
+    # SAVEPOINT + um único UPDATE + RELEASE.
+    with django_assert_num_queries(3):
+        reservar_estoque({produtos[1].pk: 2, produtos[0].pk: 3})
+
+    assert estoques(produtos) == [2, 3]
+
+@pytest.mark.django_db
+def test_reservar_estoque_insuficiente_nao_baixa_nada(produtos):
+    with pytest.raises(EstoqueInsuficiente) as erro:
+        reservar_estoque({produtos[0].pk: 1, produtos[1].pk: 6})
+
+    assert erro.value.produto_ids == [produtos[1].pk]
+    assert estoques(produtos) == [5, 5]
+
+@pytest.mark.django_db
+def test_reservar_estoque_soma_quantidades_repetidas(produtos):
+    with pytest.raises(EstoqueInsuficiente):
+        reservar_estoque([(produtos[0].pk, 3), (produtos[0].pk, 3)])
+
+    reservar_estoque([(produtos[0].pk, 2), (produtos[0].pk, 3)])
+    assert estoques(produtos) == [0, 5]
+
+@pytest.mark.django_db
+def test_liberar_estoque(produtos):
+    reservar_estoque({produtos[0].pk: 4})
+    liberar_estoque({produtos[0].pk: 4})
+
+    assert estoques(produtos) == [5, 5]
+
+@pytest.mark.django_db
+def test_criar_e_remover_itens_com_reserva(pedido, produtos):
+    itens = criar_itens_com_reserva([
+        ItemPedido(pedido=pedido, produto=produtos[0], quantidade=2, preco_unitario=10.0),
+        ItemPedido(pedido=pedido, produto=produtos[1], quantidade=1, preco_unitario=10.0),
+    ])
+    assert estoques(produtos) == [3, 4]
+    assert ItemPedido.objects.filter(pedido=pedido).count() == 2
+
+    remover_itens_com_liberacao(itens)
+    assert estoques(produtos) == [5, 5]
+    assert not ItemPedido.objects.filter(pedido=pedido).exists()
+
+@pytest.mark.django_db
+def test_criar_itens_com_reserva_sem_estoque_nao_grava(pedido, produtos):
+    with pytest.raises(EstoqueInsuficiente):
+        criar_itens_com_reserva([ItemPedido(pedido=pedido, produto=produtos[0], quantidade=9, preco_unitario=10.0)])
+
+    assert not ItemPedido.objects.exists()
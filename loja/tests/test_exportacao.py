@@ -0,0 +1,144 @@
+import csv
+import datetime
+import gzip
+import io
+import json
+from decimal import Decimal
+import pytest
+from django.core.management import CommandError, call_command
+from loja.exportacao import ZERO, exportar, periodo_do_mes
+from loja.models import EspecificacaoProduto, Fornecedor, ItemPedido, Pagamento, Pedido, Produto, ServicoFretagem, Usuario
+
+@pytest.fixture
+def produto():
+    fornecedor = Fornecedor.objects.create(
+        nome="Test Supplier", telefone="123456789", email="fornecedor@example.com", endereco="Rua Teste, 123",
+        cnpj="12345678901234",
+    )
+    return Produto.objects.create(
+        nome="Test Product", descricao="Test Description", preco=10.0, estoque=100, fornecedor=fornecedor
+    )
+
+@pytest.fixture
+def pedidos(produto):
+    usuario = Usuario.objects.create(nome="Test User", email="testuser@example.com", senha="password123")
+    criados = []
+    for dia in (datetime.date(2024, 4, 30), datetime.date(2024, 5, 1), datetime.date(2024, 5, 15),
+                datetime.date(2024, 5, 31), datetime.date(2024, 6, 1)):
+        pedido = Pedido.objects.create(
+            usuario=usuario, data_pedido=dia, valor_total=25.0, status="Pago", endereco_entrega="Rua Teste, 123"
+        )
+        ItemPedido.objects.create(pedido=pedido, produto=produto, quantidade=2, preco_unitario=10.0)
+        Pagamento.objects.create(pedido=pedido, forma_pagamento="Pix", data_pagamento=dia, valor_pagamento=25.0)
+        ServicoFretagem.objects.create(
+            pedido=pedido, nome_transportadora="Correios", preco_fretagem=5.0, tipo_servico="PAC", prazo_entrega=7
+        )
+        criados.append(pedido)
+    return criados
+
+def ler(blocos):
+    return b"".join(blocos).decode()
+
+def test_periodo_do_mes():
+    assert periodo_do_mes("2024-12") == (datetime.date(2024, 12, 1), datetime.date(2025, 1, 1))
+    with pytest.raises(ValueError):
+        periodo_do_mes("2024-13")
+
+@pytest.mark.django_db
+def test_jsonl_traz_so_o_mes_com_filhos_aninhados(pedidos):
+    linhas = ler(exportar(*periodo_do_mes("2024-05"), formato="jsonl")).splitlines()
+    documentos = [json.loads(linha) for linha in linhas]
+
+    assert [documento["id"] for documento in documentos] == [pedido.pk for pedido in pedidos[1:4]]
+    assert documentos[0]["itens"][0]["quantidade"] == 2
+    assert documentos[0]["pagamentos"][0]["forma_pagamento"] == "Pix"
+    assert documentos[0]["fretes"][0]["nome_transportadora"] == "Correios"
+
+@pytest.mark.django_db
+def test_csv_resume_os_filhos_por_pedido(pedidos):
+    linhas = list(csv.DictReader(io.StringIO(ler(exportar(*periodo_do_mes("2024-05"), formato="csv")))))
+
+    assert [int(linha["id"]) for linha in linhas] == [pedido.pk for pedido in pedidos[1:4]]
+    assert linhas[0]["itens"] == "1"
+    assert linhas[0]["valor_itens"] == "20.00"
+    assert linhas[0]["valor_pago"] == "25.00"
+    assert linhas[0]["formas_pagamento"] == "Pix"
+    assert linhas[0]["valor_frete"] == "5.00"
+
+@pytest.mark.django_db
+def test_gzip_descomprime_para_o_mesmo_conteudo(pedidos):
+    periodo = periodo_do_mes("2024-05")
+    comprimido = b"".join(exportar(*periodo, formato="jsonl", comprimir=True))
+    assert gzip.decompress(comprimido).decode() == ler(exportar(*periodo, formato="jsonl"))
+
+@pytest.mark.django_db
+def test_filhos_sao_buscados_por_fatia(pedidos, django_assert_num_queries):
+    # Dois lotes de pedidos (2 + 1), cada um com um SELECT e o das três relações de filhos.
+    with django_assert_num_queries(2 * (1 + 3)):
+        ler(exportar(*periodo_do_mes("2024-05"), formato="jsonl", tamanho_lote=2))
+
+@pytest.mark.django_db
+def test_lotes_por_chave_nao_pulam_pedidos_do_mesmo_dia(pedidos):
+    mesmo_dia = [
+        Pedido.objects.create(
+            usuario=pedidos[0].usuario, data_pedido="2024-05-15", valor_total=0, status="Pago", endereco_entrega="-"
+        )
+        for _ in range(3)
+    ]
+    linhas = ler(exportar(*periodo_do_mes("2024-05"), formato="jsonl", tamanho_lote=1)).splitlines()
+
+    esperados = [pedidos[1].pk, pedidos[2].pk] + [pedido.pk for pedido in mesmo_dia] + [pedidos[3].pk]
+    assert [json.loads(linha)["id"] for linha in linhas] == esperados
+
+@pytest.mark.django_db
+def test_valor_itens_inclui_preco_adicional(produto):
+    usuario = Usuario.objects.create(nome="Test User", email="testuser@example.com", senha="password123")
+    especificacao = EspecificacaoProduto.objects.create(produto=produto, tamanho="G", cor="Azul", preco_adicional=1.5)
+    pedido = Pedido.objects.create(usuario=usuario, data_pedido="2024-05-02", valor_total=0, status="Pago", endereco_entrega="-")
+    ItemPedido.objects.create(pedido=pedido, produto=produto, especificacao=especificacao, quantidade=2, preco_unitario=10.0)
+    ItemPedido.objects.create(pedido=pedido, produto=produto, quantidade=1, preco_unitario=10.0)
+    ServicoFretagem.objects.create(
+        pedido=pedido, nome_transportadora="Correios", preco_fretagem=5.0, tipo_servico="PAC", prazo_entrega=7
+    )
+    periodo = periodo_do_mes("2024-05")
+
+    linha = next(csv.DictReader(io.StringIO(ler(exportar(*periodo, formato="csv")))))
+    assert linha["valor_itens"] == "33.00"
+    assert Decimal(linha["valor_itens"]) + Decimal(linha["valor_frete"]) == Decimal(linha["valor_total"])
+    documento = json.loads(ler(exportar(*periodo, formato="jsonl")))
+    assert [Decimal(item["preco_adicional"]) for item in documento["itens"]] == [Decimal("1.50"), ZERO]
+
+@pytest.mark.django_db
+def test_formato_desconhecido():
+    with pytest.raises(ValueError):
+        exportar(*periodo_do_mes("2024-05"), formato="xml")
+
+@pytest.mark.django_db
+def test_comando_grava_arquivo(pedidos, tmp_path):
+    destino = tmp_path / "pedidos.csv.gz"
+    call_command("loja_export_orders", mes="2024-05", gzip=True, saida=str(destino), stderr=io.StringIO())
+    linhas = gzip.decompress(destino.read_bytes()).decode().splitlines()
+    assert len(linhas) == 1 + 3
+
+@pytest.mark.django_db
+def test_comando_rejeita_mes_invalido():
+    with pytest.raises(CommandError):
+        call_command("loja_export_orders", mes="maio")
+
+@pytest.mark.django_db
+def test_endpoint_transmite_para_staff(admin_client, pedidos):
+    resposta = admin_client.get("/loja/exportacao/pedidos/", {"mes": "2024-05", "formato": "jsonl", "gzip": "1"})
+
+    assert resposta.streaming
+    assert resposta["Content-Disposition"] == 'attachment; filename="pedidos-2024-05.jsonl.gz"'
+    linhas = gzip.decompress(b"".join(resposta.streaming_content)).decode().splitlines()
+    assert len(linhas) == 3
+
+@pytest.mark.django_db
+def test_endpoint_valida_parametros(admin_client):
+    assert admin_client.get("/loja/exportacao/pedidos/", {"mes": "2024-5x"}).status_code == 400
+    assert admin_client.get("/loja/exportacao/pedidos/", {"mes": "2024-05", "formato": "xml"}).status_code == 400
+
+@pytest.mark.django_db
+def test_endpoint_exige_staff(client):
+    assert client.get("/loja/exportacao/pedidos/", {"mes": "2024-05"}).status_code == 302
@@ -0,0 +1,153 @@
+import threading
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from loja import facetas
+from loja.facetas import IndiceFacetas, faixa_preco
+from loja.models import EspecificacaoProduto, Fornecedor, Produto
+
+@pytest.fixture(autouse=True)
+def indice_limpo(monkeypatch):
+    cache.clear()
+    monkeypatch.setattr(facetas, "_indice", IndiceFacetas())
+    yield
+    cache.clear()
+
+@pytest.fixture
+def fornecedores():
+    return [
+        Fornecedor.objects.create(nome=f"Fornecedor {i}", telefone="1", email="f@example.com", endereco="-", cnpj=str(i) * 14)
+        for i in range(2)
+    ]
+
+def criar(fornecedor, preco, *variacoes):
+    produto = Produto.objects.create(nome="Produto", descricao="-", preco=preco, estoque=1, fornecedor=fornecedor)
+    for tamanho, cor in variacoes:
+        EspecificacaoProduto.objects.create(produto=produto, tamanho=tamanho, cor=cor)
+    return produto
+
+@pytest.fixture
+def catalogo(fornecedores):
+    um, dois = fornecedores
+    return [
+        criar(um, 30, ("M", "Azul"), ("G", "Azul")),
+        criar(um, 80, ("M", "Preto")),
+        criar(dois, 150, ("P", "Azul"), ("M", "Branco")),
+        criar(dois, 900),
+    ]
+
+def test_faixa_preco():
+    limites = (50, 100)
+    assert [faixa_preco(p, limites) for p in (0, 49, 50, 100, 1000)] == ["0-50", "0-50", "50-100", "100+", "100+"]
+
+@pytest.mark.django_db
+def test_contagens_sem_filtro(catalogo, fornecedores):
+    resultado = facetas.contagens()
+    assert resultado["total"] == 4
+    assert resultado["facetas"]["tamanho"] == {"M": 3, "G": 1, "P": 1}
+    assert resultado["facetas"]["cor"] == {"Azul": 2, "Preto": 1, "Branco": 1}
+    assert resultado["facetas"]["fornecedor"] == {fornecedores[0].pk: 2, fornecedores[1].pk: 2}
+    assert resultado["facetas"]["preco"] == {"0-50": 1, "50-100": 1, "100-200": 1, "500+": 1}
+
+@pytest.mark.django_db
+def test_contagens_disjuntivas(catalogo, fornecedores, django_assert_num_queries):
+    facetas.contagens()
+    with django_assert_num_queries(0):
+        resultado = facetas.contagens({"cor": ["Azul", "Preto"], "tamanho": ["M"]})
+    # Os filtros valem por produto: o terceiro tem uma variação M e outra Azul.
+    assert resultado["total"] == 3
+    # A faceta filtrada conta como se só as outras estivessem aplicadas.
+    assert resultado["facetas"]["cor"] == {"Azul": 2, "Preto": 1, "Branco": 1}
+    assert resultado["facetas"]["tamanho"] == {"M": 3, "G": 1, "P": 1}
+    assert resultado["facetas"]["fornecedor"] == {fornecedores[0].pk: 2, fornecedores[1].pk: 1}
+    assert facetas.indice().produtos({"cor": ["Azul"], "tamanho": ["M"]}) == [catalogo[0].pk, catalogo[2].pk]
+
+@pytest.mark.django_db
+def test_mudancas_aplicadas_no_commit(catalogo, django_capture_on_commit_callbacks):
+    facetas.contagens()
+    with django_capture_on_commit_callbacks(execute=True):
+        catalogo[3].preco = 40
+        catalogo[3].save()
+        EspecificacaoProduto.objects.filter(produto=catalogo[1]).update(cor="Verde")
+        EspecificacaoProduto.objects.create(produto=catalogo[1], tamanho="GG", cor="Verde")
+        catalogo[2].delete()
+
+    resultado = facetas.contagens()
+    assert resultado["total"] == 3
+    assert resultado["facetas"]["preco"] == {"0-50": 2, "50-100": 1}
+    assert resultado["facetas"]["cor"] == {"Azul": 1, "Verde": 1}
+    assert resultado["facetas"]["tamanho"] == {"M": 2, "G": 1, "GG": 1}
+
+@pytest.mark.django_db
+def test_outro_processo_aplica_mudancas_publicadas(catalogo, django_capture_on_commit_callbacks):
+    outro = IndiceFacetas()
+    outro.contagens()
+    with django_capture_on_commit_callbacks(execute=True):
+        criar(catalogo[0].fornecedor, 10, ("P", "Rosa"))
+    assert outro.contagens()["facetas"]["cor"]["Rosa"] == 1
+
+@pytest.mark.django_db
+def test_mudanca_expirada_refaz_indice(catalogo, django_capture_on_commit_callbacks):
+    facetas.contagens()
+    with django_capture_on_commit_callbacks(execute=True):
+        criar(catalogo[0].fornecedor, 10, ("P", "Rosa"))
+    cache.delete("loja:facetas:mudanca:1")
+    assert facetas.contagens()["total"] == 5
+
+@pytest.mark.django_db
+def test_api_facetas(client, catalogo):
+    resposta = client.get(reverse("loja:api_facetas_produtos"), {"cor": ["Azul", "Branco"], "preco": "100-200"})
+    assert resposta.json()["total"] == 1
+    assert client.get(reverse("loja:api_facetas_produtos"), {"fornecedor": "x"}).status_code == 400
+
+@pytest.mark.django_db
+def test_indice_velho_e_refeito(catalogo, monkeypatch):
+    agora = [100.0]
+    monkeypatch.setattr(facetas.time, "monotonic", lambda: agora[0])
+    indice = IndiceFacetas(max_idade=60)
+    indice.contagens()
+    # Mudança que não passou pelo diário (ex.: outro processo com LocMemCache).
+    Produto.objects.filter(pk=catalogo[3].pk).update(preco=40)
+
+    assert indice.contagens()["facetas"]["preco"]["500+"] == 1
+    agora[0] += 60
+    assert "500+" not in indice.contagens()["facetas"]["preco"]
+
+@pytest.mark.django_db
+def test_carga_completa_nao_trava_consultas(catalogo, fornecedores, monkeypatch):
+    indice = IndiceFacetas(max_idade=0)
+    indice.contagens()
+    criar(fornecedores[0], 40)
+    durante = []
+    carregar = facetas._Bitmaps.carregar
+
+    def carregar_e_consultar(dados, produtos, especificacoes):
+        carregar(dados, produtos, especificacoes)
+        # Outra thread consulta enquanto a carga ainda não trocou o índice: não espera
+        # nem começa outra carga, e responde com o índice anterior.
+        consulta = threading.Thread(target=lambda: durante.append(indice.contagens()["total"]))
+        consulta.start()
+        consulta.join(5)
+
+    monkeypatch.setattr(facetas._Bitmaps, "carregar", carregar_e_consultar)
+    assert indice.contagens()["total"] == 5
+    assert durante == [4]
+
+@pytest.mark.django_db
+def test_carga_em_lotes(catalogo, monkeypatch, django_assert_num_queries):
+    monkeypatch.setattr(facetas, "TAMANHO_LOTE", 2)
+    indice = IndiceFacetas()
+    # 4 produtos em lotes de 2 (o último vazio) e 5 variações: 3 consultas cada.
+    with django_assert_num_queries(6):
+        indice.carregar()
+    assert indice.contagens()["facetas"]["tamanho"] == {"M": 3, "G": 1, "P": 1}
+
+@pytest.mark.django_db
+def test_aquecer(catalogo, settings, django_assert_num_queries):
+    facetas.aquecer()
+    assert facetas.indice().versao is None
+
+    settings.LOJA_FACETAS = {"AQUECER": True}
+    facetas.aquecer()
+    with django_assert_num_queries(0):
+        assert facetas.contagens()["total"] == 4
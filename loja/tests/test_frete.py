@@ -0,0 +1,183 @@
+import json
+import threading
+from decimal import Decimal
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from loja import frete
+from loja.frete import Cotacao, Cotador, MemoTTL, TabelaFrete, carregar_tabelas
+from loja.models import Pedido, ServicoFretagem, Usuario
+
+def tabela(transportadora="Teste", servico="Normal", preco_base=10):
+    return TabelaFrete(transportadora, servico, [
+        ("01000000", "19999999", 1000, preco_base, 3),
+        ("01000000", "19999999", 5000, preco_base * 2, 4),
+        ("80000000", "99999999", 1000, preco_base * 3, 6),
+    ])
+
+class TabelaContada:
+    def __init__(self, tabela):
+        self.tabela = tabela
+        self.chamadas = 0
+
+    def cotar(self, cep, peso):
+        self.chamadas += 1
+        return self.tabela.cotar(cep, peso)
+
+def test_tabela_acha_faixa_de_cep_e_peso():
+    t = tabela()
+    assert t.cotar("01310100", 800) == Cotacao("Teste", "Normal", Decimal(10), 3)
+    assert t.cotar("01310100", 1000).preco == Decimal(10)
+    assert t.cotar("01310100", 1001).preco == Decimal(20)
+    assert t.cotar("90000000", 500).prazo == 6
+    assert t.cotar("01310100", 6000) is None
+    assert t.cotar("50000000", 500) is None
+    assert t.cotar("00500000", 500) is None
+
+def test_tabela_rejeita_faixas_sobrepostas():
+    with pytest.raises(ValueError):
+        TabelaFrete("X", "Y", [("01000000", "05999999", 1000, 10, 1), ("05000000", "09999999", 1000, 10, 1)])
+
+def test_carrega_csv_e_json(tmp_path):
+    csv_ = tmp_path / "tabela.csv"
+    csv_.write_text(
+        "transportadora,servico,cep_inicio,cep_fim,peso_ate,preco,prazo\n"
+        "A,PAC,01000000,01999999,1000,12.50,5\n"
+        "A,SEDEX,01000000,01999999,1000,20.00,1\n"
+    )
+    json_ = tmp_path / "tabela.json"
+    json_.write_text(json.dumps([{"transportadora": "B", "servico": "X", "faixas": [
+        {"cep_inicio": "01000000", "cep_fim": "01999999", "peso_ate": 1000, "preco": "9.99", "prazo": 7},
+    ]}]))
+    tabelas = carregar_tabelas(csv_) + carregar_tabelas(json_)
+    assert [str(t) for t in tabelas] == ["A PAC", "A SEDEX", "B X"]
+    with pytest.raises(ValueError):
+        carregar_tabelas(tmp_path / "tabela.xml")
+
+def test_tabelas_de_exemplo_cotam_todo_o_pais():
+    with Cotador() as cotador:
+        cotacoes = cotador.cotar("01310-100", 1200)
+        assert [c.preco for c in cotacoes] == sorted(c.preco for c in cotacoes)
+        assert {c.transportadora for c in cotacoes} == {"Correios", "Jadlog"}
+        assert cotador.cotar("69000-000", 1200)
+
+def test_cotacao_memorizada_por_prefixo_e_faixa_de_peso():
+    contada = TabelaContada(tabela())
+    with Cotador([contada], FAIXA_PESO=500) as cotador:
+        primeira = cotador.cotar("01310100", 600)
+        # Mesmo prefixo de CEP e mesma faixa de peso (501-1000 g).
+        assert cotador.cotar("01310-999", 1000) == primeira
+        assert contada.chamadas == 1
+        # A faixa é cotada pelo limite superior, então nunca sai mais barata que o peso real.
+        assert primeira[0].preco == Decimal(10)
+        cotador.cotar("01310100", 1001)
+        assert contada.chamadas == 2
+
+def test_memo_expira_e_respeita_o_maximo():
+    agora = [0.0]
+    memo = MemoTTL(ttl=10, maximo=2, relogio=lambda: agora[0])
+    memo.guardar("a", 1)
+    memo.guardar("b", 2)
+    memo.obter("a")
+    memo.guardar("c", 3)
+    assert memo.obter("b") is None
+    assert memo.obter("a") == 1
+    agora[0] = 11
+    assert memo.obter("a") is None
+    assert len(memo) == 1
+
+def test_tabelas_avaliadas_em_paralelo():
+    barreira = threading.Barrier(3, timeout=2)
+
+    class Sincronizada:
+        def __init__(self, preco):
+            self.tabela = tabela(servico=str(preco), preco_base=preco)
+
+        def cotar(self, cep, peso):
+            # Só passa se as três tabelas estiverem sendo cotadas ao mesmo tempo.
+            barreira.wait()
+            return self.tabela.cotar(cep, peso)
+
+    with Cotador([Sincronizada(30), Sincronizada(10), Sincronizada(20)], WORKERS=1) as cotador:
+        assert [c.servico for c in cotador.cotar("01310100", 500)] == ["10", "20", "30"]
+
+def test_tabela_travada_nao_prende_as_outras():
+    liberar = threading.Event()
+    chamadas = []
+
+    class Travada:
+        def cotar(self, cep, peso):
+            chamadas.append(cep)
+            liberar.wait(5)
+            return None
+
+    with Cotador([tabela(), Travada(), TabelaContada(tabela("Outra"))], WORKERS=1, ESPERA=0.05) as cotador:
+        try:
+            assert [c.transportadora for c in cotador.cotar("01310100", 500)] == ["Outra", "Teste"]
+            # A única thread da travada ainda está presa: ela é pulada, sem esperar ESPERA.
+            assert len(cotador.cotar("80000000", 500)) == 2
+            assert chamadas == ["01310100"]
+            # Cotações incompletas não são memorizadas.
+            assert not len(cotador.memo)
+        finally:
+            liberar.set()
+
+def test_tabela_com_erro_fica_de_fora_e_nao_e_memorizada():
+    class Quebrada:
+        def cotar(self, cep, peso):
+            raise ConnectionError("fora do ar")
+
+    contada = TabelaContada(tabela())
+    with Cotador([contada, Quebrada()]) as cotador:
+        assert len(cotador.cotar("01310100", 500)) == 1
+        cotador.cotar("01310100", 500)
+        assert contada.chamadas == 2
+
+def test_tabela_desalinhada_com_o_prefixo():
+    desalinhada = TabelaFrete("X", "Y", [("01000000", "01000499", 1000, 10, 1)])
+    with pytest.raises(ImproperlyConfigured):
+        Cotador([desalinhada])
+    with Cotador([desalinhada], DIGITOS_CEP=8) as cotador:
+        assert cotador.cotar("01000100", 100)
+
+def test_cep_e_peso_invalidos():
+    with Cotador([tabela()]) as cotador:
+        with pytest.raises(ValueError):
+            cotador.cotar("0131", 500)
+        with pytest.raises(ValueError):
+            cotador.cotar("01310100", 0)
+
+@pytest.fixture
+def pedido():
+    usuario = Usuario.objects.create(nome="Test User", email="testuser@example.com", senha="password123")
+    return Pedido.objects.create(
+        usuario=usuario, data_pedido="2024-01-01", valor_total=0, status="Pendente", endereco_entrega="Rua Teste, 123"
+    )
+
+@pytest.fixture
+def cotador_teste(monkeypatch):
+    with Cotador([tabela("Barata", "Normal", 10), tabela("Cara", "Expressa", 30)]) as cotador:
+        monkeypatch.setattr(frete, "_cotador", cotador)
+        yield cotador
+
+@pytest.mark.django_db
+def test_escolher_frete_grava_e_substitui(pedido, cotador_teste):
+    frete.escolher_frete(pedido, "01310100", 800, "Cara", "Expressa")
+    escolhido = frete.escolher_frete(pedido, "01310100", 800, "Barata", "Normal")
+
+    assert list(ServicoFretagem.objects.filter(pedido=pedido)) == [escolhido]
+    assert (escolhido.preco_fretagem, escolhido.prazo_entrega) == (Decimal(10), 3)
+    pedido.refresh_from_db()
+    assert pedido.valor_total == Decimal("10.00")
+
+@pytest.mark.django_db
+def test_escolher_frete_que_nao_atende(pedido, cotador_teste):
+    with pytest.raises(ValueError):
+        frete.escolher_frete(pedido, "50000000", 800, "Barata", "Normal")
+    assert not ServicoFretagem.objects.exists()
+
+def test_endpoint_de_cotacoes(client, cotador_teste):
+    resposta = client.get("/loja/api/frete/cotacoes/", {"cep": "01310-100", "peso": 800})
+    assert resposta.status_code == 200
+    assert [c["transportadora"] for c in resposta.json()["cotacoes"]] == ["Barata", "Cara"]
+    assert client.get("/loja/api/frete/cotacoes/", {"cep": "123", "peso": 800}).status_code == 400
+    assert client.get("/loja/api/frete/cotacoes/", {"cep": "01310100"}).status_code == 400
@@ -0,0 +1,31 @@
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from loja.management.commands.loja_index_audit import (
+    classificar_plano, SEEK, VARREDURA, VARREDURA_INDICE,
+)
+from loja.models import Pedido
+
+def test_classificar_plano_sqlite():
+    assert classificar_plano('sqlite', "SEARCH loja_pedido USING INDEX pedido_usuario_data_idx (usuario_id=?)") == SEEK
+    assert classificar_plano('sqlite', "SCAN loja_pedido USING INDEX pedido_data_id_idx") == VARREDURA_INDICE
+    assert classificar_plano('sqlite', "SCAN loja_pedido") == VARREDURA
+
+def test_classificar_plano_mysql():
+    assert classificar_plano('mysql', '{"table": {"access_type": "ref"}}') == SEEK
+    assert classificar_plano('mysql', '{"table": {"access_type": "index"}}') == VARREDURA_INDICE
+    assert classificar_plano('mysql', '{"table": {"access_type": "ALL"}}') == VARREDURA
+
+def test_classificar_plano_postgresql():
+    assert classificar_plano('postgresql', "Index Scan using pedido_status_data_idx on loja_pedido") == SEEK
+    assert classificar_plano('postgresql', "Seq Scan on loja_pedido") == VARREDURA
+
+def test_indices_compostos_declarados():
+    nomes = {indice.name for indice in Pedido._meta.indexes}
+    assert {'pedido_usuario_data_idx', 'pedido_status_data_idx'} <= nomes
+
+@pytest.mark.django_db
+def test_loja_index_audit_executa():
+    saida = StringIO()
+    call_command('loja_index_audit', stdout=saida)
+    assert "pedidos do usuário por data" in saida.getvalue()
@@ -0,0 +1,136 @@
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.contrib.auth.models import AnonymousUser, User
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory
+from loja import instrumentacao
+from loja.middleware import InstrumentacaoConsultasMiddleware
+from loja.models import Fornecedor, Produto
+
+MEDIR_TUDO = {"AMOSTRAGEM": 1.0, "REPETICOES": 3, "LENTAS": 2, "SERVER_TIMING": True}
+
+@pytest.fixture(autouse=True)
+def registros_vazios():
+    instrumentacao.registros().limpar()
+    yield
+    instrumentacao.registros().limpar()
+
+@pytest.fixture
+def produtos():
+    fornecedor = Fornecedor.objects.create(
+        nome="Test Supplier", telefone="123456789", email="fornecedor@example.com", endereco="Rua Teste, 123",
+        cnpj="12345678901234",
+    )
+    return [
+        Produto.objects.create(nome=f"Produto {i}", descricao="-", preco=10.0, estoque=1, fornecedor=fornecedor)
+        for i in range(4)
+    ]
+
+def view_n_mais_1(produtos):
+    def view(request):
+        for produto in Produto.objects.filter(pk__in=[p.pk for p in produtos]):
+            produto.fornecedor.nome
+        return HttpResponse("ok")
+    return view
+
+def test_assinatura_ignora_valores():
+    assert instrumentacao.assinatura("SELECT * FROM t WHERE id = 12 AND nome = 'a''b'") == (
+        "SELECT * FROM t WHERE id = ? AND nome = ?"
+    )
+    assert instrumentacao.assinatura("SELECT * FROM t WHERE id IN (%s, %s, %s)") == instrumentacao.assinatura(
+        "SELECT * FROM t WHERE id IN (%s)"
+    )
+
+@pytest.mark.django_db
+def test_mede_consultas_e_detecta_repetidas(settings, produtos):
+    settings.LOJA_INSTRUMENTACAO = MEDIR_TUDO
+    middleware = InstrumentacaoConsultasMiddleware(view_n_mais_1(produtos))
+    request = RequestFactory().get("/loja/qualquer/")
+    request.user = User(username="staff", is_staff=True)
+    response = middleware(request)
+
+    registro, = instrumentacao.registros().recentes()
+    assert registro["consultas"] == 1 + 4
+    assert registro["caminho"] == "/loja/qualquer/"
+    repetida, = registro["repetidas"]
+    assert repetida["vezes"] == 4
+    assert "loja_fornecedor" in repetida["sql"]
+    assert len(registro["lentas"]) == 2
+    assert response["Server-Timing"].startswith('db;dur=')
+    assert 'desc="5 consultas"' in response["Server-Timing"]
+
+@pytest.mark.django_db
+def test_sem_amostragem_nao_mede(settings, produtos, monkeypatch):
+    settings.LOJA_INSTRUMENTACAO = {"AMOSTRAGEM": 0}
+    monkeypatch.setattr(instrumentacao, "MedicaoConsultas", None)
+    response = InstrumentacaoConsultasMiddleware(view_n_mais_1(produtos))(RequestFactory().get("/"))
+    assert "Server-Timing" not in response
+    assert instrumentacao.registros().recentes() == []
+
+@pytest.mark.django_db
+def test_server_timing_so_para_staff(settings, produtos):
+    settings.LOJA_INSTRUMENTACAO = MEDIR_TUDO
+    middleware = InstrumentacaoConsultasMiddleware(view_n_mais_1(produtos))
+    for usuario in (None, AnonymousUser(), User(username="cliente")):
+        request = RequestFactory().get("/")
+        if usuario is not None:
+            request.user = usuario
+        assert "Server-Timing" not in middleware(request)
+
+    settings.LOJA_INSTRUMENTACAO = {**MEDIR_TUDO, "SERVER_TIMING": False}
+    request = RequestFactory().get("/")
+    request.user = User(username="staff", is_staff=True)
+    assert "Server-Timing" not in middleware(request)
+    assert len(instrumentacao.registros().recentes()) == 4
+
+@pytest.mark.django_db
+def test_middleware_assincrono_mede_sem_adaptar(settings, produtos):
+    settings.LOJA_INSTRUMENTACAO = MEDIR_TUDO
+
+    class Staff:
+        is_active = is_staff = True
+
+    async def view(request):
+        return HttpResponse(str([produto async for produto in Produto.objects.values_list("pk", flat=True)]))
+
+    async def auser():
+        return Staff()
+
+    middleware = InstrumentacaoConsultasMiddleware(view)
+    assert iscoroutinefunction(middleware)
+    request = RequestFactory().get("/loja/async/")
+    request.auser = auser
+    response = async_to_sync(middleware)(request)
+
+    registro, = instrumentacao.registros().recentes()
+    assert registro["consultas"] == 1
+    assert response["Server-Timing"].startswith("db;dur=")
+    assert not iscoroutinefunction(InstrumentacaoConsultasMiddleware(view_n_mais_1(produtos)))
+
+    instrumentacao.registros().limpar()
+    resposta = async_to_sync(AsyncClient().get)(f"/loja/api/async/produtos/{produtos[0].pk}/")
+    assert resposta.status_code == 200
+    assert instrumentacao.registros().recentes()[0]["consultas"] >= 1
+
+def test_buffer_circular_guarda_os_mais_recentes():
+    registros = instrumentacao.Registros(3)
+    for numero in range(5):
+        registros.adicionar({"numero": numero})
+    assert [registro["numero"] for registro in registros.recentes()] == [4, 3, 2]
+    assert [registro["numero"] for registro in registros.recentes(1)] == [4]
+
+@pytest.mark.django_db
+def test_endpoint_lista_requisicoes_medidas(settings, admin_client, produtos):
+    settings.LOJA_INSTRUMENTACAO = MEDIR_TUDO
+    admin_client.get(f"/loja/api/produtos/{produtos[0].pk}/")
+    resposta = admin_client.get("/loja/monitoramento/consultas/", {"limite": 1})
+
+    assert resposta.status_code == 200
+    assert resposta.has_header("Server-Timing")
+    registro, = resposta.json()["requisicoes"]
+    assert registro["caminho"] == f"/loja/api/produtos/{produtos[0].pk}/"
+    assert registro["consultas"] >= 1
+
+@pytest.mark.django_db
+def test_endpoint_exige_staff(client):
+    assert client.get("/loja/monitoramento/consultas/").status_code == 302
@@ -0,0 +1,109 @@
+import threading
+import pytest
+from django.db import connections, transaction
+from loja.backends.pool import PoolConexoes, PoolEsgotado, estatisticas, fechar_pools
+
+class ConexaoFalsa:
+    def __init__(self):
+        self.fechada = False
+
+    def close(self):
+        self.fechada = True
+
+@pytest.fixture
+def pool():
+    return PoolConexoes(ConexaoFalsa, tamanho=2, espera=0.05, validar=lambda c: not c.fechada, validar_apos=0)
+
+def test_pool_reutiliza_conexao_devolvida(pool):
+    conexao = pool.obter()
+    pool.devolver(conexao)
+    assert pool.obter() is conexao
+    assert pool.estatisticas()["criadas"] == 1
+    assert pool.estatisticas()["reutilizadas"] == 1
+
+def test_pool_limita_conexoes_abertas(pool):
+    pool.obter(), pool.obter()
+    with pytest.raises(PoolEsgotado):
+        pool.obter()
+    assert pool.estatisticas()["esperas"] == 1
+
+def test_pool_entrega_conexao_devolvida_a_quem_espera(pool):
+    primeira, _ = pool.obter(), pool.obter()
+    pool.espera = 5
+    obtidas = []
+    espera = threading.Thread(target=lambda: obtidas.append(pool.obter()))
+    espera.start()
+    pool.devolver(primeira)
+    espera.join()
+    assert obtidas == [primeira]
+
+def test_pool_substitui_conexao_que_falha_na_validacao(pool):
+    conexao = pool.obter()
+    pool.devolver(conexao)
+    conexao.fechada = True
+    nova = pool.obter()
+    assert nova is not conexao
+    assert pool.estatisticas()["descartadas"] == 1
+    assert pool.estatisticas()["abertas"] == 1
+
+def test_pool_nao_valida_conexao_ociosa_ha_pouco_tempo(pool):
+    pool.validar_apos = 60
+    conexao = pool.obter()
+    pool.devolver(conexao)
+    conexao.fechada = True
+    assert pool.obter() is conexao
+
+def test_pool_libera_vaga_quando_criacao_falha():
+    def criar():
+        raise OSError("recusada")
+    pool = PoolConexoes(criar, tamanho=1, espera=0.05)
+    for _ in range(2):
+        with pytest.raises(OSError):
+            pool.obter()
+    assert pool.estatisticas()["abertas"] == 0
+
+def test_pool_fechar_fecha_conexoes_livres(pool):
+    conexao = pool.obter()
+    pool.devolver(conexao)
+    pool.fechar()
+    assert conexao.fechada
+    assert pool.estatisticas()["livres"] == 0
+
+@pytest.fixture
+def alias_com_pool(tmp_path, django_db_blocker):
+    # Banco próprio em arquivo, fora do banco de teste: o pool não se aplica a SQLite em memória.
+    alias = "teste_pool"
+    connections.settings[alias] = {
+        **connections["default"].settings_dict,
+        "ENGINE": "loja.backends.sqlite_pool",
+        "NAME": str(tmp_path / "pool.sqlite3"),
+        "CONN_MAX_AGE": 0,
+        "POOL": {"TAMANHO": 2},
+    }
+    with django_db_blocker.unblock():
+        yield alias
+        connections[alias].close()
+    del connections[alias]
+    del connections.settings[alias]
+    fechar_pools(alias)
+
+def test_backend_com_pool_reaproveita_conexao_fechada(alias_com_pool):
+    conexao = connections[alias_com_pool]
+    with conexao.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    bruta = conexao.connection
+    conexao.close()
+    with conexao.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    assert conexao.connection is bruta
+    assert estatisticas(alias_com_pool)[0]["reutilizadas"] == 1
+
+def test_backend_com_pool_descarta_conexao_fechada_em_transacao(alias_com_pool):
+    conexao = connections[alias_com_pool]
+    with transaction.atomic(using=alias_com_pool):
+        bruta = conexao.connection
+        conexao.close()
+    with conexao.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    assert conexao.connection is not bruta
+    assert estatisticas(alias_com_pool)[0]["descartadas"] == 1
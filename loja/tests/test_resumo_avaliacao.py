@@ -0,0 +1,82 @@
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from loja.models import Avaliacao, Fornecedor, Produto, ResumoAvaliacaoProduto, Usuario
+
+@pytest.fixture
+def usuario():
+    return Usuario.objects.create(
+        nome="Test User",
+        email="testuser@example.com",
+        senha="password123"
+    )
+
+@pytest.fixture
+def fornecedor():
+    return Fornecedor.objects.create(
+        nome="Test Fornecedor",
+        telefone="123456789",
+        email="fornecedor@example.com",
+        endereco="123 Test St",
+        cnpj="12345678000100"
+    )
+
+@pytest.fixture
+def produto(fornecedor):
+    return Produto.objects.create(
+        nome="Test Product",
+        descricao="Test Description",
+        preco=10.0,
+        estoque=10,
+        fornecedor=fornecedor
+    )
+
+def resumo(produto):
+    return ResumoAvaliacaoProduto.objects.get(produto=produto)
+
+@pytest.mark.django_db
+def test_resumo_atualizado_na_criacao(usuario, produto):
+    Avaliacao.objects.create(usuario=usuario, produto=produto, nota=5)
+    Avaliacao.objects.create(usuario=usuario, produto=produto, nota=3)
+
+    assert resumo(produto).total == 2
+    assert resumo(produto).soma == 8
+    assert resumo(produto).media == 4
+    assert resumo(produto).histograma == [0, 0, 0, 1, 0, 1]
+
+@pytest.mark.django_db
+def test_resumo_atualizado_na_edicao_e_exclusao(usuario, produto, fornecedor):
+    avaliacao = Avaliacao.objects.create(usuario=usuario, produto=produto, nota=5)
+
+    avaliacao = Avaliacao.objects.get(pk=avaliacao.pk)
+    avaliacao.nota = 1
+    avaliacao.save()
+    assert resumo(produto).histograma == [0, 1, 0, 0, 0, 0]
+
+    outro = Produto.objects.create(nome="Outro", descricao="Outro", preco=1, estoque=1, fornecedor=fornecedor)
+    avaliacao.produto = outro
+    avaliacao.save()
+    assert resumo(produto).total == 0
+    assert resumo(outro).histograma == [0, 1, 0, 0, 0, 0]
+
+    avaliacao.delete()
+    assert resumo(outro).total == 0
+    assert resumo(outro).soma == 0
+    assert resumo(outro).media is None
+
+@pytest.mark.django_db
+def test_loja_rebuild_ratings(usuario, produto, fornecedor):
+    outro = Produto.objects.create(nome="Outro", descricao="Outro", preco=1, estoque=1, fornecedor=fornecedor)
+    for nota in (0, 2, 2, 5):
+        Avaliacao.objects.create(usuario=usuario, produto=produto, nota=nota)
+    Avaliacao.objects.create(usuario=usuario, produto=outro, nota=4)
+    ResumoAvaliacaoProduto.objects.update(total=0, soma=0, nota_2=0)
+
+    saida = StringIO()
+    call_command("loja_rebuild_ratings", tamanho_lote=1, stdout=saida)
+
+    assert "2 resumos" in saida.getvalue()
+    assert resumo(produto).total == 4
+    assert resumo(produto).soma == 9
+    assert resumo(produto).histograma == [1, 0, 2, 0, 0, 1]
+    assert resumo(outro).histograma == [0, 0, 0, 0, 1, 0]
@@ -0,0 +1,149 @@
+import shutil
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.core.management import call_command
+from django.db import connections, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+from loja import routers
+from loja.middleware import COOKIE_PRIMARIO, FixarPrimarioMiddleware
+from loja.models import Pedido, Produto, Usuario
+
+PRIMARIO, REPLICA = "primario_teste", "replica_teste"
+
+def registrar(alias, caminho):
+    connections.settings[alias] = {
+        **connections["default"].settings_dict,
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": str(caminho),
+        "TEST": {},
+    }
+
+def remover(alias):
+    connections[alias].close()
+    del connections[alias]
+    del connections.settings[alias]
+
+@pytest.fixture(scope="module")
+def banco_migrado(tmp_path_factory, django_db_blocker):
+    caminho = tmp_path_factory.mktemp("routers") / "molde.sqlite3"
+    registrar("molde_teste", caminho)
+    try:
+        with django_db_blocker.unblock():
+            call_command("migrate", database="molde_teste", verbosity=0)
+    finally:
+        remover("molde_teste")
+    return caminho
+
+@pytest.fixture
+def bancos(banco_migrado, tmp_path, settings, django_db_blocker):
+    """Dois SQLite no papel de primário e réplica; a réplica é uma cópia que não recebe as escritas."""
+    for alias in (PRIMARIO, REPLICA):
+        shutil.copy(banco_migrado, tmp_path / f"{alias}.sqlite3")
+        registrar(alias, tmp_path / f"{alias}.sqlite3")
+    settings.LOJA_REPLICA = {"PRIMARIO": PRIMARIO, "ALIAS": REPLICA}
+    with django_db_blocker.unblock(), routers.escopo_requisicao():
+        yield
+    for alias in (PRIMARIO, REPLICA):
+        remover(alias)
+
+def criar_pedido(using=None):
+    usuario = Usuario.objects.db_manager(using).create(
+        nome="Test User", email="testuser@example.com", senha="password123"
+    )
+    return Pedido.objects.db_manager(using).create(
+        usuario=usuario, data_pedido="2024-12-18", valor_total=0, status="Pendente", endereco_entrega="Rua Teste, 123"
+    )
+
+def test_leituras_ficam_no_primario_fora_de_usar_replica(bancos):
+    pedido = criar_pedido(using=PRIMARIO)
+    assert not routers.escreveu()
+    assert router.db_for_read(Pedido) == PRIMARIO
+    assert Pedido.objects.filter(pk=pedido.pk).exists()
+    with routers.usar_replica():
+        assert router.db_for_read(Produto) == REPLICA
+        assert not Pedido.objects.filter(pk=pedido.pk).exists()
+    assert router.db_for_read(Produto) == PRIMARIO
+    assert routers.banco_de_leitura(Pedido) == REPLICA
+
+def test_modelos_configurados_vao_para_replica(bancos, settings):
+    settings.LOJA_REPLICA = {**settings.LOJA_REPLICA, "MODELOS": ["loja.pedido"]}
+    pedido = criar_pedido(using=PRIMARIO)
+    assert router.db_for_read(Pedido) == REPLICA
+    assert not Pedido.objects.filter(pk=pedido.pk).exists()
+    assert router.db_for_read(Produto) == PRIMARIO
+
+def test_escrita_fixa_leituras_no_primario(bancos):
+    pedido = criar_pedido()
+    assert pedido._state.db == PRIMARIO
+    assert routers.escreveu()
+    with routers.usar_replica():
+        assert Pedido.objects.filter(pk=pedido.pk).exists()
+
+    with routers.escopo_requisicao(), routers.usar_replica():
+        assert not Pedido.objects.filter(pk=pedido.pk).exists()
+    assert routers.escreveu()
+
+def test_transacao_aberta_le_do_primario(bancos):
+    pedido = criar_pedido(using=PRIMARIO)
+    with transaction.atomic(using=PRIMARIO), routers.usar_replica():
+        assert Pedido.objects.filter(pk=pedido.pk).exists()
+
+def test_relacao_entre_primario_e_replica_permitida(bancos):
+    pedido = criar_pedido(using=PRIMARIO)
+    usuario = Usuario.objects.using(REPLICA).create(nome="Outro", email="outro@example.com", senha="password123")
+    pedido.usuario = usuario
+    assert pedido.usuario_id == usuario.pk
+
+def test_replica_nao_recebe_migracoes(bancos):
+    assert router.allow_migrate(REPLICA, "loja") is False
+    assert router.allow_migrate(PRIMARIO, "loja") is True
+
+def test_sem_replica_configurada_nao_roteia(settings):
+    settings.LOJA_REPLICA = {"ALIAS": "inexistente"}
+    with routers.escopo_requisicao():
+        assert router.db_for_read(Pedido) == "default"
+        assert router.db_for_write(Pedido) == "default"
+        assert not routers.escreveu()
+
+def test_middleware_fixa_requisicoes_seguintes_de_quem_escreveu(bancos):
+    lidos = []
+
+    def view(request):
+        if request.method == "POST":
+            criar_pedido()
+        lidos.append(routers.banco_de_leitura(Pedido))
+        return HttpResponse()
+
+    middleware = FixarPrimarioMiddleware(view)
+    fabrica = RequestFactory()
+
+    resposta = middleware(fabrica.get("/"))
+    assert COOKIE_PRIMARIO not in resposta.cookies
+    resposta = middleware(fabrica.post("/"))
+    assert resposta.cookies[COOKIE_PRIMARIO]["max-age"] == 5
+
+    seguinte = fabrica.get("/")
+    seguinte.COOKIES[COOKIE_PRIMARIO] = "1"
+    middleware(seguinte)
+    assert lidos == [REPLICA, PRIMARIO, PRIMARIO]
+    assert not routers.escreveu()
+
+def test_middleware_assincrono(bancos):
+    lidos = []
+
+    async def view(request):
+        if request.method == "POST":
+            await sync_to_async(criar_pedido)()
+        lidos.append(await sync_to_async(routers.banco_de_leitura)(Pedido))
+        return HttpResponse()
+
+    middleware = FixarPrimarioMiddleware(view)
+    assert iscoroutinefunction(middleware)
+    fabrica = RequestFactory()
+
+    assert COOKIE_PRIMARIO not in async_to_sync(middleware)(fabrica.get("/")).cookies
+    resposta = async_to_sync(middleware)(fabrica.post("/"))
+    assert resposta.cookies[COOKIE_PRIMARIO]["max-age"] == 5
+    assert lidos == [REPLICA, PRIMARIO]
+    assert not routers.escreveu()
@@ -0,0 +1,125 @@
+import json
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.urls import reverse
+from loja import senhas
+from loja.models import Usuario
+from loja.views import SESSAO_USUARIO
+
+@pytest.fixture
+def usuario():
+    return Usuario.objects.create(nome="Test User", email="testuser@example.com", senha="password123")
+
+def entrar(client, **dados):
+    return client.post(reverse("loja:api_async_login"), json.dumps(dados), content_type="application/json")
+
+@pytest.mark.django_db
+def test_save_grava_hash_com_o_custo_configurado(usuario):
+    assert usuario.senha.startswith("pbkdf2_sha256$1000$")
+    assert not usuario.senha_em_texto
+    assert Usuario.objects.get().senha == usuario.senha
+    assert usuario.verificar_senha("password123")
+    assert not usuario.verificar_senha("password124")
+
+@pytest.mark.django_db
+def test_save_nao_refaz_hash_existente(usuario):
+    anterior = usuario.senha
+    usuario.nome = "Outro Nome"
+    usuario.save()
+    assert Usuario.objects.get().senha == anterior
+
+@pytest.mark.django_db
+def test_save_nao_adivinha_pelo_formato():
+    # Uma senha em texto com cara de hash ainda é texto: só o senha_em_texto decide.
+    usuario = Usuario.objects.create(nome="Test User", email="testuser@example.com", senha="pbkdf2_sha256$1$x$y")
+    assert usuario.senha != "pbkdf2_sha256$1$x$y"
+    assert usuario.verificar_senha("pbkdf2_sha256$1$x$y")
+
+    pronto = make_password("password123")
+    importado = Usuario.objects.create(nome="Outro", email="outro@example.com", senha=pronto, senha_em_texto=False)
+    assert Usuario.objects.get(pk=importado.pk).senha == pronto
+
+def test_clean_confere_tamanho_so_da_senha_em_texto():
+    usuario = Usuario(nome="Test User", email="testuser@example.com", senha=make_password("curta"), senha_em_texto=False)
+    usuario.full_clean(validate_unique=False)
+
+    usuario.definir_senha("curta")
+    with pytest.raises(ValidationError):
+        usuario.full_clean(validate_unique=False)
+
+@pytest.mark.django_db
+def test_autenticar(usuario, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        assert senhas.autenticar("TestUser@example.com ", "password123") == usuario
+    assert senhas.autenticar("testuser@example.com", "errada123") is None
+    assert senhas.autenticar("ninguem@example.com", "password123") is None
+
+@pytest.mark.django_db
+def test_login_refaz_hash_com_custo_novo(usuario, settings, django_assert_num_queries):
+    settings.LOJA_SENHAS = {"ITERACOES": 1500}
+
+    # A senha errada não troca o hash.
+    assert senhas.autenticar(usuario.email, "errada123") is None
+    assert Usuario.objects.get().senha == usuario.senha
+    with django_assert_num_queries(2):
+        senhas.autenticar(usuario.email, "password123")
+    assert Usuario.objects.get().senha.startswith("pbkdf2_sha256$1500$")
+
+@pytest.mark.django_db
+def test_login_migra_algoritmo_antigo(usuario):
+    legado = make_password("password123", hasher="pbkdf2_sha1")
+    Usuario.objects.filter(pk=usuario.pk).update(senha=legado)
+
+    assert senhas.autenticar(usuario.email, "password123") == usuario
+    assert Usuario.objects.get().senha.startswith("pbkdf2_sha256$1000$")
+
+@pytest.mark.django_db
+def test_login_troca_senha_legada_em_texto(usuario):
+    Usuario.objects.filter(pk=usuario.pk).update(senha="password123", senha_em_texto=True)
+
+    assert senhas.autenticar(usuario.email, "errada123") is None
+    assert Usuario.objects.get().senha == "password123"
+    assert senhas.autenticar(usuario.email, "password123") == usuario
+    gravado = Usuario.objects.get()
+    assert gravado.senha.startswith("pbkdf2_sha256$1000$") and not gravado.senha_em_texto
+
+@pytest.mark.django_db
+def test_loja_hash_passwords(usuario, capsys):
+    Usuario.objects.filter(pk=usuario.pk).update(senha="password123", senha_em_texto=True)
+    outro = Usuario.objects.create(nome="Outro", email="outro@example.com", senha="outrasenha")
+    Usuario.objects.filter(pk=outro.pk).update(senha="outrasenha", senha_em_texto=True)
+    Usuario.objects.create(nome="Já com hash", email="hash@example.com", senha="terceira123")
+
+    call_command("loja_hash_passwords", "--tamanho-lote", "1")
+
+    assert "2 senhas em texto trocadas pelo hash." in capsys.readouterr().out
+    assert not Usuario.objects.filter(senha_em_texto=True).exists()
+    assert senhas.autenticar(usuario.email, "password123") == usuario
+    assert senhas.autenticar(outro.email, "outrasenha") == outro
+
+@pytest.mark.django_db
+def test_aautenticar(usuario, settings):
+    settings.LOJA_SENHAS = {"ITERACOES": 1500}
+
+    assert async_to_sync(senhas.aautenticar)(usuario.email, "password123") == usuario
+    assert async_to_sync(senhas.aautenticar)(usuario.email, "errada123") is None
+    assert Usuario.objects.get().senha.startswith("pbkdf2_sha256$1500$")
+
+@pytest.mark.django_db
+def test_login_async(client, usuario):
+    resposta = entrar(client, email="testuser@example.com", senha="password123")
+
+    assert resposta.status_code == 200
+    assert resposta.json() == {"id": usuario.pk, "nome": "Test User", "email": "testuser@example.com"}
+    assert client.session[SESSAO_USUARIO] == usuario.pk
+
+@pytest.mark.django_db
+def test_login_async_recusa(client, usuario):
+    assert entrar(client, email="testuser@example.com", senha="errada123").status_code == 401
+    assert SESSAO_USUARIO not in client.session
+    assert entrar(client, email="testuser@example.com").status_code == 400
+    assert client.post(reverse("loja:api_async_login"), "x", content_type="application/json").status_code == 400
+    assert client.get(reverse("loja:api_async_login")).status_code == 405
@@ -0,0 +1,230 @@
+import csv
+import io
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from loja import consolidados
+from loja.models import Fornecedor, ItemPedido, Pagamento, Pedido, Produto, Usuario, EspecificacaoProduto
+from loja.services import bulk_import_orders, bulk_import_users
+
+@pytest.fixture
+def usuario():
+    return Usuario.objects.create(
+        nome="Test User",
+        email="testuser@example.com",
+        senha="password123"
+    )
+
+@pytest.fixture
+def produto():
+    fornecedor = Fornecedor.objects.create(
+        nome="Test Supplier",
+        telefone="123456789",
+        email="fornecedor@example.com",
+        endereco="Rua Teste, 123",
+        cnpj="12345678901234"
+    )
+    return Produto.objects.create(
+        nome="Test Product",
+        descricao="Test Description",
+        preco=10.0,
+        estoque=10,
+        fornecedor=fornecedor
+    )
+
+def linha_pedido(usuario_id, produto_id, **extra):
+    linha = {
+        "usuario": usuario_id,
+        "data_pedido": "2024-12-18",
+        "valor_total": "20.00",
+        "status": "Pendente",
+        "endereco_entrega": "Rua Teste, 123",
+        "itens": [{"produto": produto_id, "quantidade": 2, "preco_unitario": "10.00"}],
+        "pagamentos": [{"forma_pagamento": "Pix", "data_pagamento": "2024-12-18", "valor_pagamento": "20.00"}],
+    }
+    linha.update(extra)
+    return linha
+
+@pytest.mark.django_db
+def test_bulk_import_orders_cria_pedidos_itens_e_pagamentos(usuario, produto):
+    linhas = [linha_pedido(usuario.id, produto.id) for _ in range(5)]
+
+    resultado = bulk_import_orders(linhas, tamanho_lote=2)
+
+    assert resultado.criados == 5
+    assert resultado.erros == []
+    assert Pedido.objects.count() == 5
+    assert ItemPedido.objects.count() == 5
+    assert Pagamento.objects.count() == 5
+
+@pytest.mark.django_db
+def test_bulk_import_orders_reporta_erros_por_linha(usuario, produto):
+    outro_produto = Produto.objects.create(
+        nome="Outro", descricao="Outro", preco=5.0, estoque=1, fornecedor=produto.fornecedor
+    )
+    especificacao = EspecificacaoProduto.objects.create(produto=outro_produto, tamanho="M", cor="Azul")
+    linhas = [
+        linha_pedido(usuario.id, produto.id),
+        linha_pedido(usuario.id, produto.id, valor_total="-1.00"),
+        linha_pedido(999999, produto.id),
+        linha_pedido(usuario.id, 999999),
+        linha_pedido(usuario.id, produto.id, itens=[
+            {"produto": produto.id, "especificacao": especificacao.id, "quantidade": 1, "preco_unitario": "10.00"}
+        ]),
+        linha_pedido(usuario.id, produto.id),
+    ]
+
+    resultado = bulk_import_orders(linhas)
+
+    assert resultado.criados == 2
+    assert [indice for indice, _ in resultado.erros] == [1, 2, 3, 4]
+    assert Pedido.objects.count() == 2
+
+@pytest.mark.django_db
+def test_bulk_import_orders_recusa_linha_que_nao_e_objeto(usuario, produto):
+    linhas = [
+        linha_pedido(usuario.id, produto.id),
+        ["não", "é", "um", "objeto"],
+        linha_pedido(usuario.id, produto.id, itens=["x"]),
+        linha_pedido(usuario.id, produto.id, pagamentos={"forma_pagamento": "Pix"}),
+        linha_pedido(usuario.id, produto.id),
+    ]
+
+    resultado = bulk_import_orders(linhas)
+
+    assert resultado.criados == 2
+    assert resultado.erros == [
+        (1, ["A linha deve ser um objeto, não list."]),
+        (2, ["O campo itens deve ser uma lista de objetos."]),
+        (3, ["O campo pagamentos deve ser uma lista de objetos."]),
+    ]
+
+@pytest.mark.django_db
+def test_bulk_import_orders_erro_do_banco_fica_na_linha(usuario, produto, monkeypatch):
+    vendas_importadas = consolidados.vendas_importadas
+
+    def recusar(pedidos, itens, pagamentos, using=None):
+        if any(pedido.endereco_entrega == "Recusado" for pedido in pedidos):
+            raise DatabaseError("recusado pelo banco")
+        vendas_importadas(pedidos, itens, pagamentos, using=using)
+
+    monkeypatch.setattr(consolidados, "vendas_importadas", recusar)
+    linhas = [linha_pedido(usuario.id, produto.id) for _ in range(4)]
+    linhas[2]["endereco_entrega"] = "Recusado"
+
+    resultado = bulk_import_orders(linhas)
+
+    assert resultado.criados == 3
+    assert resultado.erros == [(2, ["recusado pelo banco"])]
+    assert Pedido.objects.count() == 3
+    assert ItemPedido.objects.count() == 3
+    assert Pagamento.objects.count() == 3
+
+@pytest.mark.django_db
+def test_bulk_import_orders_consultas_por_lote(usuario, produto, django_assert_max_num_queries):
+    linhas = [linha_pedido(usuario.id, produto.id) for _ in range(50)]
+
+    # 3 consultas de FKs + inserts em lote, independente do número de linhas. Sem retorno
+    # de PKs no bulk_create (MySQL) os pedidos são inseridos um a um.
+    limite = 10 if connection.features.can_return_rows_from_bulk_insert else 10 + len(linhas)
+    with django_assert_max_num_queries(limite):
+        bulk_import_orders(linhas)
+
+def linha_usuario(i, **extra):
+    return {"nome": f"Cliente {i}", "email": f"cliente{i}@example.com", "senha": f"senha-{i:04d}", **extra}
+
+@pytest.mark.django_db
+def test_bulk_import_users_grava_hash_e_normaliza_email():
+    resultado = bulk_import_users([linha_usuario(1, email="  Cliente1@Example.COM ")])
+
+    assert (resultado.criados, resultado.erros) == (1, [])
+    usuario = Usuario.objects.get()
+    assert usuario.email == "cliente1@example.com"
+    assert usuario.senha.startswith("pbkdf2_sha256$")
+    assert usuario.verificar_senha("senha-0001")
+
+@pytest.mark.django_db
+def test_bulk_import_users_recusa_linhas_invalidas(usuario):
+    rejeitadas = []
+    linhas = [
+        linha_usuario(0),
+        linha_usuario(1, email="CLIENTE0@example.com"),
+        linha_usuario(2, email="testuser@example.com"),
+        linha_usuario(3, senha="curta"),
+        linha_usuario(4, email="sem-arroba"),
+        linha_usuario(5, nome=""),
+        linha_usuario(6),
+    ]
+
+    resultado = bulk_import_users(
+        linhas, tamanho_lote=3, ao_rejeitar=lambda indice, linha, mensagens: rejeitadas.append(indice),
+    )
+
+    assert resultado.criados == 2
+    assert [indice for indice, _ in resultado.erros] == [1, 2, 3, 4, 5]
+    assert sorted(rejeitadas) == [1, 2, 3, 4, 5]
+    assert "repetido na linha 0" in resultado.erros[0][1][0]
+    assert Usuario.objects.count() == 3
+
+@pytest.mark.django_db
+def test_bulk_import_users_uma_consulta_por_lote(django_assert_num_queries):
+    linhas = [linha_usuario(i) for i in range(10)]
+
+    # Por lote: o IN dos emails e o INSERT num savepoint.
+    with django_assert_num_queries(2 * (1 + 3)):
+        resultado = bulk_import_users(linhas, tamanho_lote=5)
+    assert resultado.criados == 10
+
+@pytest.mark.django_db
+def test_bulk_import_users_recusa_email_gravado_durante_a_importacao():
+    inseriu = []
+
+    def concorrente(execute, sql, params, many, context):
+        resultado = execute(sql, params, many, context)
+        # Outra transação grava o email logo depois da consulta dos existentes.
+        if sql.startswith('SELECT "loja_usuario"."email"') and not inseriu:
+            inseriu.append(True)
+            Usuario.objects.create(nome="Outro", email="cliente1@example.com", senha="password123")
+        return resultado
+
+    rejeitadas = []
+    with connection.execute_wrapper(concorrente):
+        resultado = bulk_import_users(
+            [linha_usuario(i) for i in range(3)],
+            ao_rejeitar=lambda indice, linha, mensagens: rejeitadas.append(indice),
+        )
+
+    assert resultado.criados == 2
+    assert [indice for indice, _ in resultado.erros] == rejeitadas == [1]
+    assert "cliente1@example.com" in resultado.erros[0][1][0]
+    assert Usuario.objects.get(email="cliente1@example.com").nome == "Outro"
+    assert Usuario.objects.count() == 3
+
+@pytest.mark.django_db
+def test_bulk_import_users_com_processos():
+    resultado = bulk_import_users([linha_usuario(i) for i in range(6)], tamanho_lote=4, workers=2)
+
+    assert resultado.criados == 6
+    assert all(usuario.verificar_senha(f"senha-{i:04d}") for i, usuario in enumerate(Usuario.objects.order_by("pk")))
+
+@pytest.mark.django_db
+def test_comando_loja_import_users(tmp_path):
+    arquivo = tmp_path / "usuarios.csv"
+    with arquivo.open("w", encoding="utf-8", newline="") as destino:
+        escritor = csv.DictWriter(destino, fieldnames=["nome", "email", "senha"])
+        escritor.writeheader()
+        escritor.writerows([linha_usuario(1), linha_usuario(2, senha="curta"), linha_usuario(3)])
+    saida = io.StringIO()
+
+    call_command("loja_import_users", str(arquivo), "--workers", "1", stdout=saida)
+
+    assert "2 usuários importados, 1 recusados" in saida.getvalue()
+    with open(f"{arquivo}.rejeitados.csv", encoding="utf-8", newline="") as relatorio:
+        rejeitados = list(csv.DictReader(relatorio))
+    assert [(linha["linha"], linha["email"]) for linha in rejeitados] == [("3", "cliente2@example.com")]
+    assert "senha" not in rejeitados[0]
+
+    incompleto = tmp_path / "incompleto.csv"
+    incompleto.write_text("nome,email\nFulano,fulano@example.com\n", encoding="utf-8")
+    with pytest.raises(CommandError):
+        call_command("loja_import_users", str(incompleto), "--workers", "1")
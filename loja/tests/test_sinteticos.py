@@ -0,0 +1,92 @@
+import io
+import pytest
+from django.core.management import CommandError, call_command
+from loja.models import (
+    Avaliacao, EspecificacaoProduto, Fornecedor, HistoricoPedido, ItemPedido, Pagamento, Pedido, Produto,
+    ResumoAvaliacaoProduto, ServicoFretagem, TermoBusca, Usuario,
+)
+from loja.sinteticos import Escala, popular
+from loja.totais import recalcular_totais
+
+ESCALA = dict(pedidos=60, usuarios=10, produtos=8, fornecedores=2, avaliacoes=20)
+
+def conteudo():
+    return (
+        list(Pedido.objects.order_by("pk").values_list("usuario_id", "data_pedido", "status", "valor_total")),
+        list(ItemPedido.objects.order_by("pk").values_list("produto_id", "especificacao_id", "quantidade")),
+        list(Avaliacao.objects.order_by("pk").values_list("produto_id", "nota")),
+    )
+
+@pytest.mark.django_db
+def test_popular_gera_todos_os_modelos():
+    criados = popular(Escala(**ESCALA), tamanho_lote=25)
+
+    assert criados["Pedido"] == Pedido.objects.count() == 60
+    assert criados["Usuario"] == Usuario.objects.count() == 10
+    assert Fornecedor.objects.count() == 2
+    assert Produto.objects.count() == 8
+    assert EspecificacaoProduto.objects.count() == 8 * 3
+    assert Avaliacao.objects.count() == 20
+    assert ServicoFretagem.objects.count() == 60
+    assert ItemPedido.objects.count() == criados["ItemPedido"] >= 60
+    assert Pagamento.objects.count() == criados["Pagamento"] > 0
+    assert HistoricoPedido.objects.count() == criados["HistoricoPedido"] > 0
+    assert ResumoAvaliacaoProduto.objects.exists()
+    assert TermoBusca.objects.exists()
+
+@pytest.mark.django_db
+def test_totais_dos_pedidos_batem_com_os_itens():
+    popular(Escala(**ESCALA), derivados=False)
+    assert recalcular_totais(list(Pedido.objects.values_list("pk", flat=True)), aplicar=False) == 0
+
+@pytest.mark.django_db
+def test_historico_termina_no_status_do_pedido():
+    popular(Escala(**ESCALA), derivados=False)
+    ultimo = {}
+    for pedido_id, status in HistoricoPedido.objects.order_by("data_alteracao", "pk").values_list("pedido_id", "status_atual"):
+        ultimo[pedido_id] = status
+    for pedido_id, status in Pedido.objects.values_list("pk", "status"):
+        assert ultimo.get(pedido_id, "Pendente") == status
+
+@pytest.mark.django_db
+def test_mesma_semente_gera_os_mesmos_dados():
+    popular(Escala(**ESCALA), semente=7, derivados=False)
+    primeira = conteudo()
+    for modelo in (HistoricoPedido, Pagamento, ServicoFretagem, ItemPedido, Pedido, Avaliacao):
+        modelo.objects.all().delete()
+    EspecificacaoProduto.objects.all().delete()
+    Produto.objects.all().delete()
+    Usuario.objects.all().delete()
+    Fornecedor.objects.all().delete()
+
+    popular(Escala(**ESCALA), semente=7, derivados=False)
+    segunda = conteudo()
+    assert [linha[2:] for linha in segunda[0]] == [linha[2:] for linha in primeira[0]]
+    assert [linha[2] for linha in segunda[1]] == [linha[2] for linha in primeira[1]]
+    assert [linha[1] for linha in segunda[2]] == [linha[1] for linha in primeira[2]]
+
+@pytest.mark.django_db
+def test_popular_acrescenta_sem_colidir_ids():
+    popular(Escala(**ESCALA), derivados=False)
+    popular(Escala(**ESCALA), derivados=False)
+    assert Pedido.objects.count() == 120
+    assert Usuario.objects.values("email").distinct().count() == 20
+
+@pytest.mark.django_db
+def test_insercoes_em_lote(django_assert_max_num_queries):
+    # Lotes de 25: 3 lotes de pedidos x 5 modelos, mais usuários, produtos, avaliações,
+    # os SELECTs de maior id e os SAVEPOINTs.
+    with django_assert_max_num_queries(60):
+        popular(Escala(**ESCALA), derivados=False, tamanho_lote=25)
+
+@pytest.mark.django_db
+def test_comando_loja_seed():
+    saida = io.StringIO()
+    call_command("loja_seed", pedidos=40, produtos=5, sem_derivados=True, stdout=saida)
+    assert Pedido.objects.count() == 40
+    assert "Pedido: 40" in saida.getvalue()
+
+@pytest.mark.django_db
+def test_comando_loja_seed_rejeita_escala_invalida():
+    with pytest.raises(CommandError):
+        call_command("loja_seed", pedidos=10, usuarios=0)
@@ -0,0 +1,121 @@
+import datetime
+import pytest
+from django.db import connection, transaction
+from loja.models import HistoricoPedido, Pedido, Usuario
+
+@pytest.fixture
+def usuario():
+    return Usuario.objects.create(nome="Test User", email="testuser@example.com", senha="password123")
+
+@pytest.fixture
+def pedido(usuario):
+    return Pedido.objects.create(
+        usuario=usuario, data_pedido="2024-12-18", valor_total=0, status="Pendente", endereco_entrega="Rua Teste, 123"
+    )
+
+def transicoes(pedido=None):
+    historico = HistoricoPedido.objects.order_by("id")
+    if pedido is not None:
+        historico = historico.filter(pedido=pedido)
+    return list(historico.values_list("pedido_id", "status_anterior", "status_atual"))
+
+@pytest.mark.django_db
+def test_alterar_status_registra_historico_sem_select(pedido, django_assert_num_queries, django_capture_on_commit_callbacks):
+    pedido = Pedido.objects.get(pk=pedido.pk)
+    with django_capture_on_commit_callbacks(execute=True):
+        # UPDATE do pedido; o INSERT do histórico fica para o commit.
+        with django_assert_num_queries(1):
+            pedido.alterar_status("Pago")
+    assert transicoes() == [(pedido.pk, "Pendente", "Pago")]
+    assert HistoricoPedido.objects.get().data_alteracao is not None
+
+@pytest.mark.django_db
+def test_save_comum_tambem_registra_transicao(pedido, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        pedido.status = "Enviado"
+        pedido.save()
+        pedido.endereco_entrega = "Outra rua"
+        pedido.save()
+    assert transicoes() == [(pedido.pk, "Pendente", "Enviado")]
+
+@pytest.mark.django_db
+def test_transicoes_da_transacao_gravadas_num_unico_insert(usuario, django_capture_on_commit_callbacks, django_assert_num_queries):
+    pedidos = [
+        Pedido.objects.create(usuario=usuario, data_pedido="2024-12-18", valor_total=0, status="Pendente", endereco_entrega="-")
+        for _ in range(3)
+    ]
+    with django_capture_on_commit_callbacks() as callbacks:
+        with transaction.atomic():
+            for pedido in pedidos:
+                pedido.alterar_status("Pago")
+                pedido.alterar_status("Enviado")
+    assert len(callbacks) == 1
+    assert transicoes() == []
+    with django_assert_num_queries(1):
+        callbacks[0]()
+    assert len(transicoes()) == 6
+    assert transicoes(pedidos[0]) == [(pedidos[0].pk, "Pendente", "Pago"), (pedidos[0].pk, "Pago", "Enviado")]
+
+@pytest.mark.django_db
+def test_savepoint_desfeito_descarta_transicoes(pedido, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        with transaction.atomic():
+            pedido.alterar_status("Pago")
+            try:
+                with transaction.atomic():
+                    pedido.alterar_status("Cancelado")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+    assert transicoes() == [(pedido.pk, "Pendente", "Pago")]
+
+@pytest.mark.django_db
+def test_alterar_status_em_massa(usuario, django_assert_num_queries):
+    for status in ["Pendente", "Pendente", "Pago", "Enviado"]:
+        Pedido.objects.create(usuario=usuario, data_pedido="2024-12-18", valor_total=0, status=status, endereco_entrega="-")
+    data = datetime.date(2024, 12, 20)
+
+    # SAVEPOINT, SELECT ... FOR UPDATE, UPDATE, INSERT e RELEASE.
+    with django_assert_num_queries(5):
+        alterados = Pedido.objects.filter(status__in=["Pendente", "Pago", "Enviado"]).alterar_status("Enviado", data=data)
+
+    assert alterados == 3
+    assert set(Pedido.objects.values_list("status", flat=True)) == {"Enviado"}
+    assert sorted(s for _, s, _ in transicoes()) == ["Pago", "Pendente", "Pendente"]
+    assert set(HistoricoPedido.objects.values_list("data_alteracao", "status_atual")) == {(data, "Enviado")}
+    assert Pedido.objects.all().alterar_status("Enviado") == 0
+
+@pytest.mark.django_db
+def test_alterar_status_em_massa_atualiza_so_as_linhas_travadas(usuario):
+    travado = Pedido.objects.create(usuario=usuario, data_pedido="2024-12-18", valor_total=0, status="Pendente", endereco_entrega="-")
+    novo = []
+
+    def criar_antes_do_update(execute, sql, params, many, context):
+        # Um pedido que passa a casar com o filtro entre o SELECT ... FOR UPDATE e o UPDATE.
+        if sql.startswith("UPDATE") and not novo:
+            novo.append(Pedido.objects.create(
+                usuario=usuario, data_pedido="2024-12-18", valor_total=0, status="Pendente", endereco_entrega="-"
+            ))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(criar_antes_do_update):
+        assert Pedido.objects.filter(status="Pendente").alterar_status("Pago") == 1
+
+    assert Pedido.objects.get(pk=travado.pk).status == "Pago"
+    assert Pedido.objects.get(pk=novo[0].pk).status == "Pendente"
+    assert transicoes() == [(travado.pk, "Pendente", "Pago")]
+
+@pytest.mark.django_db(transaction=True)
+def test_transacao_desfeita_nao_passa_transicoes_para_a_seguinte(usuario):
+    pedidos = [
+        Pedido.objects.create(usuario=usuario, data_pedido="2024-12-18", valor_total=0, status="Pendente", endereco_entrega="-")
+        for _ in range(2)
+    ]
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            pedidos[0].alterar_status("Pago")
+            raise RuntimeError
+    with transaction.atomic():
+        pedidos[1].alterar_status("Pago")
+
+    assert transicoes() == [(pedidos[1].pk, "Pendente", "Pago")]
@@ -0,0 +1,129 @@
+import pytest
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from loja.models import EspecificacaoProduto, Fornecedor, ItemPedido, Pedido, Produto, ServicoFretagem, Usuario
+
+@pytest.fixture
+def produto():
+    fornecedor = Fornecedor.objects.create(
+        nome="Test Supplier",
+        telefone="123456789",
+        email="fornecedor@example.com",
+        endereco="Rua Teste, 123",
+        cnpj="12345678901234"
+    )
+    return Produto.objects.create(
+        nome="Test Product",
+        descricao="Test Description",
+        preco=10.0,
+        estoque=10,
+        fornecedor=fornecedor
+    )
+
+@pytest.fixture
+def pedido():
+    usuario = Usuario.objects.create(
+        nome="Test User",
+        email="testuser@example.com",
+        senha="password123"
+    )
+    return Pedido.objects.create(
+        usuario=usuario,
+        data_pedido="2024-12-18",
+        valor_total=0,
+        status="Pendente",
+        endereco_entrega="Rua Teste, 123"
+    )
+
+def totais(pedido):
+    pedido.refresh_from_db()
+    return pedido.valor_total, pedido.quantidade_itens
+
+@pytest.mark.django_db
+def test_item_pedido_atualiza_totais(pedido, produto):
+    item = ItemPedido.objects.create(pedido=pedido, produto=produto, quantidade=2, preco_unitario=10.0)
+    assert totais(pedido) == (Decimal("20.00"), 2)
+
+    item.quantidade = 3
+    item.save()
+    assert totais(pedido) == (Decimal("30.00"), 3)
+
+    item = ItemPedido.objects.get(pk=item.pk)
+    item.preco_unitario = Decimal("5.00")
+    item.save()
+    assert totais(pedido) == (Decimal("15.00"), 3)
+
+    item.delete()
+    assert totais(pedido) == (Decimal("0.00"), 0)
+
+@pytest.mark.django_db
+def test_item_pedido_troca_de_pedido(pedido, produto):
+    outro = Pedido.objects.create(
+        usuario=pedido.usuario, data_pedido="2024-12-18", valor_total=0,
+        status="Pendente", endereco_entrega="Rua Teste, 123"
+    )
+    item = ItemPedido.objects.create(pedido=pedido, produto=produto, quantidade=2, preco_unitario=10.0)
+
+    item.pedido = outro
+    item.save()
+
+    assert totais(pedido) == (Decimal("0.00"), 0)
+    assert totais(outro) == (Decimal("20.00"), 2)
+
+@pytest.mark.django_db
+def test_preco_adicional_da_especificacao(pedido, produto):
+    especificacao = EspecificacaoProduto.objects.create(produto=produto, tamanho="M", cor="Azul", preco_adicional=1)
+    ItemPedido.objects.create(
+        pedido=pedido, produto=produto, especificacao=especificacao, quantidade=2, preco_unitario=10.0
+    )
+    assert totais(pedido) == (Decimal("22.00"), 2)
+
+    especificacao.preco_adicional = Decimal("3.00")
+    especificacao.save()
+    assert totais(pedido) == (Decimal("26.00"), 2)
+
+@pytest.mark.django_db
+def test_frete_atualiza_total(pedido):
+    frete = ServicoFretagem.objects.create(
+        nome_transportadora="Correios", preco_fretagem=15.0, tipo_servico="PAC", pedido=pedido, prazo_entrega=5
+    )
+    assert totais(pedido) == (Decimal("15.00"), 0)
+
+    frete.preco_fretagem = Decimal("20.00")
+    frete.save()
+    assert totais(pedido) == (Decimal("20.00"), 0)
+
+    frete.delete()
+    assert totais(pedido) == (Decimal("0.00"), 0)
+
+@pytest.mark.django_db
+def test_loja_recompute_totals_corrige_divergencias(pedido, produto):
+    ItemPedido.objects.create(pedido=pedido, produto=produto, quantidade=2, preco_unitario=10.0)
+    Pedido.objects.filter(pk=pedido.pk).update(valor_total=999, quantidade_itens=0)
+
+    saida = StringIO()
+    call_command("loja_recompute_totals", workers=1, stdout=saida)
+
+    assert "1 pedidos divergentes corrigidos" in saida.getvalue()
+    assert totais(pedido) == (Decimal("20.00"), 2)
+
+@pytest.mark.django_db
+def test_loja_recompute_totals_percorre_todos_os_lotes(pedido, produto):
+    outros = [
+        Pedido.objects.create(
+            usuario=pedido.usuario, data_pedido="2024-12-18", valor_total=0, status="Pendente", endereco_entrega="-"
+        )
+        for _ in range(4)
+    ]
+    for alvo in [pedido, *outros]:
+        ItemPedido.objects.create(pedido=alvo, produto=produto, quantidade=1, preco_unitario=10.0)
+    Pedido.objects.update(valor_total=0)
+
+    saida = StringIO()
+    call_command("loja_recompute_totals", workers=1, tamanho_lote=2, stdout=saida)
+
+    assert "5 pedidos divergentes corrigidos" in saida.getvalue()
+    assert set(Pedido.objects.values_list("valor_total", flat=True)) == {Decimal("10.00")}
+    call_command("loja_recompute_totals", workers=1, tamanho_lote=2, simular=True, stdout=saida)
+    assert "0 pedidos divergentes encontrados" in saida.getvalue()
@@ -0,0 +1,187 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+  DecimalField, ExpressionWrapper, F, IntegerField, OuterRef, Subquery, Sum, Value,
+)
+from django.db.models.functions import Coalesce
+
+from loja.models import EspecificacaoProduto, ItemPedido, Pedido, ServicoFretagem
+
+CENTAVO = Decimal('0.01')
+ZERO = Decimal('0.00')
+VALOR = DecimalField(max_digits=12, decimal_places=2)
+
+
+def _decimal(modelo, campo, valor):
+  return modelo._meta.get_field(campo).to_python(valor) or ZERO
+
+
+def aplicar_delta(pedido_id, valor=ZERO, quantidade=0, using=None):
+  """Soma os deltas ao Pedido com um único UPDATE atômico, sem ler a linha antes."""
+  if not valor and not quantidade:
+    return
+  Pedido.objects.using(using).filter(pk=pedido_id).update(
+    valor_total=F('valor_total') + valor,
+    quantidade_itens=F('quantidade_itens') + quantidade,
+  )
+
+
+def _precos_adicionais(item, especificacao_ids, using):
+  especificacao_ids = {pk for pk in especificacao_ids if pk is not None}
+  precos = {}
+  if ItemPedido.especificacao.is_cached(item) and item.especificacao is not None:
+    precos[item.especificacao.pk] = item.especificacao.preco_adicional
+  faltantes = especificacao_ids - precos.keys()
+  if faltantes:
+    precos.update(
+      EspecificacaoProduto.objects.using(using)
+      .filter(pk__in=faltantes)
+      .values_list('pk', 'preco_adicional')
+    )
+  return precos
+
+
+def _contribuicao(valores, precos):
+  quantidade = int(valores['quantidade'] or 0)
+  preco = _decimal(ItemPedido, 'preco_unitario', valores['preco_unitario'])
+  adicional = _decimal(EspecificacaoProduto, 'preco_adicional', precos.get(valores['especificacao_id']))
+  return valores['pedido_id'], quantidade * (preco + adicional), quantidade
+
+
+CAMPOS_ITEM = ('pedido_id', 'especificacao_id', 'quantidade', 'preco_unitario')
+
+
+def item_salvo(item, created, using=None):
+  atual = {campo: getattr(item, campo) for campo in CAMPOS_ITEM}
+  anterior = None if created else {
+    campo: item.valores_carregados().get(campo, atual[campo]) for campo in CAMPOS_ITEM
+  }
+  if anterior == atual:
+    return
+
+  ids = {atual['especificacao_id']} | ({anterior['especificacao_id']} if anterior else set())
+  precos = _precos_adicionais(item, ids, using)
+  pedido_id, valor, quantidade = _contribuicao(atual, precos)
+  if anterior:
+    pedido_anterior, valor_anterior, quantidade_anterior = _contribuicao(anterior, precos)
+    if pedido_anterior != pedido_id:
+      aplicar_delta(pedido_anterior, -valor_anterior, -quantidade_anterior, using=using)
+    else:
+      valor -= valor_anterior
+      quantidade -= quantidade_anterior
+  aplicar_delta(pedido_id, valor, quantidade, using=using)
+
+
+def item_removido(item, using=None):
+  valores = {campo: item.valores_carregados().get(campo, getattr(item, campo)) for campo in CAMPOS_ITEM}
+  precos = _precos_adicionais(item, {valores['especificacao_id']}, using)
+  pedido_id, valor, quantidade = _contribuicao(valores, precos)
+  aplicar_delta(pedido_id, -valor, -quantidade, using=using)
+
+
+def especificacao_salva(especificacao, created, using=None):
+  if created:
+    return
+  anterior = especificacao.valores_carregados().get('preco_adicional', especificacao.preco_adicional)
+  delta = (
+    _decimal(EspecificacaoProduto, 'preco_adicional', especificacao.preco_adicional)
+    - _decimal(EspecificacaoProduto, 'preco_adicional', anterior)
+  )
+  if not delta:
+    return
+  itens = ItemPedido.objects.using(using).filter(especificacao_id=especificacao.pk)
+  quantidade_por_pedido = (
+    itens.filter(pedido_id=OuterRef('pk'))
+    .values('pedido_id')
+    .annotate(total=Sum('quantidade'))
+    .values('total')
+  )
+  Pedido.objects.using(using).filter(pk__in=itens.values('pedido_id')).update(
+    valor_total=F('valor_total') + ExpressionWrapper(
+      Subquery(quantidade_por_pedido, output_field=IntegerField()) * Value(delta, output_field=VALOR),
+      output_field=VALOR,
+    ),
+  )
+
+
+def frete_salvo(frete, created, using=None):
+  preco = _decimal(ServicoFretagem, 'preco_fretagem', frete.preco_fretagem)
+  if created:
+    aplicar_delta(frete.pedido_id, preco, using=using)
+    return
+  carregados = frete.valores_carregados()
+  pedido_anterior = carregados.get('pedido_id', frete.pedido_id)
+  preco_anterior = _decimal(ServicoFretagem, 'preco_fretagem', carregados.get('preco_fretagem', preco))
+  if pedido_anterior != frete.pedido_id:
+    aplicar_delta(pedido_anterior, -preco_anterior, using=using)
+    aplicar_delta(frete.pedido_id, preco, using=using)
+  else:
+    aplicar_delta(frete.pedido_id, preco - preco_anterior, using=using)
+
+
+def frete_removido(frete, using=None):
+  carregados = frete.valores_carregados()
+  preco = carregados.get('preco_fretagem', frete.preco_fretagem)
+  aplicar_delta(
+    carregados.get('pedido_id', frete.pedido_id),
+    -_decimal(ServicoFretagem, 'preco_fretagem', preco),
+    using=using,
+  )
+
+
+def totais_esperados(pedido_ids, using=None):
+  """Recalcula a partir das tabelas filhas o valor total e a quantidade de itens de cada pedido."""
+  totais = {pk: [ZERO, 0] for pk in pedido_ids}
+  itens = (
+    ItemPedido.objects.using(using)
+    .filter(pedido_id__in=pedido_ids)
+    .values('pedido_id')
+    .annotate(
+      valor=Sum(
+        ExpressionWrapper(
+          F('quantidade') * (
+            F('preco_unitario') + Coalesce(F('especificacao__preco_adicional'), Value(ZERO))
+          ),
+          output_field=VALOR,
+        )
+      ),
+      quantidade=Sum('quantidade'),
+    )
+    .order_by()
+  )
+  for linha in itens:
+    totais[linha['pedido_id']] = [linha['valor'] or ZERO, linha['quantidade'] or 0]
+  fretes = (
+    ServicoFretagem.objects.using(using)
+    .filter(pedido_id__in=pedido_ids)
+    .values('pedido_id')
+    .annotate(valor=Sum('preco_fretagem'))
+    .order_by()
+  )
+  for linha in fretes:
+    totais[linha['pedido_id']][0] += linha['valor'] or ZERO
+  return {pk: (valor.quantize(CENTAVO), quantidade) for pk, (valor, quantidade) in totais.items()}
+
+
+def recalcular_totais(pedido_ids, using=None, aplicar=True):
+  """
+  Corrige os pedidos cujo total divergiu; devolve quantos estavam divergentes. Com
+  ``aplicar``, os pedidos são travados (SELECT ... FOR UPDATE) antes de os filhos serem
+  somados: um delta F() de outra transação já confirmado entra na soma, e um ainda em
+  andamento espera o commit e é somado por cima do total corrigido, sem ser sobrescrito.
+  """
+  pedidos = Pedido.objects.using(using).filter(pk__in=pedido_ids).order_by('pk').only('valor_total', 'quantidade_itens')
+  with transaction.atomic(using=using):
+    if aplicar:
+      pedidos = list(pedidos.select_for_update())
+    esperados = totais_esperados(pedido_ids, using=using)
+    divergentes = []
+    for pedido in pedidos:
+      valor, quantidade = esperados[pedido.pk]
+      if pedido.valor_total != valor or pedido.quantidade_itens != quantidade:
+        pedido.valor_total, pedido.quantidade_itens = valor, quantidade
+        divergentes.append(pedido)
+    if aplicar and divergentes:
+      Pedido.objects.using(using).bulk_update(divergentes, ['valor_total', 'quantidade_itens'])
+  return len(divergentes)
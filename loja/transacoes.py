@@ -0,0 +1,43 @@
+import weakref
+
+from django.db import connections, transaction
+
+# Por conexão, os acumulados ainda não executados, por (classe, pilha de savepoints). Os
+# valores são referências fracas: quem mantém um acumulado vivo é a fila de on_commit do
+# Django, então quando o savepoint ou a transação é desfeito e o callback é descartado,
+# ele também some daqui, sem nenhum código de rollback.
+_pendentes = weakref.WeakKeyDictionary()
+
+
+class AcumuladoNoCommit:
+  """
+  Callback de on_commit que junta o trabalho de uma transação (ou savepoint) para
+  executá-lo de uma vez no commit. ``da_transacao`` devolve o acumulado do nível atual,
+  registrando um novo com transaction.on_commit na primeira vez; as subclasses
+  implementam ``executar``.
+  """
+
+  def __init__(self, using):
+    self.using = using
+
+  @classmethod
+  def da_transacao(cls, using):
+    conexao = connections[using]
+    pendentes = _pendentes.setdefault(conexao, weakref.WeakValueDictionary())
+    chave = (cls, tuple(conexao.savepoint_ids))
+    acumulado = pendentes.get(chave)
+    if acumulado is None:
+      acumulado = cls(using)
+      acumulado._pendentes, acumulado._chave = pendentes, chave
+      pendentes[chave] = acumulado
+      transaction.on_commit(acumulado, using=using)
+    return acumulado
+
+  def __call__(self):
+    # Executado, não recebe mais trabalho: o próximo da_transacao no mesmo nível cria outro.
+    if self._pendentes.get(self._chave) is self:
+      del self._pendentes[self._chave]
+    self.executar()
+
+  def executar(self):
+    raise NotImplementedError
@@ -0,0 +1,23 @@
+from django.urls import path
+
+from loja import views
+
+app_name = 'loja'
+
+urlpatterns = [
+  path('api/produtos/', views.produtos, name='api_produtos'),
+  path('api/pedidos/', views.pedidos, name='api_pedidos'),
+  path('api/avaliacoes/', views.avaliacoes, name='api_avaliacoes'),
+  path('api/produtos/facetas/', views.facetas_produtos, name='api_facetas_produtos'),
+  path('api/produtos/busca/', views.busca_produtos, name='api_busca_produtos'),
+  path('api/produtos/<int:produto_id>/', views.produto_detalhe, name='api_produto'),
+  path('api/pedidos/<int:pedido_id>/status/', views.status_pedido, name='api_status_pedido'),
+  path('api/frete/cotacoes/', views.cotacoes_frete, name='api_cotacoes_frete'),
+  path('api/async/produtos/', views.produtos_async, name='api_async_produtos'),
+  path('api/async/produtos/<int:produto_id>/', views.produto_detalhe_async, name='api_async_produto'),
+  path('api/async/pedidos/<int:pedido_id>/status/', views.status_pedido_async, name='api_async_status_pedido'),
+  path('api/async/login/', views.login_async, name='api_async_login'),
+  path('exportacao/pedidos/', views.exportar_pedidos, name='exportar_pedidos'),
+  path('monitoramento/catalogo/', views.estatisticas_catalogo, name='estatisticas_catalogo'),
+  path('monitoramento/consultas/', views.consultas_recentes, name='consultas_recentes'),
+]
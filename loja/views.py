@@ -1,3 +1,388 @@
-from django.shortcuts import render
+import asyncio
+import dataclasses
+import datetime
+import decimal
+import json
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET, require_POST
+
+from loja import busca, catalogo, exportacao, facetas, frete, instrumentacao, routers, senhas
+from loja.historico import historico_pedido
+from loja.models import Avaliacao, ItemPedido, Pedido, Produto
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+
+CAMPOS_PRODUTO = ('id', 'nome', 'preco', 'estoque', 'fornecedor_id')
+CAMPOS_PEDIDO = ('id', 'usuario_id', 'data_pedido', 'status', 'valor_total', 'quantidade_itens')
+CAMPOS_ITEM = ('id', 'pedido_id', 'produto_id', 'especificacao_id', 'quantidade', 'preco_unitario')
+CAMPOS_AVALIACAO = ('id', 'produto_id', 'usuario_id', 'nota', 'comentario')
+LIMITE_HISTORICO = 20
+# Chave da sessão com o id do Usuario autenticado por login_async.
+SESSAO_USUARIO = 'loja_usuario_id'
+NAO_AUTENTICADO = "Faça login para ver pedidos."
+
+
+class ParametroInvalido(ValueError):
+  pass
+
+
+class NaoAutenticado(Exception):
+  pass
+
+
+def _e_staff(usuario):
+  return usuario.is_active and usuario.is_staff
+
+
+def _dono_dos_pedidos(request):
+  """
+  Id do Usuario cujos pedidos a requisição pode ver, guardado na sessão por login_async;
+  None para staff do admin, que vê os de todos. Sem nenhum dos dois, NaoAutenticado.
+  """
+  if _e_staff(request.user):
+    return None
+  usuario_id = request.session.get(SESSAO_USUARIO)
+  if usuario_id is None:
+    raise NaoAutenticado
+  return usuario_id
+
+
+async def _adono_dos_pedidos(request):
+  if _e_staff(await request.auser()):
+    return None
+  usuario_id = await request.session.aget(SESSAO_USUARIO)
+  if usuario_id is None:
+    raise NaoAutenticado
+  return usuario_id
+
+
+def _do_dono(pedidos, dono):
+  return pedidos if dono is None else pedidos.filter(usuario_id=dono)
+
+
+def _inteiro(request, nome, padrao=None):
+  valor = request.GET.get(nome)
+  if valor in (None, ''):
+    return padrao
+  try:
+    return int(valor)
+  except ValueError:
+    raise ParametroInvalido(f"Parâmetro '{nome}' deve ser um inteiro.")
+
+
+def _decimal(request, nome):
+  valor = request.GET.get(nome)
+  if valor in (None, ''):
+    return None
+  try:
+    return decimal.Decimal(valor)
+  except decimal.InvalidOperation:
+    raise ParametroInvalido(f"Parâmetro '{nome}' deve ser um número.")
+
+
+def _limite(request):
+  return max(1, min(_inteiro(request, 'limite', LIMITE_PADRAO), LIMITE_MAXIMO))
+
+
+def _cursor_pedido(valor):
+  """Cursor de pedidos no formato ``AAAA-MM-DD_id``, o último (data_pedido, id) da página anterior."""
+  try:
+    data, pk = valor.split('_', 1)
+    return datetime.date.fromisoformat(data), int(pk)
+  except ValueError:
+    raise ParametroInvalido("Parâmetro 'depois' inválido.")
+
+
+def _json_em_fluxo(resultados, proximo):
+  """Serializa a página objeto a objeto, sem montar o documento inteiro em memória."""
+  encoder = DjangoJSONEncoder(ensure_ascii=False)
+  yield '{"proximo": %s, "resultados": [' % json.dumps(proximo)
+  for indice, resultado in enumerate(resultados):
+    yield (',' if indice else '') + encoder.encode(resultado)
+  yield ']}'
+
+
+def _pagina(queryset, limite):
+  linhas = list(queryset[:limite + 1])
+  return linhas[:limite], len(linhas) > limite
+
+
+def _api(view):
+  def wrapper(request, *args, **kwargs):
+    try:
+      resultados, proximo = view(request, *args, **kwargs)
+    except ParametroInvalido as erro:
+      return JsonResponse({'erro': str(erro)}, status=400)
+    except NaoAutenticado:
+      return JsonResponse({'erro': NAO_AUTENTICADO}, status=401)
+    return StreamingHttpResponse(_json_em_fluxo(resultados, proximo), content_type='application/json')
+  wrapper.__name__ = view.__name__
+  wrapper.__doc__ = view.__doc__
+  return require_GET(wrapper)
+
+
+def _proximo_por_id(linhas, limite):
+  pagina = linhas[:limite]
+  return pagina, (pagina[-1]['id'] if len(linhas) > limite else None)
+
+
+def _consulta_produtos(request):
+  queryset = Produto.objects.order_by('id').values(*CAMPOS_PRODUTO)
+  fornecedor = _inteiro(request, 'fornecedor')
+  if fornecedor is not None:
+    queryset = queryset.filter(fornecedor_id=fornecedor)
+  depois = _inteiro(request, 'depois')
+  if depois is not None:
+    queryset = queryset.filter(id__gt=depois)
+  limite = _limite(request)
+  return queryset[:limite + 1], limite
+
+
+@_api
+def produtos(request):
+  """Produtos por id crescente; ``depois`` é o último id recebido."""
+  queryset, limite = _consulta_produtos(request)
+  return _proximo_por_id(list(queryset), limite)
+
+
+@_api
+def pedidos(request):
+  """
+  Pedidos por (data_pedido, id) com seus itens; ``depois`` é o cursor ``data_id`` recebido.
+  Cada usuário vê só os próprios pedidos; staff vê todos e pode filtrar por ``usuario``.
+  """
+  queryset = Pedido.objects.order_by('data_pedido', 'id').values(*CAMPOS_PEDIDO)
+  queryset = _do_dono(queryset, _dono_dos_pedidos(request))
+  usuario = _inteiro(request, 'usuario')
+  if usuario is not None:
+    queryset = queryset.filter(usuario_id=usuario)
+  if request.GET.get('status'):
+    queryset = queryset.filter(status=request.GET['status'])
+  if request.GET.get('depois'):
+    data, pk = _cursor_pedido(request.GET['depois'])
+    queryset = queryset.filter(Q(data_pedido__gt=data) | Q(data_pedido=data, id__gt=pk))
+
+  pagina, ha_mais = _pagina(queryset, _limite(request))
+  itens = {pedido['id']: [] for pedido in pagina}
+  for item in ItemPedido.objects.filter(pedido_id__in=itens).order_by('id').values(*CAMPOS_ITEM):
+    itens[item['pedido_id']].append(item)
+  for pedido in pagina:
+    pedido['itens'] = itens[pedido['id']]
+
+  proximo = f"{pagina[-1]['data_pedido'].isoformat()}_{pagina[-1]['id']}" if ha_mais else None
+  return pagina, proximo
+
+
+@_api
+def avaliacoes(request):
+  """Avaliações por id crescente, opcionalmente de um produto; ``depois`` é o último id recebido."""
+  queryset = Avaliacao.objects.order_by('id').values(*CAMPOS_AVALIACAO)
+  produto = _inteiro(request, 'produto')
+  if produto is not None:
+    queryset = queryset.filter(produto_id=produto)
+  depois = _inteiro(request, 'depois')
+  if depois is not None:
+    queryset = queryset.filter(id__gt=depois)
+
+  pagina, ha_mais = _pagina(queryset, _limite(request))
+  return pagina, (pagina[-1]['id'] if ha_mais else None)
+
+
+@_api
+def busca_produtos(request):
+  """Produtos que contêm os termos de ``q``, do mais ao menos relevante; filtra por preço e fornecedor."""
+  resultados = busca.buscar(
+    request.GET.get('q', ''),
+    preco_min=_decimal(request, 'preco_min'),
+    preco_max=_decimal(request, 'preco_max'),
+    fornecedor=_inteiro(request, 'fornecedor'),
+    limite=_limite(request),
+  )
+  return resultados, None
+
+
+def _produto_detalhe(dados, estoque):
+  """A página do produto vem do cache (loja.catalogo); o estoque, que muda a cada reserva, do banco."""
+  return {**dados, 'estoque': estoque}
+
+
+def _estoque(produto_id):
+  return Produto.objects.filter(pk=produto_id).values_list('estoque', flat=True)
+
+
+def _consultas_status_pedido(pedido_id):
+  return (
+    Pedido.objects.filter(pk=pedido_id).values('id', 'status', 'data_pedido', 'valor_total'),
+    historico_pedido(pedido_id)[:LIMITE_HISTORICO],
+  )
+
+
+def _json(dados, status=200):
+  return JsonResponse(dados, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+@require_GET
+def produto_detalhe(request, produto_id):
+  estoque = _estoque(produto_id).first()
+  if estoque is None:
+    return _json({'erro': "Produto não encontrado."}, status=404)
+  try:
+    dados = catalogo.obter_produto(produto_id)
+  except Produto.DoesNotExist:
+    return _json({'erro': "Produto não encontrado."}, status=404)
+  return _json(_produto_detalhe(dados, estoque))
+
+
+@require_GET
+def status_pedido(request, pedido_id):
+  try:
+    dono = _dono_dos_pedidos(request)
+  except NaoAutenticado:
+    return _json({'erro': NAO_AUTENTICADO}, status=401)
+  pedido, historico = _consultas_status_pedido(pedido_id)
+  # Pedido de outro usuário responde como inexistente, para não revelar quais ids existem.
+  pedido = _do_dono(pedido, dono).first()
+  if pedido is None:
+    return _json({'erro': "Pedido não encontrado."}, status=404)
+  return _json({**pedido, 'historico': list(historico)})
+
+
+@require_GET
+def facetas_produtos(request):
+  """Total e contagens por tamanho, cor, fornecedor e faixa de preço; cada faceta aceita vários valores."""
+  filtros = {faceta: request.GET.getlist(faceta) for faceta in facetas.FACETAS}
+  try:
+    filtros['fornecedor'] = [int(valor) for valor in filtros['fornecedor']]
+  except ValueError:
+    return _json({'erro': "Parâmetro 'fornecedor' deve ser um inteiro."}, status=400)
+  return _json(facetas.contagens(filtros))
+
+
+@require_GET
+def cotacoes_frete(request):
+  """Ofertas de frete para ``cep`` e ``peso`` (gramas), da mais barata para a mais cara."""
+  try:
+    peso = _inteiro(request, 'peso')
+    if peso is None:
+      raise ParametroInvalido("Parâmetro 'peso' é obrigatório.")
+    cotacoes = frete.cotar(request.GET.get('cep', ''), peso)
+  except ValueError as erro:
+    return _json({'erro': str(erro)}, status=400)
+  return _json({'cotacoes': [dataclasses.asdict(cotacao) for cotacao in cotacoes]})
+
+
+# Versões assíncronas para o servidor ASGI. As consultas independentes são disparadas
+# juntas com asyncio.gather; o ORM assíncrono do Django ainda executa cada consulta em
+# sync_to_async, então o ganho vem de não prender um worker enquanto o MySQL responde.
+
+async def _listar(queryset):
+  return [linha async for linha in queryset]
+
+
+@require_GET
+async def produtos_async(request):
+  try:
+    queryset, limite = _consulta_produtos(request)
+  except ParametroInvalido as erro:
+    return _json({'erro': str(erro)}, status=400)
+  pagina, proximo = _proximo_por_id(await _listar(queryset), limite)
+  return _json({'proximo': proximo, 'resultados': pagina})
+
+
+@require_GET
+async def produto_detalhe_async(request, produto_id):
+  estoque = await _estoque(produto_id).afirst()
+  if estoque is None:
+    return _json({'erro': "Produto não encontrado."}, status=404)
+  try:
+    # O cache é síncrono; num acerto não há consulta, só a leitura do cache compartilhado.
+    dados = await sync_to_async(catalogo.obter_produto)(produto_id)
+  except Produto.DoesNotExist:
+    return _json({'erro': "Produto não encontrado."}, status=404)
+  return _json(_produto_detalhe(dados, estoque))
+
+
+@require_GET
+async def status_pedido_async(request, pedido_id):
+  try:
+    dono = await _adono_dos_pedidos(request)
+  except NaoAutenticado:
+    return _json({'erro': NAO_AUTENTICADO}, status=401)
+  pedido, historico = _consultas_status_pedido(pedido_id)
+  # O histórico vem junto, mas só é devolvido se o pedido for de quem pediu.
+  pedido, historico = await asyncio.gather(_do_dono(pedido, dono).afirst(), _listar(historico))
+  if pedido is None:
+    return _json({'erro': "Pedido não encontrado."}, status=404)
+  return _json({**pedido, 'historico': historico})
+
+
+@require_POST
+async def login_async(request):
+  """
+  Recebe ``{"email", "senha"}`` em JSON e guarda o usuário na sessão. A verificação do hash
+  roda no executor de loja.senhas, sem prender o loop de eventos.
+  """
+  try:
+    dados = json.loads(request.body)
+    email, senha = dados['email'], dados['senha']
+    if not isinstance(email, str) or not isinstance(senha, str):
+      raise TypeError
+  except (ValueError, KeyError, TypeError):
+    return _json({'erro': "Envie 'email' e 'senha' num objeto JSON."}, status=400)
+  usuario = await senhas.aautenticar(email, senha)
+  if usuario is None:
+    return _json({'erro': "Email ou senha inválidos."}, status=401)
+  await request.session.acycle_key()
+  await request.session.aset(SESSAO_USUARIO, usuario.pk)
+  return _json({'id': usuario.pk, 'nome': usuario.nome, 'email': usuario.email})
+
+
+@staff_member_required
+@require_GET
+def exportar_pedidos(request):
+  """Pedidos de ``mes`` (AAAA-MM) em CSV ou JSONL, gerados enquanto são enviados; ``gzip=1`` comprime."""
+  formato = request.GET.get('formato', 'csv')
+  if formato not in exportacao.FORMATOS:
+    return _json({'erro': f"Formato deve ser um de: {', '.join(exportacao.FORMATOS)}."}, status=400)
+  try:
+    inicio, fim = exportacao.periodo_do_mes(request.GET.get('mes', ''))
+  except ValueError:
+    return _json({'erro': "Parâmetro 'mes' deve estar no formato AAAA-MM."}, status=400)
+
+  comprimir = request.GET.get('gzip') == '1'
+  nome = f"pedidos-{inicio:%Y-%m}.{formato}" + ('.gz' if comprimir else '')
+  if comprimir:
+    tipo = 'application/gzip'
+  else:
+    tipo = 'text/csv; charset=utf-8' if formato == 'csv' else 'application/x-ndjson; charset=utf-8'
+  resposta = StreamingHttpResponse(
+    exportacao.exportar(inicio, fim, formato=formato, comprimir=comprimir, using=routers.banco_de_leitura(Pedido)),
+    content_type=tipo,
+  )
+  resposta['Content-Disposition'] = f'attachment; filename="{nome}"'
+  return resposta
+
+
+@staff_member_required
+def estatisticas_catalogo(request):
+  return JsonResponse(catalogo.estatisticas())
+
+
+@staff_member_required
+def consultas_recentes(request):
+  """Últimas requisições medidas por InstrumentacaoConsultasMiddleware neste processo."""
+  try:
+    limite = _inteiro(request, 'limite')
+  except ParametroInvalido as erro:
+    return _json({'erro': str(erro)}, status=400)
+  config = instrumentacao.configuracao()
+  return _json({
+    'amostragem': config['AMOSTRAGEM'],
+    'requisicoes': instrumentacao.registros().recentes(limite),
+  })
@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'projeto_django.settings')
 
 application = get_asgi_application()
+
+from loja import facetas  # noqa: E402
+
+facetas.aquecer()
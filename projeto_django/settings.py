@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +49,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'loja.middleware.FixarPrimarioMiddleware',
+    'loja.middleware.InstrumentacaoConsultasMiddleware',
 ]
 
 ROOT_URLCONF = 'projeto_django.urls'
@@ -74,14 +77,35 @@ WSGI_APPLICATION = 'projeto_django.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+def _env_idade_conexao(nome, padrao):
+    valor = os.environ.get(nome, padrao)
+    return None if valor.lower() == 'none' else int(valor)
+
+
+def _env_booleano(nome, padrao='0'):
+    return os.environ.get(nome, padrao).lower() in ('1', 'true', 'sim')
+
+
+# Conexões: LOJA_DB_CONN_MAX_AGE mantém a conexão aberta entre requisições (segundos,
+# "none" para sem limite), validada no início de cada requisição com LOJA_DB_HEALTH_CHECKS.
+# LOJA_DB_POOL=1 troca o backend por loja.backends.mysql_pool, que devolve a conexão a um
+# pool do processo no fim da requisição; nesse modo CONN_MAX_AGE fica em 0.
+LOJA_DB_POOL = _env_booleano('LOJA_DB_POOL')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'nome_do_banco',
-        'USER': 'root',
-        'PASSWORD': 'Root',
-        'HOST': 'localhost',  # ou o IP do servidor
-        'PORT': '3306',  # Porta do MySQL
+        'ENGINE': 'loja.backends.mysql_pool' if LOJA_DB_POOL else 'django.db.backends.mysql',
+        'NAME': os.environ.get('LOJA_DB_NAME', 'nome_do_banco'),
+        'USER': os.environ.get('LOJA_DB_USER', 'root'),
+        'PASSWORD': os.environ.get('LOJA_DB_PASSWORD', 'Root'),
+        'HOST': os.environ.get('LOJA_DB_HOST', 'localhost'),  # ou o IP do servidor
+        'PORT': os.environ.get('LOJA_DB_PORT', '3306'),  # Porta do MySQL
+        'CONN_MAX_AGE': 0 if LOJA_DB_POOL else _env_idade_conexao('LOJA_DB_CONN_MAX_AGE', '0'),
+        'CONN_HEALTH_CHECKS': _env_booleano('LOJA_DB_HEALTH_CHECKS'),
+        'POOL': {
+            'TAMANHO': int(os.environ.get('LOJA_DB_POOL_TAMANHO', '10')),
+            'ESPERA': int(os.environ.get('LOJA_DB_POOL_ESPERA', '30')),
+        },
         'TEST': {
             'NAME': 'test_nome_do_banco',
             'MIRROR': 'default',
@@ -89,6 +113,29 @@ DATABASES = {
     }
 }
 
+# Réplica de leitura para relatórios e listagens do admin (loja.routers); sem
+# LOJA_DB_REPLICA_HOST todas as consultas continuam no default.
+if os.environ.get('LOJA_DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['LOJA_DB_REPLICA_HOST'],
+        'PORT': os.environ.get('LOJA_DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['loja.routers.RoteadorReplica']
+
+# Cache compartilhado entre os processos: as versões de loja.catalogo e o diário de
+# mudanças de loja.facetas só chegam aos outros workers por ele. Sem LOJA_CACHE_REDIS
+# cada processo usa o próprio LocMemCache, o que só serve para um processo (ou testes).
+if os.environ.get('LOJA_CACHE_REDIS'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['LOJA_CACHE_REDIS'],
+        },
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -130,3 +177,76 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Loja
+
+# Cache de leitura das páginas de produto (loja.catalogo).
+LOJA_CATALOGO_CACHE = {
+    'CACHE': 'default',
+    'TIMEOUT': 300,
+    'LRU_MAXIMO': 1024,
+    'LRU_TTL': 30,
+}
+
+# Contagens de facetas em memória das listagens de produto (loja.facetas). Com
+# LOJA_FACETAS_AQUECER=1 cada worker monta o índice ao subir, e não na primeira consulta.
+LOJA_FACETAS = {
+    'CACHE': 'default',
+    'TIMEOUT_MUDANCAS': 3600,
+    'MAX_IDADE': 900,
+    'AQUECER': _env_booleano('LOJA_FACETAS_AQUECER'),
+    'FAIXAS_PRECO': (50, 100, 200, 500),
+}
+
+# Roteamento de leituras para a réplica (loja.routers). Os relatórios (listagens do
+# admin, exportação de pedidos) leem da réplica com usar_replica(); MODELOS manda para lá
+# todas as leituras de um modelo e fica vazio.
+LOJA_REPLICA = {
+    'ALIAS': 'replica',
+    'MODELOS': [],
+    'FIXAR_POR': 5,
+}
+
+# Cotação de frete (loja.frete). As tabelas de exemplo ficam em loja/tabelas_frete.
+LOJA_FRETE = {
+    'WORKERS': 2,
+    'ESPERA': 2.0,
+    'TTL': 600,
+    'MEMO_MAXIMO': 4096,
+    'DIGITOS_CEP': 5,
+    'FAIXA_PESO': 500,
+}
+
+# Contagem de consultas e tempo de banco por requisição (loja.instrumentacao). Com
+# AMOSTRAGEM em 0 o middleware não mede nada.
+LOJA_INSTRUMENTACAO = {
+    'AMOSTRAGEM': float(os.environ.get('LOJA_INSTRUMENTACAO_AMOSTRAGEM', '0')),
+    'SERVER_TIMING': _env_booleano('LOJA_INSTRUMENTACAO_SERVER_TIMING'),
+    'REGISTROS': 200,
+    'LENTAS': 5,
+    'REPETICOES': 3,
+}
+
+# Instantâneo colunar (numpy) para os relatórios de loja.analise e manage.py loja_analise.
+LOJA_ANALISE = {
+    'DIRETORIO': str(BASE_DIR / 'var' / 'analise'),
+    'TAMANHO_LOTE': 50000,
+    'MAX_IDADE': 3600,
+}
+
+# Hashes das senhas de loja.Usuario. O primeiro é o usado para gravar; os demais só
+# verificam hashes antigos, que são refeitos com o primeiro no próximo login. PBKDF2Loja
+# substitui o pbkdf2_sha256 do Django, com o custo de LOJA_SENHAS['ITERACOES'].
+PASSWORD_HASHERS = [
+    'loja.senhas.PBKDF2Loja',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+LOJA_SENHAS = {
+    'ITERACOES': int(os.environ['LOJA_SENHAS_ITERACOES']) if os.environ.get('LOJA_SENHAS_ITERACOES') else None,
+    'WORKERS': 4,
+}
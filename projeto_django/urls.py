@@ -1,5 +1,5 @@
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
 from django.http import HttpResponse
 
 def home(request):
@@ -7,6 +7,7 @@ def home(request):
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('loja/', include('loja.urls')),
     path('', home),  
     
 ]
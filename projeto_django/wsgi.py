@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'projeto_django.settings')
 
 application = get_wsgi_application()
+
+from loja import facetas  # noqa: E402
+
+facetas.aquecer()